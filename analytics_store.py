@@ -0,0 +1,533 @@
+import contextlib
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import database as db
+
+# Columnar analytics snapshot
+# Each tenant's transactions and line items are copied out of the OLTP
+# SQLite file into column files next to it (<db>_analytics/<account_id>/):
+# Parquet parts when pyarrow is installed, otherwise raw NumPy arrays that are
+# memory-mapped on read (zero-copy; the OS page cache is shared by every
+# Streamlit session). Syncs are incremental by rowid, so the nightly job and
+# the pages' TTL refresh only read rows added since the previous sync; each
+# adds one Parquet part per table, merged back into one every COMPACT_PARTS
+# syncs (and by the nightly job).
+# Report queries (Dashboard, ChurnGuard full re-score, GeoViz, IsoBar) then
+# run as vectorized NumPy / pandas over the arrays instead of SQL over the
+# live database.
+
+CHUNK_ROWS = 50_000
+SNAPSHOT_TTL = 300  # Seconds before a page-triggered read re-syncs the tail
+COMPACT_PARTS = 16  # Parquet parts per table before a sync merges them into one
+DAY = 86_400
+
+# Column layout. Strings are dictionary-encoded (codes index manifest['dicts']).
+TABLES = {
+    'transactions': (('rowid', 'i8'), ('ts', 'i8'), ('amount', 'f8'), ('profit', 'f8'),
+                     ('points', 'f8'), ('customer', 'i4'), ('payment', 'i2')),
+    'items': (('txn', 'i4'), ('ts', 'i8'), ('product', 'i4'), ('qty', 'f8'), ('price', 'f8'), ('cost', 'f8')),
+}
+
+_SNAPSHOTS = {}  # path -> (manifest mtime_ns, snapshot)
+_SYNC_LOCKS = {}  # path -> threading.Lock (one sync per tenant in this process)
+_LOCK = threading.Lock()
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def snapshot_dir(account_id):
+    return os.path.join(f"{os.path.splitext(db.DB_NAME)[0]}_analytics", str(account_id))
+
+
+def _manifest_path(path):
+    return os.path.join(path, "manifest.json")
+
+
+def _read_manifest(path):
+    try:
+        with open(_manifest_path(path), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(path, meta):
+    """Atomic: readers see either the previous sync or this one, never a mix."""
+    tmp = _manifest_path(path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, _manifest_path(path))
+
+
+def _empty_manifest(backend):
+    return {
+        'backend': backend, 'txn_rowid': 0, 'item_rowid': 0,
+        'rows': {'transactions': 0, 'items': 0}, 'parts': {'transactions': [], 'items': []},
+        'dicts': {'customers': [], 'payments': [], 'products': []},
+        'dims': {'products': {}, 'customers': {}},
+        'max_timestamp': None, 'synced_at': None, 'synced_epoch': 0.0,
+    }
+
+
+# --- Storage backends ---
+
+def _append(path, meta, table, cols):
+    """Appends one chunk of columns. Rows count only once the manifest is written."""
+    n = meta['rows'][table]
+    if meta['backend'] == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        os.makedirs(os.path.join(path, table), exist_ok=True)
+        part = f"{table}/part-{n:012d}-{n + len(cols[TABLES[table][0][0]]):012d}.parquet"  # Rows [start, end)
+        pq.write_table(pa.table({name: np.asarray(cols[name], dtype) for name, dtype in TABLES[table]}), os.path.join(path, part))
+        meta['parts'][table].append(part)
+    else:
+        for name, dtype in TABLES[table]:
+            with open(os.path.join(path, f"{table}.{name}.bin"), "ab") as f:
+                f.truncate(n * np.dtype(dtype).itemsize)  # Drop bytes left by an interrupted sync
+                f.write(np.ascontiguousarray(cols[name], dtype=dtype).tobytes())
+    meta['rows'][table] = n + len(cols[TABLES[table][0][0]])
+
+
+def _read_columns(path, meta, table, columns=None):
+    n = meta['rows'][table]
+    layout = [(name, dtype) for name, dtype in TABLES[table] if columns is None or name in columns]
+    if n == 0:
+        return {name: np.empty(0, dtype) for name, dtype in layout}
+    if meta['backend'] == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        names = [name for name, _ in layout]
+        tbl = pa.concat_tables([pq.read_table(os.path.join(path, p), columns=names, memory_map=True) for p in meta['parts'][table]])
+        return {name: tbl.column(name).to_numpy() for name in names}
+    return {name: np.memmap(os.path.join(path, f"{table}.{name}.bin"), dtype=dtype, mode="r", shape=(n,))
+            for name, dtype in layout}
+
+
+def _compact(path, meta, table):
+    """
+    Merges a table's Parquet parts into one file, one part at a time (row groups
+    are kept, memory stays flat). The old parts are deleted by the next sync's
+    _sweep, so readers holding the previous manifest can still open them.
+    """
+    import pyarrow.parquet as pq
+    parts = meta['parts'][table]
+    merged = f"{table}/part-{0:012d}-{meta['rows'][table]:012d}.parquet"
+    with pq.ParquetWriter(os.path.join(path, merged), pq.read_schema(os.path.join(path, parts[0]))) as writer:
+        for part in parts:
+            writer.write_table(pq.read_table(os.path.join(path, part)))
+    meta['parts'][table] = [merged]
+
+
+def _sweep(path, meta):
+    """Deletes Parquet parts the manifest no longer lists (compacted, or left by a failed sync)."""
+    for table in TABLES:
+        listed = {os.path.basename(p) for p in meta['parts'][table]}
+        folder = os.path.join(path, table)
+        for name in os.listdir(folder) if os.path.isdir(folder) else []:
+            if name not in listed:
+                try:
+                    os.remove(os.path.join(folder, name))
+                except OSError:
+                    pass  # Still open on Windows: retried next sync
+
+
+def _positions(heads, rowids, offset=0):
+    """offset + index of each head rowid in the sorted `rowids` array (-1 where absent)."""
+    if len(rowids) == 0:
+        return np.full(len(heads), -1, dtype=np.int64)
+    pos = np.minimum(np.searchsorted(rowids, heads), len(rowids) - 1)
+    return np.where(rowids[pos] == heads, pos + offset, -1)
+
+
+# --- Sync ---
+
+def _epoch_seconds(values):
+    """SQLite timestamp strings -> int64 epoch seconds (0 for NULL / unparseable)."""
+    ts = pd.to_datetime(pd.Series(values, dtype=object), format="ISO8601", errors="coerce")
+    out = ts.to_numpy(dtype="datetime64[s]").astype(np.int64)
+    out[ts.isna().to_numpy()] = 0
+    return out
+
+
+def _encode(values, keys):
+    """Dictionary-encodes values, appending unseen ones to `keys` (codes stay stable across syncs)."""
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+    index = {k: i for i, k in enumerate(keys)}
+    lut = np.empty(len(uniques), dtype=np.int32)
+    for k, value in enumerate(uniques):
+        if value not in index:
+            index[value] = len(keys)
+            keys.append(value)
+        lut[k] = index[value]
+    out = np.full(len(codes), -1, dtype=np.int32)
+    known = codes >= 0
+    out[known] = lut[codes[known]]
+    return out
+
+
+def _lock_file(f, wait):
+    """OS-level exclusive lock on an open file (released when it is closed). False if busy."""
+    try:
+        import fcntl
+    except ImportError:  # Windows
+        import msvcrt
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if wait else msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+@contextlib.contextmanager
+def _sync_lock(path, wait=False):
+    """
+    One sync per tenant at a time: a threading.Lock for the Streamlit sessions
+    of this process plus a lock on <snapshot dir>.lock for other processes
+    (the nightly cron job). Yields False when another sync holds it.
+    """
+    with _LOCK:
+        lock = _SYNC_LOCKS.setdefault(path, threading.Lock())
+    if not lock.acquire(blocking=wait):
+        yield False
+        return
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.lock", "ab") as f:
+            yield _lock_file(f, wait)
+    finally:
+        lock.release()
+
+
+def refresh_snapshot(full=False, account_id=None, chunk_rows=CHUNK_ROWS, wait=False, compact=False):
+    """
+    Syncs one tenant's snapshot with the live database.
+    Incremental by rowid (only rows added since the last sync are read), in one
+    read transaction so heads and line items come from the same state.
+    full=True rebuilds from scratch (e.g. after bulk edits of old bills).
+    Skipped when another session or process is already syncing the tenant
+    (wait=True blocks until it is done instead).
+    Parquet parts are merged once a table has COMPACT_PARTS of them
+    (compact=True merges any number, as the nightly job does).
+    Returns (Success, Msg).
+    """
+    aid = account_id if account_id is not None else db.get_current_account_id()
+    path = snapshot_dir(aid)
+    with _sync_lock(path, wait) as acquired:
+        if not acquired:
+            return True, "Sync already running; skipped."
+        return _sync(aid, path, full, chunk_rows, compact)
+
+
+def _sync(aid, path, full, chunk_rows, compact=False):
+    backend = 'parquet' if parquet_available() else 'memmap'
+    t0 = time.perf_counter()
+    meta = None if full else _read_manifest(path)
+    if meta is None or meta['backend'] != backend:
+        shutil.rmtree(path, ignore_errors=True)
+        meta = _empty_manifest(backend)
+    os.makedirs(path, exist_ok=True)
+    if backend == 'parquet':
+        _sweep(path, meta)
+    dicts = meta['dicts']
+    before = dict(meta['rows'])
+    old_txn_rowid = meta['txn_rowid']
+    new_rowids = []  # Heads added by this sync: items are linked to them without re-reading the snapshot
+
+    conn = db.get_connection(read_only=True)
+    try:
+        conn.execute("BEGIN")
+        top_txn = conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM transactions").fetchone()[0]
+        top_item = conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM transaction_items").fetchone()[0]
+
+        # 1. Bill heads
+        cur = conn.execute('''
+            SELECT rowid, timestamp, total_amount, total_profit, COALESCE(points_redeemed, 0), customer_id, payment_method
+            FROM transactions WHERE account_id = ? AND rowid > ? AND rowid <= ?
+            ORDER BY rowid
+        ''', (aid, meta['txn_rowid'], top_txn))
+        while True:
+            rows = cur.fetchmany(chunk_rows)
+            if not rows:
+                break
+            rowid, ts, amount, profit, points, customer, payment = zip(*rows)
+            new_rowids.extend(rowid)
+            stamps = [t for t in ts if t]
+            if stamps:
+                meta['max_timestamp'] = max(meta['max_timestamp'] or "", str(max(stamps)))
+            _append(path, meta, 'transactions', {
+                'rowid': rowid, 'ts': _epoch_seconds(ts), 'amount': amount, 'profit': profit, 'points': points,
+                'customer': _encode(customer, dicts['customers']), 'payment': _encode(payment, dicts['payments']),
+            })
+
+        # 2. Line items, linked to their head's position in the snapshot. Heads added
+        # by this sync are looked up in memory; the snapshot's rowid column is read
+        # only for items added to bills that were already synced (rare).
+        new_rowids = np.asarray(new_rowids, dtype=np.int64)
+        new_offset = before['transactions']
+        old_rowids = None
+        cur = conn.execute('''
+            SELECT t.rowid, t.timestamp, ti.product_id, ti.product_name, ti.quantity, ti.price_at_sale, ti.cost_at_sale
+            FROM transaction_items ti JOIN transactions t ON t.id = ti.transaction_id
+            WHERE t.account_id = ? AND ti.rowid > ? AND ti.rowid <= ?
+            ORDER BY ti.rowid
+        ''', (aid, meta['item_rowid'], top_item))
+        while True:
+            rows = cur.fetchmany(chunk_rows)
+            if not rows:
+                break
+            head, ts, product_id, product_name, qty, price, cost = zip(*rows)
+            head = np.asarray(head, dtype=np.int64)
+            pos = _positions(head, new_rowids, new_offset)
+            old = head <= old_txn_rowid
+            if old.any():
+                if old_rowids is None:
+                    old_rowids = np.asarray(_read_columns(path, meta, 'transactions', ['rowid'])['rowid'][:new_offset])
+                pos[old] = _positions(head[old], old_rowids)
+            found = pos >= 0
+            keys = [f"{pid or ''}\x1f{name or ''}" for pid, name in zip(product_id, product_name)]
+            cols = {
+                'txn': pos, 'ts': _epoch_seconds(ts), 'product': _encode(keys, dicts['products']),
+                'qty': np.asarray(qty, dtype=float), 'price': np.asarray(price, dtype=float), 'cost': np.asarray(cost, dtype=float),
+            }
+            if found.any():
+                _append(path, meta, 'items', {k: np.asarray(v)[found] for k, v in cols.items()})
+
+        # 3. Dimensions (small): current category per product, address per customer
+        meta['dims']['products'] = dict(conn.execute("SELECT id, category FROM products WHERE account_id = ?", (aid,)).fetchall())
+        meta['dims']['customers'] = {r[0]: list(r[1:]) for r in conn.execute(
+            "SELECT id, name, phone, email, city, pincode FROM customers WHERE account_id = ?", (aid,))}
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"Analytics Snapshot Error ({aid}): {e}")
+        return False, str(e)
+    finally:
+        conn.close()
+
+    meta['txn_rowid'], meta['item_rowid'] = top_txn, top_item
+    if backend == 'parquet':
+        for table in TABLES:
+            if len(meta['parts'][table]) >= (2 if compact else COMPACT_PARTS):
+                try:
+                    _compact(path, meta, table)
+                except Exception as e:  # The parts stay valid; retried next sync
+                    print(f"Analytics Compaction Error ({aid}, {table}): {e}")
+    meta['synced_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    meta['synced_epoch'] = time.time()
+    _write_manifest(path, meta)
+    added_t = meta['rows']['transactions'] - before['transactions']
+    added_i = meta['rows']['items'] - before['items']
+    return True, (f"+{added_t:,} bills, +{added_i:,} line items ({meta['rows']['items']:,} total, "
+                  f"{backend}) in {time.perf_counter() - t0:.1f}s.")
+
+
+def run_nightly_snapshots(account_ids=None, full=False):
+    """Syncs every ACTIVE tenant's snapshot (System Level). Returns {account_id: (Success, Msg)}."""
+    if account_ids is None:
+        conn = db.get_connection(read_only=True)
+        account_ids = [r[0] for r in conn.execute("SELECT id FROM accounts WHERE status = 'ACTIVE'").fetchall()]
+        conn.close()
+    return {aid: refresh_snapshot(full=full, account_id=aid, compact=True) for aid in account_ids}
+
+
+# --- Read side ---
+
+def load_snapshot(account_id=None):
+    """
+    Memory-mapped snapshot as a plain dict (None if never synced):
+    'txn' / 'items' column arrays, 'products' / 'customers' frames (by code),
+    'payments', 'max_timestamp', 'synced_at', 'synced_epoch'.
+    Cached per process until the manifest changes.
+    """
+    aid = account_id if account_id is not None else db.get_current_account_id()
+    path = snapshot_dir(aid)
+    try:
+        stamp = os.stat(_manifest_path(path)).st_mtime_ns
+    except OSError:
+        return None
+    with _LOCK:
+        cached = _SNAPSHOTS.get(path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+    meta = _read_manifest(path)
+    if meta is None:
+        return None
+
+    keys = meta['dicts']['products']
+    split = [k.split("\x1f", 1) for k in keys]
+    products = pd.DataFrame({'product_id': [s[0] or None for s in split], 'product_name': [s[1] for s in split]})
+    products['category'] = products['product_id'].map(meta['dims']['products'])
+    dims = meta['dims']['customers']
+    customers = pd.DataFrame([[cid] + dims.get(cid, [None] * 5) for cid in meta['dicts']['customers']],
+                             columns=['customer_id', 'name', 'phone', 'email', 'city', 'pincode'])
+    snap = {
+        'txn': _read_columns(path, meta, 'transactions'),
+        'items': _read_columns(path, meta, 'items'),
+        'products': products,
+        'customers': customers,
+        'payments': meta['dicts']['payments'],
+        'max_timestamp': meta['max_timestamp'],
+        'synced_at': meta['synced_at'],
+        'synced_epoch': meta['synced_epoch'],
+    }
+    with _LOCK:
+        _SNAPSHOTS[path] = (stamp, snap)
+    return snap
+
+
+def ensure_snapshot(max_age=SNAPSHOT_TTL, account_id=None):
+    """Snapshot no older than max_age seconds (syncs the tail first if needed)."""
+    snap = load_snapshot(account_id)
+    if snap is None or time.time() - snap['synced_epoch'] > max_age:
+        # A stale snapshot is served while another session syncs; a missing one is waited for
+        refresh_snapshot(account_id=account_id, wait=snap is None)
+        snap = load_snapshot(account_id)
+    return snap
+
+
+def clear():
+    with _LOCK:
+        _SNAPSHOTS.clear()
+
+
+def _day_bounds(start_date=None, end_date=None):
+    """Inclusive 'YYYY-MM-DD' bounds -> [lo, hi) epoch seconds."""
+    lo = int(pd.Timestamp(start_date).timestamp()) if start_date else np.iinfo(np.int64).min
+    hi = int(pd.Timestamp(end_date).timestamp()) + DAY if end_date else np.iinfo(np.int64).max
+    return lo, hi
+
+
+def _in_range(ts, start_date, end_date):
+    if not start_date and not end_date:
+        return slice(None)
+    lo, hi = _day_bounds(start_date, end_date)
+    return (ts >= lo) & (ts < hi)
+
+
+def _to_datetime(seconds):
+    return pd.to_datetime(np.asarray(seconds, dtype=np.int64), unit="s")
+
+
+def sales_summary(snap, start_date=None, end_date=None):
+    """{'revenue', 'profit', 'bills', 'avg_order', 'items_sold'} for an inclusive date range."""
+    txn, items = snap['txn'], snap['items']
+    m = _in_range(txn['ts'], start_date, end_date)
+    amount = txn['amount'][m]
+    bills = len(amount)
+    return {
+        'revenue': float(amount.sum()),
+        'profit': float(txn['profit'][m].sum()),
+        'bills': bills,
+        'avg_order': float(amount.mean()) if bills else 0.0,
+        'items_sold': float(items['qty'][_in_range(items['ts'], start_date, end_date)].sum()),
+    }
+
+
+def daily_revenue(snap, start_date=None, end_date=None):
+    """DataFrame[date, total_amount, bills], one row per trading day."""
+    txn = snap['txn']
+    m = _in_range(txn['ts'], start_date, end_date)
+    days, inverse = np.unique(txn['ts'][m] // DAY, return_inverse=True)
+    return pd.DataFrame({
+        'date': _to_datetime(days * DAY).strftime('%Y-%m-%d'),
+        'total_amount': np.bincount(inverse, weights=txn['amount'][m], minlength=len(days)),
+        'bills': np.bincount(inverse, minlength=len(days)),
+    })
+
+
+def product_sales(snap, start_date=None, end_date=None):
+    """DataFrame[product_id, product_name, category, quantity, revenue, profit] per product code."""
+    items = snap['items']
+    m = _in_range(items['ts'], start_date, end_date)
+    code, qty, price = items['product'][m], items['qty'][m], items['price'][m]
+    n = len(snap['products'])
+    df = snap['products'].copy()
+    df['quantity'] = np.bincount(code, weights=qty, minlength=n)
+    df['revenue'] = np.bincount(code, weights=qty * price, minlength=n)
+    df['profit'] = df['revenue'] - np.bincount(code, weights=qty * items['cost'][m], minlength=n)
+    return df[df['quantity'] != 0].reset_index(drop=True)
+
+
+def category_revenue(snap, start_date=None, end_date=None):
+    """DataFrame[category, revenue] over products still in the catalog."""
+    df = product_sales(snap, start_date, end_date)
+    df = df[df['product_id'].notna() & df['category'].notna()]
+    return df.groupby('category', as_index=False)['revenue'].sum()
+
+
+def top_products(snap, n=5, start_date=None, end_date=None):
+    """DataFrame[product_name, quantity, revenue] for the n best sellers by volume."""
+    df = product_sales(snap, start_date, end_date)
+    df = df.groupby('product_name', as_index=False)[['quantity', 'revenue']].sum()
+    return df.sort_values('quantity', ascending=False).head(n).reset_index(drop=True)
+
+
+def customer_summary(snap):
+    """DataFrame[customer_id, visits, total_spend, first_seen, last_seen] (tagged bills only)."""
+    txn = snap['txn']
+    m = txn['customer'] >= 0
+    df = pd.DataFrame({'code': txn['customer'][m], 'ts': txn['ts'][m], 'amount': txn['amount'][m]})
+    agg = df.groupby('code').agg(visits=('ts', 'size'), total_spend=('amount', 'sum'), first=('ts', 'min'), last=('ts', 'max'))
+    ids = snap['customers']['customer_id'].to_numpy()
+    return pd.DataFrame({
+        'customer_id': ids[agg.index.to_numpy()],
+        'visits': agg['visits'].to_numpy(),
+        'total_spend': agg['total_spend'].to_numpy(),
+        'first_seen': _to_datetime(agg['first']),
+        'last_seen': _to_datetime(agg['last']),
+    })
+
+
+def top_customers(snap, n=10):
+    """DataFrame[name, email, visits, total_spend, last_visit] for the n biggest spenders still on file."""
+    df = customer_summary(snap).merge(snap['customers'], on='customer_id')
+    df = df[df['name'].notna()].rename(columns={'last_seen': 'last_visit'})
+    return df.sort_values('total_spend', ascending=False).head(n)[['name', 'email', 'visits', 'total_spend', 'last_visit']]
+
+
+def daily_product_sales(snap, start_date=None, end_date=None):
+    """[(date, product_name, qty, revenue)] per day and product, the shape of daily_product_sales."""
+    items = snap['items']
+    m = _in_range(items['ts'], start_date, end_date)
+    names = snap['products']['product_name'].to_numpy()
+    df = pd.DataFrame({'day': items['ts'][m] // DAY, 'name': names[items['product'][m]], 'qty': items['qty'][m]})
+    df['revenue'] = df['qty'] * items['price'][m]
+    agg = df.groupby(['day', 'name'], as_index=False)[['qty', 'revenue']].sum()
+    dates = _to_datetime(agg['day'].to_numpy() * DAY).strftime('%Y-%m-%d')
+    return list(zip(dates, agg['name'].tolist(), agg['qty'].tolist(), agg['revenue'].tolist()))
+
+
+def area_product_sales(snap, city=None, n=10):
+    """Best sellers among customers of one city (all tagged sales if city is None)."""
+    items, txn = snap['items'], snap['txn']
+    cust = txn['customer'][items['txn']]
+    m = cust >= 0
+    if city is not None:
+        in_city = (snap['customers']['city'] == city).to_numpy()
+        m &= in_city[np.maximum(cust, 0)]
+    names = snap['products']['product_name'].to_numpy()
+    df = pd.DataFrame({'product_name': names[items['product'][m]], 'quantity': items['qty'][m],
+                       'revenue': items['qty'][m] * items['price'][m], 'customer': cust[m]})
+    agg = df.groupby('product_name', as_index=False).agg(quantity=('quantity', 'sum'), revenue=('revenue', 'sum'),
+                                                          buyers=('customer', 'nunique'))
+    return agg.sort_values('revenue', ascending=False).head(n).reset_index(drop=True)
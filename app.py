@@ -11,9 +11,15 @@ st.set_page_config(
 )
 
 import ui_components as ui
+import asset_cache
+import db_maintenance
 
 # Initialize DB
 db.init_db()
+# Load + encode bundled logos once per process
+asset_cache.warm_up()
+# WAL checkpoints, optimize / ANALYZE and vacuum in a background thread (once per process)
+db_maintenance.start_scheduler()
 
 # Session State for Authentication
 if "authenticated" not in st.session_state:
@@ -435,9 +441,8 @@ if not st.session_state["authenticated"]:
             # MOTION GRAPHICS: Final Mix (Bloom + Flow)
             motion_class = "motion-FinalMix"
             
-            # Inject Inline SVG
-            with open(logo_file, "r") as f:
-                svg_content = f.read().replace('\n', '').replace('\r', '')
+            # Inject Inline SVG (read once, served from the asset cache)
+            svg_content = asset_cache.read_text(logo_file).replace('\n', '').replace('\r', '')
             logo_html = f'<div class="brand-logo-container {motion_class}" style="margin-bottom: -90px;">{svg_content}</div>'
         except:
             logo_html = '<h1 style="font-size: 5rem;">🧠</h1>'
@@ -495,6 +500,9 @@ if not st.session_state["authenticated"]:
                                 st.session_state["permissions"] = result[4]
                             except IndexError:
                                 st.session_state["permissions"] = None
+                            # Resolve sidebar entitlements once per login
+                            import entitlements
+                            entitlements.get_entitlements(force=True)
                             
                             st.success(f"Welcome back, {login_user}!")
                             st.rerun()
@@ -565,7 +573,7 @@ else:
     try:
         aid = db.get_current_account_id()
         role = st.session_state.get('role', 'staff')
-        conn = db.get_connection()
+        conn = db.get_connection(read_only=True, replica=(role == 'super_admin'))
         
         if role == 'super_admin':
              # Global Stats
@@ -0,0 +1,118 @@
+import base64
+import os
+import threading
+import time
+
+# Asset cache
+# Logos and other static files are read and base64-encoded once per
+# (path, mtime) and served from process memory afterwards. The file's mtime
+# is re-checked at most every STAT_TTL seconds, so a busy counter printing
+# hundreds of receipts an hour does not touch the filesystem per receipt,
+# while a newly uploaded logo still shows up within a few seconds.
+
+STAT_TTL = 5.0  # Seconds between mtime checks of a cached file
+
+DEFAULT_LOGO = "logo_no_text_3.svg"   # "Ascending Lotus"
+FALLBACK_LOGO = "logo_no_text_1.svg"
+BUNDLED_ASSETS = (DEFAULT_LOGO, FALLBACK_LOGO, "logo.svg")
+
+MIME_TYPES = {".svg": "image/svg+xml", ".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".gif": "image/gif", ".webp": "image/webp"}
+
+_ENTRIES = {}   # path -> {'mtime', 'checked', 'data', 'uri', 'text', 'img'}
+_LOCK = threading.Lock()
+_STATS = {'hits': 0, 'loads': 0}
+
+
+def _entry(path):
+    """Cached entry for a file (None if it does not exist). Reloads when its mtime changes."""
+    now = time.monotonic()
+    with _LOCK:
+        entry = _ENTRIES.get(path)
+        if entry and now - entry['checked'] < STAT_TTL:
+            _STATS['hits'] += 1
+            return entry
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        with _LOCK:
+            _ENTRIES.pop(path, None)
+        return None
+    with _LOCK:
+        entry = _ENTRIES.get(path)
+        if entry and entry['mtime'] == mtime:
+            entry['checked'] = now
+            _STATS['hits'] += 1
+            return entry
+    with open(path, "rb") as f:
+        data = f.read()
+    entry = {'mtime': mtime, 'checked': now, 'data': data, 'uri': None, 'text': None, 'img': {}}
+    with _LOCK:
+        _ENTRIES[path] = entry
+        _STATS['loads'] += 1
+    return entry
+
+
+def read_bytes(path):
+    entry = _entry(path)
+    return entry['data'] if entry else None
+
+
+def read_text(path):
+    entry = _entry(path)
+    if entry is None:
+        return None
+    if entry['text'] is None:
+        entry['text'] = entry['data'].decode("utf-8", errors="replace")
+    return entry['text']
+
+
+def _uri(entry, path):
+    if entry['uri'] is None:
+        mime = MIME_TYPES.get(os.path.splitext(path)[1].lower(), "application/octet-stream")
+        entry['uri'] = f"data:{mime};base64,{base64.b64encode(entry['data']).decode()}"
+    return entry['uri']
+
+
+def data_uri(path):
+    """data:<mime>;base64,... for a file, encoded once per (path, mtime)."""
+    entry = _entry(path)
+    return _uri(entry, path) if entry else None
+
+
+def resolve_logo_file(logo_choice):
+    """Settings 'app_logo' value -> logo file on disk (same rules as the sidebar)."""
+    if logo_choice and logo_choice != "Ascending Lotus" and _entry(logo_choice) is not None:
+        return logo_choice
+    if not logo_choice or logo_choice == "Ascending Lotus":
+        return DEFAULT_LOGO
+    return FALLBACK_LOGO
+
+
+def logo_html(logo_choice, max_height=80, fallback='<span style="font-size: 40px;">🍚</span>'):
+    """<img> tag with the tenant logo inlined as a data-URI (fallback emoji if missing)."""
+    path = resolve_logo_file(logo_choice)
+    entry = _entry(path)
+    if entry is None:
+        return fallback
+    # Same string object every time, so downstream caches (compiled headers) hash it only once
+    tags = entry['img']
+    if max_height not in tags:
+        tags[max_height] = f'<img src="{_uri(entry, path)}" style="max-height: {max_height}px; width: auto;">'
+    return tags[max_height]
+
+
+def warm_up(paths=BUNDLED_ASSETS):
+    """Loads and encodes the bundled assets (call once at startup)."""
+    for path in paths:
+        data_uri(path)
+
+
+def clear():
+    with _LOCK:
+        _ENTRIES.clear()
+
+
+def stats():
+    """{'hits', 'loads', 'entries', 'bytes'} for diagnostics."""
+    with _LOCK:
+        return dict(_STATS, entries=len(_ENTRIES), bytes=sum(len(e['data']) for e in _ENTRIES.values()))
@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+
+# The "Brain" of basket mining (ShelfSense affinities)
+# Counts how often every pair of products lands in the same basket, chunk by
+# chunk. Pairs are encoded as a single int64 key (a * KEY_BASE + b, a < b) and kept
+# in sorted arrays, so memory grows with the number of distinct pairs - never
+# with the number of line items.
+
+MAX_BASKET = 50       # Bigger baskets (bulk / B2B orders) are skipped for pairs
+MIN_PAIR_BASKETS = 5  # A pair must co-occur in this many baskets to be stored
+TOP_PAIRS = 500       # Pairs kept per tenant (highest lift first)
+KEY_BASE = 1 << 31    # Room for 2^31 distinct items per tenant
+PENDING_MIN = 1 << 20 # Pair keys buffered before the first merge
+
+
+def basket_pairs(basket_ids, item_codes):
+    """
+    Pair keys for one chunk of (basket, item) rows.
+    Rows must be grouped by basket. Duplicate items within a basket count once.
+    Returns (pair keys as (a, b) arrays, unique item codes per basket, n_baskets).
+    """
+    basket_ids = np.asarray(basket_ids)
+    item_codes = np.asarray(item_codes, dtype=np.int64)
+    if basket_ids.size == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return (empty, empty), empty, 0
+
+    # Basket number per row, then dedupe (basket, item)
+    starts = np.r_[True, basket_ids[1:] != basket_ids[:-1]]
+    basket_no = np.cumsum(starts) - 1
+    order = np.lexsort((item_codes, basket_no))
+    b, items = basket_no[order], item_codes[order]
+    keep = np.r_[True, (b[1:] != b[:-1]) | (items[1:] != items[:-1])]
+    b, items = b[keep], items[keep]
+
+    # Position of every row inside its basket, and the basket size
+    first = np.r_[0, np.flatnonzero(b[1:] != b[:-1]) + 1]
+    sizes = np.diff(np.r_[first, b.size])
+    size_per_row = np.repeat(sizes, sizes)
+    pos = np.arange(b.size) - np.repeat(first, sizes)
+
+    # Every row pairs with the rows after it in the same basket
+    ok = size_per_row <= MAX_BASKET
+    after = np.where(ok, size_per_row - pos - 1, 0)
+    left = np.repeat(np.arange(b.size), after)
+    step = np.arange(left.size) - np.repeat(np.cumsum(after) - after, after) + 1
+    right = left + step
+    return (items[left], items[right]), items, int(first.size)
+
+
+def merge_counts(keys, counts, new_keys, new_counts=None):
+    """Adds new keys into sorted (keys, counts) arrays."""
+    if new_counts is None:
+        new_counts = np.ones(len(new_keys), dtype=np.int64)
+    all_keys = np.concatenate([keys, new_keys])
+    all_counts = np.concatenate([counts, new_counts])
+    order = np.argsort(all_keys, kind='stable')
+    all_keys, all_counts = all_keys[order], all_counts[order]
+    if all_keys.size == 0:
+        return all_keys, all_counts
+    first = np.r_[0, np.flatnonzero(all_keys[1:] != all_keys[:-1]) + 1]
+    return all_keys[first], np.add.reduceat(all_counts, first)
+
+
+class BasketMiner:
+    """Streaming pair counter. Feed chunks with add(); read results with rules()."""
+
+    def __init__(self):
+        self.codes = {}
+        self.pair_keys = np.zeros(0, dtype=np.int64)
+        self.pair_counts = np.zeros(0, dtype=np.int64)
+        self.item_keys = np.zeros(0, dtype=np.int64)
+        self.item_counts = np.zeros(0, dtype=np.int64)
+        self.n_baskets = 0
+        self._pending = []  # Chunk pair keys not merged yet
+        self._pending_size = 0
+
+    def add(self, basket_ids, items):
+        """One chunk of line items, grouped by basket (baskets must not straddle chunks)."""
+        local, uniques = pd.factorize(np.asarray(items, dtype=object))
+        lookup = np.array([self.codes.setdefault(x, len(self.codes)) for x in uniques], dtype=np.int64)
+        (a, b), uniq_items, n = basket_pairs(basket_ids, lookup[local])
+        self._pending.append(np.minimum(a, b) * KEY_BASE + np.maximum(a, b))
+        self._pending_size += a.size
+        self.item_keys, self.item_counts = merge_counts(self.item_keys, self.item_counts, uniq_items)
+        self.n_baskets += n
+        # Merging re-sorts every known pair, so wait until the buffer is as big as
+        # the table: total work stays O(n log n), memory at most ~2x the distinct pairs.
+        if self._pending_size >= max(self.pair_keys.size, PENDING_MIN):
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self.pair_keys, self.pair_counts = merge_counts(self.pair_keys, self.pair_counts, np.concatenate(self._pending))
+            self._pending, self._pending_size = [], 0
+
+    def rules(self, min_baskets=MIN_PAIR_BASKETS, top=TOP_PAIRS):
+        """
+        Pair metrics for pairs seen in >= min_baskets baskets, highest lift first:
+        list of dicts {product_a, product_b, pair_count, support, confidence_ab, confidence_ba, lift}.
+        """
+        self._flush()
+        if self.pair_keys.size == 0 or self.n_baskets == 0:
+            return []
+        names = np.empty(len(self.codes), dtype=object)
+        for name, code in self.codes.items():
+            names[code] = name
+        item_count = np.zeros(len(self.codes), dtype=np.int64)
+        item_count[self.item_keys] = self.item_counts
+
+        keep = self.pair_counts >= min_baskets
+        keys, n_ab = self.pair_keys[keep], self.pair_counts[keep].astype(float)
+        a, b = keys // KEY_BASE, keys % KEY_BASE
+        n_a, n_b = item_count[a].astype(float), item_count[b].astype(float)
+        N = float(self.n_baskets)
+        lift = n_ab * N / (n_a * n_b)
+        order = np.lexsort((-n_ab, -lift))[:top]
+        return [{
+            'product_a': names[a[i]], 'product_b': names[b[i]], 'pair_count': int(n_ab[i]),
+            'support': n_ab[i] / N, 'confidence_ab': n_ab[i] / n_a[i], 'confidence_ba': n_ab[i] / n_b[i],
+            'lift': lift[i],
+        } for i in order]
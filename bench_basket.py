@@ -0,0 +1,75 @@
+import time
+import tracemalloc
+
+import numpy as np
+
+import basket_engine as be
+
+# Benchmark: basket mining over synthetic POS line items.
+# Streams baskets through BasketMiner in chunks and compares against a
+# Python itertools/Counter pass (on a sample) for speed and correctness.
+# Usage: python bench_basket.py [line_items] [products] [chunk_size]
+
+def synthetic_items(n_items, n_products, seed=1):
+    """(basket ids, product names) grouped by basket, sizes 1-12, with a few planted pairs."""
+    rng = np.random.default_rng(seed)
+    sizes = rng.integers(1, 13, size=n_items // 6 + 1)
+    sizes = sizes[np.cumsum(sizes) <= n_items]
+    baskets = np.repeat(np.arange(sizes.size), sizes)
+    popularity = 1 / np.arange(1, n_products + 1)
+    products = rng.choice(n_products, size=baskets.size, p=popularity / popularity.sum())
+    # Plant: half of the baskets holding product 10 also get product 11
+    first = np.r_[0, np.cumsum(sizes)[:-1]]
+    plant = first[rng.random(sizes.size) < 0.05]
+    products[plant], products[np.minimum(plant + 1, products.size - 1)] = 10, 11
+    return baskets, np.array([f"SKU-{p}" for p in products], dtype=object)
+
+def legacy_pairs(baskets, items):
+    from collections import Counter
+    from itertools import combinations
+    groups = {}
+    for b, i in zip(baskets, items):
+        groups.setdefault(b, set()).add(i)
+    return Counter(p for g in groups.values() for p in combinations(sorted(g), 2))
+
+def run(n_items=1_000_000, n_products=2_000, chunk_size=50_000):
+    baskets, items = synthetic_items(n_items, n_products)
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    miner = be.BasketMiner()
+    for start in range(0, baskets.size, chunk_size):
+        stop = start + chunk_size
+        while stop < baskets.size and baskets[stop] == baskets[stop - 1]:
+            stop += 1  # keep baskets whole
+        miner.add(baskets[start:stop], items[start:stop])
+    rules = miner.rules()
+    mine_s = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    sample = min(100_000, baskets.size)
+    t0 = time.perf_counter()
+    legacy = legacy_pairs(baskets[:sample], items[:sample])
+    legacy_s = (time.perf_counter() - t0) * baskets.size / sample
+
+    check = be.BasketMiner()
+    check.add(baskets[:sample], items[:sample])
+    got = {(check_a, check_b): n for check_a, check_b, n in
+           ((r['product_a'], r['product_b'], r['pair_count']) for r in check.rules(min_baskets=1, top=10 ** 9))}
+    same = all(got.get(k, got.get(k[::-1])) == v for k, v in legacy.items())
+
+    print(f"Line items       : {baskets.size:,} in {miner.n_baskets:,} baskets, {n_products:,} products")
+    print(f"Python Counter   : ~{legacy_s:.1f}s (extrapolated from {sample:,} items)")
+    print(f"BasketMiner      : {mine_s:.2f}s ({legacy_s / mine_s:.0f}x), peak {peak / 2 ** 20:.0f} MiB, chunk {chunk_size:,}")
+    print(f"Distinct pairs   : {miner.pair_keys.size:,}  stored: {len(rules)}  counts match: {same}")
+    if rules:
+        top = rules[0]
+        print(f"Top pair         : {top['product_a']} + {top['product_b']}  lift {top['lift']:.1f}, {top['pair_count']} baskets")
+
+if __name__ == "__main__":
+    import sys
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    p = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+    c = int(sys.argv[3]) if len(sys.argv) > 3 else 50_000
+    run(n, p, c)
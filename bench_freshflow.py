@@ -0,0 +1,61 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+import freshflow_engine as ff
+
+# Benchmark: FreshFlow markdown pricing for a large tenant.
+# Compares the vectorized engine with the old per-row strptime .apply().
+# Usage: python bench_freshflow.py [n_batches]
+
+def make_batches(n, seed=11):
+    rng = np.random.default_rng(seed)
+    today = pd.Timestamp.now().normalize()
+    expiry = today + pd.to_timedelta(rng.integers(-2, 11, n), unit='D')
+    price = rng.uniform(10, 500, n).round(2)
+    return pd.DataFrame({
+        'id': np.arange(n).astype(str),
+        'product_id': rng.integers(0, n // 10 + 1, n).astype(str),
+        'expiry_date': expiry.strftime('%Y-%m-%d'),
+        'quantity': rng.integers(1, 100, n),
+        'cost_price': (price * 0.7).round(2),
+        'current_price': price,
+    })
+
+def legacy(df):
+    from datetime import datetime
+    today = datetime.now().date()
+    def calculate_discount(expiry_str):
+        days_left = (datetime.strptime(expiry_str, '%Y-%m-%d').date() - today).days
+        if days_left <= 2: return 50
+        if days_left <= 5: return 30
+        if days_left <= 10: return 10
+        return 0
+    df = df.copy()
+    df['days_left'] = df['expiry_date'].apply(lambda x: (datetime.strptime(x, '%Y-%m-%d').date() - today).days)
+    df['suggested_discount'] = df['expiry_date'].apply(calculate_discount)
+    df['new_price'] = df['current_price'] * (1 - df['suggested_discount'] / 100)
+    return df
+
+def run(n=100_000):
+    df = make_batches(n)
+
+    t0 = time.perf_counter()
+    old = legacy(df)
+    legacy_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    new = ff.price_markdowns(df)
+    marks = ff.batch_markdowns(new)
+    engine_s = time.perf_counter() - t0
+
+    assert (old['days_left'].to_numpy() == new['days_left'].to_numpy()).all()
+    print(f"Batches          : {n:,} ({len(marks):,} batches marked down)")
+    print(f"Per-row apply    : {legacy_s * 1000:.0f}ms")
+    print(f"Vectorized engine: {engine_s * 1000:.0f}ms ({legacy_s / engine_s:.0f}x)")
+    print(f"Value at risk    : ₹{new['value_at_risk'].sum():,.0f}")
+
+if __name__ == "__main__":
+    import sys
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,47 @@
+import base64
+import os
+import time
+
+import asset_cache
+import receipt_engine
+
+# Benchmark: receipt HTML rendering.
+# Compares the per-render path (open + base64 the logo, build every piece of
+# markup) with the asset cache + compiled template.
+# Usage: python bench_receipts.py [receipts] [items_per_receipt] [logo_file]
+
+def legacy_logo_html(logo_file):
+    with open(logo_file, "rb") as image_file:
+        logo_b64 = base64.b64encode(image_file.read()).decode()
+    mime = "image/svg+xml" if logo_file.endswith(".svg") else "image/png"
+    return f'<img src="data:{mime};base64,{logo_b64}" style="max-height: 80px; width: auto;">'
+
+def run(receipts=2_000, n_items=8, logo=None):
+    items = [{'name': f"Item {k}", 'qty': k % 3 + 1, 'total': 40.0 * (k + 1)} for k in range(n_items)]
+    store = dict(receipt_engine.DEFAULT_STORE)
+    logo = logo or asset_cache.resolve_logo_file(None)
+
+    t0 = time.perf_counter()
+    for r in range(receipts):
+        receipt_engine.compiled_header.cache_clear()
+        receipt_engine.render_receipt_html(items, 500.0, 476.0, 24.0, f"R{r}", store=store, logo_html=legacy_logo_html(logo))
+    legacy_s = time.perf_counter() - t0
+
+    asset_cache.clear()
+    asset_cache.warm_up()
+    loads = asset_cache.stats()['loads']
+    t0 = time.perf_counter()
+    for r in range(receipts):
+        receipt_engine.render_receipt_html(items, 500.0, 476.0, 24.0, f"R{r}", store=store, logo_html=asset_cache.logo_html(logo))
+    cached_s = time.perf_counter() - t0
+
+    print(f"Receipts         : {receipts:,} x {n_items} items, logo {logo} ({os.path.getsize(logo) / 1024:.0f} KiB)")
+    print(f"Read + encode    : {legacy_s * 1000 / receipts:.3f} ms/receipt")
+    print(f"Cached template  : {cached_s * 1000 / receipts:.3f} ms/receipt ({legacy_s / cached_s:.0f}x)")
+    print(f"File loads       : {asset_cache.stats()['loads'] - loads} during the run")
+
+if __name__ == "__main__":
+    import sys
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    run(n, k, sys.argv[3] if len(sys.argv) > 3 else None)
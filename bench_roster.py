@@ -0,0 +1,45 @@
+import time
+
+import numpy as np
+
+import roster_engine as re_
+
+# Benchmark: ShiftSmart weekly optimizer.
+# Solves a 7-day roster for a large store and compares the labor cost with
+# the old "first N staff in the directory" assignment.
+# Usage: python bench_roster.py [n_staff]
+
+# Three-slot store (adds a night shift to the default two)
+BENCH_SLOTS = {**re_.DEFAULT_SLOTS, "Night (9PM-2AM)": 5}
+
+def run(n_staff=200, seed=3):
+    rng = np.random.default_rng(seed)
+    slots = list(BENCH_SLOTS)
+    hours = np.array(list(BENCH_SLOTS.values()), dtype=float)
+    rates = rng.choice([90, 100, 120, 150, 250], size=n_staff).astype(float)
+    roles = np.where(rates >= 250, "Store Manager", "Cashier")
+    daily_units = rng.uniform(0.2, 0.6, 7) * n_staff * 100 / 3
+    demand = re_.slot_demand(daily_units, hours, 100)
+
+    t0 = time.perf_counter()
+    result = re_.solve_roster(demand, rates, hours, roles=roles, role_minimums={"Store Manager": 1})
+    solve_s = time.perf_counter() - t0
+
+    # Naive baseline: directory order, same weekly caps
+    used = np.zeros(n_staff, dtype=int)
+    naive = 0.0
+    for d in range(7):
+        free = np.flatnonzero(used < re_.MAX_SHIFTS_PER_WEEK)
+        for s in range(len(slots)):
+            take, free = free[:demand[d, s]], free[demand[d, s]:]
+            used[take] += 1
+            naive += (rates[take] * hours[s]).sum()
+
+    print(f"Staff x slots    : {n_staff} x {demand.size} ({demand.sum()} shifts needed)")
+    print(f"Solve time       : {solve_s * 1000:.0f}ms")
+    print(f"Optimized cost   : ₹{result['cost']:,.0f} (unfilled: {result['unmet'].sum()})")
+    print(f"Naive cost       : ₹{naive:,.0f}")
+
+if __name__ == "__main__":
+    import sys
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
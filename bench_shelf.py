@@ -0,0 +1,63 @@
+import time
+
+import numpy as np
+
+import shelf_engine as se
+import shelf_optimizer as so
+
+# Benchmark: ShelfSense scoring on a store-wide planogram.
+# Compares the per-cell dict engine (demo version) with the bitmask/array engine,
+# then optimizes 500-slot aisles (one per process) with the layout optimizer.
+# Usage: python bench_shelf.py [rows] [cols] [aisles]
+
+def run(rows=100, cols=100, seed=1):
+    rng = np.random.default_rng(seed)
+    names = sorted(se.PRODUCT_SCIENCE_DB) + [f"SKU-{i}" for i in range(200)]
+    planogram = rng.integers(-1, len(names), size=(rows, cols)).astype(np.int32)
+
+    t0 = time.perf_counter()
+    masks = se.resolve_masks(names)
+    result = se.score_planogram(planogram, masks)
+    array_s = time.perf_counter() - t0
+
+    # Demo engine equivalent: tag lookup per cell and per neighbour
+    grid = [[names[x] if x >= 0 else None for x in row] for row in planogram]
+    t0 = time.perf_counter()
+    hits = 0
+    for r in range(rows):
+        for c in range(cols):
+            if not grid[r][c]:
+                continue
+            mine = se.get_tags(grid[r][c])
+            for nr, nc in ((r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)):
+                if 0 <= nr < rows and 0 <= nc < cols and grid[nr][nc]:
+                    theirs = se.get_tags(grid[nr][nc])
+                    hits += sum(1 for t in mine for rule in [se.KNOWLEDGE_BASE.get(t, {})]
+                                for x in rule.get('conflicts_with', []) + rule.get('boosts', []) if x in theirs)
+    loop_s = time.perf_counter() - t0
+
+    print(f"Planogram        : {rows} x {cols} = {rows * cols:,} slots")
+    print(f"Per-cell lookup  : {loop_s * 1000:.0f}ms")
+    print(f"Bitmask engine   : {array_s * 1000:.1f}ms ({loop_s / array_s:.0f}x)")
+    print(f"Raw score        : {result['raw']:,}  rule hits: {result['counts']}")
+
+def run_optimizer(aisles=4, rows=5, cols=100):
+    names = sorted(se.PRODUCT_SCIENCE_DB) + [f"SKU-{i}" for i in range(39)]
+    masks = se.resolve_masks(names)
+    facings = [rows * cols // len(names)] * len(names)
+    jobs = [{'masks': masks, 'facings': facings, 'rows': rows, 'cols': cols}] * aisles
+
+    t0 = time.perf_counter()
+    results = so.optimize_aisles(jobs)
+    wall = time.perf_counter() - t0
+    print(f"Optimizer        : {aisles} aisles x {rows * cols} slots, {so.ITERATIONS:,} swaps each, {wall:.1f}s wall")
+    for k, res in enumerate(results):
+        curve = " ".join(f"{s:+.0f}" for _, s in res['history'][::25])
+        print(f"   aisle {k}: {res['start_score']:+.0f} -> {res['score']:+.0f} in {res['seconds']:.1f}s  [{curve}]")
+
+if __name__ == "__main__":
+    import sys
+    r = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    c = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    run(r, c)
+    run_optimizer(int(sys.argv[3]) if len(sys.argv) > 3 else 4)
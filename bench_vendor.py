@@ -0,0 +1,68 @@
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import database as db
+
+# Benchmark: VendorTrust scorecards for a large tenant.
+# Compares the per-supplier scorecard loop with the single aggregation query.
+# Usage: python bench_vendor.py [n_suppliers] [pos_per_supplier]
+
+AID = '1111222233334444'
+
+def seed(n_suppliers, pos_per_supplier, seed=5):
+    rng = np.random.default_rng(seed)
+    base = pd.Timestamp("2025-01-01")
+    conn = db.get_connection()
+    conn.executemany("INSERT INTO suppliers (id, account_id, name, phone, category_specialty) VALUES (?, ?, ?, ?, 'General')",
+                     [(f"S{i}", AID, f"Supplier {i}", f"9{i:09d}") for i in range(n_suppliers)])
+    n = n_suppliers * pos_per_supplier
+    order = base + pd.to_timedelta(rng.integers(0, 365, n), unit='D')
+    expected = order + pd.to_timedelta(rng.integers(1, 15, n), unit='D')
+    received = expected + pd.to_timedelta(rng.integers(-2, 4, n), unit='D')
+    fmt = lambda d: d.strftime('%Y-%m-%d')
+    conn.executemany("""INSERT INTO purchase_orders (id, account_id, supplier_id, order_date, expected_date, received_date, status, quality_rating)
+                        VALUES (?, ?, ?, ?, ?, ?, 'RECEIVED', ?)""",
+                     zip([f"PO{k}" for k in range(n)], [AID] * n, [f"S{k % n_suppliers}" for k in range(n)],
+                         fmt(order), fmt(expected), fmt(received), rng.integers(2, 6, n).astype(float).tolist()))
+    conn.commit()
+    conn.close()
+
+def legacy_scorecard(supplier_id):
+    """The old per-supplier path: one query + pandas date parsing per supplier."""
+    conn = db.get_connection()
+    df = pd.read_sql_query("SELECT * FROM purchase_orders WHERE supplier_id = ? AND account_id = ? AND status = 'RECEIVED'",
+                           conn, params=(supplier_id, AID))
+    conn.close()
+    df['expected_date'] = pd.to_datetime(df['expected_date'])
+    df['received_date'] = pd.to_datetime(df['received_date'])
+    return (df['received_date'] <= df['expected_date']).mean() * 100, df['quality_rating'].mean()
+
+def run(n_suppliers=300, pos_per_supplier=40):
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_NAME = os.path.join(tmp, "bench_vendor.db")
+        db.init_db()
+        seed(n_suppliers, pos_per_supplier)
+
+        t0 = time.perf_counter()
+        for sid in db.get_all_suppliers(override_account_id=AID)['id']:
+            legacy_scorecard(sid)
+        loop_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        cards = db.get_vendor_scorecards(override_account_id=AID)
+        agg_s = time.perf_counter() - t0
+
+        print(f"Suppliers x POs  : {n_suppliers} x {pos_per_supplier}")
+        print(f"Per-supplier loop: {loop_s * 1000:.0f}ms ({n_suppliers + 1} queries)")
+        print(f"Single query     : {agg_s * 1000:.0f}ms")
+        print(f"Risk mix         : {cards['risk'].value_counts().to_dict()}")
+
+if __name__ == "__main__":
+    import sys
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    run(n, k)
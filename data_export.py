@@ -0,0 +1,177 @@
+import argparse
+import csv
+import os
+import sys
+import time
+
+import database as db
+
+# Streaming data export
+# Rows come out of SQLite in fetchmany() chunks and are written straight to
+# the output file, so a month of line items exports in constant memory
+# instead of going through a full DataFrame (as dump_db.py does).
+# Formats: csv, xlsx (openpyxl write-only mode) and parquet (only when
+# pyarrow is installed).
+# Usage:
+#   python data_export.py --account ID --dataset transaction_items --from 2026-09-01 --to 2026-09-30 --format csv --out sep.csv
+
+FORMATS = ("csv", "xlsx", "parquet")
+DATASETS = tuple(db.EXPORT_DATASETS)
+DEFAULT_CHUNK = 5_000
+XLSX_MAX_ROWS = 1_048_576  # Excel's sheet limit (header included); longer exports continue on a new sheet
+UI_MAX_ROWS = 250_000  # The Settings download button holds the whole file in memory; bigger exports go through the CLI
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def available_formats():
+    return tuple(f for f in FORMATS if f != "parquet" or parquet_available())
+
+
+def cli_command(account_id, dataset, fmt, start_date=None, end_date=None):
+    """The equivalent CLI call, offered when an export is over UI_MAX_ROWS."""
+    args = ["python data_export.py", f"--account {account_id}", f"--dataset {dataset}", f"--format {fmt}"]
+    if start_date:
+        args.append(f"--from {start_date}")
+    if end_date:
+        args.append(f"--to {end_date}")
+    return " ".join(args + [f"--out {dataset}.{fmt}"])
+
+
+def _write_csv(path, columns, chunks):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for rows in chunks:
+            writer.writerows(rows)
+
+
+def _write_xlsx(path, columns, chunks):
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws, sheet_rows, sheets = None, XLSX_MAX_ROWS, 0
+    for rows in chunks:
+        for row in rows:
+            if sheet_rows >= XLSX_MAX_ROWS:
+                sheets += 1
+                ws = wb.create_sheet(f"Export {sheets}" if sheets > 1 else "Export")
+                ws.append(columns)
+                sheet_rows = 1
+            ws.append(row)
+            sheet_rows += 1
+    if ws is None:
+        wb.create_sheet("Export").append(columns)
+    wb.save(path)
+
+
+def _arrow_type(pa, decltype):
+    """Parquet column type from the column's declared SQLite type (SQLite affinity rules)."""
+    decltype = (decltype or "").upper()
+    if "INT" in decltype or "BOOL" in decltype:
+        return pa.int64()
+    if any(k in decltype for k in ("CHAR", "CLOB", "TEXT")):
+        return pa.string()
+    if "BLOB" in decltype:
+        return pa.binary()
+    if any(k in decltype for k in ("REAL", "FLOA", "DOUB", "NUMERIC", "DECIMAL")):
+        return pa.float64()
+    return pa.string()  # TIMESTAMP / DATE / undeclared: stored as text here
+
+
+def _arrow_array(pa, name, values, arrow_type):
+    """Converts one chunk of a column; raises ValueError rather than losing data (2.75 -> 2)."""
+    if arrow_type == pa.string():
+        return pa.array([None if v is None else str(v) for v in values], type=arrow_type)
+    try:
+        return pa.array(values).cast(arrow_type)  # Safe cast: truncation or overflow raises
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+        raise ValueError(f"Column '{name}' has values that do not fit its declared type ({arrow_type}): {e}") from e
+
+
+def _write_parquet(path, columns, chunks, column_types=None):
+    if not parquet_available():
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow).")
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    column_types = column_types or {}
+    schema = pa.schema([(name, _arrow_type(pa, column_types.get(name))) for name in columns])
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in chunks:
+            arrays = [_arrow_array(pa, field.name, list(col), field.type) for col, field in zip(zip(*rows), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))  # One row group per chunk
+
+
+WRITERS = {"csv": _write_csv, "xlsx": _write_xlsx, "parquet": _write_parquet}
+
+
+def export_dataset(dataset, fmt, out, start_date=None, end_date=None, chunk_size=DEFAULT_CHUNK, account_id=None, progress=None):
+    """
+    Streams one dataset of a tenant into `out`.
+    progress(rows_done, rows_total) is called after every chunk.
+    Returns {'rows', 'bytes', 'seconds', 'path'}.
+    """
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if fmt == "parquet" and not parquet_available():
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow).")
+    t0 = time.perf_counter()
+    total = db.count_export_rows(dataset, start_date, end_date, override_account_id=account_id) if progress else None
+    stream = db.iter_export_rows(dataset, start_date, end_date, chunk_size, override_account_id=account_id)
+    columns = next(stream)
+    done = 0
+
+    def chunks():
+        nonlocal done
+        for rows in stream:
+            yield rows
+            done += len(rows)
+            if progress:
+                progress(done, total)
+
+    # Parquet's schema comes from the declared column types, not from the first chunk's values
+    options = {'column_types': db.get_export_column_types(dataset)} if fmt == "parquet" else {}
+    try:
+        WRITERS[fmt](out, columns, chunks(), **options)
+    finally:
+        stream.close()
+    if progress and done == 0:
+        progress(0, total)
+    return {'rows': done, 'bytes': os.path.getsize(out), 'seconds': time.perf_counter() - t0, 'path': out}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VyaparMind streaming data export")
+    parser.add_argument("--db", default=None, help="SQLite database file")
+    parser.add_argument("--account", required=True, help="Account ID")
+    parser.add_argument("--dataset", choices=DATASETS, default="transaction_items")
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--from", dest="start_date", default=None, help="First day (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end_date", default=None, help="Last day, inclusive (YYYY-MM-DD)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+    if args.db:
+        db.DB_NAME = args.db
+
+    def report(done, total):
+        pct = f" ({done / total:.0%})" if total else ""
+        print(f"\r  {done:,} / {total:,} rows{pct}", end="", file=sys.stderr, flush=True)
+
+    try:
+        stats = export_dataset(args.dataset, args.format, args.out, args.start_date, args.end_date,
+                               args.chunk_size, account_id=args.account, progress=report)
+    except (RuntimeError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+    print(file=sys.stderr)
+    print(f"📤 {stats['rows']:,} {args.dataset} rows -> {args.out} ({args.format}, {stats['bytes']:,} bytes) in {stats['seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
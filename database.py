@@ -1,16 +1,101 @@
 import sqlite3
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
 import streamlit as st
 
 import secrets
 import string
 import hashlib
+import threading
+import os
+import time
+from urllib.request import pathname2url
+
+import query_profiler
 
 DB_NAME = "retail_supply_chain.db"
+BUSY_TIMEOUT = 30  # Seconds a connection waits on another writer's lock before "database is locked"
+
+# Read replica: a backup-API copy of the database that long analytics reads run
+# against, so they never pin the WAL (blocking checkpoints) or compete with checkout.
+REPLICA_TTL = 300  # Seconds a replica copy is served before it is re-copied (None = always read the live file)
+_REPLICA_REFRESHING = set()
+_REPLICA_LOCK = threading.Lock()
+
+def get_connection(read_only=False, replica=False):
+    """
+    read_only=True opens the file with mode=ro and PRAGMA query_only, so a read
+    path can never take a write lock.
+    replica=True (implies read_only) reads the backup-API copy while it is
+    younger than REPLICA_TTL; a stale copy is re-made in the background and
+    the live file is read until one exists.
+    """
+    # Profiling (Super Admin > Performance) swaps in a timing connection class
+    factory = query_profiler.ProfiledConnection if query_profiler.ENABLED else sqlite3.Connection
+    if not read_only and not replica:
+        return sqlite3.connect(DB_NAME, timeout=BUSY_TIMEOUT, check_same_thread=False, factory=factory)
+    path = (_fresh_replica(DB_NAME) if replica and REPLICA_TTL is not None else None) or DB_NAME
+    conn = sqlite3.connect(f"file:{pathname2url(os.path.abspath(path))}?mode=ro", uri=True, timeout=BUSY_TIMEOUT, check_same_thread=False, factory=factory)
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+def replica_path(db_name=None):
+    base, ext = os.path.splitext(db_name or DB_NAME)
+    return f"{base}.replica{ext or '.db'}"
+
+def get_replica_age(db_name=None):
+    """Seconds since the read replica was copied (None if there is none)."""
+    try:
+        return time.time() - os.path.getmtime(replica_path(db_name))
+    except OSError:
+        return None
+
+def refresh_read_replica(db_name=None):
+    """
+    Copies the live database into the read replica with the SQLite backup API.
+    The copy is written beside the replica and swapped in atomically, so open
+    replica readers keep their (old) file. Returns (Success, Msg).
+    """
+    db_name = db_name or DB_NAME
+    target = replica_path(db_name)
+    tmp = f"{target}.{os.getpid()}.tmp"  # Per process: concurrent refreshes never share a half-written copy
+    t0 = time.perf_counter()
+    try:
+        for leftover in (tmp, f"{tmp}-wal", f"{tmp}-shm"):  # From a refresh killed mid-copy
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        src = sqlite3.connect(f"file:{pathname2url(os.path.abspath(db_name))}?mode=ro", uri=True, timeout=30)
+        dst = sqlite3.connect(tmp)
+        try:
+            src.backup(dst)  # One step: a consistent copy under a single WAL read mark
+            dst.execute("PRAGMA journal_mode=DELETE")  # Readers open it mode=ro without -wal / -shm files
+        finally:
+            dst.close()
+            src.close()
+        os.replace(tmp, target)
+        return True, f"Replica refreshed in {time.perf_counter() - t0:.2f}s."
+    except Exception as e:
+        print(f"Replica Refresh Error: {e}")
+        return False, str(e)
 
-def get_connection():
-    return sqlite3.connect(DB_NAME, timeout=30, check_same_thread=False)
+def _refresh_replica_async(db_name):
+    try:
+        refresh_read_replica(db_name)
+    finally:
+        with _REPLICA_LOCK:
+            _REPLICA_REFRESHING.discard(db_name)
+
+def _fresh_replica(db_name):
+    """Replica file to read, or None for the live file. Stale copies are refreshed in the background."""
+    age = get_replica_age(db_name)
+    if age is None or age > REPLICA_TTL:
+        with _REPLICA_LOCK:
+            start = db_name not in _REPLICA_REFRESHING
+            _REPLICA_REFRESHING.add(db_name)
+        if start:
+            threading.Thread(target=_refresh_replica_async, args=(db_name,), daemon=True).start()
+    # Serve a stale copy while its successor is made, but never one older than 2x TTL
+    return replica_path(db_name) if age is not None and age <= 2 * REPLICA_TTL else None
 
 def generate_unique_id(length=16, numeric_only=False, prefix=''):
     """Generates a secure 16-character unique ID."""
@@ -39,6 +124,9 @@ def get_current_account_id():
 def init_db():
     """Initializes the database with necessary tables if they don't exist."""
     conn = get_connection()
+    # Free pages are returned by the maintenance scheduler's incremental vacuum
+    # (takes effect on a new file; existing files switch on their next full VACUUM)
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL;")
     # OPTIMIZATION: Enable WAL Mode for concurrency
     conn.execute("PRAGMA journal_mode=WAL;")
     conn.execute("PRAGMA foreign_keys=ON;") # Ensure FK constraints are respected
@@ -307,6 +395,33 @@ def init_db():
     
     # product_batches(expiry_date) for FreshFlow
     c.execute("CREATE INDEX IF NOT EXISTS idx_batches_expiry ON product_batches(expiry_date)")
+    # product_batches(account_id, expiry_date) for the per-tenant markdown scan
+    c.execute("CREATE INDEX IF NOT EXISTS idx_batches_account_expiry ON product_batches(account_id, expiry_date)")
+
+    # Batch-level clearance price (FreshFlow markdowns, resolved FEFO at POS)
+    try:
+        c.execute("SELECT sale_price FROM product_batches LIMIT 1")
+    except:
+        c.execute("ALTER TABLE product_batches ADD COLUMN sale_price REAL")
+    # product_batches(account_id, product_id, expiry_date) for FEFO lookups
+    c.execute("CREATE INDEX IF NOT EXISTS idx_batches_fefo ON product_batches(account_id, product_id, expiry_date)")
+
+    # Suppliers are unique per tenant by name and by phone (blank phones exempt)
+    c.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_suppliers_name'")
+    if not c.fetchone():
+        _merge_duplicate_suppliers(c)
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_suppliers_name ON suppliers(account_id, name)")
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_suppliers_phone ON suppliers(account_id, phone) WHERE phone IS NOT NULL AND phone != ''")
+
+    # purchase_orders(account_id, status, supplier_id) for the VendorTrust scorecard aggregation
+    c.execute("CREATE INDEX IF NOT EXISTS idx_po_account_status ON purchase_orders(account_id, status, supplier_id)")
+
+    # Expiry band maintained by the daily sweep (see run_expiry_sweep)
+    try:
+        c.execute("SELECT expiry_bucket FROM product_batches LIMIT 1")
+    except:
+        c.execute("ALTER TABLE product_batches ADD COLUMN expiry_bucket INTEGER")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_batches_bucket ON product_batches(account_id, expiry_bucket)")
 
     # 9. Subscription Plans Table (Super Admin)
     c.execute('''
@@ -335,6 +450,220 @@ def init_db():
     except:
         c.execute("ALTER TABLE users ADD COLUMN permissions TEXT")
 
+    # 17. Analytics Watermarks (Incremental Jobs)
+    # One row per (account, job): the last source timestamp a job has consumed.
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS analytics_watermarks (
+            account_id TEXT,
+            job TEXT,
+            watermark TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (account_id, job),
+            FOREIGN KEY (account_id) REFERENCES accounts(id)
+        )
+    ''')
+
+    # 18. Customer RFM Scores (ChurnGuard)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS customer_rfm (
+            account_id TEXT,
+            customer_id TEXT,
+            first_seen TIMESTAMP,
+            last_seen TIMESTAMP,
+            frequency INTEGER,
+            monetary REAL,
+            recency_days REAL,
+            r_score INTEGER,
+            f_score INTEGER,
+            m_score INTEGER,
+            rfm_score INTEGER,
+            mean_gap_days REAL,
+            churn_prob REAL,
+            segment TEXT,
+            scored_at TIMESTAMP,
+            PRIMARY KEY (account_id, customer_id),
+            FOREIGN KEY (account_id) REFERENCES accounts(id),
+            FOREIGN KEY (customer_id) REFERENCES customers(id)
+        )
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_rfm_churn ON customer_rfm(account_id, churn_prob)")
+
+    # 19. Geo Revenue Rollup (GeoViz)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS geo_revenue_rollup (
+            account_id TEXT,
+            city TEXT,
+            pincode TEXT,
+            month TEXT, -- YYYY-MM
+            revenue REAL DEFAULT 0,
+            txn_count INTEGER DEFAULT 0,
+            PRIMARY KEY (account_id, city, pincode, month),
+            FOREIGN KEY (account_id) REFERENCES accounts(id)
+        )
+    ''')
+
+    # 20. Context Demand Index (IsoBar / ShiftSmart)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS daily_product_sales (
+            account_id TEXT,
+            date DATE,
+            product_name TEXT,
+            qty INTEGER DEFAULT 0,
+            revenue REAL DEFAULT 0,
+            PRIMARY KEY (account_id, date, product_name),
+            FOREIGN KEY (account_id) REFERENCES accounts(id)
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS context_demand_index (
+            account_id TEXT,
+            weather_tag TEXT,
+            event_tag TEXT,
+            product_name TEXT,
+            days_sold INTEGER DEFAULT 0,
+            total_qty REAL DEFAULT 0,
+            sum_sq_qty REAL DEFAULT 0,
+            revenue REAL DEFAULT 0,
+            PRIMARY KEY (account_id, weather_tag, event_tag, product_name),
+            FOREIGN KEY (account_id) REFERENCES accounts(id)
+        )
+    ''')
+
+    # 21. Demand Forecasts (IsoBar / ShiftSmart)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS demand_forecasts (
+            account_id TEXT,
+            product_name TEXT,
+            forecast_date DATE,
+            qty REAL,
+            model TEXT,
+            generated_at TIMESTAMP,
+            PRIMARY KEY (account_id, product_name, forecast_date),
+            FOREIGN KEY (account_id) REFERENCES accounts(id)
+        )
+    ''')
+
+    # 22. Notifications (Alerts raised by background jobs)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS notifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            account_id TEXT,
+            kind TEXT, -- EXPIRY_CRITICAL, EXPIRED, ...
+            ref_id TEXT, -- e.g. batch id
+            message TEXT,
+            is_read INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (account_id) REFERENCES accounts(id)
+        )
+    ''')
+    # One alert per (kind, ref) so re-running a sweep never duplicates
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_notifications_ref ON notifications(account_id, kind, ref_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_notifications_unread ON notifications(account_id, is_read, created_at)")
+
+    # 23. Stock Write-Offs (FreshFlow)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS stock_write_offs (
+            id TEXT PRIMARY KEY,
+            account_id TEXT,
+            batch_id TEXT,
+            product_id TEXT,
+            quantity INTEGER,
+            cost_value REAL,
+            reason TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (account_id) REFERENCES accounts(id),
+            FOREIGN KEY (batch_id) REFERENCES product_batches(id)
+        )
+    ''')
+
+    # 24. Purchase Order Lines (VendorTrust)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS purchase_order_lines (
+            id TEXT PRIMARY KEY,
+            account_id TEXT,
+            po_id TEXT,
+            product_id TEXT,
+            quantity INTEGER,
+            unit_cost REAL,
+            received_qty INTEGER DEFAULT 0,
+            FOREIGN KEY (po_id) REFERENCES purchase_orders(id),
+            FOREIGN KEY (product_id) REFERENCES products(id),
+            FOREIGN KEY (account_id) REFERENCES accounts(id)
+        )
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_po_lines_po ON purchase_order_lines(po_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_po_lines_product ON purchase_order_lines(account_id, product_id)")
+
+    # 25. Product Affinity (ShelfSense basket mining: top product pairs per tenant)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS product_affinity (
+            account_id TEXT,
+            product_a TEXT,
+            product_b TEXT,
+            pair_count INTEGER,
+            support REAL,
+            confidence_ab REAL,
+            confidence_ba REAL,
+            lift REAL,
+            computed_at TIMESTAMP,
+            PRIMARY KEY (account_id, product_a, product_b),
+            FOREIGN KEY (account_id) REFERENCES accounts(id)
+        )
+    ''')
+
+    # 26. Maintenance Log (checkpoints, optimize / ANALYZE, vacuum, integrity checks)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS db_maintenance_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task TEXT,
+            started_at TIMESTAMP,
+            duration_ms REAL,
+            success INTEGER,
+            detail TEXT,
+            wal_bytes_before INTEGER,
+            wal_bytes_after INTEGER
+        )
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_maintenance_task ON db_maintenance_log(task, started_at)")
+
+    # 27. Slow Query Log (written by query_profiler while profiling is on)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS slow_query_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            logged_at TIMESTAMP,
+            function TEXT,
+            sql TEXT,
+            duration_ms REAL,
+            rows INTEGER,
+            plan TEXT
+        )
+    ''')
+
+    # 28. Page Render Stats (ui_components.profile_section, aggregated per page section)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS page_render_stats (
+            page TEXT,
+            section TEXT,
+            calls INTEGER,
+            total_ms REAL,
+            max_ms REAL,
+            last_ms REAL,
+            buckets TEXT,
+            updated_at TIMESTAMP,
+            PRIMARY KEY (page, section)
+        )
+    ''')
+
+    # shifts(date, slot, staff_id) must be unique: one-time migration drops legacy duplicates, then enforces
+    c.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_shifts_unique'")
+    if not c.fetchone():
+        c.execute("DELETE FROM shifts WHERE rowid NOT IN (SELECT MIN(rowid) FROM shifts GROUP BY date, slot, staff_id)")
+        c.execute("CREATE UNIQUE INDEX idx_shifts_unique ON shifts(date, slot, staff_id)")
+
+    # transactions(account_id, timestamp) for watermark scans, (account_id, customer_id) for per-customer rollups
+    c.execute("CREATE INDEX IF NOT EXISTS idx_transactions_account_ts ON transactions(account_id, timestamp)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_transactions_account_customer ON transactions(account_id, customer_id)")
+
     # Ensure Restaurant Tables are created/migrated
     create_table_management_tables(conn)
     create_online_integration_tables(conn)
@@ -346,7 +675,7 @@ def init_db():
 
 def get_setting(key):
     """Fetch a setting value by key (Scoped)."""
-    conn = get_connection()
+    conn = get_connection(read_only=True)
     c = conn.cursor()
     aid = get_current_account_id()
     # Check Account Specific Setting
@@ -357,6 +686,18 @@ def get_setting(key):
         return result[0]
     return "VyaparMind Store" if key == 'store_name' else None # Fallback
 
+def get_settings(keys, override_account_id=None):
+    """Fetch several settings in one query (Scoped). Returns {key: value} for the keys that exist."""
+    import json
+    conn = get_connection(read_only=True)
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    try:
+        rows = conn.execute("SELECT key, value FROM settings WHERE account_id = ? AND key IN (SELECT value FROM json_each(?))",
+                            (aid, json.dumps(list(keys)))).fetchall()
+        return dict(rows)
+    finally:
+        conn.close()
+
 def update_setting(key, value):
     """Update or Set a setting (Scoped)."""
     return set_setting(key, value)
@@ -379,6 +720,8 @@ def set_setting(key, value):
             c.execute("UPDATE accounts SET subscription_plan = ? WHERE id = ?", (value, aid))
             
         conn.commit()
+        if key in ('subscription_plan', 'custom_modules_list'):
+            _bump_entitlements(aid)
         return True, "Success"
     except Exception as e:
         err_msg = f"DB Error: {e}"
@@ -407,6 +750,7 @@ def add_product(name, category, price, cost_price, stock_quantity, tax_rate=0.0,
         # Invalidate Cache
         _fetch_all_products_impl.clear()
         _fetch_pos_inventory_impl.clear()
+        _invalidate_tag_index(account_id)
 
 def update_product(product_id, price, cost_price, stock_quantity, tax_rate):
     """Updates price, cost, stock, and tax (Scoped)."""
@@ -432,7 +776,7 @@ def update_product(product_id, price, cost_price, stock_quantity, tax_rate):
 @st.cache_data(ttl=300)
 def _fetch_all_products_impl(account_id):
     """Internal cached fetcher."""
-    conn = get_connection()
+    conn = get_connection(read_only=True)
     # RLS: Filter by account_id
     df = pd.read_sql_query("SELECT * FROM products WHERE account_id = ?", conn, params=(account_id,))
     conn.close()
@@ -443,7 +787,7 @@ def fetch_all_products(search_term=None, override_account_id=None):
     Optimized fetcher with server-side searching.
     search_term: Optional string to filter by name or category.
     """
-    conn = get_connection()
+    conn = get_connection(read_only=True)
     aid = override_account_id if override_account_id is not None else get_current_account_id()
     
     query = "SELECT * FROM products WHERE account_id = ?"
@@ -460,7 +804,7 @@ def fetch_all_products(search_term=None, override_account_id=None):
 
 @st.cache_data(ttl=60)
 def _fetch_pos_inventory_impl(account_id):
-    conn = get_connection()
+    conn = get_connection(read_only=True)
     # Left join to include products even with 0 sales
     # RLS: Only products for this account
     query = """
@@ -480,7 +824,7 @@ def fetch_pos_inventory(search_term=None, limit=50, override_account_id=None):
     - search_term: Filter by name/category
     - limit: Max rows to return (default 50 for speed)
     """
-    conn = get_connection()
+    conn = get_connection(read_only=True)
     aid = override_account_id if override_account_id is not None else get_current_account_id()
     
     query = """
@@ -506,12 +850,13 @@ def fetch_pos_inventory(search_term=None, limit=50, override_account_id=None):
     
     df = pd.read_sql_query(query, conn, params=params)
     conn.close()
-    return df
+    # Charge the FEFO batch price where FreshFlow has marked it down
+    return resolve_pos_prices(df, override_account_id=aid)
 
 @st.cache_data(ttl=300)
 def _fetch_customers_impl(account_id):
     """Internal cached fetcher."""
-    conn = get_connection()
+    conn = get_connection(read_only=True)
     df = pd.read_sql_query("SELECT * FROM customers WHERE account_id = ?", conn, params=(account_id,))
     conn.close()
     return df
@@ -523,7 +868,7 @@ def fetch_customers():
 
 def get_customer_by_phone(phone):
     """Fetch customer by phone number (Scoped)."""
-    conn = get_connection()
+    conn = get_connection(read_only=True)
     aid = get_current_account_id()
     # clean phone? assume exact match for now
     df = pd.read_sql_query("SELECT * FROM customers WHERE phone = ? AND account_id = ?", conn, params=(phone, aid))
@@ -580,8 +925,12 @@ def add_batch(product_id, batch_code, expiry_date, quantity, cost_price, overrid
         
         # 2. Update Total Stock in master table (Scoped)
         c.execute('UPDATE products SET stock_quantity = stock_quantity + ? WHERE id = ? AND account_id = ?', (quantity, product_id, aid))
+
+        # 3. Expiry band (the daily sweep keeps it current afterwards)
+        _bucket_batches(c, aid, [new_id])
         
         conn.commit()
+        _invalidate_price_map(aid, [product_id])
         return True, "Batch added successfully."
     except Exception as e:
         conn.rollback()
@@ -592,168 +941,1262 @@ def add_batch(product_id, batch_code, expiry_date, quantity, cost_price, overrid
         _fetch_pos_inventory_impl.clear()
 
 def get_expiring_batches(days_threshold=7, override_account_id=None):
-    """Returns batches expiring within threshold days (Scoped)."""
-    conn = get_connection()
+    """Returns batches expiring within threshold days (Scoped). Bands come from the daily sweep."""
+    import freshflow_engine
     aid = override_account_id if override_account_id is not None else get_current_account_id()
-    # Logic: expiry_date <= (today + threshold) AND quantity > 0
-    query = '''
+    conn = get_connection(read_only=True)
+    # Read the precomputed expiry bands; the exact day cut is applied on the (small) result
+    bucket = freshflow_engine.bucket_for_lookahead(days_threshold)
+    if bucket is not None:
+        band_filter, params = "AND b.expiry_bucket <= ?", (aid, bucket)
+    else:
+        band_filter, params = "AND b.expiry_date <= date('now', 'localtime', '+' || ? || ' days')", (aid, str(days_threshold))
+    query = f'''
         SELECT b.*, p.name as product_name, p.price as current_price
         FROM product_batches b
         JOIN products p ON b.product_id = p.id
         WHERE b.account_id = ? 
         AND b.quantity > 0 
-        AND b.expiry_date <= date('now', '+' || ? || ' days')
+        {band_filter}
         ORDER BY b.expiry_date ASC
     '''
-    df = pd.read_sql_query(query, conn, params=(aid, str(days_threshold)))
+    df = pd.read_sql_query(query, conn, params=params)
     conn.close()
+    if bucket is not None and not df.empty:
+        cutoff = (datetime.now().date() + timedelta(days=days_threshold)).strftime('%Y-%m-%d')
+        df = df[df['expiry_date'].astype(str) <= cutoff].reset_index(drop=True)
     return df
 
-# --- VENDORTRUST MODULE LOGIC ---
+def _bucket_batches(c, aid, batch_ids=None):
+    """Recomputes expiry bands for a tenant's batches (or just batch_ids)."""
+    import json
+    import freshflow_engine
+    case = freshflow_engine.bucket_case_sql("(julianday(expiry_date) - julianday(date('now', 'localtime')))")
+    query = f"UPDATE product_batches SET expiry_bucket = {case} WHERE account_id = ?"
+    params = [aid]
+    if batch_ids is not None:
+        query += " AND id IN (SELECT value FROM json_each(?))"
+        params.append(json.dumps(batch_ids))
+    c.execute(query, params)
 
-def add_supplier(name, contact, phone, specialty, override_account_id=None):
+def run_expiry_sweep(force=False, write_off=True, override_account_id=None):
+    """
+    Daily FreshFlow sweep (Scoped). Runs at most once per day unless force=True.
+    1. Re-bands every batch into expired / <=2d / <=5d / <=10d / <=30d.
+    2. Raises a notification per batch that turned critical (<=2d) or expired.
+    3. Writes off expired stock in bulk (batch qty -> 0, product stock reduced, logged).
+    Returns (Success, Msg).
+    """
+    import freshflow_engine
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    today_str = datetime.now().strftime('%Y-%m-%d')
     conn = get_connection()
     c = conn.cursor()
-    aid = override_account_id if override_account_id is not None else get_current_account_id()
-    new_id = generate_unique_id(16)
+    written_off = []
     try:
-        # Check uniqueness (Scoped)
-        c.execute("SELECT id FROM suppliers WHERE (name = ? OR phone = ?) AND account_id = ?", (name, phone, aid))
-        if c.fetchone():
-            return False, "Supplier already exists (same name or phone)."
-            
-        c.execute("INSERT INTO suppliers (id, account_id, name, contact_person, phone, category_specialty) VALUES (?, ?, ?, ?, ?, ?)", 
-                  (new_id, aid, name, contact, phone, specialty))
+        if not force and _get_watermark(c, aid, 'expiry_sweep') == today_str:
+            return True, "Expiry sweep already ran today."
+
+        _bucket_batches(c, aid)
+
+        before = conn.total_changes
+        c.execute('''
+            INSERT OR IGNORE INTO notifications (account_id, kind, ref_id, message)
+            SELECT b.account_id,
+                   CASE WHEN b.expiry_bucket = ? THEN 'EXPIRED' ELSE 'EXPIRY_CRITICAL' END,
+                   b.id,
+                   p.name || ' (batch ' || COALESCE(b.batch_code, '-') || '): ' || b.quantity ||
+                   CASE WHEN b.expiry_bucket = ? THEN ' units expired on ' ELSE ' units expire on ' END || b.expiry_date
+            FROM product_batches b
+            JOIN products p ON b.product_id = p.id
+            WHERE b.account_id = ? AND b.quantity > 0 AND b.expiry_bucket <= ?
+        ''', (freshflow_engine.EXPIRED_BUCKET, freshflow_engine.EXPIRED_BUCKET, aid, freshflow_engine.EXPIRY_BUCKETS[0]))
+        alerts = conn.total_changes - before
+
+        if write_off:
+            c.execute("SELECT id, product_id, quantity, COALESCE(cost_price, 0) FROM product_batches WHERE account_id = ? AND expiry_bucket = ? AND quantity > 0",
+                      (aid, freshflow_engine.EXPIRED_BUCKET))
+            written_off = c.fetchall()
+            if written_off:
+                c.executemany("INSERT INTO stock_write_offs (id, account_id, batch_id, product_id, quantity, cost_value, reason) VALUES (?, ?, ?, ?, ?, ?, 'EXPIRED')",
+                              [(generate_unique_id(16), aid, b_id, p_id, qty, qty * cost) for b_id, p_id, qty, cost in written_off])
+                c.executemany("UPDATE product_batches SET quantity = 0 WHERE id = ? AND account_id = ?",
+                              [(b_id, aid) for b_id, _, _, _ in written_off])
+                per_product = {}
+                for _, p_id, qty, _ in written_off:
+                    per_product[p_id] = per_product.get(p_id, 0) + qty
+                c.executemany("UPDATE products SET stock_quantity = MAX(stock_quantity - ?, 0) WHERE id = ? AND account_id = ?",
+                              [(qty, p_id, aid) for p_id, qty in per_product.items()])
+
+        _set_watermark(c, aid, 'expiry_sweep', today_str)
         conn.commit()
-        return True, "Supplier added."
     except Exception as e:
+        conn.rollback()
         return False, str(e)
     finally:
         conn.close()
 
-def get_all_suppliers(override_account_id=None):
+    if written_off:
+        _invalidate_price_map(aid, list({p_id for _, p_id, _, _ in written_off}))
+        _fetch_all_products_impl.clear()
+        _fetch_pos_inventory_impl.clear()
+    units = sum(qty for _, _, qty, _ in written_off)
+    return True, f"Swept: {alerts} new alerts, {len(written_off)} expired batches written off ({units} units)."
+
+def run_nightly_expiry_sweeps(account_ids=None, force=False):
+    """Runs the expiry sweep for many tenants (System Level). Returns {account_id: (Success, Msg)}."""
+    if account_ids is None:
+        conn = get_connection(read_only=True)
+        account_ids = [r[0] for r in conn.execute("SELECT id FROM accounts WHERE status = 'ACTIVE'").fetchall()]
+        conn.close()
+    return {aid: run_expiry_sweep(force=force, override_account_id=aid) for aid in account_ids}
+
+def get_write_offs(override_account_id=None):
+    """Expired / damaged stock written off, newest first (Scoped)."""
+    conn = get_connection(read_only=True)
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    try:
+        return pd.read_sql_query('''
+            SELECT w.created_at, p.name as product_name, b.batch_code, w.quantity, w.cost_value, w.reason
+            FROM stock_write_offs w
+            LEFT JOIN products p ON w.product_id = p.id
+            LEFT JOIN product_batches b ON w.batch_id = b.id
+            WHERE w.account_id = ?
+            ORDER BY w.created_at DESC
+        ''', conn, params=(aid,))
+    finally:
+        conn.close()
+
+# --- NOTIFICATIONS ---
+
+def get_notifications(unread_only=True, limit=50, override_account_id=None):
+    """Alerts raised by background jobs, newest first (Scoped)."""
+    conn = get_connection(read_only=True)
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    query = "SELECT id, kind, ref_id, message, is_read, created_at FROM notifications WHERE account_id = ?"
+    if unread_only:
+        query += " AND is_read = 0"
+    query += " ORDER BY created_at DESC, id DESC LIMIT ?"
+    try:
+        return pd.read_sql_query(query, conn, params=(aid, limit))
+    finally:
+        conn.close()
+
+def mark_notifications_read(notification_ids=None, override_account_id=None):
+    """Marks the given alerts (or all of the tenant's) as read."""
+    import json
     conn = get_connection()
     aid = override_account_id if override_account_id is not None else get_current_account_id()
-    # Deduplicate view logic: Group by name/phone to hide dupes if they exist
-    df = pd.read_sql_query("SELECT * FROM suppliers WHERE account_id = ? GROUP BY name", conn, params=(aid,))
-    conn.close()
-    return df
+    try:
+        if notification_ids is None:
+            conn.execute("UPDATE notifications SET is_read = 1 WHERE account_id = ? AND is_read = 0", (aid,))
+        else:
+            conn.execute("UPDATE notifications SET is_read = 1 WHERE account_id = ? AND id IN (SELECT value FROM json_each(?))",
+                         (aid, json.dumps([int(i) for i in notification_ids])))
+        conn.commit()
+        return True
+    finally:
+        conn.close()
 
-def create_purchase_order(supplier_id, expected_date, notes="", override_account_id=None):
+def get_freshflow_markdowns(days_threshold=10, mode="tiered", floor_at_cost=False, override_account_id=None):
+    """Expiring batches with days left, suggested discount, new price and value at risk (Scoped)."""
+    import freshflow_engine
+    df = get_expiring_batches(days_threshold, override_account_id=override_account_id)
+    if df.empty:
+        return df
+    return freshflow_engine.price_markdowns(df, mode=mode, floor_at_cost=floor_at_cost)
+
+def apply_markdowns(markdowns, override_account_id=None):
+    """
+    Sets clearance prices on many batches in one transaction (Scoped).
+    markdowns: list of (batch_id, new_price) or a DataFrame with id / new_price
+    columns. A new_price of None clears the markdown.
+    The product master price is untouched; POS picks the FEFO batch price.
+    Returns (Success, Msg).
+    """
+    if isinstance(markdowns, pd.DataFrame):
+        markdowns = list(markdowns[['id', 'new_price']].itertuples(index=False, name=None))
+    if not markdowns:
+        return True, "No markdowns to apply."
+
+    import json
     conn = get_connection()
     c = conn.cursor()
     aid = override_account_id if override_account_id is not None else get_current_account_id()
+    batch_ids = [b_id for b_id, _ in markdowns]
     try:
-        c.execute("INSERT INTO purchase_orders (account_id, supplier_id, order_date, expected_date, notes) VALUES (?, ?, date('now'), ?, ?)",
-                  (aid, supplier_id, expected_date, notes))
+        before = conn.total_changes
+        c.executemany("UPDATE product_batches SET sale_price = ? WHERE id = ? AND account_id = ?",
+                      [(None if price is None else float(price), b_id, aid) for b_id, price in markdowns])
+        updated = conn.total_changes - before
+        c.execute("SELECT DISTINCT product_id FROM product_batches WHERE account_id = ? AND id IN (SELECT value FROM json_each(?))",
+                  (aid, json.dumps(batch_ids)))
+        product_ids = [r[0] for r in c.fetchall()]
         conn.commit()
-        return True, "PO Created."
+        _invalidate_price_map(aid, product_ids)
+        return True, f"Markdowns applied to {updated} batches."
     except Exception as e:
+        conn.rollback()
         return False, str(e)
     finally:
         conn.close()
 
-def get_open_pos():
-    conn = get_connection()
-    aid = get_current_account_id()
-    query = '''
-        SELECT po.*, s.name as supplier_name 
-        FROM purchase_orders po
-        JOIN suppliers s ON po.supplier_id = s.id
-        WHERE po.status = 'PENDING' AND po.account_id = ?
-    '''
-    df = pd.read_sql_query(query, conn, params=(aid,))
-    conn.close()
-    return df
+# --- POS PRICE RESOLVER ---
+# Per-tenant map of product_id -> sale price of its FEFO batch (the batch the
+# next sale is deducted from). Only products whose FEFO batch is marked down
+# are in the map; everything else sells at products.price. Kept in process
+# memory (keyed by database file + tenant) and refreshed per product, so a
+# clearance run never touches the products table or the product caches.
+_PRICE_MAPS = {}
+_PRICE_MAPS_LOCK = threading.Lock()
+
+_FEFO_PRICE_SQL = '''
+    SELECT b.product_id, b.sale_price
+    FROM product_batches b
+    WHERE b.account_id = ? AND b.quantity > 0 AND b.sale_price IS NOT NULL {product_filter}
+    AND b.id = (
+        SELECT b2.id FROM product_batches b2
+        WHERE b2.account_id = b.account_id AND b2.product_id = b.product_id AND b2.quantity > 0
+        ORDER BY b2.expiry_date IS NULL, b2.expiry_date ASC, b2.created_at ASC  -- Undated (non-perishable) batches last
+        LIMIT 1
+    )
+'''
+
+def _load_fefo_prices(aid, product_ids=None):
+    import json
+    conn = get_connection(read_only=True)
+    try:
+        if product_ids is None:
+            rows = conn.execute(_FEFO_PRICE_SQL.format(product_filter=""), (aid,)).fetchall()
+        else:
+            rows = conn.execute(_FEFO_PRICE_SQL.format(product_filter="AND b.product_id IN (SELECT value FROM json_each(?))"),
+                                (aid, json.dumps([str(p) for p in product_ids]))).fetchall()
+        return dict(rows)
+    finally:
+        conn.close()
+
+def _invalidate_price_map(aid, product_ids=None):
+    """Refreshes the given products in a tenant's price map (or drops the whole map)."""
+    with _PRICE_MAPS_LOCK:
+        price_map = _PRICE_MAPS.get((DB_NAME, aid))
+        if price_map is None:
+            return
+        if product_ids is None:
+            del _PRICE_MAPS[(DB_NAME, aid)]
+            return
+    fresh = _load_fefo_prices(aid, product_ids)
+    with _PRICE_MAPS_LOCK:
+        for pid in product_ids:
+            pid = str(pid)
+            if pid in fresh:
+                price_map[pid] = fresh[pid]
+            else:
+                price_map.pop(pid, None)
+
+def get_price_map(override_account_id=None):
+    """Returns {product_id: FEFO batch sale price} for the tenant, loading it once."""
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    with _PRICE_MAPS_LOCK:
+        price_map = _PRICE_MAPS.get((DB_NAME, aid))
+    if price_map is None:
+        price_map = _load_fefo_prices(aid)
+        with _PRICE_MAPS_LOCK:
+            _PRICE_MAPS[(DB_NAME, aid)] = price_map
+    return price_map
+
+def resolve_pos_prices(products, override_account_id=None):
+    """
+    Applies FEFO batch prices to a products frame (Scoped).
+    Keeps the master price in list_price and sets price to what the till charges.
+    """
+    if products.empty:
+        return products
+    price_map = get_price_map(override_account_id)
+    products = products.copy()
+    products['list_price'] = products['price']
+    sale = products['id'].astype(str).map(price_map)
+    products['price'] = sale.fillna(products['price'])
+    products['on_markdown'] = sale.notna()
+    return products
+
+# --- VENDORTRUST MODULE LOGIC ---
 
-def receive_purchase_order(po_id, quality_rating):
+def add_supplier(name, contact, phone, specialty, override_account_id=None):
     conn = get_connection()
     c = conn.cursor()
-    aid = get_current_account_id()
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    new_id = generate_unique_id(16)
     try:
+        # Uniqueness is enforced by idx_suppliers_name / idx_suppliers_phone (Scoped)
         c.execute('''
-            UPDATE purchase_orders 
-            SET status = 'RECEIVED', received_date = date('now'), quality_rating = ?
-            WHERE id = ? AND account_id = ?
-        ''', (quality_rating, po_id, aid))
+            INSERT INTO suppliers (id, account_id, name, contact_person, phone, category_specialty) VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT DO NOTHING
+        ''', (new_id, aid, name, contact, phone, specialty))
+        if c.rowcount == 0:
+            return False, "Supplier already exists (same name or phone)."
         conn.commit()
-        return True, "PO Received."
+        return True, "Supplier added."
     except Exception as e:
         return False, str(e)
     finally:
         conn.close()
 
-def get_vendor_scorecard(supplier_id):
-    conn = get_connection()
-    aid = get_current_account_id()
-    # Scoped to Account
-    query = "SELECT * FROM purchase_orders WHERE supplier_id = ? AND account_id = ? AND status = 'RECEIVED'"
-    df = pd.read_sql_query(query, conn, params=(supplier_id, aid))
-    conn.close()
-    
-    if df.empty:
-        return {'on_time_rate': 100, 'avg_quality': 5.0, 'risk': 'Unknown (New)'}
-    
-    df['expected_date'] = pd.to_datetime(df['expected_date'])
-    df['received_date'] = pd.to_datetime(df['received_date'])
-    
-    on_time_count = len(df[df['received_date'] <= df['expected_date']])
-    total = len(df)
-    on_time_rate = (on_time_count / total) * 100
-    avg_quality = df['quality_rating'].mean()
-    
-    risk = "Low"
-    if on_time_rate < 70 or avg_quality < 3.0:
-        risk = "High"
-    elif on_time_rate < 90 or avg_quality < 4.0:
-        risk = "Medium"
-        
-    return {'on_time_rate': on_time_rate, 'avg_quality': avg_quality, 'risk': risk}
-
-# --- ISOBAR MODULE LOGIC ---
-
-def set_daily_context(date_str, weather, event, notes=""):
+def upsert_suppliers(suppliers, override_account_id=None):
+    """
+    Bulk import: inserts new suppliers and refreshes contact details of
+    existing ones (matched by name) in one transaction (Scoped).
+    suppliers: list of (name, contact, phone, specialty)
+    Returns (Success, Msg).
+    """
     conn = get_connection()
     c = conn.cursor()
-    aid = get_current_account_id()
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
     try:
-        c.execute("INSERT OR REPLACE INTO daily_context (account_id, date, weather_tag, event_tag, notes) VALUES (?, ?, ?, ?, ?)",
-                  (aid, date_str, weather, event, notes))
+        before = conn.total_changes
+        c.executemany('''
+            INSERT INTO suppliers (id, account_id, name, contact_person, phone, category_specialty) VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(account_id, name) DO UPDATE SET
+                contact_person = COALESCE(excluded.contact_person, contact_person),
+                phone = COALESCE(NULLIF(excluded.phone, ''), phone),
+                category_specialty = COALESCE(excluded.category_specialty, category_specialty)
+        ''', [(generate_unique_id(16), aid, name, contact, phone, specialty) for name, contact, phone, specialty in suppliers])
         conn.commit()
-        return True, "Context Saved."
+        return True, f"{conn.total_changes - before} suppliers imported."
+    except sqlite3.IntegrityError as e:
+        conn.rollback()
+        return False, f"Phone number already used by another supplier ({e})."
     except Exception as e:
-        print(f"ISO Error: {e}")
+        conn.rollback()
         return False, str(e)
     finally:
         conn.close()
 
-def get_daily_context(date_str):
-    conn = get_connection()
-    c = conn.cursor()
-    aid = get_current_account_id()
-    c.execute("SELECT * FROM daily_context WHERE date = ? AND account_id = ?", (date_str, aid))
-    res = c.fetchone()
+def get_all_suppliers(override_account_id=None):
+    conn = get_connection(read_only=True)
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    df = pd.read_sql_query("SELECT * FROM suppliers WHERE account_id = ? ORDER BY name", conn, params=(aid,))
     conn.close()
-    return res
+    return df
 
-def analyze_context_demand(weather_filter=None, event_filter=None):
+def _merge_duplicate_suppliers(c):
     """
-    Finds top selling items on days that match the filters (Scoped).
+    One-time migration before the unique supplier indexes: duplicates by
+    (account, name) or (account, phone) are merged into the oldest row.
+    Purchase orders are repointed and blank details filled from the duplicates.
+    """
+    c.execute("SELECT rowid, id, account_id, name, phone, contact_person, category_specialty FROM suppliers ORDER BY rowid")
+    keeper_by_key = {}
+    merges = []  # (dup_id, keeper_id)
+    details = {}
+    for _, sid, aid, name, phone, contact, specialty in c.fetchall():
+        keys = [(aid, 'name', name)] + ([(aid, 'phone', phone)] if phone else [])
+        keeper = next((keeper_by_key[k] for k in keys if k in keeper_by_key), None)
+        if keeper is None:
+            keeper = sid
+            details[sid] = {'phone': phone, 'contact_person': contact, 'category_specialty': specialty}
+        else:
+            merges.append((sid, keeper))
+            kept = details[keeper]
+            for col, val in (('phone', phone), ('contact_person', contact), ('category_specialty', specialty)):
+                # A phone may only move to the keeper if no other supplier owns it
+                if col == 'phone' and keeper_by_key.get((aid, 'phone', val), keeper) != keeper:
+                    continue
+                if not kept[col] and val:
+                    kept[col] = val
+        for k in keys:
+            keeper_by_key.setdefault(k, keeper)
+    if not merges:
+        return
+    c.executemany("UPDATE purchase_orders SET supplier_id = ? WHERE supplier_id = ?", [(keep, dup) for dup, keep in merges])
+    c.executemany("DELETE FROM suppliers WHERE id = ?", [(dup,) for dup, _ in merges])
+    kept_ids = {keep for _, keep in merges}
+    c.executemany("UPDATE suppliers SET phone = ?, contact_person = ?, category_specialty = ? WHERE id = ?",
+                  [(details[k]['phone'], details[k]['contact_person'], details[k]['category_specialty'], k) for k in kept_ids])
+    print(f"Supplier migration: merged {len(merges)} duplicate suppliers.")
+
+def create_purchase_order(supplier_id, expected_date, notes="", lines=None, status='PENDING', override_account_id=None):
+    """
+    Creates a PO, optionally with line items (Scoped).
+    lines: list of dicts {'product_id', 'quantity', 'unit_cost'} (unit_cost optional)
+    Returns (Success, Msg).
     """
     conn = get_connection()
-    aid = get_current_account_id()
-    
-    # 1. Find dates matching context for this account
-    query = "SELECT date FROM daily_context WHERE account_id = ?"
+    c = conn.cursor()
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    new_id = generate_unique_id(16)
+    try:
+        c.execute("INSERT INTO purchase_orders (id, account_id, supplier_id, order_date, expected_date, status, notes) VALUES (?, ?, ?, date('now'), ?, ?, ?)",
+                  (new_id, aid, supplier_id, expected_date, status, notes))
+        if lines:
+            c.executemany("INSERT INTO purchase_order_lines (id, account_id, po_id, product_id, quantity, unit_cost) VALUES (?, ?, ?, ?, ?, ?)",
+                          [(generate_unique_id(16), aid, new_id, l['product_id'], int(l['quantity']), l.get('unit_cost')) for l in lines])
+        conn.commit()
+        return True, "PO Created."
+    except Exception as e:
+        conn.rollback()
+        return False, str(e)
+    finally:
+        conn.close()
+
+def get_open_pos(status='PENDING', override_account_id=None):
+    conn = get_connection(read_only=True)
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    query = '''
+        SELECT po.*, s.name as supplier_name,
+               (SELECT COUNT(*) FROM purchase_order_lines l WHERE l.po_id = po.id) as line_count,
+               (SELECT SUM(l.quantity * COALESCE(l.unit_cost, 0)) FROM purchase_order_lines l WHERE l.po_id = po.id) as po_value
+        FROM purchase_orders po
+        JOIN suppliers s ON po.supplier_id = s.id
+        WHERE po.status = ? AND po.account_id = ?
+        ORDER BY po.expected_date
+    '''
+    df = pd.read_sql_query(query, conn, params=(status, aid))
+    conn.close()
+    return df
+
+def get_po_lines(po_id, override_account_id=None):
+    """Line items of a PO with product names (Scoped)."""
+    conn = get_connection(read_only=True)
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    try:
+        return pd.read_sql_query('''
+            SELECT l.*, p.name as product_name
+            FROM purchase_order_lines l
+            LEFT JOIN products p ON l.product_id = p.id
+            WHERE l.po_id = ? AND l.account_id = ?
+        ''', conn, params=(po_id, aid))
+    finally:
+        conn.close()
+
+def approve_purchase_orders(po_ids, override_account_id=None):
+    """Turns DRAFT POs into PENDING orders placed today (lead time counts from approval)."""
+    import json
+    conn = get_connection()
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    try:
+        cur = conn.execute('''
+            UPDATE purchase_orders SET status = 'PENDING', order_date = date('now'),
+                   expected_date = date('now', '+' || CAST(ROUND(julianday(expected_date) - julianday(order_date)) AS INTEGER) || ' days')
+            WHERE account_id = ? AND status = 'DRAFT' AND id IN (SELECT value FROM json_each(?))
+        ''', (aid, json.dumps(list(po_ids))))
+        conn.commit()
+        return True, f"{cur.rowcount} POs approved."
+    except Exception as e:
+        return False, str(e)
+    finally:
+        conn.close()
+
+def receive_purchase_order(po_id, quality_rating, batch_code=None, expiry_date=None, override_account_id=None):
+    """
+    Marks an approved (PENDING) PO received and books its lines into stock in one transaction (Scoped):
+    one product_batches row per line (add_batch semantics) and stock += quantity.
+    Returns (Success, Msg).
+    """
+    conn = get_connection()
+    c = conn.cursor()
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    try:
+        c.execute('''
+            UPDATE purchase_orders 
+            SET status = 'RECEIVED', received_date = date('now'), quality_rating = ?
+            WHERE id = ? AND account_id = ? AND status = 'PENDING'
+        ''', (quality_rating, po_id, aid))
+        if c.rowcount == 0:
+            return False, "PO not found, not approved yet, or already received."
+
+        c.execute("SELECT id, product_id, quantity - COALESCE(received_qty, 0), unit_cost FROM purchase_order_lines WHERE po_id = ? AND account_id = ?", (po_id, aid))
+        lines = [l for l in c.fetchall() if l[2] > 0]
+        batch_code = batch_code or f"PO-{po_id[:8]}"
+        batches = [(generate_unique_id(16), aid, p_id, batch_code, expiry_date, qty, cost) for _, p_id, qty, cost in lines]
+        if batches:
+            c.executemany('''
+                INSERT INTO product_batches (id, account_id, product_id, batch_code, expiry_date, quantity, cost_price)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', batches)
+            c.executemany("UPDATE products SET stock_quantity = stock_quantity + ? WHERE id = ? AND account_id = ?",
+                          [(qty, p_id, aid) for _, p_id, qty, _ in lines])
+            c.executemany("UPDATE purchase_order_lines SET received_qty = quantity WHERE id = ?", [(l[0],) for l in lines])
+            _bucket_batches(c, aid, [b[0] for b in batches])
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        return False, str(e)
+    finally:
+        conn.close()
+
+    if lines:
+        _invalidate_price_map(aid, list({l[1] for l in lines}))
+        _fetch_all_products_impl.clear()
+        _fetch_pos_inventory_impl.clear()
+    return True, f"PO Received. {len(lines)} batches booked into stock."
+
+# Scorecard rules (shared by the SQL aggregation and the per-supplier wrapper)
+VENDOR_HIGH_RISK = (70, 3.0)    # on-time % / avg quality below these -> High
+VENDOR_MEDIUM_RISK = (90, 4.0)  # ... below these -> Medium
+
+def get_vendor_scorecards(supplier_id=None, override_account_id=None):
+    """
+    Scorecards for every supplier of the tenant in one query (Scoped):
+    po_count, on_time_rate, avg_quality, avg / p50 / p90 lead time (days) and risk.
+    Suppliers without received POs score 100% / 5.0 with risk 'Unknown (New)'.
+    """
+    conn = get_connection(read_only=True)
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    query = '''
+        WITH recv AS (
+            SELECT supplier_id,
+                   julianday(received_date) - julianday(order_date) AS lead_days,
+                   CASE WHEN date(received_date) <= date(expected_date) THEN 1.0 ELSE 0.0 END AS on_time,
+                   quality_rating
+            FROM purchase_orders
+            WHERE account_id = ? AND status = 'RECEIVED' {po_filter}
+        ),
+        agg AS (
+            SELECT supplier_id, COUNT(*) AS po_count, 100.0 * AVG(on_time) AS on_time_rate,
+                   AVG(quality_rating) AS avg_quality, AVG(lead_days) AS avg_lead_days
+            FROM recv GROUP BY supplier_id
+        ),
+        ranked AS (
+            SELECT supplier_id, lead_days,
+                   ROW_NUMBER() OVER (PARTITION BY supplier_id ORDER BY lead_days) AS rn,
+                   COUNT(*) OVER (PARTITION BY supplier_id) AS n
+            FROM recv WHERE lead_days IS NOT NULL
+        ),
+        pct AS (
+            -- Nearest-rank percentiles
+            SELECT supplier_id,
+                   MIN(CASE WHEN rn >= 0.5 * n THEN lead_days END) AS lead_p50_days,
+                   MIN(CASE WHEN rn >= 0.9 * n THEN lead_days END) AS lead_p90_days
+            FROM ranked GROUP BY supplier_id
+        ),
+        scored AS (
+            SELECT s.*, COALESCE(a.po_count, 0) AS po_count,
+                   COALESCE(a.on_time_rate, 100.0) AS on_time_rate,
+                   COALESCE(a.avg_quality, 5.0) AS avg_quality,
+                   a.avg_lead_days, p.lead_p50_days, p.lead_p90_days
+            FROM suppliers s
+            LEFT JOIN agg a ON a.supplier_id = s.id
+            LEFT JOIN pct p ON p.supplier_id = s.id
+            WHERE s.account_id = ? {supplier_filter}
+        )
+        SELECT *,
+               CASE WHEN po_count = 0 THEN 'Unknown (New)'
+                    WHEN on_time_rate < ? OR avg_quality < ? THEN 'High'
+                    WHEN on_time_rate < ? OR avg_quality < ? THEN 'Medium'
+                    ELSE 'Low' END AS risk
+        FROM scored
+        ORDER BY name
+    '''
+    po_filter = supplier_filter = ""
+    params = [aid, aid]
+    if supplier_id is not None:
+        po_filter, supplier_filter = "AND supplier_id = ?", "AND s.id = ?"
+        params = [aid, supplier_id, aid, supplier_id]
+    params += [*VENDOR_HIGH_RISK, *VENDOR_MEDIUM_RISK]
+    try:
+        return pd.read_sql_query(query.format(po_filter=po_filter, supplier_filter=supplier_filter), conn, params=params)
+    finally:
+        conn.close()
+
+def get_vendor_scorecard(supplier_id, override_account_id=None):
+    """Single-supplier scorecard dict (on_time_rate, avg_quality, risk, lead times)."""
+    df = get_vendor_scorecards(supplier_id, override_account_id=override_account_id)
+    if df.empty:
+        return {'on_time_rate': 100, 'avg_quality': 5.0, 'risk': 'Unknown (New)'}
+    row = df.iloc[0]
+    return {
+        'on_time_rate': row['on_time_rate'],
+        'avg_quality': row['avg_quality'],
+        'risk': row['risk'],
+        'po_count': int(row['po_count']),
+        'lead_p50_days': row['lead_p50_days'],
+        'lead_p90_days': row['lead_p90_days'],
+    }
+
+# --- VENDORTRUST REPLENISHMENT ---
+# Reorder points from sales velocity (transaction_items) and supplier lead
+# times (received POs); SKUs at or below their ROP get draft POs, one per supplier.
+
+def compute_reorder_plan(history_days=56, service_level=None, order_cost=None, holding_rate=None, override_account_id=None):
+    """
+    Reorder point / EOQ for every product of the tenant in one pass (Scoped).
+    Each product is sourced from the supplier it was last ordered from, else
+    the tenant's best-scored supplier.
+    Returns DataFrame: product_id, name, stock_quantity, on_order, daily_demand,
+    lead_days, safety_stock, reorder_point, eoq, order_qty, unit_cost, supplier_id, supplier_name.
+    """
+    import reorder_engine
+    import numpy as np
+
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    service_level = service_level or reorder_engine.SERVICE_LEVEL
+    order_cost = order_cost or reorder_engine.ORDER_COST
+    holding_rate = holding_rate or reorder_engine.HOLDING_RATE
+    since = (datetime.now().date() - timedelta(days=history_days)).strftime('%Y-%m-%d')
+
+    conn = get_connection(read_only=True)
+    try:
+        products = pd.read_sql_query('''
+            SELECT p.id as product_id, p.name, p.stock_quantity, COALESCE(p.cost_price, 0) as unit_cost,
+                   COALESCE((SELECT SUM(l.quantity - COALESCE(l.received_qty, 0))
+                             FROM purchase_order_lines l JOIN purchase_orders po ON l.po_id = po.id
+                             WHERE l.account_id = p.account_id AND l.product_id = p.id AND po.status IN ('DRAFT', 'PENDING')), 0) as on_order,
+                   (SELECT po.supplier_id FROM purchase_order_lines l JOIN purchase_orders po ON l.po_id = po.id
+                    WHERE l.account_id = p.account_id AND l.product_id = p.id
+                    ORDER BY po.order_date DESC LIMIT 1) as supplier_id
+            FROM products p WHERE p.account_id = ?
+        ''', conn, params=(aid,))
+        daily = pd.read_sql_query('''
+            SELECT ti.product_id, date(t.timestamp) as day, SUM(ti.quantity) as qty
+            FROM transactions t JOIN transaction_items ti ON ti.transaction_id = t.id
+            WHERE t.account_id = ? AND t.timestamp >= ?
+            GROUP BY ti.product_id, day
+        ''', conn, params=(aid, since))
+        leads = pd.read_sql_query('''
+            SELECT supplier_id, AVG(lead) as lead_mean, AVG(lead * lead) - AVG(lead) * AVG(lead) as lead_var
+            FROM (SELECT supplier_id, julianday(received_date) - julianday(order_date) as lead
+                  FROM purchase_orders WHERE account_id = ? AND status = 'RECEIVED' AND received_date IS NOT NULL)
+            GROUP BY supplier_id
+        ''', conn, params=(aid,)).set_index('supplier_id')
+    finally:
+        conn.close()
+    if products.empty:
+        return products
+
+    # Default supplier: best on-time / quality among the tenant's suppliers
+    cards = get_vendor_scorecards(override_account_id=aid)
+    default_supplier = None
+    if not cards.empty:
+        default_supplier = cards.sort_values(['on_time_rate', 'avg_quality'], ascending=False).iloc[0]['id']
+        products['supplier_id'] = products['supplier_id'].fillna(default_supplier)
+
+    # Dense (product x day) demand matrix; days without sales count as zero
+    Y = np.zeros((len(products), history_days))
+    if not daily.empty:
+        row = pd.Index(products['product_id']).get_indexer(daily['product_id'])
+        col = (pd.to_datetime(daily['day']) - pd.Timestamp(since)).dt.days.to_numpy()
+        ok = (row >= 0) & (col >= 0) & (col < history_days)
+        np.add.at(Y, (row[ok], col[ok]), daily['qty'].to_numpy(dtype=float)[ok])
+    d_mean, d_std = reorder_engine.sales_velocity(Y)
+
+    lead_mean = products['supplier_id'].map(leads['lead_mean']).fillna(reorder_engine.DEFAULT_LEAD_DAYS).to_numpy(dtype=float)
+    lead_std = np.sqrt(np.maximum(products['supplier_id'].map(leads['lead_var']).fillna(0).to_numpy(dtype=float), 0))
+    rop, safety = reorder_engine.reorder_points(d_mean, d_std, lead_mean, lead_std, service_level)
+    eoq = reorder_engine.economic_order_qty(d_mean, products['unit_cost'], order_cost, holding_rate)
+
+    products['daily_demand'] = d_mean
+    products['lead_days'] = lead_mean
+    products['safety_stock'] = safety
+    products['reorder_point'] = rop
+    products['eoq'] = eoq
+    products['order_qty'] = reorder_engine.plan_orders(products['stock_quantity'].fillna(0), products['on_order'], rop, eoq)
+    products['supplier_name'] = products['supplier_id'].map(cards.set_index('id')['name']) if not cards.empty else None
+    return products
+
+def generate_draft_pos(history_days=56, override_account_id=None):
+    """
+    Creates DRAFT POs (one per supplier, with lines) for every product at or
+    below its reorder point, in one transaction (Scoped). Returns (Success, Msg).
+    """
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    plan = compute_reorder_plan(history_days, override_account_id=aid)
+    if plan.empty:
+        return True, "No products to plan."
+    todo = plan[plan['order_qty'] > 0]
+    if todo.empty:
+        return True, "All products above reorder point."
+    if todo['supplier_id'].isna().any():
+        return False, "Add a supplier before generating purchase orders."
+
+    conn = get_connection()
+    c = conn.cursor()
+    today = datetime.now().date()
+    try:
+        pos, lines = [], []
+        for supplier_id, group in todo.groupby('supplier_id'):
+            po_id = generate_unique_id(16)
+            expected = (today + timedelta(days=int(round(group['lead_days'].iloc[0])))).strftime('%Y-%m-%d')
+            pos.append((po_id, aid, supplier_id, today.strftime('%Y-%m-%d'), expected, 'DRAFT', f"Auto-replenishment: {len(group)} SKUs below reorder point"))
+            lines += [(generate_unique_id(16), aid, po_id, r.product_id, int(r.order_qty), float(r.unit_cost))
+                      for r in group.itertuples(index=False)]
+        c.executemany("INSERT INTO purchase_orders (id, account_id, supplier_id, order_date, expected_date, status, notes) VALUES (?, ?, ?, ?, ?, ?, ?)", pos)
+        c.executemany("INSERT INTO purchase_order_lines (id, account_id, po_id, product_id, quantity, unit_cost) VALUES (?, ?, ?, ?, ?, ?)", lines)
+        conn.commit()
+        return True, f"{len(pos)} draft POs created for {len(lines)} SKUs."
+    except Exception as e:
+        conn.rollback()
+        return False, str(e)
+    finally:
+        conn.close()
+
+def run_nightly_reorders(account_ids=None):
+    """Generates draft POs for many tenants (System Level). Returns {account_id: (Success, Msg)}."""
+    if account_ids is None:
+        conn = get_connection(read_only=True)
+        account_ids = [r[0] for r in conn.execute("SELECT id FROM accounts WHERE status = 'ACTIVE'").fetchall()]
+        conn.close()
+    return {aid: generate_draft_pos(override_account_id=aid) for aid in account_ids}
+
+# --- SHELFSENSE MODULE LOGIC ---
+
+# Tag index: per-tenant {product name: frozenset(tags)} built from
+# products.science_tags in one query. Untagged products (NULL / blank) get
+# keyword-inferred tags once, at load time; "[]" is a stored empty list and
+# is respected. Kept in process memory (keyed by database file + tenant) and
+# dropped whenever a product or its tags change.
+_TAG_INDEXES = {}
+_TAG_INDEXES_LOCK = threading.Lock()
+
+def _load_tag_index(aid):
+    import shelf_engine
+    conn = get_connection(read_only=True)
+    try:
+        rows = conn.execute("SELECT name, science_tags FROM products WHERE account_id = ? AND name IS NOT NULL", (aid,)).fetchall()
+    finally:
+        conn.close()
+    index = {}
+    for name, raw in rows:
+        tags = frozenset(shelf_engine.parse_science_tags(raw)) if shelf_engine.has_science_tags(raw) else shelf_engine.infer_tags(name)
+        index[name] = index.get(name, frozenset()) | tags
+    return index
+
+def _invalidate_tag_index(aid):
+    with _TAG_INDEXES_LOCK:
+        _TAG_INDEXES.pop((DB_NAME, aid), None)
+
+def get_tag_index(override_account_id=None):
+    """Returns {product name: frozenset(tags)} for the tenant's catalog, loading it once."""
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    with _TAG_INDEXES_LOCK:
+        index = _TAG_INDEXES.get((DB_NAME, aid))
+    if index is None:
+        index = _load_tag_index(aid)
+        with _TAG_INDEXES_LOCK:
+            _TAG_INDEXES[(DB_NAME, aid)] = index
+    return index
+
+def get_tag_lookup(override_account_id=None):
+    """name -> tags for shelf_engine (catalog tags first, keyword inference for unknown names)."""
+    import shelf_engine
+    return shelf_engine.index_lookup(get_tag_index(override_account_id))
+
+def get_shelf_products(override_account_id=None):
+    """
+    Products with their ShelfSense tags (Scoped).
+    tag_source is 'catalog' for stored science_tags, 'inferred' for keyword matches.
+    """
+    conn = get_connection(read_only=True)
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    try:
+        df = pd.read_sql_query("SELECT id, name, category, science_tags FROM products WHERE account_id = ? ORDER BY name", conn, params=(aid,))
+    finally:
+        conn.close()
+    import shelf_engine
+    index = get_tag_index(aid)
+    df['tags'] = [sorted(index.get(n, ())) for n in df['name']]
+    df['tag_source'] = ['catalog' if shelf_engine.has_science_tags(t) else 'inferred' for t in df['science_tags']]
+    return df
+
+def set_science_tags(product_ids, tags, mode='add', override_account_id=None):
+    """
+    Bulk tag assignment (Scoped).
+    mode: 'add' (union with current tags), 'remove', or 'replace'.
+    Products without stored tags start from their inferred tags, so adding one
+    tag never silently drops the ones ShelfSense was already using.
+    Returns (Success, Msg).
+    """
+    import json
+    import shelf_engine
+
+    if mode not in ('add', 'remove', 'replace'):
+        return False, f"Unknown mode: {mode}"
+    if not product_ids:
+        return False, "No products selected."
+    conn = get_connection()
+    c = conn.cursor()
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    tags = set(tags or [])
+    try:
+        c.execute("SELECT id, name, science_tags FROM products WHERE account_id = ? AND id IN (SELECT value FROM json_each(?))",
+                  (aid, json.dumps([str(p) for p in product_ids])))
+        updates = []
+        for pid, name, raw in c.fetchall():
+            current = set(shelf_engine.parse_science_tags(raw) if shelf_engine.has_science_tags(raw) else shelf_engine.infer_tags(name or ""))
+            new = tags if mode == 'replace' else (current | tags if mode == 'add' else current - tags)
+            updates.append((shelf_engine.format_science_tags(new), datetime.now(), pid, aid))
+        c.executemany("UPDATE products SET science_tags = ?, updated_at = ? WHERE id = ? AND account_id = ?", updates)
+        conn.commit()
+        return True, f"Tags updated on {len(updates)} products."
+    except Exception as e:
+        conn.rollback()
+        return False, str(e)
+    finally:
+        conn.close()
+        _invalidate_tag_index(aid)
+        _fetch_all_products_impl.clear()
+
+def persist_inferred_tags(override_account_id=None):
+    """Stores keyword-inferred tags on every untagged product (Scoped), so they can be reviewed and edited. Returns (Success, Msg)."""
+    import shelf_engine
+    df = get_shelf_products(override_account_id)
+    todo = df[(df['tag_source'] == 'inferred') & (df['tags'].str.len() > 0)]
+    if todo.empty:
+        return True, "No untagged products with a keyword match."
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    conn = get_connection()
+    try:
+        conn.executemany("UPDATE products SET science_tags = ?, updated_at = ? WHERE id = ? AND account_id = ?",
+                         [(shelf_engine.format_science_tags(t), datetime.now(), pid, aid) for pid, t in zip(todo['id'], todo['tags'])])
+        conn.commit()
+        return True, f"Saved inferred tags on {len(todo)} products."
+    except Exception as e:
+        conn.rollback()
+        return False, str(e)
+    finally:
+        conn.close()
+        _invalidate_tag_index(aid)
+        _fetch_all_products_impl.clear()
+
+def optimize_shelf_layouts(aisles, iterations=None, max_workers=None, override_account_id=None):
+    """
+    Optimizes several aisles in a process pool, using the tenant's product tags
+    and mined basket affinities.
+    aisles: list of dicts {'products': [names], 'facings': [slots per product], 'rows', 'cols'}
+    Returns one result per aisle (see shelf_optimizer.optimize_layout) plus 'products'.
+    """
+    import shelf_engine
+    import shelf_optimizer
+
+    lookup = get_tag_lookup(override_account_id)
+    affinity = get_affinity_map(override_account_id)
+    jobs = [{'masks': shelf_engine.resolve_masks(a['products'], tag_lookup=lookup),
+             'bonus': shelf_engine.affinity_matrix(a['products'], affinity) if affinity else None,
+             'facings': list(a['facings']), 'rows': a['rows'], 'cols': a['cols']} for a in aisles]
+    results = shelf_optimizer.optimize_aisles(jobs, iterations=iterations or shelf_optimizer.ITERATIONS, max_workers=max_workers)
+    for aisle, result in zip(aisles, results):
+        result['products'] = list(aisle['products'])
+    return results
+
+# Basket affinities: product pairs bought together more often than chance,
+# mined from transaction_items and stored in product_affinity. They feed
+# analyze_grid and the layout optimizer as extra boost rules.
+
+def refresh_product_affinity(days=None, chunk_size=50_000, min_baskets=None, top=None, override_account_id=None):
+    """
+    Mines basket pairs for a tenant (Scoped) and replaces its stored top pairs.
+    Line items are streamed in chunks of chunk_size rows, so memory is bounded
+    by the number of distinct pairs, not by the size of the sales history.
+    days: only baskets from the last N days (None = all history).
+    Returns (Success, Msg).
+    """
+    import basket_engine
+
+    conn = get_connection()
+    c = conn.cursor()
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    since = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d') if days else '0000-00-00'
+    try:
+        miner = basket_engine.BasketMiner()
+        # Transactions are read in id (primary key) order, so each basket's items arrive together
+        c.execute('''
+            SELECT t.id, ti.product_name
+            FROM transactions t JOIN transaction_items ti ON ti.transaction_id = t.id
+            WHERE t.account_id = ? AND t.timestamp >= ? AND ti.product_name IS NOT NULL
+            ORDER BY t.id
+        ''', (aid, since))
+        carry = []
+        while True:
+            rows = c.fetchmany(chunk_size)
+            if not rows:
+                break
+            rows = carry + rows
+            # Hold back the last basket: it may continue in the next chunk
+            cut = len(rows)
+            while cut > 0 and rows[cut - 1][0] == rows[-1][0]:
+                cut -= 1
+            if cut == 0:
+                carry = rows
+                continue
+            miner.add([r[0] for r in rows[:cut]], [r[1] for r in rows[:cut]])
+            carry = rows[cut:]
+        if carry:
+            miner.add([r[0] for r in carry], [r[1] for r in carry])
+
+        pairs = miner.rules(min_baskets=min_baskets or basket_engine.MIN_PAIR_BASKETS, top=top or basket_engine.TOP_PAIRS)
+        now = datetime.now()
+        c.execute("DELETE FROM product_affinity WHERE account_id = ?", (aid,))
+        c.executemany('''
+            INSERT INTO product_affinity (account_id, product_a, product_b, pair_count, support, confidence_ab, confidence_ba, lift, computed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(aid, p['product_a'], p['product_b'], p['pair_count'], p['support'], p['confidence_ab'],
+               p['confidence_ba'], p['lift'], now) for p in pairs])
+        conn.commit()
+        return True, f"{len(pairs)} product pairs mined from {miner.n_baskets} baskets."
+    except Exception as e:
+        conn.rollback()
+        return False, str(e)
+    finally:
+        conn.close()
+
+def run_nightly_affinity(account_ids=None, days=None):
+    """Re-mines basket affinities for many tenants (System Level). Returns {account_id: (Success, Msg)}."""
+    if account_ids is None:
+        conn = get_connection(read_only=True)
+        account_ids = [r[0] for r in conn.execute("SELECT id FROM accounts WHERE status = 'ACTIVE'").fetchall()]
+        conn.close()
+    return {aid: refresh_product_affinity(days=days, override_account_id=aid) for aid in account_ids}
+
+def get_product_affinity(min_lift=1.0, limit=None, override_account_id=None):
+    """Stored basket pairs (Scoped), highest lift first."""
+    conn = get_connection(read_only=True)
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    try:
+        query = "SELECT product_a, product_b, pair_count, support, confidence_ab, confidence_ba, lift, computed_at FROM product_affinity WHERE account_id = ? AND lift > ? ORDER BY lift DESC, pair_count DESC"
+        params = [aid, min_lift]
+        if limit:
+            query += " LIMIT ?"
+            params.append(int(limit))
+        return pd.read_sql_query(query, conn, params=params)
+    finally:
+        conn.close()
+
+def get_affinity_map(override_account_id=None):
+    """{(product_a, product_b): lift} for shelf_engine.analyze_grid / the layout optimizer."""
+    df = get_product_affinity(override_account_id=override_account_id)
+    return {(a, b): lift for a, b, lift in zip(df['product_a'], df['product_b'], df['lift'])}
+
+# --- ISOBAR MODULE LOGIC ---
+
+def set_daily_context(date_str, weather, event, notes="", override_account_id=None):
+    conn = get_connection()
+    c = conn.cursor()
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    try:
+        # Re-tagging a day that is already in the demand index moves its sales between contexts
+        indexed_until = _get_watermark(c, aid, 'context_demand')
+        if indexed_until and date_str <= indexed_until:
+            c.execute("SELECT weather_tag, event_tag FROM daily_context WHERE account_id = ? AND date = ?", (aid, date_str))
+            old = c.fetchone()
+            if old:
+                _apply_day_to_context_index(c, aid, date_str, old[0], old[1], -1)
+            _apply_day_to_context_index(c, aid, date_str, weather, event, +1)
+
+        c.execute("INSERT OR REPLACE INTO daily_context (account_id, date, weather_tag, event_tag, notes) VALUES (?, ?, ?, ?, ?)",
+                  (aid, date_str, weather, event, notes))
+        conn.commit()
+        return True, "Context Saved."
+    except Exception as e:
+        print(f"ISO Error: {e}")
+        conn.rollback()
+        return False, str(e)
+    finally:
+        conn.close()
+
+def get_daily_context(date_str):
+    conn = get_connection(read_only=True)
+    c = conn.cursor()
+    aid = get_current_account_id()
+    c.execute("SELECT * FROM daily_context WHERE date = ? AND account_id = ?", (date_str, aid))
+    res = c.fetchone()
+    conn.close()
+    return res
+
+# Context Demand Index:
+#   daily_product_sales   - per closed day, per product totals (rolled up once per day)
+#   context_demand_index  - per (weather, event, product) stats over all tagged closed days
+# Readers (IsoBar, ShiftSmart) only touch context_demand_index + daily_context.
+
+def _apply_day_to_context_index(c, account_id, date_str, weather, event, sign):
+    """Adds (sign=+1) or removes (sign=-1) one closed day's sales under the given tags."""
+    c.execute('''
+        INSERT INTO context_demand_index (account_id, weather_tag, event_tag, product_name, days_sold, total_qty, sum_sq_qty, revenue)
+        SELECT account_id, ?, ?, product_name, ?, ? * qty, ? * qty * qty, ? * revenue
+        FROM daily_product_sales WHERE account_id = ? AND date = ?
+        ON CONFLICT(account_id, weather_tag, event_tag, product_name) DO UPDATE SET
+            days_sold = days_sold + excluded.days_sold, total_qty = total_qty + excluded.total_qty,
+            sum_sq_qty = sum_sq_qty + excluded.sum_sq_qty, revenue = revenue + excluded.revenue
+    ''', (weather, event, sign, sign, sign, sign, account_id, date_str))
+    if sign < 0:
+        c.execute("DELETE FROM context_demand_index WHERE account_id = ? AND days_sold <= 0", (account_id,))
+
+def refresh_context_demand_index(full=False, override_account_id=None):
+    """
+    Rolls closed days (before today) into the context demand index (Scoped).
+    Incremental: only days after the 'context_demand' watermark are scanned,
+    via a timestamp range that can use idx_transactions_account_ts.
+    Returns (Success, Msg).
+    """
+    conn = get_connection()
+    c = conn.cursor()
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    today = datetime.now().strftime('%Y-%m-%d')
+    try:
+        if full:
+            c.execute("DELETE FROM daily_product_sales WHERE account_id = ?", (aid,))
+            c.execute("DELETE FROM context_demand_index WHERE account_id = ?", (aid,))
+            last_closed = None
+        else:
+            last_closed = _get_watermark(c, aid, 'context_demand')
+
+        # Scan starts the day after the watermark
+        since = '0000-00-00'
+        if last_closed:
+            since = (datetime.strptime(last_closed, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+        if since >= today:
+            return True, "Index up to date."
+
+        # 1. Roll up closed days (from the analytics snapshot when it was synced today)
+        import analytics_store
+        snap = analytics_store.load_snapshot(aid)
+        if snap is not None and (snap['synced_at'] or '') >= today:
+            yesterday = (datetime.strptime(today, '%Y-%m-%d') - timedelta(days=1)).strftime('%Y-%m-%d')
+            rows = analytics_store.daily_product_sales(snap, since if since > '0000-00-00' else None, yesterday)
+            c.executemany('''
+                INSERT INTO daily_product_sales (account_id, date, product_name, qty, revenue) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(account_id, date, product_name) DO UPDATE SET
+                    qty = qty + excluded.qty, revenue = revenue + excluded.revenue
+            ''', [(aid,) + row for row in rows])
+            rolled = len(rows)
+        else:
+            c.execute('''
+                INSERT INTO daily_product_sales (account_id, date, product_name, qty, revenue)
+                SELECT t.account_id, date(t.timestamp), ti.product_name, SUM(ti.quantity), SUM(ti.quantity * ti.price_at_sale)
+                FROM transactions t
+                JOIN transaction_items ti ON ti.transaction_id = t.id
+                WHERE t.account_id = ? AND t.timestamp >= ? AND t.timestamp < ?
+                GROUP BY 2, 3
+                ON CONFLICT(account_id, date, product_name) DO UPDATE SET
+                    qty = qty + excluded.qty, revenue = revenue + excluded.revenue
+            ''', (aid, since, today))
+            rolled = c.rowcount
+
+        # 2. Fold tagged days into the index in one grouped pass
+        c.execute('''
+            INSERT INTO context_demand_index (account_id, weather_tag, event_tag, product_name, days_sold, total_qty, sum_sq_qty, revenue)
+            SELECT d.account_id, dc.weather_tag, dc.event_tag, d.product_name,
+                   COUNT(*), SUM(d.qty), SUM(d.qty * d.qty), SUM(d.revenue)
+            FROM daily_product_sales d
+            JOIN daily_context dc ON dc.account_id = d.account_id AND dc.date = d.date
+            WHERE d.account_id = ? AND d.date >= ? AND d.date < ?
+            GROUP BY 2, 3, 4
+            ON CONFLICT(account_id, weather_tag, event_tag, product_name) DO UPDATE SET
+                days_sold = days_sold + excluded.days_sold, total_qty = total_qty + excluded.total_qty,
+                sum_sq_qty = sum_sq_qty + excluded.sum_sq_qty, revenue = revenue + excluded.revenue
+        ''', (aid, since, today))
+
+        yesterday = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+        _set_watermark(c, aid, 'context_demand', yesterday)
+        conn.commit()
+        return True, f"Indexed {rolled} day/product rows."
+    except Exception as e:
+        conn.rollback()
+        print(f"Context Index Error: {e}")
+        return False, str(e)
+    finally:
+        conn.close()
+
+def _context_filter_sql(column, value):
+    """
+    Builds a filter on one tag column. `value` may be a single tag or a list of tags;
+    lists are bound as ONE JSON parameter (json_each), so any number of tags stays
+    clear of SQLite's host-variable limit.
+    """
+    if value is None or value == "None":
+        return "", []
+    if isinstance(value, (list, tuple, set)):
+        tags = [v for v in value if v]
+        if not tags:
+            return "", []
+        import json
+        return f" AND {column} IN (SELECT value FROM json_each(?))", [json.dumps(tags)]
+    return f" AND {column} = ?", [value]
+
+def count_context_days(weather_filter=None, event_filter=None, override_account_id=None):
+    """Number of indexed (closed) days tagged with the given context."""
+    conn = get_connection(read_only=True)
+    c = conn.cursor()
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    try:
+        indexed_until = _get_watermark(c, aid, 'context_demand')
+        if not indexed_until:
+            return 0
+        w_sql, w_params = _context_filter_sql("weather_tag", weather_filter)
+        e_sql, e_params = _context_filter_sql("event_tag", event_filter)
+        c.execute("SELECT COUNT(*) FROM daily_context WHERE account_id = ? AND date <= ?" + w_sql + e_sql,
+                  [aid, indexed_until] + w_params + e_params)
+        return c.fetchone()[0]
+    finally:
+        conn.close()
+
+def analyze_context_demand(weather_filter=None, event_filter=None, limit=10, override_account_id=None):
+    """
+    Finds top selling items on days that match the filters (Scoped).
+    Filters accept a single tag or a list of tags. Reads only the precomputed index.
+    """
+    conn = get_connection(read_only=True)
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+
+    w_sql, w_params = _context_filter_sql("weather_tag", weather_filter)
+    e_sql, e_params = _context_filter_sql("event_tag", event_filter)
+    query = f'''
+        SELECT product_name, SUM(total_qty) as total_qty,
+               SUM(revenue) / NULLIF(SUM(total_qty), 0) as avg_price,
+               SUM(days_sold) as days_sold
+        FROM context_demand_index
+        WHERE account_id = ?{w_sql}{e_sql}
+        GROUP BY product_name
+        ORDER BY total_qty DESC
+    '''
+    params = [aid] + w_params + e_params
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+    try:
+        sales_df = pd.read_sql_query(query, conn, params=params)
+    finally:
+        conn.close()
+
+    if not sales_df.empty:
+        n_days = count_context_days(weather_filter, event_filter, override_account_id=aid)
+        sales_df['avg_daily_qty'] = sales_df['total_qty'] / max(n_days, 1)
+    return sales_df
+
+# --- ISOBAR FORECASTING ---
+
+def refresh_demand_forecasts(force=False, history_days=112, override_account_id=None):
+    """
+    Fits per-SKU models for one tenant and stores the next 14 days (Scoped).
+    Runs at most once per day unless force=True. History comes from the
+    daily_product_sales rollup, so only newly closed days are ever re-scanned.
+    Returns (Success, Msg).
+    """
+    import forecast_engine
+    import numpy as np
+
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    today = datetime.now().date()
+    today_str = today.strftime('%Y-%m-%d')
+
+    conn = get_connection()
+    c = conn.cursor()
+    try:
+        if not force and _get_watermark(c, aid, 'forecast') == today_str:
+            return True, "Forecasts already fresh."
+    finally:
+        conn.close()
+
+    # Close any pending days into daily_product_sales first
+    refresh_context_demand_index(override_account_id=aid)
+
+    start = today - timedelta(days=history_days)
+    horizon_end = today + timedelta(days=forecast_engine.HORIZON - 1)
+    hist_dates = pd.date_range(start, today - timedelta(days=1), freq='D')
+    future_dates = pd.date_range(today, horizon_end, freq='D')
+
+    conn = get_connection()
+    c = conn.cursor()
+    try:
+        sales = pd.read_sql_query(
+            "SELECT date, product_name, qty FROM daily_product_sales WHERE account_id = ? AND date >= ? AND date < ?",
+            conn, params=(aid, start.strftime('%Y-%m-%d'), today_str))
+        if sales.empty:
+            return True, "No sales history to forecast."
+
+        ctx = pd.read_sql_query(
+            "SELECT date, weather_tag, event_tag FROM daily_context WHERE account_id = ? AND date >= ? AND date <= ?",
+            conn, params=(aid, start.strftime('%Y-%m-%d'), horizon_end.strftime('%Y-%m-%d')))
+
+        # Dense SKU x day matrix (missing days = zero sales)
+        sales['date'] = pd.to_datetime(sales['date'])
+        Y_df = sales.pivot_table(index='product_name', columns='date', values='qty', aggfunc='sum', fill_value=0)
+        Y_df = Y_df.reindex(columns=hist_dates, fill_value=0)
+
+        ctx['date'] = pd.to_datetime(ctx['date'])
+        ctx = ctx.set_index('date')
+        hist_ctx = ctx.reindex(hist_dates)
+        fut_ctx = ctx.reindex(future_dates)
+        X_hist, vocab = forecast_engine.context_matrix(hist_ctx['weather_tag'].tolist(), hist_ctx['event_tag'].tolist())
+        X_future, _ = forecast_engine.context_matrix(fut_ctx['weather_tag'].tolist(), fut_ctx['event_tag'].tolist(), vocab)
+
+        result = forecast_engine.forecast_skus(
+            Y_df.to_numpy(dtype=float), hist_dates.dayofweek.to_numpy(), future_dates.dayofweek.to_numpy(),
+            X_hist, X_future
+        )
+
+        products = Y_df.index.tolist()
+        date_strs = future_dates.strftime('%Y-%m-%d').tolist()
+        fc = np.round(result['forecast'], 2)
+        generated = datetime.now()
+        rows = [
+            (aid, products[i], date_strs[h], float(fc[i, h]), str(result['model'][i]), generated)
+            for i in range(len(products)) for h in range(len(date_strs))
+        ]
+        c.execute("DELETE FROM demand_forecasts WHERE account_id = ?", (aid,))
+        c.executemany('''
+            INSERT INTO demand_forecasts (account_id, product_name, forecast_date, qty, model, generated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', rows)
+        _set_watermark(c, aid, 'forecast', today_str)
+        conn.commit()
+        return True, f"Forecast {len(products)} SKUs (holdout MAPE {result['holdout_mape']:.1f}%)."
+    except Exception as e:
+        conn.rollback()
+        print(f"Forecast Error: {e}")
+        return False, str(e)
+    finally:
+        conn.close()
+
+def _forecast_worker(args):
+    """Process-pool entry point: one tenant per task."""
+    db_name, account_id, force = args
+    global DB_NAME
+    DB_NAME = db_name
+    return account_id, refresh_demand_forecasts(force=force, override_account_id=account_id)
+
+def run_nightly_forecasts(account_ids=None, max_workers=None, force=False):
+    """
+    Refreshes forecasts for many tenants in a process pool (System Level).
+    account_ids: defaults to all ACTIVE accounts.
+    Returns {account_id: (Success, Msg)}.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    if account_ids is None:
+        conn = get_connection(read_only=True)
+        account_ids = [r[0] for r in conn.execute("SELECT id FROM accounts WHERE status = 'ACTIVE'").fetchall()]
+        conn.close()
+    if not account_ids:
+        return {}
+
+    tasks = [(DB_NAME, aid, force) for aid in account_ids]
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return dict(pool.map(_forecast_worker, tasks))
+
+def get_demand_forecast(product_name=None, override_account_id=None):
+    """Stored 14-day forecasts (Scoped)."""
+    conn = get_connection(read_only=True)
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    query = "SELECT product_name, forecast_date, qty, model FROM demand_forecasts WHERE account_id = ?"
     params = [aid]
-    
-    if weather_filter and weather_filter != "None":
-        query += " AND weather_tag = ?"
-        params.append(weather_filter)
-        
-    if event_filter and event_filter != "None":
-        query += " AND event_tag = ?"
-        params.append(event_filter)
+    if product_name:
+        query += " AND product_name = ?"
+        params.append(product_name)
+    query += " ORDER BY forecast_date, qty DESC"
+    try:
+        return pd.read_sql_query(query, conn, params=params)
+    finally:
+        conn.close()
+
+def get_forecast_totals(override_account_id=None):
+    """Forecast units per day across all SKUs (Scoped)."""
+    conn = get_connection(read_only=True)
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    try:
+        return pd.read_sql_query(
+            "SELECT forecast_date, SUM(qty) as qty FROM demand_forecasts WHERE account_id = ? GROUP BY forecast_date ORDER BY forecast_date",
+            conn, params=(aid,))
+    finally:
+        conn.close()
 
 # --- TABLELINK (RESTAURANT) MODULE LOGIC ---
 
@@ -815,20 +2258,20 @@ def create_table_management_tables(conn):
     
     conn.commit()
 
-def get_tables():
-    conn = get_connection()
+def get_tables(override_account_id=None):
+    conn = get_connection(read_only=True)
     c = conn.cursor()
-    aid = get_current_account_id()
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
     # Ensure tables exist for this account (Multi-tenant seeding logic omitted for brevity, assuming shared or pre-seeded)
     # For now, just fetch checks
     df = pd.read_sql_query("SELECT * FROM restaurant_tables WHERE account_id = ?", conn, params=(aid,))
     conn.close()
     return df
 
-def occupy_table(table_id):
+def occupy_table(table_id, override_account_id=None):
     conn = get_connection()
     c = conn.cursor()
-    aid = get_current_account_id()
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
     new_order_id = generate_unique_id(16)
     try:
         # Create new order
@@ -845,7 +2288,7 @@ def occupy_table(table_id):
         conn.close()
 
 def get_table_order(table_id):
-    conn = get_connection()
+    conn = get_connection(read_only=True)
     c = conn.cursor()
     query = """
         SELECT o.id, o.items_json 
@@ -919,10 +2362,10 @@ def free_table(table_id):
     conn.commit()
     conn.close()
 
-def add_restaurant_table(label, capacity):
+def add_restaurant_table(label, capacity, override_account_id=None):
     conn = get_connection()
     c = conn.cursor()
-    aid = get_current_account_id()
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
     new_id = generate_unique_id(16)
     try:
         c.execute("INSERT INTO restaurant_tables (id, account_id, label, capacity, status) VALUES (?, ?, ?, ?, 'Available')", (new_id, aid, label, capacity))
@@ -1007,7 +2450,7 @@ def update_table_position(table_id, x, y):
 
 def get_enriched_tables():
     """Replacment for fetch_floor_status to include new columns"""
-    conn = get_connection()
+    conn = get_connection(read_only=True)
     c = conn.cursor()
     aid = get_current_account_id()
     
@@ -1217,7 +2660,7 @@ def map_online_item(platform, ext_name, int_prod_id):
         conn.close()
 
 def get_online_mappings(platform=None):
-    conn = get_connection()
+    conn = get_connection(read_only=True)
     aid = get_current_account_id()
     query = "SELECT m.*, p.name as internal_name FROM online_menu_mapping m JOIN products p ON m.internal_product_id = p.id WHERE m.account_id = ?"
     params = [aid]
@@ -1228,14 +2671,14 @@ def get_online_mappings(platform=None):
     conn.close()
     return df
 
-def sync_online_order(platform, ext_order_id, items_list):
+def sync_online_order(platform, ext_order_id, items_list, override_account_id=None):
     """
     Ingests an online order. 
     items_list: list of dicts {'name': external_name, 'qty': qty}
     """
     conn = get_connection()
     c = conn.cursor()
-    aid = get_current_account_id()
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
     try:
         import json
         order_id = generate_unique_id(16)
@@ -1250,31 +2693,37 @@ def sync_online_order(platform, ext_order_id, items_list):
         conn.close()
 
 def get_pending_online_orders():
-    conn = get_connection()
+    conn = get_connection(read_only=True)
     aid = get_current_account_id()
     try:
         df = pd.read_sql_query("SELECT * FROM online_orders_sync WHERE account_id = ? AND status = 'PENDING' ORDER BY created_at DESC", conn, params=(aid,))
         conn.close()
         return df
     except:
-        # Table might be missing if just added
+        # Table might be missing if just added (created on a writable connection)
+        conn.close()
+        conn = get_connection()
         create_online_integration_tables(conn)
-        conn = get_connection() # Re-open
+        conn.close()
+        conn = get_connection(read_only=True) # Re-open
         df = pd.read_sql_query("SELECT * FROM online_orders_sync WHERE account_id = ? AND status = 'PENDING' ORDER BY created_at DESC", conn, params=(aid,))
         conn.close()
         return df
 
 def get_accepted_online_orders():
-    conn = get_connection()
+    conn = get_connection(read_only=True)
     aid = get_current_account_id()
     try:
         df = pd.read_sql_query("SELECT * FROM online_orders_sync WHERE account_id = ? AND status = 'ACCEPTED' ORDER BY created_at DESC", conn, params=(aid,))
         conn.close()
         return df
     except:
-        # Table might be missing
+        # Table might be missing (created on a writable connection)
+        conn.close()
+        conn = get_connection()
         create_online_integration_tables(conn)
-        conn = get_connection() # Re-open
+        conn.close()
+        conn = get_connection(read_only=True) # Re-open
         df = pd.read_sql_query("SELECT * FROM online_orders_sync WHERE account_id = ? AND status = 'ACCEPTED' ORDER BY created_at DESC", conn, params=(aid,))
         conn.close()
         return df
@@ -1313,30 +2762,6 @@ def update_online_item_kds_status(sync_id, item_idx, new_status):
         return False
     finally:
         conn.close()
-    matching_dates_df = pd.read_sql_query(query, conn, params=params)
-    
-    if matching_dates_df.empty:
-        conn.close()
-        return pd.DataFrame() # No history
-        
-    dates = matching_dates_df['date'].tolist()
-    placeholders = ','.join(['?']*len(dates))
-    
-    # 2. Aggregates sales on those dates (Scoped)
-    sales_query = f'''
-        SELECT ti.product_name, SUM(ti.quantity) as total_qty, AVG(ti.price_at_sale) as avg_price
-        FROM transaction_items ti
-        JOIN transactions t ON ti.transaction_id = t.id
-        WHERE t.account_id = ? AND date(t.timestamp) IN ({placeholders})
-        GROUP BY ti.product_name
-        ORDER BY total_qty DESC
-        LIMIT 10
-    '''
-    
-    sales_params = [aid] + dates
-    sales_df = pd.read_sql_query(sales_query, conn, params=sales_params)
-    conn.close()
-    return sales_df
 
 # --- SHIFTSMART MODULE LOGIC ---
 
@@ -1383,7 +2808,7 @@ def add_staff(name, role, rate):
         conn.close()
 
 def get_all_staff(override_account_id=None):
-    conn = get_connection()
+    conn = get_connection(read_only=True)
     aid = override_account_id if override_account_id is not None else get_current_account_id()
     df = pd.read_sql_query("SELECT * FROM staff WHERE account_id = ?", conn, params=(aid,))
     conn.close()
@@ -1413,7 +2838,7 @@ def assign_shift(date_str, slot, staff_id):
         conn.close()
 
 def get_shifts(date_str):
-    conn = get_connection()
+    conn = get_connection(read_only=True)
     aid = get_current_account_id()
     # Join with Staff to filter by Account via Staff
     query = '''
@@ -1426,23 +2851,51 @@ def get_shifts(date_str):
     conn.close()
     return df
 
+def get_receipts_for_day(date_str, override_account_id=None):
+    """
+    Every receipt of one day as receipt_engine models (Scoped), oldest first.
+    Two queries (headers + all line items), so a day re-renders in one pass.
+    Tax is the difference between the bill and its line totals (tax is not stored per line).
+    """
+    import receipt_engine
+    conn = get_connection(read_only=True)
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    day_start = f"{date_str} 00:00:00"
+    day_end = (datetime.strptime(date_str, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d 00:00:00')
+    try:
+        heads = conn.execute('''
+            SELECT t.id, t.timestamp, t.total_amount, COALESCE(t.points_redeemed, 0), c.name, c.phone
+            FROM transactions t LEFT JOIN customers c ON c.id = t.customer_id
+            WHERE t.account_id = ? AND t.timestamp >= ? AND t.timestamp < ?
+            ORDER BY t.timestamp, t.id
+        ''', (aid, day_start, day_end)).fetchall()
+        lines = conn.execute('''
+            SELECT ti.transaction_id, ti.product_name, ti.quantity, ti.quantity * ti.price_at_sale
+            FROM transactions t JOIN transaction_items ti ON ti.transaction_id = t.id
+            WHERE t.account_id = ? AND t.timestamp >= ? AND t.timestamp < ?
+        ''', (aid, day_start, day_end)).fetchall()
+    finally:
+        conn.close()
+    store = get_settings(('store_name', 'store_address', 'store_phone', 'invoice_footer'), override_account_id=aid)
+    items = {}
+    for txn_id, name, qty, total in lines:
+        items.setdefault(txn_id, []).append({'name': name, 'qty': qty or 0, 'total': total or 0.0})
+
+    receipts = []
+    for txn_id, ts, total, points, cust_name, cust_phone in heads:
+        rows = items.get(txn_id, [])
+        subtotal = sum(r['total'] for r in rows)
+        stamp = pd.Timestamp(ts).strftime('%d-%b-%Y %H:%M:%S') if ts else None
+        customer = f"{cust_name} ({cust_phone})" if cust_name and cust_phone else cust_name
+        receipts.append(receipt_engine.make_receipt(rows, total, subtotal, max(total + points - subtotal, 0.0), txn_id, store=store,
+                                                    date_str=stamp, customer_info=customer, points_redeemed=points,
+                                                    footer_msg=store.get('invoice_footer')))
+    return receipts
+
 def update_setting(key, value):
     # Already handled in scoped set_setting above
     return set_setting(key, value)
 
-def predict_labor_demand(weather, event):
-    # Uses analyze_context_demand which is now scoped
-    sales_df = analyze_context_demand(weather, event)
-    if sales_df.empty:
-        return 2 # Baseline staffing
-        
-    total_est_volume = sales_df['total_qty'].sum() / 10 
-    
-    daily_vol = total_est_volume / 5 
-    
-    staff_needed = max(2, int(daily_vol / 20) + 1)
-    return staff_needed
-
 def record_transaction(items, total_amount, total_profit, customer_id=None, points_redeemed=0, payment_method='CASH', override_account_id=None):
     """
     items: list of dicts {'id': prod_id, 'name': name, 'qty': qty, 'price': price, 'cost': cost}
@@ -1461,11 +2914,12 @@ def record_transaction(items, total_amount, total_profit, customer_id=None, poin
 
     aid = override_account_id if override_account_id is not None else get_current_account_id()
     print(f"DEBUG: record_transaction for account_id={aid}, method={payment_method}")
+    txn_time = datetime.now()
     
     try:
         # 1. Create Transaction Record (With Account ID)
         c.execute('INSERT INTO transactions (id, account_id, total_amount, total_profit, timestamp, customer_id, transaction_hash, points_redeemed, payment_method) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', 
-                  (new_txn_id, aid, total_amount, total_profit, datetime.now(), customer_id, txn_hash, points_redeemed, payment_method))
+                  (new_txn_id, aid, total_amount, total_profit, txn_time, customer_id, txn_hash, points_redeemed, payment_method))
         
         transaction_id = new_txn_id # Use our generated ID
         
@@ -1488,12 +2942,13 @@ def record_transaction(items, total_amount, total_profit, customer_id=None, poin
         c.executemany('UPDATE products SET stock_quantity = stock_quantity - ? WHERE id = ? AND account_id = ?', stock_updates)
 
        # 4. FEFO Batch Deduction (FreshFlow Logic - Scoped)
+        fefo_changed = []  # Products whose FEFO batch ran out (POS price may change)
         for item in items:
             qty_needed = item['qty']
             p_id = item['id']
             
-            # Fetch batches for this product ordered by expiry (Scoped to Account)
-            c.execute("SELECT id, quantity FROM product_batches WHERE product_id = ? AND account_id = ? AND quantity > 0 ORDER BY expiry_date ASC", (p_id, aid))
+            # Fetch batches for this product ordered by expiry, undated batches last (Scoped to Account)
+            c.execute("SELECT id, quantity FROM product_batches WHERE product_id = ? AND account_id = ? AND quantity > 0 ORDER BY expiry_date IS NULL, expiry_date ASC", (p_id, aid))
             batches = c.fetchall()
             
             for b_id, b_qty in batches:
@@ -1503,6 +2958,8 @@ def record_transaction(items, total_amount, total_profit, customer_id=None, poin
                 deduct = min(qty_needed, b_qty)
                 c.execute("UPDATE product_batches SET quantity = quantity - ? WHERE id = ? AND account_id = ?", (deduct, b_id, aid))
                 qty_needed -= deduct
+                if deduct == b_qty:
+                    fefo_changed.append(p_id)
         
         # 5. Update Loyalty Points
         if customer_id:
@@ -1513,8 +2970,13 @@ def record_transaction(items, total_amount, total_profit, customer_id=None, poin
             net_points_change = points_earned - points_redeemed
             
             c.execute('UPDATE customers SET loyalty_points = loyalty_points + ? WHERE id = ? AND account_id = ?', (net_points_change, customer_id, aid))
+
+            # 6. Geo Revenue Rollup (GeoViz)
+            _bump_geo_rollup(c, aid, customer_id, txn_time, total_amount)
             
         conn.commit()
+        if fefo_changed:
+            _invalidate_price_map(aid, fefo_changed)
         return txn_hash 
     except Exception as e:
         print(f"Transaction Error: {e}")
@@ -1593,7 +3055,7 @@ def verify_user(username, password, company_name_check):
     """
     Verifies credentials requiring Company Name.
     """
-    conn = get_connection()
+    conn = get_connection(read_only=True)
     c = conn.cursor()
     
     if not company_name_check:
@@ -1635,7 +3097,7 @@ def initiate_password_reset(contact):
     """
     Simulates sending a password reset link to Email or Phone.
     """
-    conn = get_connection()
+    conn = get_connection(read_only=True)
     c = conn.cursor()
     try:
         # Search in users (username or email matching contact)
@@ -1659,7 +3121,7 @@ def initiate_password_reset(contact):
 
 def get_all_account_users():
     """Returns all users for the current account."""
-    conn = get_connection()
+    conn = get_connection(read_only=True)
     aid = get_current_account_id()
     try:
         df = pd.read_sql_query("SELECT username, email, role, created_at, permissions FROM users WHERE account_id = ? ORDER BY created_at DESC", conn, params=(aid,))
@@ -1718,6 +3180,7 @@ def update_user_permissions(username, permissions_list):
         c.execute("UPDATE users SET permissions = ? WHERE username = ? AND account_id = ?", (perm_str, username, aid))
         if c.rowcount > 0:
             conn.commit()
+            _bump_entitlements(aid)
             return True, "Permissions updated."
         return False, "User not found."
     except Exception as e:
@@ -1725,22 +3188,7 @@ def update_user_permissions(username, permissions_list):
     finally:
         conn.close()
 
-
-def create_purchase_order(supplier_id, expected_date, notes="", override_account_id=None):
-    conn = get_connection()
-    c = conn.cursor()
-    aid = override_account_id if override_account_id is not None else get_current_account_id()
-    new_id = generate_unique_id(16)
-    try:
-        c.execute("INSERT INTO purchase_orders (id, account_id, supplier_id, order_date, expected_date, notes) VALUES (?, ?, ?, date('now'), ?, ?)",
-                  (new_id, aid, supplier_id, expected_date, notes))
-        conn.commit()
-        return True, "PO Created."
-    except Exception as e:
-        return False, str(e)
-    finally:
-        conn.close()
-
+
 def add_staff(name, role, rate, override_account_id=None):
     conn = get_connection()
     c = conn.cursor()
@@ -1766,21 +3214,48 @@ def assign_shift(date_str, slot, staff_id, override_account_id=None):
         if not c.fetchone():
             return False, "Staff member not found or unauthorized."
 
-        # Check if already assigned
-        c.execute("SELECT id FROM shifts WHERE date = ? AND slot = ? AND staff_id = ?", (date_str, slot, staff_id))
-        if c.fetchone():
-            return True, "Already assigned."
-            
-        c.execute("INSERT INTO shifts (id, date, slot, staff_id) VALUES (?, ?, ?, ?)", (new_id, date_str, slot, staff_id))
+        # Duplicates are rejected by idx_shifts_unique (date, slot, staff_id)
+        c.execute("INSERT OR IGNORE INTO shifts (id, date, slot, staff_id) VALUES (?, ?, ?, ?)", (new_id, date_str, slot, staff_id))
         conn.commit()
+        if c.rowcount == 0:
+            return True, "Already assigned."
         return True, "Shift assigned."
     except Exception as e:
         return False, str(e)
     finally:
         conn.close()
 
-def get_shifts(date_str):
+def bulk_assign_shifts(assignments, override_account_id=None):
+    """
+    Inserts many shifts in one transaction.
+    assignments: list of (date_str, slot, staff_id)
+    Ownership is checked with one query; duplicates are skipped by the unique index.
+    Returns (Success, Msg).
+    """
     conn = get_connection()
+    c = conn.cursor()
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    try:
+        c.execute("SELECT id FROM staff WHERE account_id = ?", (aid,))
+        own_staff = {r[0] for r in c.fetchall()}
+        foreign = {a[2] for a in assignments} - own_staff
+        if foreign:
+            return False, f"{len(foreign)} staff member(s) not found or unauthorized."
+
+        before = conn.total_changes
+        c.executemany("INSERT OR IGNORE INTO shifts (id, date, slot, staff_id) VALUES (?, ?, ?, ?)",
+                      [(generate_unique_id(16), d, slot, sid) for d, slot, sid in assignments])
+        inserted = conn.total_changes - before
+        conn.commit()
+        return True, f"{inserted} shifts assigned ({len(assignments) - inserted} already on roster)."
+    except Exception as e:
+        conn.rollback()
+        return False, str(e)
+    finally:
+        conn.close()
+
+def get_shifts(date_str):
+    conn = get_connection(read_only=True)
     aid = get_current_account_id()
     # Join with Staff to filter by Account via Staff
     query = '''
@@ -1793,13 +3268,100 @@ def get_shifts(date_str):
     conn.close()
     return df
 
+def plan_week_roster(start_date, max_shifts_per_week=None, role_minimums=None, override_account_id=None):
+    """
+    Builds a cost-minimal 7-day roster for the tenant (Scoped).
+    Demand per slot comes from the demand forecast (or the context index for
+    days without one); shifts already on the roster are kept and counted.
+    Returns (plan_df of NEW shifts, summary dict).
+    """
+    import roster_engine
+    import numpy as np
+
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    if max_shifts_per_week is None:
+        max_shifts_per_week = roster_engine.MAX_SHIFTS_PER_WEEK
+    slots = list(roster_engine.DEFAULT_SLOTS)
+    slot_hours = np.array(list(roster_engine.DEFAULT_SLOTS.values()), dtype=float)
+    dates = [(pd.Timestamp(start_date) + pd.Timedelta(days=d)).strftime('%Y-%m-%d') for d in range(7)]
+
+    staff = get_all_staff(override_account_id=aid)
+    if staff.empty:
+        return pd.DataFrame(), {'cost': 0.0, 'unmet': 0, 'new_shifts': 0}
+    staff['hourly_rate'] = staff['hourly_rate'].fillna(0).astype(float)
+
+    conn = get_connection(read_only=True)
+    try:
+        ctx = pd.read_sql_query(
+            "SELECT date, weather_tag, event_tag FROM daily_context WHERE account_id = ? AND date >= ? AND date <= ?",
+            conn, params=(aid, dates[0], dates[-1])).set_index('date')
+        existing_df = pd.read_sql_query('''
+            SELECT sh.date, sh.slot, sh.staff_id FROM shifts sh
+            JOIN staff s ON sh.staff_id = s.id
+            WHERE s.account_id = ? AND sh.date >= ? AND sh.date <= ?
+        ''', conn, params=(aid, dates[0], dates[-1]))
+    finally:
+        conn.close()
+
+    # Demand (headcount per day x slot)
+    totals = get_forecast_totals(override_account_id=aid).set_index('forecast_date')['qty']
+    demand = np.zeros((len(dates), len(slots)), dtype=int)
+    for d, date_str in enumerate(dates):
+        if date_str in totals.index:
+            demand[d] = roster_engine.slot_demand([totals[date_str]], slot_hours, UNITS_PER_STAFF)[0]
+        else:
+            w, e = (ctx.loc[date_str, 'weather_tag'], ctx.loc[date_str, 'event_tag']) if date_str in ctx.index else (None, None)
+            headcount = predict_labor_demand(w, e, override_account_id=aid)
+            demand[d] = roster_engine.slot_demand([headcount * UNITS_PER_STAFF], slot_hours, UNITS_PER_STAFF)[0]
+
+    # Existing assignments as a (staff x day x slot) mask
+    staff_pos = {sid: i for i, sid in enumerate(staff['id'])}
+    date_pos = {ds: i for i, ds in enumerate(dates)}
+    slot_pos = {sl: i for i, sl in enumerate(slots)}
+    existing = np.zeros((len(staff), len(dates), len(slots)), dtype=bool)
+    for r in existing_df.itertuples(index=False):
+        if r.staff_id in staff_pos and r.slot in slot_pos:
+            existing[staff_pos[r.staff_id], date_pos[r.date], slot_pos[r.slot]] = True
+
+    result = roster_engine.solve_roster(
+        demand, staff['hourly_rate'].to_numpy(), slot_hours, roles=staff['role'].to_numpy(),
+        role_minimums=role_minimums, existing=existing, max_shifts_per_week=max_shifts_per_week
+    )
+
+    p_idx, d_idx, s_idx = np.nonzero(result['new'])
+    plan_df = pd.DataFrame({
+        'date': [dates[d] for d in d_idx],
+        'slot': [slots[s] for s in s_idx],
+        'staff_id': staff['id'].to_numpy()[p_idx],
+        'name': staff['name'].to_numpy()[p_idx],
+        'role': staff['role'].to_numpy()[p_idx],
+        'cost': staff['hourly_rate'].to_numpy()[p_idx] * slot_hours[s_idx],
+    }).sort_values(['date', 'slot', 'name'])
+    summary = {
+        'cost': result['cost'],
+        'unmet': int(result['unmet'].sum()),
+        'new_shifts': len(plan_df),
+        'demand': pd.DataFrame(demand, index=dates, columns=slots),
+    }
+    return plan_df, summary
+
 def update_setting(key, value):
     # Already handled in scoped set_setting above
     return set_setting(key, value)
 
-def predict_labor_demand(weather, event):
-    # Uses analyze_context_demand which is now scoped
-    sales_df = analyze_context_demand(weather, event)
+# Units one staff member can handle in a day (forecast-driven staffing)
+UNITS_PER_STAFF = 100
+
+def predict_labor_demand(weather, event, date_str=None, override_account_id=None):
+    # Prefer the 14-day SKU forecast for that date when one exists
+    if date_str:
+        totals = get_forecast_totals(override_account_id=override_account_id)
+        day = totals[totals['forecast_date'] == date_str]
+        if not day.empty:
+            return max(2, int(day.iloc[0]['qty'] / UNITS_PER_STAFF) + 1)
+
+    # Reads the precomputed context demand index (a handful of rows)
+    sales_df = analyze_context_demand(weather, event, override_account_id=override_account_id)
     if sales_df.empty:
         return 2 # Baseline staffing
         
@@ -1816,7 +3378,7 @@ def predict_labor_demand(weather, event):
 
 def fetch_all_accounts():
     """Returns all accounts (System Level)."""
-    conn = get_connection()
+    conn = get_connection(read_only=True)
     df = pd.read_sql_query("SELECT * FROM accounts ORDER BY created_at DESC", conn)
     conn.close()
     return df
@@ -1876,6 +3438,7 @@ def update_tenant_plan(account_id, new_plan):
         # Update Settings Table
         c.execute("INSERT OR REPLACE INTO settings (account_id, key, value) VALUES (?, 'subscription_plan', ?)", (account_id, new_plan))
         conn.commit()
+        _bump_entitlements(account_id)
         return True, "Plan Updated."
     except Exception as e:
         return False, str(e)
@@ -1887,7 +3450,7 @@ def fetch_floor_status():
     Returns enriched table data for KDS-style display.
     List of dicts: {id, label, capacity, status, start_time, order_id, items_count, items_summary}
     """
-    conn = get_connection()
+    conn = get_connection(read_only=True)
     # Left join to get all tables even if empty
     # We also need to calculate elapsed time in python or sql. Python is easier for formatting.
     q = """
@@ -2011,9 +3574,55 @@ def mark_items_kot_printed(table_id):
     finally:
         conn.close()
 
+# --- ENTITLEMENTS ---
+# Version stamps for the sidebar entitlement cache (entitlements.py). Each
+# write that can change what a session may see bumps its tenant's counter
+# (or the global one for the plan catalog); sessions compare stamps in
+# memory and only re-resolve when theirs is stale.
+_ENTITLEMENT_VERSIONS = {}
+_ENTITLEMENT_VERSIONS_LOCK = threading.Lock()
+
+def _bump_entitlements(account_id=None):
+    """account_id=None bumps every tenant (plan catalog changed)."""
+    with _ENTITLEMENT_VERSIONS_LOCK:
+        key = (DB_NAME, account_id)
+        _ENTITLEMENT_VERSIONS[key] = _ENTITLEMENT_VERSIONS.get(key, 0) + 1
+
+def get_entitlement_stamp(account_id):
+    """(plan catalog version, tenant version) - cheap, in-memory."""
+    with _ENTITLEMENT_VERSIONS_LOCK:
+        return (_ENTITLEMENT_VERSIONS.get((DB_NAME, None), 0), _ENTITLEMENT_VERSIONS.get((DB_NAME, account_id), 0))
+
+def get_entitlement_inputs(username, override_account_id=None):
+    """
+    Everything the entitlement resolver needs, in one connection (Scoped):
+    {'plan', 'custom_modules', 'plan_features', 'permissions', 'user_found'}.
+    """
+    conn = get_connection(read_only=True)
+    c = conn.cursor()
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    try:
+        c.execute("SELECT key, value FROM settings WHERE account_id = ? AND key IN ('subscription_plan', 'custom_modules_list')", (aid,))
+        settings = dict(c.fetchall())
+        plan = settings.get('subscription_plan') or 'Starter'
+        c.execute("SELECT features FROM subscription_plans WHERE name = ?", (plan,))
+        row = c.fetchone()
+        features = [f.strip() for f in row[0].split(',') if f.strip()] if row and row[0] else []
+        c.execute("SELECT permissions FROM users WHERE username = ? AND account_id = ?", (username, aid))
+        user = c.fetchone()
+        return {
+            'plan': plan,
+            'custom_modules': settings.get('custom_modules_list') or "",
+            'plan_features': features,
+            'permissions': user[0] if user else None,
+            'user_found': user is not None,
+        }
+    finally:
+        conn.close()
+
 def get_plan_features(plan_name):
     """Returns a list of feature strings for a given plan."""
-    conn = get_connection()
+    conn = get_connection(read_only=True)
     try:
         # Check standard hardcoded tiers first (Optional, but DB is source of truth for custom)
         # We'll just check DB.
@@ -2030,7 +3639,7 @@ def get_plan_features(plan_name):
 
 def get_system_overview():
     """Aggregate stats for Super Admin."""
-    conn = get_connection()
+    conn = get_connection(read_only=True, replica=True)
     
     # Total Tenants
     total_tenants = pd.read_sql_query("SELECT COUNT(*) as count FROM accounts", conn).iloc[0]['count']
@@ -2052,7 +3661,7 @@ def get_system_overview():
 
 def get_all_plans():
     """Returns all subscription plans as a dataframe."""
-    conn = get_connection()
+    conn = get_connection(read_only=True)
     try:
         df = pd.read_sql_query("SELECT * FROM subscription_plans ORDER BY price ASC", conn)
         return df
@@ -2068,6 +3677,7 @@ def add_plan(name, price, features=""):
     try:
         c.execute("INSERT INTO subscription_plans (name, price, features) VALUES (?, ?, ?)", (name, price, features))
         conn.commit()
+        _bump_entitlements()
         return True, "Plan Added."
     except Exception as e:
         return False, str(e)
@@ -2092,6 +3702,7 @@ def update_plan(old_name, new_name, new_price, new_features):
         """, (new_name, new_price, new_features, old_name))
         
         conn.commit()
+        _bump_entitlements()
         return True, "Plan Updated."
     except Exception as e:
         return False, str(e)
@@ -2105,6 +3716,7 @@ def delete_plan(plan_name):
     try:
         c.execute("DELETE FROM subscription_plans WHERE name = ?", (plan_name,))
         conn.commit()
+        _bump_entitlements()
         return True, "Plan Deleted."
     except Exception as e:
         return False, str(e)
@@ -2118,7 +3730,7 @@ def get_churn_metrics(days_threshold=30):
     Identifies at-risk customers who haven't purchased in > days_threshold.
     Optimized to do heavy lifting in SQL.
     """
-    conn = get_connection()
+    conn = get_connection(read_only=True, replica=True)
     aid = get_current_account_id()
     
     # Logic: 
@@ -2147,28 +3759,301 @@ def get_churn_metrics(days_threshold=30):
     finally:
         conn.close()
 
-# --- GEO ANALYSIS ---
-def get_geo_revenue():
+def _get_watermark(c, account_id, job):
+    """Last source timestamp consumed by an incremental job (None = never run)."""
+    c.execute("SELECT watermark FROM analytics_watermarks WHERE account_id = ? AND job = ?", (account_id, job))
+    row = c.fetchone()
+    return row[0] if row else None
+
+def _set_watermark(c, account_id, job, watermark):
+    c.execute('''
+        INSERT INTO analytics_watermarks (account_id, job, watermark, updated_at) VALUES (?, ?, ?, ?)
+        ON CONFLICT(account_id, job) DO UPDATE SET watermark = excluded.watermark, updated_at = excluded.updated_at
+    ''', (account_id, job, watermark, datetime.now()))
+
+def refresh_customer_rfm(full=False, override_account_id=None):
     """
-    Returns total revenue grouped by City.
-    Used for GeoViz catchment analysis.
+    Incrementally refreshes ChurnGuard RFM scores (Scoped).
+    1. Re-aggregates only customers with transactions since the last run (or all if full=True).
+       Returns early when nothing was sold since the last run and scores are from today.
+       A full run takes the bulk of the aggregates from the analytics snapshot and
+       only re-reads customers seen after it.
+    2. Re-scores the whole tenant from the persisted aggregates (quintiles are tenant-relative).
+    Returns (Success, Msg).
     """
+    import churn_engine
+
+    from_snapshot = []
+    watermark = None
+    if full:
+        import analytics_store
+        snap = analytics_store.load_snapshot(override_account_id)
+        if snap is not None and snap['max_timestamp']:
+            agg = analytics_store.customer_summary(snap)
+            fmt = '%Y-%m-%d %H:%M:%S'
+            from_snapshot = list(zip(agg['customer_id'].tolist(), agg['first_seen'].dt.strftime(fmt).tolist(),
+                                     agg['last_seen'].dt.strftime(fmt).tolist(), agg['visits'].tolist(), agg['total_spend'].tolist()))
+            watermark = snap['max_timestamp']
+
     conn = get_connection()
-    aid = get_current_account_id()
-    
-    query = """
-        SELECT c.city, SUM(t.total_amount) as revenue
+    c = conn.cursor()
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    try:
+        # Read before aggregating: rows committed meanwhile are picked up again next run
+        c.execute("SELECT MAX(timestamp) FROM transactions WHERE account_id = ?", (aid,))
+        new_watermark = c.fetchone()[0]
+        now_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+        if not full:
+            watermark = _get_watermark(c, aid, 'churn_rfm')
+            if watermark and (new_watermark is None or new_watermark <= watermark):
+                # No new sales: only recency moves, so re-score at most once a day
+                c.execute("SELECT MAX(scored_at) FROM customer_rfm WHERE account_id = ?", (aid,))
+                scored_at = c.fetchone()[0]
+                if scored_at and scored_at[:10] == now_str[:10]:
+                    return True, "Scores up to date."
+
+        # 1. Aggregate touched customers
+        agg_query = '''
+            SELECT customer_id, MIN(timestamp), MAX(timestamp), COUNT(*), SUM(total_amount)
+            FROM transactions
+            WHERE account_id = ? AND customer_id IS NOT NULL
+        '''
+        params = [aid]
+        if watermark:
+            agg_query += " AND customer_id IN (SELECT DISTINCT customer_id FROM transactions WHERE account_id = ? AND timestamp > ?)"
+            params.extend([aid, watermark])
+        agg_query += " GROUP BY customer_id"
+        c.execute(agg_query, params)
+        touched = [(aid,) + tuple(row) for row in from_snapshot + c.fetchall()]
+
+        if full:
+            c.execute("DELETE FROM customer_rfm WHERE account_id = ?", (aid,))
+        c.executemany('''
+            INSERT INTO customer_rfm (account_id, customer_id, first_seen, last_seen, frequency, monetary)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(account_id, customer_id) DO UPDATE SET
+                first_seen = excluded.first_seen, last_seen = excluded.last_seen,
+                frequency = excluded.frequency, monetary = excluded.monetary
+        ''', touched)
+
+        # 2. Vectorized re-score of the whole tenant (no transaction scan)
+        feats = pd.read_sql_query('''
+            SELECT customer_id, frequency, monetary,
+                   julianday(?) - julianday(last_seen) AS recency_days,
+                   julianday(last_seen) - julianday(first_seen) AS span_days
+            FROM customer_rfm WHERE account_id = ?
+        ''', conn, params=(now_str, aid))
+
+        if not feats.empty:
+            scores = churn_engine.score_customers(
+                feats['recency_days'].to_numpy(), feats['frequency'].to_numpy(),
+                feats['monetary'].to_numpy(), feats['span_days'].to_numpy()
+            )
+            updates = zip(
+                feats['recency_days'].tolist(), scores['r_score'].tolist(), scores['f_score'].tolist(),
+                scores['m_score'].tolist(), scores['rfm_score'].tolist(), scores['mean_gap'].tolist(),
+                scores['churn_prob'].tolist(), scores['segment'].tolist(), [now_str] * len(feats),
+                [aid] * len(feats), feats['customer_id'].tolist()
+            )
+            c.executemany('''
+                UPDATE customer_rfm
+                SET recency_days = ?, r_score = ?, f_score = ?, m_score = ?, rfm_score = ?,
+                    mean_gap_days = ?, churn_prob = ?, segment = ?, scored_at = ?
+                WHERE account_id = ? AND customer_id = ?
+            ''', updates)
+
+        if new_watermark:
+            _set_watermark(c, aid, 'churn_rfm', new_watermark)
+        conn.commit()
+        return True, f"Scored {len(feats)} customers ({len(touched)} refreshed)."
+    except Exception as e:
+        conn.rollback()
+        print(f"RFM Refresh Error: {e}")
+        return False, str(e)
+    finally:
+        conn.close()
+
+def get_customer_rfm(min_churn_prob=None, segment=None, override_account_id=None):
+    """Returns persisted RFM scores joined to customer details (Scoped), riskiest spenders first."""
+    conn = get_connection(read_only=True)
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    query = '''
+        SELECT c.id, c.name, c.phone, c.email, r.last_seen, r.frequency, r.monetary AS total_spent,
+               r.recency_days AS days_since, r.r_score, r.f_score, r.m_score, r.rfm_score,
+               r.mean_gap_days, r.churn_prob, r.segment
+        FROM customer_rfm r
+        JOIN customers c ON r.customer_id = c.id
+        WHERE r.account_id = ?
+    '''
+    params = [aid]
+    if min_churn_prob is not None:
+        query += " AND r.churn_prob >= ?"
+        params.append(min_churn_prob)
+    if segment:
+        query += " AND r.segment = ?"
+        params.append(segment)
+    query += " ORDER BY r.churn_prob * r.monetary DESC"
+    try:
+        return pd.read_sql_query(query, conn, params=params)
+    except Exception as e:
+        print(f"RFM Fetch Error: {e}")
+        return pd.DataFrame()
+    finally:
+        conn.close()
+
+# --- GEO ANALYSIS ---
+# geo_revenue_rollup is maintained on checkout (record_transaction) and on
+# customer address changes, so GeoViz never re-scans transactions.
+
+def _bump_geo_rollup(c, account_id, customer_id, txn_time, amount, txn_delta=1):
+    """Adds one transaction's revenue to its customer's (city, pincode, month) bucket."""
+    c.execute('''
+        INSERT INTO geo_revenue_rollup (account_id, city, pincode, month, revenue, txn_count)
+        SELECT ?, COALESCE(city, 'Unknown'), COALESCE(pincode, '000000'), ?, ?, ?
+        FROM customers WHERE id = ? AND account_id = ?
+        ON CONFLICT(account_id, city, pincode, month) DO UPDATE SET
+            revenue = revenue + excluded.revenue, txn_count = txn_count + excluded.txn_count
+    ''', (account_id, txn_time.strftime('%Y-%m'), amount, txn_delta, customer_id, account_id))
+
+def _rebuild_geo_rollup(c, account_id):
+    """Full rebuild for one tenant: a single GROUP BY over its transactions."""
+    c.execute("DELETE FROM geo_revenue_rollup WHERE account_id = ?", (account_id,))
+    c.execute('''
+        INSERT INTO geo_revenue_rollup (account_id, city, pincode, month, revenue, txn_count)
+        SELECT t.account_id, COALESCE(c.city, 'Unknown'), COALESCE(c.pincode, '000000'),
+               strftime('%Y-%m', t.timestamp), SUM(t.total_amount), COUNT(*)
         FROM transactions t
         JOIN customers c ON t.customer_id = c.id
-        WHERE t.account_id = ? AND c.city IS NOT NULL
-        GROUP BY c.city
-        ORDER BY revenue DESC
+        WHERE t.account_id = ?
+        GROUP BY 2, 3, 4
+    ''', (account_id,))
+    _set_watermark(c, account_id, 'geo_rollup', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+
+def rebuild_geo_rollup(override_account_id=None):
+    """Rebuilds the tenant's geo rollup from scratch. Returns (Success, Msg)."""
+    conn = get_connection()
+    c = conn.cursor()
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    try:
+        _rebuild_geo_rollup(c, aid)
+        conn.commit()
+        return True, "Geo rollup rebuilt."
+    except Exception as e:
+        conn.rollback()
+        return False, str(e)
+    finally:
+        conn.close()
+
+def _ensure_geo_rollup(conn, account_id):
+    """Builds the rollup on first use for tenants that predate it."""
+    c = conn.cursor()
+    if _get_watermark(c, account_id, 'geo_rollup') is None:
+        _rebuild_geo_rollup(c, account_id)
+        conn.commit()
+
+def update_customer_address(customer_id, city, pincode, override_account_id=None):
     """
+    Moves a customer to a new (city, pincode) and re-buckets only their own
+    revenue in the geo rollup (old bucket minus, new bucket plus).
+    """
+    conn = get_connection()
+    c = conn.cursor()
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
     try:
-        df = pd.read_sql_query(query, conn, params=(aid,))
-        return df
+        c.execute("SELECT COALESCE(city, 'Unknown'), COALESCE(pincode, '000000') FROM customers WHERE id = ? AND account_id = ?", (customer_id, aid))
+        old = c.fetchone()
+        if not old:
+            return False, "Customer not found."
+
+        c.execute('''
+            SELECT strftime('%Y-%m', timestamp) AS month, SUM(total_amount), COUNT(*)
+            FROM transactions WHERE account_id = ? AND customer_id = ?
+            GROUP BY month
+        ''', (aid, customer_id))
+        monthly = c.fetchall()
+
+        # Subtract from old bucket
+        c.executemany('''
+            UPDATE geo_revenue_rollup SET revenue = revenue - ?, txn_count = txn_count - ?
+            WHERE account_id = ? AND city = ? AND pincode = ? AND month = ?
+        ''', [(rev, cnt, aid, old[0], old[1], month) for month, rev, cnt in monthly])
+        c.execute("DELETE FROM geo_revenue_rollup WHERE account_id = ? AND txn_count <= 0", (aid,))
+
+        # Same defaults as the rollup rebuild, so a cleared address lands in the 'Unknown' bucket
+        city = city if city is not None else 'Unknown'
+        pincode = pincode if pincode is not None else '000000'
+        c.execute("UPDATE customers SET city = ?, pincode = ? WHERE id = ? AND account_id = ?", (city, pincode, customer_id, aid))
+
+        # Add to new bucket
+        c.executemany('''
+            INSERT INTO geo_revenue_rollup (account_id, city, pincode, month, revenue, txn_count)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(account_id, city, pincode, month) DO UPDATE SET
+                revenue = revenue + excluded.revenue, txn_count = txn_count + excluded.txn_count
+        ''', [(aid, city, pincode, month, rev, cnt) for month, rev, cnt in monthly])
+        conn.commit()
+        return True, "Address updated."
+    except Exception as e:
+        conn.rollback()
+        return False, str(e)
+    finally:
+        conn.close()
+        _fetch_customers_impl.clear()
+
+def bulk_assign_customer_geo(assignments, override_account_id=None):
+    """
+    Bulk address assignment.
+    assignments: list of (customer_id, city, pincode)
+    One executemany + one rollup rebuild, all in a single transaction.
+    """
+    conn = get_connection()
+    c = conn.cursor()
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    try:
+        c.executemany("UPDATE customers SET city = ?, pincode = ? WHERE id = ? AND account_id = ?",
+                      [(city, pincode, cid, aid) for cid, city, pincode in assignments])
+        _rebuild_geo_rollup(c, aid)
+        conn.commit()
+        return True, f"{len(assignments)} customers updated."
     except Exception as e:
-        raise e
+        conn.rollback()
+        return False, str(e)
+    finally:
+        conn.close()
+        _fetch_customers_impl.clear()
+
+def get_geo_revenue(month_from=None, month_to=None, override_account_id=None):
+    """
+    Returns total revenue grouped by City (from the rollup).
+    month_from / month_to: optional 'YYYY-MM' bounds.
+    Used for GeoViz catchment analysis.
+    """
+    return _query_geo_rollup(['city'], None, month_from, month_to, override_account_id)
+
+def get_geo_revenue_by_pincode(city=None, month_from=None, month_to=None, override_account_id=None):
+    """Pincode-level drill-down (optionally within one city), read from the rollup."""
+    return _query_geo_rollup(['city', 'pincode'], city, month_from, month_to, override_account_id)
+
+def _query_geo_rollup(group_cols, city, month_from, month_to, override_account_id):
+    conn = get_connection()
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    try:
+        _ensure_geo_rollup(conn, aid)
+        cols = ", ".join(group_cols)
+        query = f"SELECT {cols}, SUM(revenue) as revenue, SUM(txn_count) as transactions FROM geo_revenue_rollup WHERE account_id = ?"
+        params = [aid]
+        if city:
+            query += " AND city = ?"
+            params.append(city)
+        if month_from:
+            query += " AND month >= ?"
+            params.append(month_from)
+        if month_to:
+            query += " AND month <= ?"
+            params.append(month_to)
+        query += f" GROUP BY {cols} ORDER BY revenue DESC"
+        return pd.read_sql_query(query, conn, params=params)
     finally:
         conn.close()
 
@@ -2180,7 +4065,7 @@ def get_b2b_deals():
     In a real mesh, this would fetch from ALL accounts (with location filter).
     For now, we fetch all deals EXCEPT the current account's own deals (to buy from others).
     """
-    conn = get_connection()
+    conn = get_connection(read_only=True)
     aid = get_current_account_id()
     
     # Logic: Show me deals from OTHER stores
@@ -2221,7 +4106,7 @@ def create_b2b_deal(store_name, product_name, quantity, price_per_unit, phone):
 
 def get_campaigns():
     """Fetches all active crowd campaigns for the store."""
-    conn = get_connection()
+    conn = get_connection(read_only=True)
     aid = get_current_account_id()
     try:
         df = pd.read_sql_query("SELECT * FROM crowd_campaigns WHERE account_id = ? ORDER BY created_at DESC", conn, params=(aid,))
@@ -2279,7 +4164,7 @@ def vote_campaign(campaign_id):
 
 # --- APPROVAL WORKFLOW ---
 def get_pending_accounts():
-    conn = get_connection()
+    conn = get_connection(read_only=True)
     try:
         df = pd.read_sql_query("SELECT * FROM accounts WHERE status='PENDING' ORDER BY created_at DESC", conn)
         return df
@@ -2348,3 +4233,369 @@ def send_approval_email(details):
     print(f"Subscribed Modules: {mod_str}")
     print("\nYou can now login at: https://app.vyaparmind.com")
     print("="*60)
+
+# --- DATA EXPORT ---
+# Dataset -> (query, timestamp column used for the date-range filter or None).
+# Dated queries walk idx_transactions_account_ts in timestamp order, so rows
+# stream out of SQLite without a temp sort.
+EXPORT_DATASETS = {
+    'transactions': ('''
+        SELECT t.id, t.timestamp, t.customer_id, c.name AS customer_name, t.total_amount, t.total_profit,
+               t.payment_method, COALESCE(t.points_redeemed, 0) AS points_redeemed, t.transaction_hash
+        FROM transactions t LEFT JOIN customers c ON c.id = t.customer_id
+        WHERE t.account_id = ? {date_filter}
+        ORDER BY t.timestamp
+    ''', 't.timestamp'),
+    'transaction_items': ('''
+        SELECT t.timestamp, ti.transaction_id, ti.product_id, ti.product_name, ti.quantity,
+               ti.price_at_sale, ti.cost_at_sale, ti.quantity * ti.price_at_sale AS line_total
+        FROM transactions t JOIN transaction_items ti ON ti.transaction_id = t.id
+        WHERE t.account_id = ? {date_filter}
+        ORDER BY t.timestamp
+    ''', 't.timestamp'),
+    'products': ('''
+        SELECT * FROM products WHERE account_id = ? {date_filter} ORDER BY name
+    ''', None),
+    'customers': ('''
+        SELECT id, name, phone, email, city, pincode, loyalty_points, created_at
+        FROM customers WHERE account_id = ? {date_filter} ORDER BY created_at
+    ''', 'created_at'),
+}
+
+def _export_query(dataset, start_date, end_date, aid):
+    """(sql, params) for an export dataset. Dates are inclusive 'YYYY-MM-DD' strings."""
+    if dataset not in EXPORT_DATASETS:
+        raise ValueError(f"Unknown export dataset: {dataset}")
+    sql, ts_col = EXPORT_DATASETS[dataset]
+    params = [aid]
+    date_filter = ""
+    if ts_col and start_date:
+        date_filter += f" AND {ts_col} >= ?"
+        params.append(f"{start_date} 00:00:00")
+    if ts_col and end_date:
+        date_filter += f" AND {ts_col} < ?"
+        params.append((datetime.strptime(str(end_date), '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d 00:00:00'))
+    return sql.format(date_filter=date_filter), params
+
+# Source tables of each export dataset (first declaration wins) and the declared types of computed columns
+EXPORT_COLUMN_SOURCES = {
+    'transactions': (('transactions',), {'customer_name': 'TEXT', 'points_redeemed': 'INTEGER'}),
+    'transaction_items': (('transaction_items', 'transactions'), {'line_total': 'REAL'}),
+    'products': (('products',), {}),
+    'customers': (('customers',), {}),
+}
+
+def get_export_column_types(dataset):
+    """{column: declared SQLite type} for an export dataset, from PRAGMA table_info of its source tables."""
+    if dataset not in EXPORT_COLUMN_SOURCES:
+        raise ValueError(f"Unknown export dataset: {dataset}")
+    tables, computed = EXPORT_COLUMN_SOURCES[dataset]
+    types = {}
+    conn = get_connection(read_only=True)
+    try:
+        for table in tables:
+            for _, name, decltype, *_ in conn.execute(f"PRAGMA table_info({table})").fetchall():
+                types.setdefault(name, decltype)
+    finally:
+        conn.close()
+    types.update(computed)
+    return types
+
+def count_export_rows(dataset, start_date=None, end_date=None, override_account_id=None):
+    """Row count of an export (Scoped), used as the progress total."""
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    sql, params = _export_query(dataset, start_date, end_date, aid)
+    conn = get_connection(read_only=True)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM ({sql})", params).fetchone()[0]
+    finally:
+        conn.close()
+
+def iter_export_rows(dataset, start_date=None, end_date=None, chunk_size=5_000, override_account_id=None):
+    """
+    Streams an export dataset (Scoped) with cursor.fetchmany.
+    The first item yielded is the column list; every following item is a list of
+    at most chunk_size row tuples, so memory stays flat whatever the row count.
+    """
+    aid = override_account_id if override_account_id is not None else get_current_account_id()
+    sql, params = _export_query(dataset, start_date, end_date, aid)
+    conn = get_connection(read_only=True)
+    try:
+        cur = conn.execute(sql, params)
+        yield [d[0] for d in cur.description]
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+# --- DATABASE MAINTENANCE ---
+# Checkpoints, PRAGMA optimize / ANALYZE, incremental vacuum and integrity checks.
+# Scheduled by db_maintenance.MaintenanceScheduler; every run is recorded in
+# db_maintenance_log for the Super Admin health panel.
+
+MAINTENANCE_BUSY_TIMEOUT = 1.0  # Seconds a maintenance task waits on other connections (keeps POS writers from stalling)
+VACUUM_FREE_RATIO = 0.2  # Full VACUUM (off-peak) only when this share of pages is free
+
+def get_wal_size(db_name=None):
+    """Bytes in the -wal file (0 when there is none)."""
+    try:
+        return os.path.getsize(f"{db_name or DB_NAME}-wal")
+    except OSError:
+        return 0
+
+def _run_maintenance(task, fn):
+    """
+    Runs fn(conn) -> (ok, detail) on an autocommit connection with a short busy
+    timeout, then records timing and WAL size before / after. Returns (Success, Msg).
+    """
+    wal_before = get_wal_size()
+    started = datetime.now()
+    t0 = time.perf_counter()
+    conn = sqlite3.connect(DB_NAME, timeout=MAINTENANCE_BUSY_TIMEOUT, check_same_thread=False, isolation_level=None)
+    try:
+        success, detail = fn(conn)
+    except Exception as e:
+        success, detail = False, str(e)
+    finally:
+        conn.close()
+    duration_ms = (time.perf_counter() - t0) * 1000
+    wal_after = get_wal_size()
+    conn = get_connection()
+    try:
+        conn.execute('''
+            INSERT INTO db_maintenance_log (task, started_at, duration_ms, success, detail, wal_bytes_before, wal_bytes_after)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (task, started, duration_ms, int(success), detail, wal_before, wal_after))
+        conn.commit()
+    except Exception as e:
+        print(f"Maintenance Log Error: {e}")
+    finally:
+        conn.close()
+    return success, detail
+
+def checkpoint_wal(mode='PASSIVE'):
+    """
+    WAL checkpoint. PASSIVE never waits; TRUNCATE also resets the -wal file to
+    zero bytes but needs a moment with no readers on old snapshots.
+    Returns (Success, Msg); a checkpoint held back by readers is not a success.
+    """
+    mode = mode.upper()
+    if mode not in ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'):
+        raise ValueError(f"Unknown checkpoint mode: {mode}")
+
+    def run(conn):
+        busy, log_frames, done = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+        if busy:
+            return False, f"Busy: {done}/{log_frames} frames checkpointed (readers active)."
+        if done < log_frames:  # PASSIVE never reports busy; readers can still hold frames back
+            return False, f"Partial: {done}/{log_frames} frames checkpointed (readers active)."
+        return True, f"{done}/{log_frames} frames checkpointed."
+    return _run_maintenance(f"checkpoint_{mode.lower()}", run)
+
+def optimize_db(analyze=False):
+    """PRAGMA optimize (cheap, hourly) or a full ANALYZE (off-peak). Returns (Success, Msg)."""
+    def run(conn):
+        if analyze:
+            conn.execute("ANALYZE")
+            return True, "Statistics rebuilt."
+        conn.execute("PRAGMA analysis_limit=400")
+        conn.execute("PRAGMA optimize")
+        return True, "Optimized."
+    return _run_maintenance('analyze' if analyze else 'optimize', run)
+
+def vacuum_db(full=False):
+    """
+    Returns free pages to the filesystem. Incremental when the file uses
+    auto_vacuum=INCREMENTAL; otherwise (full=True, off-peak) a full VACUUM that
+    also switches the file to incremental mode, if enough of it is free.
+    Returns (Success, Msg).
+    """
+    def run(conn):
+        auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        pages = conn.execute("PRAGMA page_count").fetchone()[0]
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if auto_vacuum == 2:
+            conn.executescript("PRAGMA incremental_vacuum;")  # execute() would step once = one page; a script runs to completion
+            left = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            return True, f"Incremental: {free - left} of {pages} pages released."
+        if not full or not pages or free / pages < VACUUM_FREE_RATIO:
+            return True, f"Skipped: {free} of {pages} pages free."
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+        return True, f"Full VACUUM: {free} free pages released, now incremental."
+    return _run_maintenance('vacuum', run)
+
+def check_integrity(quick=True):
+    """PRAGMA quick_check (or the slower integrity_check). Returns (Success, Msg)."""
+    def run(conn):
+        rows = [r[0] for r in conn.execute("PRAGMA quick_check" if quick else "PRAGMA integrity_check").fetchall()]
+        if rows == ['ok']:
+            return True, "ok"
+        return False, "; ".join(rows[:5]) + (f" (+{len(rows) - 5} more)" if len(rows) > 5 else "")
+    return _run_maintenance('integrity_check', run)
+
+def get_maintenance_last_runs(successful=True):
+    """{task: datetime of its last (successful) run} (System Level)."""
+    conn = get_connection(read_only=True)
+    try:
+        query = "SELECT task, MAX(started_at) FROM db_maintenance_log"
+        if successful:
+            query += " WHERE success = 1"
+        rows = conn.execute(query + " GROUP BY task").fetchall()
+    finally:
+        conn.close()
+    return {task: datetime.fromisoformat(str(ts)) for task, ts in rows if ts}
+
+def get_checkpointed_wal_size():
+    """
+    -wal bytes right after the latest completed checkpoint (0 if none yet).
+    SQLite rewrites the WAL from its start after a checkpoint, so the file only
+    grows past this size once new frames outrun the checkpointed ones.
+    """
+    conn = get_connection(read_only=True)
+    try:
+        row = conn.execute('''
+            SELECT wal_bytes_after FROM db_maintenance_log
+            WHERE task LIKE 'checkpoint_%' AND success = 1 ORDER BY id DESC LIMIT 1
+        ''').fetchone()
+    finally:
+        conn.close()
+    return (row[0] or 0) if row else 0
+
+def get_maintenance_log(limit=50):
+    """Latest maintenance runs, newest first (System Level)."""
+    conn = get_connection(read_only=True)
+    try:
+        return pd.read_sql_query('''
+            SELECT started_at, task, success, duration_ms, detail, wal_bytes_before, wal_bytes_after
+            FROM db_maintenance_log ORDER BY id DESC LIMIT ?
+        ''', conn, params=(int(limit),))
+    finally:
+        conn.close()
+
+def prune_maintenance_log(days=30):
+    """Drops log rows older than `days`. Returns (Success, Msg)."""
+    conn = get_connection()
+    try:
+        cutoff = datetime.now() - timedelta(days=days)
+        deleted = conn.execute("DELETE FROM db_maintenance_log WHERE started_at < ?", (cutoff,)).rowcount
+        conn.commit()
+        return True, f"{deleted} old log rows removed."
+    except Exception as e:
+        conn.rollback()
+        return False, str(e)
+    finally:
+        conn.close()
+
+def get_db_health():
+    """File and page statistics for the health panel (System Level)."""
+    conn = get_connection(read_only=True)
+    try:
+        stats = {name: conn.execute(f"PRAGMA {name}").fetchone()[0]
+                 for name in ('page_size', 'page_count', 'freelist_count', 'auto_vacuum', 'journal_mode')}
+    finally:
+        conn.close()
+    stats['db_bytes'] = os.path.getsize(DB_NAME) if os.path.exists(DB_NAME) else 0
+    stats['wal_bytes'] = get_wal_size()
+    stats['auto_vacuum'] = {0: 'NONE', 1: 'FULL', 2: 'INCREMENTAL'}.get(stats['auto_vacuum'], stats['auto_vacuum'])
+    return stats
+
+# --- QUERY PROFILING ---
+
+def get_slow_query_log(limit=100):
+    """Slow queries recorded by query_profiler, newest first (System Level)."""
+    conn = get_connection(read_only=True)
+    try:
+        return pd.read_sql_query('''
+            SELECT logged_at, function, duration_ms, rows, sql, plan
+            FROM slow_query_log ORDER BY id DESC LIMIT ?
+        ''', conn, params=(int(limit),))
+    finally:
+        conn.close()
+
+def clear_slow_query_log():
+    """Empties the slow query log. Returns (Success, Msg)."""
+    conn = get_connection()
+    try:
+        deleted = conn.execute("DELETE FROM slow_query_log").rowcount
+        conn.commit()
+        return True, f"{deleted} slow queries cleared."
+    except Exception as e:
+        conn.rollback()
+        return False, str(e)
+    finally:
+        conn.close()
+
+# --- PAGE RENDER STATS ---
+# Section timings from ui_components.profile_section, merged per (page, section).
+
+def save_page_render_stats(stats):
+    """
+    Merges {(page, section): {'calls', 'total_ms', 'max_ms', 'last_ms', 'buckets'}}
+    into page_render_stats (System Level). Returns (Success, Msg).
+    """
+    import json
+    conn = get_connection()
+    try:
+        c = conn.cursor()
+        now = datetime.now()
+        for (page, section), s in stats.items():
+            row = c.execute("SELECT buckets FROM page_render_stats WHERE page = ? AND section = ?", (page, section)).fetchone()
+            buckets = s['buckets']
+            if row and row[0]:
+                buckets = [a + b for a, b in zip(json.loads(row[0]), buckets)]
+            c.execute('''
+                INSERT INTO page_render_stats (page, section, calls, total_ms, max_ms, last_ms, buckets, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(page, section) DO UPDATE SET
+                    calls = calls + excluded.calls,
+                    total_ms = total_ms + excluded.total_ms,
+                    max_ms = MAX(max_ms, excluded.max_ms),
+                    last_ms = excluded.last_ms,
+                    buckets = excluded.buckets,
+                    updated_at = excluded.updated_at
+            ''', (page, section, s['calls'], s['total_ms'], s['max_ms'], s['last_ms'], json.dumps(buckets), now))
+        conn.commit()
+        return True, f"{len(stats)} page sections saved."
+    except Exception as e:
+        conn.rollback()
+        print(f"Page Render Stats Error: {e}")
+        return False, str(e)
+    finally:
+        conn.close()
+
+def get_page_render_stats(page=None):
+    """Aggregated section timings, slowest total first (System Level)."""
+    import json
+    import query_profiler
+    conn = get_connection(read_only=True)
+    try:
+        query = "SELECT page, section, calls, total_ms, max_ms, last_ms, buckets, updated_at FROM page_render_stats"
+        params = ()
+        if page:
+            query += " WHERE page = ?"
+            params = (page,)
+        df = pd.read_sql_query(query + " ORDER BY total_ms DESC", conn, params=params)
+    finally:
+        conn.close()
+    buckets = df['buckets'].map(json.loads)
+    df['avg_ms'] = (df['total_ms'] / df['calls']).round(2)
+    df['p50_ms'] = buckets.map(lambda b: query_profiler.percentile(b, 0.50))
+    df['p95_ms'] = buckets.map(lambda b: query_profiler.percentile(b, 0.95))
+    return df[['page', 'section', 'calls', 'avg_ms', 'p50_ms', 'p95_ms', 'max_ms', 'last_ms', 'total_ms', 'updated_at']]
+
+def clear_page_render_stats():
+    """Deletes all page render stats. Returns (Success, Msg)."""
+    conn = get_connection()
+    try:
+        deleted = conn.execute("DELETE FROM page_render_stats").rowcount
+        conn.commit()
+        return True, f"{deleted} page sections cleared."
+    except Exception as e:
+        conn.rollback()
+        return False, str(e)
+    finally:
+        conn.close()
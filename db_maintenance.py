@@ -0,0 +1,170 @@
+import argparse
+import threading
+import time
+from datetime import datetime
+
+import database as db
+
+# Database maintenance scheduler
+# A background thread in the app process that keeps the WAL file bounded and
+# the query planner's statistics fresh:
+#   * checkpoints when the -wal file has grown by a size since the last
+#     completed checkpoint (PASSIVE, followed by TRUNCATE once it completes)
+#   * PRAGMA optimize every hour
+#   * ANALYZE, incremental vacuum and a quick_check once per night, off-peak,
+#     plus a TRUNCATE if readers kept the daytime one from shrinking the WAL
+# Last runs are read from db_maintenance_log, so several app processes (or the
+# nightly cron job) do not repeat each other's work.
+# Usage (one-off / cron):
+#   python db_maintenance.py [--tasks checkpoint_truncate analyze vacuum integrity_check]
+
+TICK_SECONDS = 30
+WAL_PASSIVE_BYTES = 4 * 1024 * 1024
+WAL_TRUNCATE_BYTES = 64 * 1024 * 1024
+OPTIMIZE_EVERY = 3600
+OFF_PEAK_HOURS = (2, 5)  # [start, end) local hour for the nightly tasks
+NIGHTLY_EVERY = 20 * 3600  # At most one nightly run per task per night
+RETRY_SECONDS = {'checkpoint_passive': 60, 'checkpoint_truncate': 120}  # Others: 600
+
+
+def checkpoint_passive():
+    """
+    PASSIVE checkpoint (never blocks writers). A completed one leaves the -wal
+    file at its size, so a TRUNCATE follows to shrink it while nothing is left
+    to copy (best effort: readers may still hold it back).
+    """
+    success, msg = db.checkpoint_wal('PASSIVE')
+    if success:
+        db.checkpoint_wal('TRUNCATE')
+    return success, msg
+
+
+TASKS = {
+    'checkpoint_passive': checkpoint_passive,
+    'checkpoint_truncate': lambda: db.checkpoint_wal('TRUNCATE'),
+    'optimize': lambda: db.optimize_db(),
+    'analyze': lambda: db.optimize_db(analyze=True),
+    'vacuum': lambda: db.vacuum_db(full=True),
+    'integrity_check': lambda: db.check_integrity(quick=True),
+}
+NIGHTLY_TASKS = ('analyze', 'vacuum', 'integrity_check')
+
+
+def due_tasks(now, wal_bytes, last_runs, checkpointed_bytes=0):
+    """
+    Scheduling policy: tasks to run at `now`.
+    last_runs: {task: datetime of its last successful run}.
+    checkpointed_bytes: -wal size right after the last completed checkpoint.
+    SQLite reuses the WAL from its start once a checkpoint completes, so the
+    file's size alone does not mean frames are waiting: the thresholds apply
+    to growth past that size.
+    """
+    def older(task, seconds):
+        last = last_runs.get(task)
+        return last is None or (now - last).total_seconds() >= seconds
+
+    tasks = []
+    backlog = wal_bytes - checkpointed_bytes
+    if backlog >= WAL_TRUNCATE_BYTES:
+        tasks.append('checkpoint_truncate')
+    elif backlog >= WAL_PASSIVE_BYTES:
+        tasks.append('checkpoint_passive')
+    if older('optimize', OPTIMIZE_EVERY):
+        tasks.append('optimize')
+    if OFF_PEAK_HOURS[0] <= now.hour < OFF_PEAK_HOURS[1]:
+        tasks.extend(t for t in NIGHTLY_TASKS if older(t, NIGHTLY_EVERY))
+        if wal_bytes >= WAL_PASSIVE_BYTES and 'checkpoint_truncate' not in tasks:
+            tasks.append('checkpoint_truncate')  # A completed daytime checkpoint left the file large
+    return tasks
+
+
+def run_tasks(tasks):
+    """Runs tasks now, in order. Returns {task: (Success, Msg)}."""
+    return {task: TASKS[task]() for task in tasks}
+
+
+class MaintenanceScheduler(threading.Thread):
+    """Daemon thread that checks the policy every `tick` seconds."""
+
+    def __init__(self, tick=TICK_SECONDS):
+        super().__init__(name="db-maintenance", daemon=True)
+        self.tick = tick
+        self.attempts = {}  # task -> last attempt in this process (spaces out retries of busy checkpoints)
+        self.ticks = 0
+        self.started_at = None
+        self.last_results = {}
+        self._halt = threading.Event()
+
+    def run(self):
+        self.started_at = datetime.now()
+        while not self._halt.wait(self.tick):
+            self.run_once()
+
+    def run_once(self, now=None):
+        now = now or datetime.now()
+        self.ticks += 1
+        try:
+            tasks = due_tasks(now, db.get_wal_size(), db.get_maintenance_last_runs(), db.get_checkpointed_wal_size())
+        except Exception as e:
+            print(f"Maintenance Scheduler Error: {e}")
+            return {}
+        results = {}
+        for task in tasks:
+            last = self.attempts.get(task)
+            if last and (now - last).total_seconds() < RETRY_SECONDS.get(task, 600):
+                continue
+            self.attempts[task] = now
+            results[task] = TASKS[task]()
+        self.last_results.update(results)
+        return results
+
+    def stop(self):
+        self._halt.set()
+
+
+_SCHEDULER = None
+_LOCK = threading.Lock()
+
+
+def start_scheduler(tick=TICK_SECONDS):
+    """Starts the process-wide scheduler once (safe to call on every Streamlit rerun)."""
+    global _SCHEDULER
+    with _LOCK:
+        if _SCHEDULER is None or not _SCHEDULER.is_alive():
+            _SCHEDULER = MaintenanceScheduler(tick)
+            _SCHEDULER.start()
+        return _SCHEDULER
+
+
+def stop_scheduler():
+    global _SCHEDULER
+    with _LOCK:
+        if _SCHEDULER is not None:
+            _SCHEDULER.stop()
+            _SCHEDULER = None
+
+
+def scheduler_status():
+    """{'running', 'started_at', 'ticks', 'tick'} for the health panel."""
+    sched = _SCHEDULER
+    if sched is None or not sched.is_alive():
+        return {'running': False, 'started_at': None, 'ticks': 0, 'tick': TICK_SECONDS}
+    return {'running': True, 'started_at': sched.started_at, 'ticks': sched.ticks, 'tick': sched.tick}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VyaparMind database maintenance")
+    parser.add_argument("--db", default=None, help="SQLite database file")
+    parser.add_argument("--tasks", nargs="*", choices=list(TASKS), default=['checkpoint_truncate', *NIGHTLY_TASKS])
+    args = parser.parse_args()
+    if args.db:
+        db.DB_NAME = args.db
+    db.init_db()
+    t0 = time.perf_counter()
+    for task, (success, msg) in run_tasks(args.tasks).items():
+        print(f"   {'✅' if success else '❌'} {task}: {msg}")
+    print(f"   Done in {time.perf_counter() - t0:.1f}s (WAL now {db.get_wal_size():,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import time
+
+import streamlit as st
+
+import database as db
+import ui_components as ui
+
+# Entitlement service
+# Resolves plan x role x custom permissions into a frozen set of page files
+# ONCE per session (at login), and again only when the tenant's version stamp
+# moves (plan, custom modules, plan catalog or user permissions changed).
+# render_sidebar then just filters PAGES against the set - no DB round trips.
+
+BASIC_PAGES = ("4_Dashboard.py", "3_Settings.py")  # Always part of Custom / DB-defined plans
+SYSTEM_ROLES = ("super_admin", "sales_person")
+
+
+def _modules_to_files(names):
+    return [ui.MODULE_MAP[n] for n in names if n in ui.MODULE_MAP]
+
+
+def plan_pages(plan, custom_modules="", plan_features=None):
+    """Pages a subscription plan unlocks ('*' = everything)."""
+    if plan in ui.TIERS:
+        return set(ui.TIERS[plan])
+    if plan == "Custom":
+        return set(BASIC_PAGES) | set(_modules_to_files(m.strip() for m in (custom_modules or "").split(',') if m.strip()))
+    # Legacy / DB-based plans (unknown plans get the basics only)
+    return set(BASIC_PAGES) | set(_modules_to_files(plan_features or []))
+
+
+def role_pages(role, permissions=None):
+    """Pages a role may open. Custom permissions ("Inventory,POS Terminal") replace the role defaults."""
+    if permissions:
+        return set(_modules_to_files(p.strip() for p in permissions.split(',')))
+    return set(ui.ROLES.get(role, []))
+
+
+def resolve_pages(plan, role, permissions=None, custom_modules="", plan_features=None):
+    """Frozen set of page files visible in the sidebar for this plan / role / permission combination."""
+    allowed_sub = {'*'} if role == 'super_admin' else plan_pages(plan, custom_modules, plan_features)
+    allowed_role = role_pages(role, permissions)
+    visible = set()
+    for group, pages in ui.PAGES.items():
+        # System roles ONLY see the 'System' group
+        if role in SYSTEM_ROLES and group != 'System':
+            continue
+        for file_path in pages.values():
+            if "SuperAdmin" in file_path and role not in SYSTEM_ROLES:
+                continue
+            if ('*' in allowed_role or file_path in allowed_role) and ('*' in allowed_sub or file_path in allowed_sub):
+                visible.add(file_path)
+    return frozenset(visible)
+
+
+def get_entitlements(force=False):
+    """
+    The session's entitlements: {'plan', 'role', 'pages', 'stamp', 'resolve_ms'}.
+    Re-resolved from the database only on login / identity change or when the
+    tenant's entitlement stamp has moved; otherwise a pure session-state read.
+    """
+    aid = st.session_state.get('account_id')
+    username = st.session_state.get('username')
+    role = st.session_state.get('role') or 'staff'
+    stamp = db.get_entitlement_stamp(aid)
+    cached = st.session_state.get('entitlements')
+    if not force and cached and cached['stamp'] == stamp and cached['identity'] == (aid, username, role):
+        return cached
+
+    t0 = time.perf_counter()
+    inputs = db.get_entitlement_inputs(username, override_account_id=aid)
+    if not inputs['user_found']:
+        inputs['permissions'] = st.session_state.get('permissions')
+    st.session_state['permissions'] = inputs['permissions']
+    pages = resolve_pages(inputs['plan'], role, inputs['permissions'], inputs['custom_modules'], inputs['plan_features'])
+    cached = {
+        'identity': (aid, username, role),
+        'plan': inputs['plan'],
+        'role': role,
+        'pages': pages,
+        'stamp': stamp,
+        'resolve_ms': (time.perf_counter() - t0) * 1000,
+    }
+    st.session_state['entitlements'] = cached
+    return cached
+
+
+def can_access(file_path):
+    """True if the current session may open the given page file."""
+    return file_path in get_entitlements()['pages']
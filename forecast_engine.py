@@ -0,0 +1,173 @@
+import numpy as np
+
+# The "Brain" of IsoBar Forecasting
+# Lightweight per-SKU demand models, vectorized across every SKU of a tenant.
+# Inputs are a dense (n_skus x n_days) quantity matrix plus day-of-week and
+# context (weather/event) one-hot matrices; no per-SKU Python loops.
+
+HORIZON = 14          # Days forecast ahead
+SEASON = 7            # Weekly seasonality
+ALPHAS = (0.1, 0.3, 0.5)  # Smoothing grid, best picked per SKU
+SEASON_PRIOR_DAYS = 7.0   # Shrinks day-of-week profiles toward flat
+CONTEXT_PRIOR_DAYS = 3.0  # Shrinks weather/event multipliers toward 1.0
+MIN_HISTORY = 3 * SEASON  # Below this, model selection falls back to smoothing
+EPS = 1e-9
+
+
+def seasonal_naive(Y, horizon=HORIZON):
+    """Repeats the last observed week."""
+    last_week = Y[:, -SEASON:]
+    return last_week[:, np.arange(horizon) % SEASON]
+
+
+def dow_profile(Y, dow, prior=SEASON_PRIOR_DAYS):
+    """Per-SKU multiplicative day-of-week index, shape (n_skus, 7)."""
+    overall = Y.mean(axis=1, keepdims=True)
+    onehot = np.eye(SEASON)[dow]
+    sums = Y @ onehot
+    counts = onehot.sum(axis=0)
+    profile = (sums + prior * overall) / (counts + prior)
+    index = profile / np.maximum(overall, EPS)
+    index[overall[:, 0] <= 0] = 1.0
+    return np.maximum(index, 0.05)
+
+
+def exp_smoothing(Y, season_index, dow, future_dow, alphas=ALPHAS):
+    """
+    Simple exponential smoothing on the deseasonalized series, reseasonalized
+    for the forecast days. Loops over time (and the alpha grid) only - every
+    step updates all SKUs at once. The alpha with the lowest one-step-ahead
+    error is kept per SKU.
+    """
+    D = Y / season_index[:, dow]
+    n, T = D.shape
+    best_level = D[:, 0].copy()
+    best_err = np.full(n, np.inf)
+
+    for alpha in alphas:
+        level = D[:, 0].copy()
+        err = np.zeros(n)
+        for t in range(1, T):
+            resid = D[:, t] - level
+            err += np.abs(resid)
+            level += alpha * resid
+        better = err < best_err
+        best_level = np.where(better, level, best_level)
+        best_err = np.where(better, err, best_err)
+
+    return best_level[:, None] * season_index[:, future_dow]
+
+
+def context_multipliers(Y, season_index, dow, X_hist, prior=CONTEXT_PRIOR_DAYS):
+    """
+    Per-SKU demand lift for each context tag, shape (n_skus, n_tags).
+    Lift = mean deseasonalized qty on tagged days / overall mean, shrunk toward 1.
+    """
+    D = Y / season_index[:, dow]
+    base = D.mean(axis=1, keepdims=True)
+    sums = D @ X_hist
+    counts = X_hist.sum(axis=0)
+    lift = (sums + prior * base) / ((counts + prior) * np.maximum(base, EPS))
+    lift[base[:, 0] <= 0] = 1.0
+    return np.maximum(lift, 0.05)
+
+
+def apply_context(forecast, lift, X_future):
+    """Multiplies in the lifts of every tag active on each forecast day."""
+    return forecast * np.exp(np.log(lift) @ X_future.T)
+
+
+def fit_models(Y, dow, future_dow, X_hist, X_future):
+    """Fits every model on Y and returns {model_name: (n_skus, horizon) forecast}."""
+    horizon = len(future_dow)
+    season_index = dow_profile(Y, dow)
+    ses = exp_smoothing(Y, season_index, dow, future_dow)
+
+    preds = {'exp_smoothing': ses}
+    if Y.shape[1] >= SEASON:
+        preds['seasonal_naive'] = seasonal_naive(Y, horizon)
+    if X_hist.shape[1] and X_hist.any():
+        lift = context_multipliers(Y, season_index, dow, X_hist)
+        preds['exp_smoothing_context'] = apply_context(ses, lift, X_future)
+    return preds
+
+
+def mape(actual, predicted):
+    """Mean absolute percentage error (%) over cells with non-zero actuals."""
+    actual = np.asarray(actual, dtype=float)
+    predicted = np.asarray(predicted, dtype=float)
+    mask = actual > 0
+    if not mask.any():
+        return float('nan')
+    return float(np.mean(np.abs(actual[mask] - predicted[mask]) / actual[mask]) * 100)
+
+
+def forecast_skus(Y, dow, future_dow, X_hist=None, X_future=None, holdout=HORIZON):
+    """
+    Picks the best model per SKU on a trailing holdout, refits on full history
+    and forecasts len(future_dow) days.
+
+    Args:
+        Y: (n_skus, n_days) daily quantities, oldest first
+        dow: (n_days,) day-of-week of each history column (0=Mon)
+        future_dow: (horizon,) day-of-week of each forecast day
+        X_hist / X_future: (days, n_tags) 0/1 context matrices (optional)
+
+    Returns dict: forecast (n_skus, horizon), model (n_skus,) names,
+    holdout_mape (float, on the selection holdout).
+    """
+    Y = np.asarray(Y, dtype=float)
+    dow = np.asarray(dow)
+    future_dow = np.asarray(future_dow)
+    n, T = Y.shape
+    if X_hist is None:
+        X_hist = np.zeros((T, 0))
+        X_future = np.zeros((len(future_dow), 0))
+
+    full = fit_models(Y, dow, future_dow, X_hist, X_future)
+    names = list(full)
+
+    if T < MIN_HISTORY or n == 0:
+        return {
+            'forecast': np.maximum(full['exp_smoothing'], 0),
+            'model': np.full(n, 'exp_smoothing'),
+            'holdout_mape': float('nan'),
+        }
+
+    # Model selection on a trailing holdout (same models, same vectorization)
+    h = min(holdout, T - 2 * SEASON)
+    train, test = Y[:, :-h], Y[:, -h:]
+    bt = fit_models(train, dow[:-h], dow[-h:], X_hist[:-h], X_hist[-h:])
+    names = [m for m in names if m in bt]
+    bt_stack = np.stack([bt[m] for m in names])
+    errors = np.abs(bt_stack - test[None, :, :]).mean(axis=2)
+    best = errors.argmin(axis=0)
+
+    rows = np.arange(n)
+    forecast = np.stack([full[m] for m in names])[best, rows]
+    chosen_bt = bt_stack[best, rows]
+    return {
+        'forecast': np.maximum(forecast, 0),
+        'model': np.array(names)[best],
+        'holdout_mape': mape(test, chosen_bt),
+    }
+
+
+def context_matrix(weather_tags, event_tags, vocab=None):
+    """
+    One-hot context matrix from per-day tag lists ('None'/empty = untagged).
+    Returns (X, vocab) so future days can be encoded with the same columns.
+    """
+    day_tags = [
+        [f"w:{w}" for w in [wt] if w and w != "None"] + [f"e:{e}" for e in [et] if e and e != "None"]
+        for wt, et in zip(weather_tags, event_tags)
+    ]
+    if vocab is None:
+        vocab = sorted({t for tags in day_tags for t in tags})
+    col = {t: i for i, t in enumerate(vocab)}
+    X = np.zeros((len(day_tags), len(vocab)))
+    for d, tags in enumerate(day_tags):
+        for t in tags:
+            if t in col:
+                X[d, col[t]] = 1.0
+    return X, vocab
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+# The "Brain" of FreshFlow
+# Markdown pricing for near-expiry batches. Works on whole columns at once:
+# one date parse for every batch, then NumPy for discounts and prices.
+
+# Tiered rule: (max days left, % off). Evaluated top-down, first match wins.
+DISCOUNT_TIERS = [
+    (2, 50),
+    (5, 30),
+    (10, 10),
+]
+
+# Curve rule: discount ramps from 0% at CURVE_START_DAYS to CURVE_MAX_DISCOUNT on expiry day.
+CURVE_START_DAYS = 10
+CURVE_MAX_DISCOUNT = 60
+CURVE_SHAPE = 2.0  # >1 keeps early markdowns shallow and steepens near expiry
+
+# Expiry bands stored on product_batches.expiry_bucket by the daily sweep:
+# the band's upper bound in days (-1 = expired, NULL = more than 30 days out).
+EXPIRED_BUCKET = -1
+EXPIRY_BUCKETS = (2, 5, 10, 30)
+BUCKET_LABELS = {EXPIRED_BUCKET: "Expired", 2: "≤ 2 days", 5: "≤ 5 days", 10: "≤ 10 days", 30: "≤ 30 days"}
+
+NO_EXPIRY_DAYS = 10_000  # Unparseable / missing expiry dates are never marked down
+ROUND_TO = 0.5           # Prices are rounded down to the nearest 50 paise
+
+
+def days_to_expiry(expiry_dates, today=None):
+    """Whole days from today to each expiry date (negative = already expired)."""
+    today = pd.Timestamp(today if today is not None else pd.Timestamp.now()).normalize()
+    expiry = pd.to_datetime(pd.Series(expiry_dates), errors='coerce').dt.normalize()
+    days = (expiry - today).dt.days
+    return days.fillna(NO_EXPIRY_DAYS).to_numpy(dtype=np.int64)
+
+
+def bucket_for_lookahead(days):
+    """Smallest stored band covering a lookahead (None = beyond the last band)."""
+    for bucket in EXPIRY_BUCKETS:
+        if days <= bucket:
+            return bucket
+    return None
+
+
+def bucket_case_sql(days_expr):
+    """SQL CASE mapping a days-to-expiry expression to its band."""
+    whens = " ".join(f"WHEN {days_expr} <= {b} THEN {b}" for b in EXPIRY_BUCKETS)
+    return f"CASE WHEN {days_expr} < 0 THEN {EXPIRED_BUCKET} {whens} ELSE NULL END"
+
+
+def tiered_discount(days_left, tiers=DISCOUNT_TIERS):
+    """% off per batch from the step tiers."""
+    days_left = np.asarray(days_left)
+    conds = [days_left <= max_days for max_days, _ in tiers]
+    return np.select(conds, [pct for _, pct in tiers], default=0).astype(float)
+
+
+def curve_discount(days_left, start_days=CURVE_START_DAYS, max_discount=CURVE_MAX_DISCOUNT, shape=CURVE_SHAPE):
+    """% off per batch from a smooth curve: max_discount * (1 - days/start)^shape."""
+    frac = 1 - np.clip(np.asarray(days_left, dtype=float), 0, start_days) / start_days
+    return np.round(max_discount * frac ** shape)
+
+
+def price_markdowns(batches, today=None, mode="tiered", floor_at_cost=False):
+    """
+    Adds markdown columns to a batches frame (needs expiry_date, quantity,
+    cost_price, current_price):
+        days_left, suggested_discount, new_price, value_at_risk, revenue_at_risk
+    floor_at_cost keeps new_price >= cost_price (except for expired stock).
+    """
+    df = batches.copy()
+    days = days_to_expiry(df['expiry_date'], today)
+    discount = curve_discount(days) if mode == "curve" else tiered_discount(days)
+
+    price = df['current_price'].to_numpy(dtype=float)
+    cost = df['cost_price'].fillna(0).to_numpy(dtype=float)
+    qty = df['quantity'].to_numpy(dtype=float)
+
+    new_price = np.floor(price * (1 - discount / 100) / ROUND_TO) * ROUND_TO
+    if floor_at_cost:
+        new_price = np.where(days >= 0, np.maximum(new_price, np.minimum(cost, price)), new_price)
+
+    df['days_left'] = days
+    df['suggested_discount'] = np.where(price > 0, np.round((1 - new_price / np.where(price > 0, price, 1)) * 100), 0)
+    df['new_price'] = new_price
+    df['value_at_risk'] = qty * cost
+    df['revenue_at_risk'] = qty * price
+    return df
+
+
+def batch_markdowns(priced):
+    """Discounted batches as (id, new_price) rows, ready for a bulk apply."""
+    return priced.loc[priced['suggested_discount'] > 0, ['id', 'new_price']]
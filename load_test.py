@@ -0,0 +1,361 @@
+import argparse
+import asyncio
+import io
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import database as db
+
+# Load test for database.py
+# Simulated POS tills, TableLink waiters, kitchen screens (KDS) and an online
+# ordering feed run concurrently against a throwaway database seeded by
+# seed_data.py + seed_enterprise.py. Each client is an asyncio task; its
+# database calls run on a thread pool (one worker per client), the same way
+# Streamlit sessions hit database.py from their own threads.
+# Every call passes override_account_id, so no Streamlit session is needed.
+# Reports throughput, p50/p95/p99 latency per operation, failures and
+# "database is locked" timeouts, plus two consistency checks.
+# Usage:
+#   python load_test.py [--clients 16] [--duration 30] [--mix mixed] [--busy-timeout 5] [--think-ms 0]
+
+ACCOUNT_ID = '1111222233334444'
+KDS_STATUSES = ('preparing', 'ready', 'served')
+PLATFORMS = ('SWIGGY', 'ZOMATO')
+
+# Operation weights per traffic profile
+MIXES = {
+    'retail': {'inventory_lookup': 35, 'pos_sale': 55, 'online_order': 10},
+    'restaurant': {'inventory_lookup': 10, 'pos_sale': 10, 'table_add_item': 40, 'kot_print': 15, 'kds_update': 20, 'online_order': 5},
+    'mixed': {'inventory_lookup': 25, 'pos_sale': 30, 'table_add_item': 20, 'kot_print': 8, 'kds_update': 12, 'online_order': 5},
+}
+
+
+# --- SEEDING ---
+
+class _quiet:
+    """Silences the seed scripts' progress output."""
+
+    def __enter__(self):
+        self.saved, sys.stdout = sys.stdout, io.StringIO()
+
+    def __exit__(self, *exc):
+        sys.stdout = self.saved
+
+
+def seed_database(path, customers=500, history=2_000, tables=12, account_id=ACCOUNT_ID):
+    """Creates and seeds a fresh database at `path` for the load test."""
+    import seed_data
+    import seed_enterprise
+    db.DB_NAME = seed_data.DB_NAME = seed_enterprise.DB_NAME = path
+    db.init_db()
+    with _quiet():
+        seed_data.seed_products()
+        seed_data.seed_customers(customers)
+        seed_data.seed_transactions(history)
+        seed_enterprise.seed_suppliers_and_batches()
+        seed_enterprise.seed_staff_and_shifts()
+        seed_enterprise.seed_innovations()
+        seed_enterprise.seed_main_history()
+    _prepare_seeded_data(account_id, tables)
+
+
+def _prepare_seeded_data(account_id, tables):
+    """
+    The seed scripts predate TEXT primary keys: give seeded products and
+    customers ids, stock every product deep enough that no sale fails on
+    stock, and lay out the restaurant floor.
+    """
+    conn = db.get_connection()
+    try:
+        c = conn.cursor()
+        c.execute("UPDATE products SET id = 'P' || rowid WHERE id IS NULL")
+        c.execute("UPDATE customers SET id = 'C' || rowid WHERE id IS NULL")
+        c.execute("UPDATE products SET stock_quantity = 1000000 WHERE account_id = ?", (account_id,))
+        c.execute("DELETE FROM product_batches WHERE product_id IS NULL")
+        c.executemany('''
+            INSERT INTO product_batches (id, account_id, product_id, batch_code, expiry_date, quantity, cost_price)
+            SELECT ?, account_id, id, ?, DATE('now', ?), 500000, cost_price FROM products WHERE id = ?
+        ''', [(db.generate_unique_id(16), f"LOAD-{pid}-{n}", f"+{30 * (n + 1)} days", pid)
+              for (pid,) in c.execute("SELECT id FROM products WHERE account_id = ?", (account_id,)).fetchall()
+              for n in range(2)])
+        conn.commit()
+        db.create_table_management_tables(conn)
+        db.create_online_integration_tables(conn)
+    finally:
+        conn.close()
+    for n in range(tables):
+        db.add_restaurant_table(f"T{n + 1}", 4, override_account_id=account_id)
+    for table_id in db.get_tables(override_account_id=account_id)['id']:
+        db.occupy_table(table_id, override_account_id=account_id)
+
+
+# --- OPERATIONS ---
+# Each takes (state, rng) and makes the calls one screen interaction makes.
+# They return False on a failed call (database.py reports errors by return value).
+
+def _basket(state, rng, size):
+    items = []
+    for p in rng.sample(state['products'], min(size, len(state['products']))):
+        qty = rng.randint(1, 3)
+        items.append({'id': p['id'], 'name': p['name'], 'qty': qty, 'price': p['price'], 'cost': p['cost_price'],
+                      'total': p['price'] * qty, 'category': p['category']})
+    return items
+
+
+def op_inventory_lookup(state, rng):
+    """POS product grid: top sellers, or a search."""
+    term = rng.choice(state['search_terms']) if rng.random() < 0.5 else None
+    inv = db.fetch_pos_inventory(search_term=term, limit=100 if term else 10, override_account_id=state['account_id'])
+    return inv is not None
+
+
+def op_pos_sale(state, rng):
+    items = _basket(state, rng, rng.randint(1, 6))
+    total = sum(i['total'] for i in items)
+    profit = sum((i['price'] - i['cost']) * i['qty'] for i in items)
+    customer = rng.choice(state['customers']) if state['customers'] and rng.random() < 0.6 else None
+    txn = db.record_transaction(items, total, profit, customer_id=customer,
+                                payment_method=rng.choice(('CASH', 'UPI', 'CARD')), override_account_id=state['account_id'])
+    if txn:
+        with state['lock']:
+            state['units_sold'] += sum(i['qty'] for i in items)
+    return txn is not None
+
+
+def op_table_add_item(state, rng):
+    table_id = rng.choice(state['tables'])
+    item = _basket(state, rng, 1)[0]
+    item['id'] = f"{item['id']}#{rng.randrange(10 ** 9)}"  # Unique line: never merged with an earlier one
+    ok = db.add_item_to_table(table_id, item)
+    if ok:
+        with state['lock']:
+            state['table_items_added'] += 1
+    return ok
+
+
+def op_kot_print(state, rng):
+    success, _, _ = db.mark_items_kot_printed(rng.choice(state['tables']))
+    return success
+
+
+def op_kds_update(state, rng):
+    """Kitchen screen: read a table's ticket, bump one item's status."""
+    table_id = rng.choice(state['tables'])
+    _, items = db.get_table_order(table_id)
+    if not items:
+        return True
+    return db.update_item_kds_status(table_id, rng.randrange(len(items)), rng.choice(KDS_STATUSES))
+
+
+def op_online_order(state, rng):
+    items = [{'name': i['name'], 'qty': i['qty']} for i in _basket(state, rng, rng.randint(1, 4))]
+    order_id = db.sync_online_order(rng.choice(PLATFORMS), f"EXT-{rng.randrange(10 ** 12)}", items,
+                                    override_account_id=state['account_id'])
+    return order_id is not None
+
+
+OPERATIONS = {
+    'inventory_lookup': op_inventory_lookup,
+    'pos_sale': op_pos_sale,
+    'table_add_item': op_table_add_item,
+    'kot_print': op_kot_print,
+    'kds_update': op_kds_update,
+    'online_order': op_online_order,
+}
+
+
+# --- RUNNER ---
+
+class _ThreadOutput(io.TextIOBase):
+    """
+    stdout stand-in while the load runs: database.py reports lock timeouts by
+    printing the exception, so each worker thread's output is kept apart.
+    """
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def write(self, text):
+        self.local.buffer = getattr(self.local, 'buffer', '') + text
+        return len(text)
+
+    def take(self):
+        text = getattr(self.local, 'buffer', '')
+        self.local.buffer = ''
+        return text
+
+
+def _load_state(account_id, tables):
+    conn = db.get_connection(read_only=True)
+    try:
+        c = conn.cursor()
+        products = [dict(zip(('id', 'name', 'category', 'price', 'cost_price'), row)) for row in c.execute(
+            "SELECT id, name, category, price, cost_price FROM products WHERE account_id = ? AND id IS NOT NULL", (account_id,))]
+        customers = [r[0] for r in c.execute("SELECT id FROM customers WHERE account_id = ? AND id IS NOT NULL", (account_id,))]
+        table_ids = [r[0] for r in c.execute(
+            "SELECT id FROM restaurant_tables WHERE account_id = ? AND current_order_id IS NOT NULL", (account_id,))][:tables]
+    finally:
+        conn.close()
+    if not products:
+        raise RuntimeError(f"No products for account {account_id}: seed the database first.")
+    return {
+        'account_id': account_id,
+        'products': products,
+        'customers': customers,
+        'tables': table_ids,
+        'search_terms': sorted({p['name'].split()[0][:4] for p in products}),
+        'lock': threading.Lock(),
+        'units_sold': 0,
+        'table_items_added': 0,
+    }
+
+
+def _percentile(sorted_ms, p):
+    if not sorted_ms:
+        return 0.0
+    return sorted_ms[min(len(sorted_ms) - 1, int(round(p * (len(sorted_ms) - 1))))]
+
+
+def _stock_and_items(state):
+    conn = db.get_connection(read_only=True)
+    try:
+        stock = conn.execute("SELECT COALESCE(SUM(stock_quantity), 0) FROM products WHERE account_id = ?", (state['account_id'],)).fetchone()[0]
+        orders = conn.execute('''
+            SELECT o.items_json FROM restaurant_tables t JOIN table_orders o ON t.current_order_id = o.id
+            WHERE t.account_id = ?
+        ''', (state['account_id'],)).fetchall()
+    finally:
+        conn.close()
+    import json
+    return stock, sum(len(json.loads(items or '[]')) for (items,) in orders)
+
+
+def run_load(clients=16, duration=10.0, mix='mixed', think_ms=0.0, account_id=ACCOUNT_ID, tables=12, seed=None):
+    """
+    Runs `clients` concurrent clients for `duration` seconds against db.DB_NAME.
+    Returns {'ops', 'seconds', 'throughput', 'operations': {name: stats}, 'checks': {...}}.
+    """
+    weights = MIXES[mix] if isinstance(mix, str) else mix
+    names = [n for n in weights if n in OPERATIONS]
+    state = _load_state(account_id, tables)
+    if not state['tables']:
+        names = [n for n in names if n not in ('table_add_item', 'kot_print', 'kds_update')]
+    stock_before, items_before = _stock_and_items(state)
+    samples = {n: [] for n in names}
+    counts = {n: {'ok': 0, 'failed': 0, 'lock_timeouts': 0} for n in names}
+    out = _ThreadOutput()
+
+    def call(name, rng):
+        t0 = time.perf_counter()
+        try:
+            ok, error = OPERATIONS[name](state, rng), ""
+        except sqlite3.OperationalError as e:  # Calls without their own try / except
+            ok, error = False, str(e)
+        error += out.take()
+        ms = (time.perf_counter() - t0) * 1000
+        with state['lock']:
+            samples[name].append(ms)
+            counts[name]['ok' if ok else 'failed'] += 1
+            if "locked" in error:
+                counts[name]['lock_timeouts'] += 1
+
+    async def client(n, deadline, loop, pool):
+        rng = random.Random(None if seed is None else seed + n)
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights=[weights[k] for k in names])[0]
+            await loop.run_in_executor(pool, call, name, rng)
+            if think_ms:
+                await asyncio.sleep(rng.expovariate(1000.0 / think_ms))
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=clients, thread_name_prefix="load") as pool:
+            deadline = time.perf_counter() + duration
+            await asyncio.gather(*(client(n, deadline, loop, pool) for n in range(clients)))
+
+    saved, sys.stdout = sys.stdout, out
+    t0 = time.perf_counter()
+    try:
+        asyncio.run(main())
+    finally:
+        sys.stdout = saved
+    seconds = time.perf_counter() - t0
+
+    operations = {}
+    for name in names:
+        ms = sorted(samples[name])
+        operations[name] = dict(counts[name], calls=len(ms), p50_ms=_percentile(ms, 0.50), p95_ms=_percentile(ms, 0.95),
+                                p99_ms=_percentile(ms, 0.99), max_ms=ms[-1] if ms else 0.0,
+                                throughput=len(ms) / seconds if seconds else 0.0)
+    stock_after, items_after = _stock_and_items(state)
+    total = sum(op['calls'] for op in operations.values())
+    return {
+        'clients': clients,
+        'mix': mix if isinstance(mix, str) else 'custom',
+        'ops': total,
+        'seconds': seconds,
+        'throughput': total / seconds if seconds else 0.0,
+        'operations': operations,
+        'checks': {
+            'units_sold': state['units_sold'],
+            'stock_drop': stock_before - stock_after,
+            'table_items_added': state['table_items_added'],
+            'table_items_stored': items_after - items_before,
+        },
+    }
+
+
+def print_report(report):
+    print(f"Clients {report['clients']} · mix '{report['mix']}' · {report['ops']:,} ops in {report['seconds']:.1f}s "
+          f"= {report['throughput']:,.0f} ops/s")
+    print(f"{'operation':<18}{'calls':>8}{'ops/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'failed':>8}{'locked':>8}")
+    for name, s in sorted(report['operations'].items(), key=lambda kv: -kv[1]['calls']):
+        print(f"{name:<18}{s['calls']:>8,}{s['throughput']:>9.1f}{s['p50_ms']:>9.1f}{s['p95_ms']:>9.1f}"
+              f"{s['p99_ms']:>9.1f}{s['max_ms']:>9.1f}{s['failed']:>8}{s['lock_timeouts']:>8}")
+    checks = report['checks']
+    stock_ok = checks['units_sold'] == checks['stock_drop']
+    items_ok = checks['table_items_added'] == checks['table_items_stored']
+    print(f"{'✅' if stock_ok else '❌'} Stock: {checks['units_sold']:,} units sold, stock fell by {checks['stock_drop']:,}")
+    if 'table_add_item' in report['operations']:
+        print(f"{'✅' if items_ok else '❌'} Table orders: {checks['table_items_added']:,} items added, "
+              f"{checks['table_items_stored']:,} stored ({checks['table_items_added'] - checks['table_items_stored']:,} lost updates)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VyaparMind concurrent load test")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent simulated clients")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run")
+    parser.add_argument("--mix", choices=list(MIXES), default="mixed", help="Traffic profile")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Mean pause between a client's operations")
+    parser.add_argument("--busy-timeout", type=float, default=5.0, help="Seconds a call waits on a lock before giving up")
+    parser.add_argument("--tables", type=int, default=12, help="Restaurant tables to seat")
+    parser.add_argument("--customers", type=int, default=500)
+    parser.add_argument("--history", type=int, default=2_000, help="Seeded past transactions (plus seed_enterprise's 6 months)")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for the traffic")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary database")
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="vyapar_load_")
+    path = os.path.join(folder, "load.db")
+    try:
+        t0 = time.perf_counter()
+        seed_database(path, args.customers, args.history, args.tables)
+        print(f"🌱 Seeded {path} in {time.perf_counter() - t0:.1f}s")
+        db.BUSY_TIMEOUT = args.busy_timeout
+        print_report(run_load(args.clients, args.duration, args.mix, args.think_ms, tables=args.tables, seed=args.seed))
+    finally:
+        if args.keep:
+            print(f"Database kept at {path}")
+        else:
+            shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import argparse
+import time
+
+import analytics_store
+import database as db
+import db_maintenance
+
+# Nightly batch jobs (run from cron / Task Scheduler, outside Streamlit).
+# Usage: python nightly_jobs.py [--jobs snapshots expiry reorder affinity forecasts maintenance] [--accounts ID ID ...] [--workers N] [--force]
+
+def run_snapshots(account_ids=None, full=False):
+    print("🗄️ Syncing analytics snapshots...")
+    t0 = time.perf_counter()
+    results = analytics_store.run_nightly_snapshots(account_ids, full=full)
+    for aid, (success, msg) in results.items():
+        print(f"   {'✅' if success else '❌'} {aid}: {msg}")
+    print(f"   Done: {len(results)} tenants in {time.perf_counter() - t0:.1f}s")
+    return results
+
+def run_forecasts(account_ids=None, workers=None, force=False):
+    print("📈 Refreshing demand forecasts...")
+    t0 = time.perf_counter()
+    results = db.run_nightly_forecasts(account_ids, max_workers=workers, force=force)
+    for aid, (success, msg) in results.items():
+        print(f"   {'✅' if success else '❌'} {aid}: {msg}")
+    print(f"   Done: {len(results)} tenants in {time.perf_counter() - t0:.1f}s")
+    return results
+
+def run_expiry_sweeps(account_ids=None, force=False):
+    print("🍏 Running FreshFlow expiry sweep...")
+    t0 = time.perf_counter()
+    results = db.run_nightly_expiry_sweeps(account_ids, force=force)
+    for aid, (success, msg) in results.items():
+        print(f"   {'✅' if success else '❌'} {aid}: {msg}")
+    print(f"   Done: {len(results)} tenants in {time.perf_counter() - t0:.1f}s")
+    return results
+
+def run_reorders(account_ids=None):
+    print("🔁 Generating draft purchase orders...")
+    t0 = time.perf_counter()
+    results = db.run_nightly_reorders(account_ids)
+    for aid, (success, msg) in results.items():
+        print(f"   {'✅' if success else '❌'} {aid}: {msg}")
+    print(f"   Done: {len(results)} tenants in {time.perf_counter() - t0:.1f}s")
+    return results
+
+def run_affinity(account_ids=None):
+    print("🛒 Mining basket affinities...")
+    t0 = time.perf_counter()
+    results = db.run_nightly_affinity(account_ids)
+    for aid, (success, msg) in results.items():
+        print(f"   {'✅' if success else '❌'} {aid}: {msg}")
+    print(f"   Done: {len(results)} tenants in {time.perf_counter() - t0:.1f}s")
+    return results
+
+def run_maintenance():
+    print("🧹 Running database maintenance...")
+    t0 = time.perf_counter()
+    results = db_maintenance.run_tasks(['analyze', 'vacuum', 'integrity_check', 'checkpoint_truncate'])
+    results['prune_log'] = db.prune_maintenance_log()
+    for task, (success, msg) in results.items():
+        print(f"   {'✅' if success else '❌'} {task}: {msg}")
+    print(f"   Done: {len(results)} tasks in {time.perf_counter() - t0:.1f}s")
+    return results
+
+JOBS = {
+    "snapshots": lambda args: run_snapshots(args.accounts, args.force),
+    "expiry": lambda args: run_expiry_sweeps(args.accounts, args.force),
+    "reorder": lambda args: run_reorders(args.accounts),
+    "affinity": lambda args: run_affinity(args.accounts),
+    "forecasts": lambda args: run_forecasts(args.accounts, args.workers, args.force),
+    "maintenance": lambda args: run_maintenance(),
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="VyaparMind nightly jobs")
+    parser.add_argument("--db", default=db.DB_NAME, help="SQLite database file")
+    parser.add_argument("--accounts", nargs="*", help="Account IDs (default: all ACTIVE)")
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size")
+    parser.add_argument("--force", action="store_true", help="Re-run even if already run today")
+    parser.add_argument("--jobs", nargs="*", choices=list(JOBS), default=list(JOBS), help="Jobs to run (default: all)")
+    args = parser.parse_args()
+
+    db.DB_NAME = args.db
+    db.init_db()
+    for job in args.jobs:
+        JOBS[job](args)
+
+if __name__ == "__main__":
+    main()
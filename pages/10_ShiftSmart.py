@@ -1,7 +1,7 @@
 import streamlit as st
 import database as db
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
 import ui_components as ui
 
 st.set_page_config(page_title="ShiftSmart Planner", layout="wide")
@@ -9,10 +9,12 @@ ui.require_auth()
 ui.render_sidebar()
 ui.render_top_header()
 
+db.refresh_context_demand_index()
+
 st.title("👥 ShiftSmart: AI Workforce Planner")
 st.markdown("Demand-matched rostering to optimize labor costs.")
 
-tab1, tab2 = st.tabs(["📅 Smart Roster", "👔 Staff Management"])
+tab1, tab_week, tab2 = st.tabs(["📅 Smart Roster", "🗓️ Weekly Optimizer", "👔 Staff Management"])
 
 # --- TAB 1: ROSTER ---
 with tab1:
@@ -33,7 +35,7 @@ with tab1:
             
             if st.form_submit_button("Analyze & Schedule 🤖"):
                 # 1. Get Prediction
-                needed = db.predict_labor_demand(w, e)
+                needed = db.predict_labor_demand(w, e, date_str=date_pick.strftime("%Y-%m-%d"))
                 st.session_state['roster_needed'] = needed
                 st.session_state['roster_date'] = date_pick
                 st.session_state['roster_slot'] = slot
@@ -74,11 +76,15 @@ with tab1:
                     available = all_staff[~all_staff['id'].isin(assigned_ids)]
                     
                     if len(available) >= to_fill:
-                        people = available.head(to_fill)
-                        for _, p in people.iterrows():
-                            db.assign_shift(current_date.strftime("%Y-%m-%d"), current_slot, p['id'])
-                        st.success("Staff Assigned! Roster optimized.")
-                        st.rerun()
+                        # Cheapest available first, one transaction for the whole batch
+                        people = available.sort_values('hourly_rate').head(to_fill)
+                        day = current_date.strftime("%Y-%m-%d")
+                        success, msg = db.bulk_assign_shifts([(day, current_slot, sid) for sid in people['id']])
+                        if success:
+                            st.success(f"Staff Assigned! {msg}")
+                            st.rerun()
+                        else:
+                            st.error(msg)
                     else:
                         st.error(f"Not enough staff! Need {to_fill}, but only {len(available)} available.")
             elif to_fill < 0:
@@ -86,6 +92,53 @@ with tab1:
             else:
                 st.success("✅ Staffing perfectly matches predicted demand.")
 
+# --- TAB 1b: WEEKLY OPTIMIZER ---
+with tab_week:
+    st.subheader("Cost-Optimal Weekly Roster")
+    st.caption("Sizes every slot from the 14-day demand forecast and fills it with the cheapest available staff.")
+
+    wc1, wc2, wc3 = st.columns(3)
+    week_start = wc1.date_input("Week Starting", value=datetime.now() + timedelta(days=1), key="week_start")
+    max_shifts = wc2.number_input("Max Shifts / Person", min_value=1, max_value=7, value=5)
+    need_manager = wc3.checkbox("Manager on every shift", value=False)
+
+    if st.button("Generate Roster 🧠", type="primary"):
+        plan_df, summary = db.plan_week_roster(
+            week_start.strftime("%Y-%m-%d"),
+            max_shifts_per_week=int(max_shifts),
+            role_minimums={"Store Manager": 1} if need_manager else None,
+        )
+        st.session_state['week_plan'] = (plan_df, summary)
+
+    if 'week_plan' in st.session_state:
+        plan_df, summary = st.session_state['week_plan']
+        m1, m2, m3 = st.columns(3)
+        m1.metric("New Shifts", summary['new_shifts'])
+        m2.metric("Weekly Labor Cost", f"₹{summary['cost']:,.0f}")
+        m3.metric("Unfilled Slots", summary['unmet'])
+        if summary['unmet']:
+            st.warning(f"⚠️ {summary['unmet']} shift(s) could not be staffed within the weekly limits. Hire or raise the cap.")
+
+        if 'demand' in summary:
+            with st.expander("Forecast Headcount per Slot"):
+                st.dataframe(summary['demand'], use_container_width=True)
+
+        if plan_df.empty:
+            st.success("✅ Current roster already covers forecast demand.")
+        else:
+            grid = plan_df.pivot_table(index='name', columns='date', values='slot',
+                                       aggfunc=lambda x: ", ".join(s.split(" ")[0] for s in x), fill_value="")
+            st.dataframe(grid, use_container_width=True)
+
+            if st.button("📤 Publish Roster"):
+                success, msg = db.bulk_assign_shifts(list(plan_df[['date', 'slot', 'staff_id']].itertuples(index=False, name=None)))
+                if success:
+                    del st.session_state['week_plan']
+                    st.success(msg)
+                    st.rerun()
+                else:
+                    st.error(msg)
+
 # --- TAB 2: STAFF MANAGER ---
 with tab2:
     st.subheader("Employee Directory")
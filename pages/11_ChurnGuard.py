@@ -2,6 +2,8 @@ import streamlit as st
 import database as db
 import pandas as pd
 import ui_components as ui
+import churn_engine
+import analytics_store
 
 st.set_page_config(page_title="ChurnGuard", layout="wide")
 ui.require_auth()
@@ -11,44 +13,74 @@ ui.render_top_header()
 st.title("🛡️ ChurnGuard: Retention Autopilot")
 st.markdown("Identify and win back customers who are slipping away.")
 
-# Metrics
-churn_df = db.get_churn_metrics(days_threshold=30)
-if not churn_df.empty:
+# Incremental refresh: only customers with new purchases are re-aggregated
+with st.sidebar:
+    full_rebuild = st.button("🔄 Full Re-Score", use_container_width=True)
+if full_rebuild:
+    # Bulk of the history comes from the columnar snapshot; only the tail is read from SQLite
+    analytics_store.ensure_snapshot()
+db.refresh_customer_rfm(full=full_rebuild)
+
+rfm_df = db.get_customer_rfm()
+if not rfm_df.empty:
+    threshold = st.slider("Churn Probability Alert", 0.1, 0.95, churn_engine.CHURN_ALERT_THRESHOLD, 0.05)
+    churn_df = rfm_df[rfm_df['churn_prob'] >= threshold]
+
     col1, col2, col3 = st.columns(3)
-    loss_val = churn_df['total_spent'].sum()
+    loss_val = (churn_df['total_spent'] * churn_df['churn_prob']).sum()
     at_risk_count = len(churn_df)
-    
-    col1.metric("Revenue at Risk", f"₹{loss_val:,.2f}", delta="-12%", delta_color="inverse")
-    col2.metric("Customers at Risk", at_risk_count)
-    col3.metric("Win-Back Opportunity", "High")
-    
+
+    col1.metric("Expected Revenue at Risk", f"₹{loss_val:,.2f}")
+    col2.metric("Customers at Risk", at_risk_count, delta=f"of {len(rfm_df)}", delta_color="off")
+    col3.metric("Win-Back Opportunity", "High" if at_risk_count else "Low")
+
     st.divider()
-    
-    st.subheader("⚠️ At-Risk VIPs (Last Seen > 30 Days)")
-    
-    for index, row in churn_df.iterrows():
+
+    c_seg, c_tbl = st.columns([1, 2])
+    with c_seg:
+        st.subheader("📊 Segments")
+        seg_df = rfm_df.groupby('segment').agg(customers=('id', 'size'), ltv=('total_spent', 'sum')).reset_index()
+        st.dataframe(seg_df.sort_values('ltv', ascending=False), hide_index=True, use_container_width=True)
+
+    with c_tbl:
+        st.subheader(f"⚠️ At-Risk Customers (P(churn) ≥ {threshold:.0%})")
+        st.dataframe(
+            churn_df[['name', 'phone', 'segment', 'days_since', 'mean_gap_days', 'churn_prob', 'total_spent']],
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                'days_since': st.column_config.NumberColumn("Days Absent", format="%.0f"),
+                'mean_gap_days': st.column_config.NumberColumn("Usual Gap (Days)", format="%.0f"),
+                'churn_prob': st.column_config.ProgressColumn("P(Churn)", min_value=0.0, max_value=1.0, format="%.2f"),
+                'total_spent': st.column_config.NumberColumn("Total LTV", format="₹%.0f"),
+            }
+        )
+
+    # Actionable cards only for the most valuable at-risk customers
+    st.subheader("🚀 Win-Back Queue (Top 10 by Expected Loss)")
+    for row in churn_df.head(10).to_dict('records'):
         with st.container(border=True):
             c1, c2, c3, c4 = st.columns([2, 1, 1, 2])
-            
+
             with c1:
                 st.subheader(row['name'])
-                st.caption(f"Phone: {row['phone']}")
-                
+                st.caption(f"Phone: {row['phone']} | {row['segment']}")
+
             with c2:
                 st.markdown("**Days Absent**")
                 st.error(f"{int(row['days_since'])} Days")
-                
+
             with c3:
                 st.markdown("**Total LTV**")
                 st.write(f"₹{row['total_spent']:,.0f}")
-                
+
             with c4:
                 st.markdown("**Auto-Action**")
                 if st.button("🚀 Send 'Miss You' Offer", key=f"c_{row['id']}"):
                     st.toast(f"Offer sent to +91-{row['phone']}!", icon="📨")
 else:
     st.success("✅ No churn risks detected! Your customers are loyal.")
-    
+
 # Debug: Show all
 with st.expander("Reference: All Customer Stats"):
     st.dataframe(db.fetch_customers())
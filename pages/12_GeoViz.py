@@ -3,6 +3,7 @@ import database as db
 import pandas as pd
 import ui_components as ui
 import plotly.express as px
+import analytics_store
 
 st.set_page_config(page_title="GeoViz Intelligence", layout="wide")
 ui.require_auth()
@@ -13,23 +14,45 @@ st.title("🗺️ GeoViz: Catchment Analysis")
 st.markdown("Visualize where your revenue is coming from.")
 
 try:
-    geo_df = db.get_geo_revenue()
+    geo_df = db.get_geo_revenue_by_pincode()
 except Exception as e:
     st.error("Error fetching geo data. Please ensure 'city' column exists in customers.")
     geo_df = pd.DataFrame()
 
 if not geo_df.empty:
+    city_df = geo_df.groupby('city', as_index=False)[['revenue', 'transactions']].sum().sort_values('revenue', ascending=False)
+
     col1, col2 = st.columns([2, 1])
     
     with col1:
         st.subheader("Revenue by Neighborhood / City")
-        # Treemap
-        fig = px.treemap(geo_df, path=['city'], values='revenue', title="Revenue Heatmap", color='revenue', color_continuous_scale='Viridis')
+        # Treemap: click a city to drill into its pincodes (all served from the rollup)
+        fig = px.treemap(geo_df, path=['city', 'pincode'], values='revenue', title="Revenue Heatmap", color='revenue', color_continuous_scale='Viridis')
         st.plotly_chart(fig, use_container_width=True)
         
     with col2:
         st.subheader("Top Performers")
-        st.dataframe(geo_df[['city', 'revenue']], hide_index=True, use_container_width=True)
+        st.dataframe(city_df[['city', 'revenue']], hide_index=True, use_container_width=True)
+
+    st.subheader("📍 Pincode Drill-Down")
+    sel_city = st.selectbox("City", city_df['city'].tolist())
+    pin_df = geo_df[geo_df['city'] == sel_city]
+    st.dataframe(pin_df[['pincode', 'revenue', 'transactions']], hide_index=True, use_container_width=True)
+
+    # Line items x customer address: served from the columnar snapshot, not the live DB
+    st.subheader(f"🛍️ What Sells in {sel_city}")
+    snap = analytics_store.ensure_snapshot()
+    area_df = analytics_store.area_product_sales(snap, sel_city) if snap is not None else pd.DataFrame()
+    if not area_df.empty:
+        st.dataframe(area_df, hide_index=True, use_container_width=True, column_config={
+            'product_name': "Product",
+            'quantity': st.column_config.NumberColumn("Units", format="%d"),
+            'revenue': st.column_config.NumberColumn("Revenue", format="₹%.0f"),
+            'buyers': st.column_config.NumberColumn("Customers", format="%d"),
+        })
+        st.caption(f"Snapshot as of {snap['synced_at']}.")
+    else:
+        st.caption("No tagged sales for this city yet.")
         
     st.info("💡 ** Insight**: Target marketing campaigns in your top-performing cities to double-down on growth.")
 else:
@@ -39,18 +62,19 @@ else:
 with st.expander("🔧 Dev Tools: Impute Mock City Data"):
     st.write("Click this to assign random cities to existing customers for demo.")
     if st.button("Randomize Cities"):
-        # We need a direct update hack here for demo
         import secrets
-        cities = ["Mumbai", "Delhi", "Bangalore", "Pune", "Hyderabad", "Sector 15", "Sector 22"]
-        aid = db.get_current_account_id()
-        conn = db.get_connection()
-        c = conn.cursor()
-        c.execute("SELECT id FROM customers WHERE account_id = ?", (aid,))
-        ids = c.fetchall()
-        for i in ids:
-            curr_city = secrets.choice(cities)
-            c.execute("UPDATE customers SET city = ? WHERE id = ? AND account_id = ?", (curr_city, i[0], aid))
-        conn.commit()
-        conn.close()
-        st.success("Mock Data Injected! Refresh page.")
-        st.rerun()
+        cities = {
+            "Mumbai": "4000", "Delhi": "1100", "Bangalore": "5600", "Pune": "4110",
+            "Hyderabad": "5000", "Sector 15": "1220", "Sector 22": "1600"
+        }
+        customers = db.fetch_customers()
+        assignments = []
+        for cid in customers['id'].tolist():
+            city = secrets.choice(list(cities))
+            assignments.append((cid, city, f"{cities[city]}{secrets.randbelow(100):02d}"))
+        success, msg = db.bulk_assign_customer_geo(assignments)
+        if success:
+            st.success("Mock Data Injected! Refresh page.")
+            st.rerun()
+        else:
+            st.error(msg)
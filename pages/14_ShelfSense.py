@@ -55,7 +55,7 @@ with col2:
     
     # Run Analysis
     current_grid = st.session_state['shelf_grid']
-    score, logs = engine.analyze_grid(current_grid)
+    score, logs = engine.analyze_grid(current_grid, affinity=db.get_affinity_map(), tag_lookup=db.get_tag_lookup())
     
     # Score Display
     if score >= 80:
@@ -73,7 +73,7 @@ with col2:
         for log in logs:
             if "🚨" in log:
                 st.error(log)
-            elif "✅" in log:
+            elif "✅" in log or "🛒" in log:
                 st.success(log)
             elif "🏆" in log:
                 st.balloons()
@@ -82,3 +82,100 @@ with col2:
     st.markdown("### Knowledge Base")
     with st.expander("See Scientific Rules"):
         st.json(engine.KNOWLEDGE_BASE)
+
+# --- TAG MANAGER ---
+st.divider()
+st.subheader("🏷️ Science Tags")
+st.caption("Tags stored on your products drive every ShelfSense rule. Untagged products fall back to keyword matching on the name.")
+
+tag_df = db.get_shelf_products()
+if tag_df.empty:
+    st.info("Add products in Inventory to tag them.")
+else:
+    t1, t2 = st.columns([2, 1])
+    view = tag_df[['name', 'category', 'tags', 'tag_source']].copy()
+    view['tags'] = view['tags'].apply(", ".join)
+    t1.dataframe(view, use_container_width=True, hide_index=True)
+    untagged = int((tag_df['tag_source'] == 'inferred').sum())
+    t1.caption(f"{len(tag_df) - untagged} tagged, {untagged} using keyword inference.")
+
+    with t2.form("bulk_tags"):
+        labels = dict(zip(tag_df['id'], tag_df['name']))
+        sel_ids = st.multiselect("Products", list(labels), format_func=labels.get)
+        sel_cats = st.multiselect("...or whole Categories", sorted(tag_df['category'].fillna("General").unique()))
+        sel_tags = st.multiselect("Tags", sorted(engine.TAG_BITS))
+        mode = st.radio("Mode", ["add", "remove", "replace"], horizontal=True)
+        if st.form_submit_button("Apply Tags", type="primary"):
+            ids = set(sel_ids) | set(tag_df[tag_df['category'].fillna("General").isin(sel_cats)]['id'])
+            success, msg = db.set_science_tags(list(ids), sel_tags, mode=mode)
+            (st.success if success else st.error)(msg)
+            if success:
+                st.rerun()
+    if untagged and t2.button("💾 Save Inferred Tags"):
+        success, msg = db.persist_inferred_tags()
+        (st.success if success else st.error)(msg)
+        if success:
+            st.rerun()
+
+# --- BASKET AFFINITIES ---
+st.divider()
+st.subheader("🛒 Basket Affinities")
+st.caption("Product pairs your customers actually buy together, mined from POS baskets. Placing them side by side earns a boost in the score and the optimizer.")
+
+a1, a2 = st.columns([1, 3])
+window = a1.selectbox("Sales Window", ["Last 90 days", "Last 365 days", "All history"], index=1)
+if a1.button("⛏️ Mine Baskets"):
+    days = {"Last 90 days": 90, "Last 365 days": 365}.get(window)
+    with st.spinner("Mining baskets..."):
+        success, msg = db.refresh_product_affinity(days=days)
+    (st.success if success else st.error)(msg)
+
+affinity_df = db.get_product_affinity(limit=100)
+if affinity_df.empty:
+    a2.info("No affinities yet. Mine baskets once you have some sales.")
+else:
+    a2.dataframe(affinity_df.drop(columns=['computed_at']), use_container_width=True, hide_index=True,
+                 column_config={
+                     "support": st.column_config.NumberColumn(format="%.4f"),
+                     "confidence_ab": st.column_config.NumberColumn("P(B | A)", format="%.2f"),
+                     "confidence_ba": st.column_config.NumberColumn("P(A | B)", format="%.2f"),
+                     "lift": st.column_config.NumberColumn(format="%.2f"),
+                 })
+    a2.caption(f"Last mined: {affinity_df['computed_at'].iloc[0]}")
+
+# --- AUTO-LAYOUT OPTIMIZER ---
+st.divider()
+st.subheader("🤖 Auto-Layout Optimizer")
+st.caption("Searches thousands of arrangements (simulated annealing) for the highest-scoring aisle. One aisle per category runs in parallel.")
+
+shelf_products = db.get_shelf_products()
+if shelf_products.empty:
+    st.info("Add products in Inventory to optimize a layout.")
+else:
+    o1, o2, o3, o4 = st.columns(4)
+    categories = sorted(shelf_products['category'].fillna("General").unique())
+    sel_cats = o1.multiselect("Aisles (Categories)", categories, default=categories[:1])
+    shelves = o2.number_input("Shelves per Aisle", min_value=1, max_value=20, value=5)
+    facings = o3.number_input("Facings per Product", min_value=1, max_value=20, value=2)
+    iterations = o4.select_slider("Search Effort", options=[10_000, 50_000, 200_000], value=50_000)
+
+    if st.button("🚀 Optimize Layout", type="primary", disabled=not sel_cats):
+        aisles = []
+        for cat in sel_cats:
+            names = shelf_products[shelf_products['category'].fillna("General") == cat]['name'].tolist()
+            slots = len(names) * int(facings)
+            cols = -(-slots // int(shelves))  # ceil
+            aisles.append({'products': names, 'facings': [int(facings)] * len(names), 'rows': int(shelves), 'cols': cols})
+        with st.spinner("Searching layouts..."):
+            st.session_state['shelf_opt'] = (sel_cats, db.optimize_shelf_layouts(aisles, iterations=iterations))
+
+    if 'shelf_opt' in st.session_state:
+        cats, results = st.session_state['shelf_opt']
+        for cat, res in zip(cats, results):
+            with st.expander(f"🛒 {cat}: score {res['start_score']:+.0f} ➝ {res['score']:+.0f} ({res['seconds']:.1f}s)", expanded=len(results) == 1):
+                labels = res['products'] + [""]
+                grid = pd.DataFrame([[labels[x] for x in row] for row in res['planogram']],
+                                    index=[f"Shelf {r + 1}" for r in range(res['planogram'].shape[0])])
+                st.dataframe(grid, use_container_width=True)
+                hist = pd.DataFrame(res['history'], columns=['iteration', 'best score']).set_index('iteration')
+                st.line_chart(hist)
@@ -206,7 +206,8 @@ st.markdown("""
 
 # Fetch Enriched Data
 # Fetch Enriched Data
-floor_data = db.get_enriched_tables()
+with ui.profile_section("DB fetch: floor"):
+    floor_data = db.get_enriched_tables()
 
 # --- HEADER & CONTROLS ---
 col_head, col_view = st.columns([3, 1], vertical_alignment="center")
@@ -340,43 +341,44 @@ def render_card(t_data):
     return html_content
 
 # RENDER LOOP
-if view_mode == "Grid":
-    cols = st.columns(4)
-    for idx, t in enumerate(floor_data):
-        with cols[idx % 4]:
-            st.markdown(render_card(t), unsafe_allow_html=True)
-            # Action Button
-            if t['status'] != 'Available' and not t['merged_with']:
-                if st.button("Manage", key=f"btn_{t['id']}", use_container_width=True, type="primary"):
-                    st.session_state['selected_table'] = t['id']
-                    st.session_state['selected_table_label'] = t['label']
-                    st.rerun()
-            elif not t['merged_with']:
-                if st.button("Seat Guests", key=f"seat_{t['id']}", use_container_width=True):
-                    db.occupy_table(t['id'])
-                    st.rerun()
-else:
-    # Map Mode (6x6)
-    for r in range(6):
-        mcols = st.columns(6)
-        for c in range(6):
-            target = slots.get((c, r)) # x=col, y=row
-            with mcols[c]:
-                if target:
-                    st.markdown(render_card(target), unsafe_allow_html=True)
-                    if not target['merged_with']:
-                         if target['status'] != 'Available':
-                             if st.button("Manage", key=f"mbtn_{target['id']}", use_container_width=True):
-                                 st.session_state['selected_table'] = target['id']
-                                 st.session_state['selected_table_label'] = target['label']
-                                 st.rerun()
-                         else:
-                             if st.button("Seat", key=f"mseat_{target['id']}", use_container_width=True):
-                                 db.occupy_table(target['id'])
-                                 st.rerun()
-                else:
-                    # Empty Slot with Coordinate Label for guidance
-                    st.markdown(f"<div style='height:150px; border:1px dashed #e5e7eb; border-radius:8px; display:flex; align-items:center; justify-content:center; color:#e5e7eb; font-size:0.8rem;'>{r},{c}</div>", unsafe_allow_html=True)
+with ui.profile_section("Render: floor map"):
+    if view_mode == "Grid":
+        cols = st.columns(4)
+        for idx, t in enumerate(floor_data):
+            with cols[idx % 4]:
+                st.markdown(render_card(t), unsafe_allow_html=True)
+                # Action Button
+                if t['status'] != 'Available' and not t['merged_with']:
+                    if st.button("Manage", key=f"btn_{t['id']}", use_container_width=True, type="primary"):
+                        st.session_state['selected_table'] = t['id']
+                        st.session_state['selected_table_label'] = t['label']
+                        st.rerun()
+                elif not t['merged_with']:
+                    if st.button("Seat Guests", key=f"seat_{t['id']}", use_container_width=True):
+                        db.occupy_table(t['id'])
+                        st.rerun()
+    else:
+        # Map Mode (6x6)
+        for r in range(6):
+            mcols = st.columns(6)
+            for c in range(6):
+                target = slots.get((c, r)) # x=col, y=row
+                with mcols[c]:
+                    if target:
+                        st.markdown(render_card(target), unsafe_allow_html=True)
+                        if not target['merged_with']:
+                             if target['status'] != 'Available':
+                                 if st.button("Manage", key=f"mbtn_{target['id']}", use_container_width=True):
+                                     st.session_state['selected_table'] = target['id']
+                                     st.session_state['selected_table_label'] = target['label']
+                                     st.rerun()
+                             else:
+                                 if st.button("Seat", key=f"mseat_{target['id']}", use_container_width=True):
+                                     db.occupy_table(target['id'])
+                                     st.rerun()
+                    else:
+                        # Empty Slot with Coordinate Label for guidance
+                        st.markdown(f"<div style='height:150px; border:1px dashed #e5e7eb; border-radius:8px; display:flex; align-items:center; justify-content:center; color:#e5e7eb; font-size:0.8rem;'>{r},{c}</div>", unsafe_allow_html=True)
 
 # End of Grid Logic - Skip original loop
 
@@ -398,113 +400,13 @@ def show_receipt_dialog(items, total, t_label, t_id):
     tax_amt = total * 0.05
     subtotal = total - tax_amt
     
-    # --- CUSTOM LOGO LOGIC ---
-    import os
-    import base64
-    
-    # 1. Determine Logo Path (Copy logic from ui_components)
-    try:
-        logo_choice = db.get_setting('app_logo') or "Ascending Lotus"
-    except:
-        logo_choice = "Ascending Lotus"
-
-    if logo_choice and logo_choice != "Ascending Lotus" and os.path.exists(logo_choice):
-        logo_file = logo_choice
-    elif logo_choice == "Ascending Lotus":
-         logo_file = "logo_no_text_3.svg"  # Default
-    else:
-         logo_file = "logo_no_text_1.svg"
-
-    # 2. Encode to Base64
-    logo_b64 = ""
-    try:
-        if os.path.exists(logo_file):
-            with open(logo_file, "rb") as image_file:
-                logo_b64 = base64.b64encode(image_file.read()).decode()
-    except Exception as e:
-        st.error(f"Logo error: {e}")
-
-    # 3. Construct Image Tag
-    if logo_b64:
-        # Check ext for mime type (rudimentary)
-        mime = "image/svg+xml" if logo_file.endswith(".svg") else "image/png"
-        logo_html = f'<img src="data:{mime};base64,{logo_b64}" style="max-height: 80px; width: auto;">'
-    else:
-        logo_html = '<span style="font-size: 40px;">🍚</span>'
-    
-    # Use simple flat strings
-    html_bill = f"""
-<div style="font-family: 'Courier New', monospace; padding: 20px; background: #fff; color: #000; border: 1px solid #ddd; max-width: 400px; margin: auto;">
-<!-- Header -->
-<div style="text-align: center; margin-bottom: 20px;">
-<div style="display: flex; justify-content: center; margin-bottom: 10px;">
-<!-- Logo -->
-{logo_html}
-</div>
-<h2 style="margin: 0; font-weight: bold; font-size: 24px; text-transform: uppercase;">Chings Chinese Restaurant</h2>
-<p style="margin: 5px 0; font-size: 12px;">Telephone Colony, Hyderabad, India<br>Ph: 9876543210</p>
-</div>
-
-<hr style="border-top: 1px dashed #000; margin: 10px 0;">
-
-<!-- Metadata -->
-<div style="font-size: 14px; margin-bottom: 10px;">
-<strong>Receipt #:</strong> {receipt_id}<br>
-<strong>Date:</strong> {date_str}
-</div>
-
-<hr style="border-top: 1px dashed #000; margin: 10px 0;">
-
-<!-- Table -->
-<table style="width: 100%; font-size: 14px; border-collapse: collapse;">
-<thead>
-<tr style="border-bottom: 1px dashed #000;">
-<th style="text-align: left; padding: 5px 0;">Item</th>
-<th style="text-align: center; padding: 5px 0;">Qty</th>
-<th style="text-align: right; padding: 5px 0;">Rate</th>
-<th style="text-align: right; padding: 5px 0;">Amt</th>
-</tr>
-</thead>
-<tbody>
-"""
-    
-    for i in items:
-        rate = i['total'] / i['qty'] if i['qty'] > 0 else 0
-        html_bill += f"""
-<tr>
-<td style="text-align: left; padding: 5px 0;">{i['name']}</td>
-<td style="text-align: center; padding: 5px 0;">{i['qty']}</td>
-<td style="text-align: right; padding: 5px 0;">₹{rate:.2f}</td>
-<td style="text-align: right; padding: 5px 0;">₹{i['total']:.2f}</td>
-</tr>
-"""
-        
-    html_bill += f"""
-</tbody>
-</table>
-
-<hr style="border-top: 1px dashed #000; margin: 10px 0;">
-
-<!-- Totals -->
-<div style="text-align: right; font-size: 14px; line-height: 1.6;">
-Subtotal: ₹{subtotal:.2f}<br>
-CGST (2.5%): ₹{tax_amt/2:.2f}<br>
-SGST (2.5%): ₹{tax_amt/2:.2f}<br>
-<div style="font-size: 20px; font-weight: bold; margin-top: 10px;">TOTAL: ₹{total:.2f}</div>
-</div>
-
-<hr style="border-top: 2px solid #000; margin: 10px 0;">
-<div style="text-align: center; font-size: 18px; font-weight: bold; margin-bottom: 20px;">
-NET PAYABLE: ₹{total:.2f}
-</div>
-
-<hr style="border-top: 1px dashed #000; margin: 10px 0;">
-
-<div style="text-align: center; font-size: 12px; margin-top: 20px;">
-Thank you for dining with us!
-</div>
-</div>
-"""
+    # Logo + store block from the asset cache / compiled receipt template
+    import asset_cache
+    import receipt_engine
+    store = db.get_settings(('store_name', 'store_address', 'store_phone', 'app_logo'))
+    html_bill = receipt_engine.render_receipt_html(
+        items, total, subtotal, tax_amt, receipt_id, store=store,
+        logo_html=asset_cache.logo_html(store.get('app_logo')), date_str=date_str)
     
     st.markdown(html_bill, unsafe_allow_html=True)
     
@@ -589,14 +491,16 @@ if 'selected_table' in st.session_state:
     c_menu, c_bill = st.columns([1.5, 1])
     
     # FETCH ORDERS
-    order_id, items = db.get_table_order(t_id)
+    with ui.profile_section("DB fetch: order"):
+        order_id, items = db.get_table_order(t_id)
     
-    with c_menu:
+    with c_menu, ui.profile_section("Render: menu"):
         st.subheader("Add Items")
         # Reuse Inventory Search logic
         search = st.text_input("Search Food/Drink", placeholder="e.g. Pasta")
         
-        inv = db.fetch_pos_inventory()
+        with ui.profile_section("DB fetch: menu"):
+            inv = db.fetch_pos_inventory()
         if search:
             inv = inv[inv['name'].str.contains(search, case=False)]
         else:
@@ -638,7 +542,7 @@ if 'selected_table' in st.session_state:
             del st.session_state['selected_table']
             st.rerun()
 
-    with c_bill:
+    with c_bill, ui.profile_section("Render: bill"):
         st.subheader("Current Bill")
         if items:
             total_bill = 0
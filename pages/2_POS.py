@@ -113,7 +113,7 @@ def hold_current_bill(cust_phone=None):
 selected_customer_id = None
 st.write(" ") # Spacer
 
-with st.expander("👤 Customer Details (Optional)", expanded=True):
+with st.expander("👤 Customer Details (Optional)", expanded=True), ui.profile_section("Customer lookup"):
     # 1. Search by Phone
     # 1. Search by Phone
     with st.form("customer_search_form_pos"):
@@ -161,7 +161,7 @@ col_products, col_cart = st.columns([3, 2], vertical_alignment="top")
 
 
 # Left: Product Selection
-with col_products:
+with col_products, ui.profile_section("Products"):
     with st.container(border=True):
         st.subheader("Select Products")
         
@@ -177,11 +177,12 @@ with col_products:
             submitted = c_s2.form_submit_button("Find", use_container_width=True)
         
         # Fetch Optimized Data
-        if search_term:
-            inventory = db.fetch_pos_inventory(search_term=search_term, limit=100)
-        else:
-            # Default: Show Top 10 by Sales (User Request)
-            inventory = db.fetch_pos_inventory(limit=10)
+        with ui.profile_section("DB fetch: inventory"):
+            if search_term:
+                inventory = db.fetch_pos_inventory(search_term=search_term, limit=100)
+            else:
+                # Default: Show Top 10 by Sales (User Request)
+                inventory = db.fetch_pos_inventory(limit=10)
             
         if not inventory.empty:
             
@@ -195,6 +196,8 @@ with col_products:
                         st.caption(f"{row['category']}")
                     with c2:
                         st.markdown(f"**₹{row['price']:.2f}**")
+                        if row.get('on_markdown'):
+                            st.caption(f"~~₹{row['list_price']:.2f}~~ 🍏 Clearance")
                     with c3:
                         if row['stock_quantity'] > 0:
                             st.success(f"{row['stock_quantity']} In Stock")
@@ -219,7 +222,7 @@ with col_products:
 
 
 # Right Column Start
-with col_cart:
+with col_cart, ui.profile_section("Cart"):
     with st.container(border=True):
         st.subheader("🛒 Current Cart")
     
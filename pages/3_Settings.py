@@ -12,7 +12,7 @@ ui.render_top_header()
 
 st.title("⚙️ Settings & Administration")
 
-tab1, tab2, tab3 = st.tabs(["Store Profile", "Subscription Plan", "User Management"])
+tab1, tab2, tab3, tab4 = st.tabs(["Store Profile", "Subscription Plan", "User Management", "Data Export"])
 
 with tab1:
     st.subheader("Store Details")
@@ -163,7 +163,7 @@ with tab2:
             if not bill_amt or not cust_modules_str:
                  try:
                      # Helper to fetch plan details raw
-                     conn = db.get_connection()
+                     conn = db.get_connection(read_only=True)
                      # Fetch Price & Features
                      plan_row = pd.read_sql_query("SELECT price, features FROM subscription_plans WHERE name = ?", conn, params=(current_plan,))
                      conn.close()
@@ -217,7 +217,7 @@ with tab2:
                  
                  # Try to fetch details
                  try:
-                     conn = db.get_connection()
+                     conn = db.get_connection(read_only=True)
                      plan_row = pd.read_sql_query("SELECT price, features FROM subscription_plans WHERE name = ?", conn, params=(prev_custom,))
                      conn.close()
                      if not plan_row.empty:
@@ -388,3 +388,56 @@ with tab3:
                         
                 else:
                     st.info("No other users to manage.")
+
+with tab4:
+    st.subheader("📤 Data Export")
+    st.caption("Streams rows straight from the database into the file, so large monthly exports do not load into memory.")
+
+    if st.session_state.get('role', 'staff') != 'admin':
+        st.error("⛔ Only Admins can export data.")
+    else:
+        import data_export
+        import tempfile
+        from datetime import date
+
+        labels = {"transactions": "Transactions (bills)", "transaction_items": "Transaction Line Items",
+                  "products": "Product Catalog", "customers": "Customers"}
+        c1, c2 = st.columns(2)
+        dataset = c1.selectbox("Dataset", data_export.DATASETS, format_func=lambda d: labels.get(d, d))
+        fmt = c2.selectbox("Format", data_export.available_formats(), format_func=str.upper)
+        if not data_export.parquet_available():
+            st.caption("Parquet needs `pyarrow` installed on the server.")
+
+        start_date = end_date = None
+        if db.EXPORT_DATASETS[dataset][1]:
+            today = date.today()
+            period = st.date_input("Date Range", value=(today.replace(day=1), today), key="export_range")
+            if isinstance(period, (list, tuple)) and len(period) == 2:
+                start_date, end_date = (d.strftime('%Y-%m-%d') for d in period)
+            else:
+                st.info("Pick an end date.")
+                st.stop()
+
+        if st.button("Prepare Export", type="primary"):
+            # The download button buffers the whole file, so big exports are handed to the CLI
+            rows = db.count_export_rows(dataset, start_date, end_date)
+            if rows > data_export.UI_MAX_ROWS:
+                st.session_state.pop('data_export', None)
+                st.warning(f"{rows:,} rows is over the {data_export.UI_MAX_ROWS:,}-row browser download limit. Run this on the server instead:")
+                st.code(data_export.cli_command(db.get_current_account_id(), dataset, fmt, start_date, end_date), language="bash")
+            else:
+                bar = st.progress(0.0, text="Counting rows...")
+
+                def report(done, total):
+                    bar.progress(min(done / total, 1.0) if total else 1.0, text=f"{done:,} / {total:,} rows")
+
+                out = os.path.join(tempfile.gettempdir(), f"vyaparmind_{db.get_current_account_id()}_{dataset}.{fmt}")
+                stats = data_export.export_dataset(dataset, fmt, out, start_date, end_date, progress=report)
+                st.session_state['data_export'] = dict(stats, name=f"{dataset}_{start_date or 'all'}_{end_date or ''}.{fmt}".replace("_.", "."))
+
+        export = st.session_state.get('data_export')
+        if export and os.path.exists(export['path']):
+            st.success(f"{export['rows']:,} rows ready ({export['bytes'] / 1024:,.0f} KB, {export['seconds']:.1f}s).")
+            with open(export['path'], "rb") as f:
+                st.download_button("⬇️ Download", f, file_name=export['name'], on_click="ignore")
+            st.caption(f"Exports over {data_export.UI_MAX_ROWS:,} rows use the CLI: `python data_export.py --account <ID> --dataset ... --out ...`")
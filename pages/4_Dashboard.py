@@ -4,6 +4,7 @@ import pandas as pd
 import plotly.express as px
 from datetime import datetime
 import ui_components as ui
+import analytics_store
 
 st.set_page_config(page_title="VyaparMind Analytics", layout="wide")
 ui.require_auth()
@@ -44,65 +45,27 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Optimized Data Fetching (SQL Aggregation)
-# Instead of loading ALL transactions, we fetch aggregated metrics directly.
-# This scales to millions of records.
-conn = db.get_connection()
-aid = db.get_current_account_id()
+# Analytics Snapshot (Columnar)
+# Reports read the tenant's memory-mapped snapshot (analytics_store) instead of
+# querying the live database; only rows added since the last sync are copied over.
+with ui.profile_section("DB fetch: snapshot"):
+    snap = analytics_store.ensure_snapshot()
+if snap is None:
+    st.error("Analytics snapshot unavailable. Please try again shortly.")
+    st.stop()
+st.caption(f"Figures as of {snap['synced_at']} (refreshed every {analytics_store.SNAPSHOT_TTL // 60} min)")
 
 # Dates
 now = datetime.now()
-curr_month = now.month
-curr_year = now.year
-
-# Previous Month Logic
 first_of_this_month = now.replace(day=1)
 last_month = first_of_this_month - pd.DateOffset(days=1)
-prev_month_num = last_month.month
-prev_year_num = last_month.year
-
-# --- 1. Top Level Metrics (Optimized) ---
-# Current Month Metrics
-q_curr = """
-    SELECT 
-        SUM(t.total_amount) as revenue,
-        SUM(t.total_profit) as profit,
-        SUM(ti.quantity) as items_sold,
-        AVG(t.total_amount) as avg_order
-    FROM transactions t
-    LEFT JOIN transaction_items ti ON t.id = ti.transaction_id
-    WHERE t.account_id = ? 
-    AND strftime('%m', t.timestamp) = ? 
-    AND strftime('%Y', t.timestamp) = ?
-"""
-# Note: strftime returns '01', '02' etc. Python str(month) might be '1'. Pad it.
-c_m_str = f"{curr_month:02d}"
-c_y_str = str(curr_year)
-
-curr_df = pd.read_sql_query(q_curr, conn, params=(aid, c_m_str, c_y_str))
-curr_metrics = curr_df.iloc[0]
-
-# Previous Month Metrics
-q_prev = """
-    SELECT 
-        SUM(t.total_amount) as revenue,
-        SUM(t.total_profit) as profit,
-        SUM(ti.quantity) as items_sold
-    FROM transactions t
-    LEFT JOIN transaction_items ti ON t.id = ti.transaction_id
-    WHERE t.account_id = ? 
-    AND strftime('%m', t.timestamp) = ? 
-    AND strftime('%Y', t.timestamp) = ?
-"""
-p_m_str = f"{prev_month_num:02d}"
-p_y_str = str(prev_year_num)
 
-prev_df = pd.read_sql_query(q_prev, conn, params=(aid, p_m_str, p_y_str))
-prev_metrics = prev_df.iloc[0]
+# --- 1. Top Level Metrics ---
+with ui.profile_section("Data processing: metrics"):
+    curr_metrics = analytics_store.sales_summary(snap, first_of_this_month.strftime('%Y-%m-%d'), now.strftime('%Y-%m-%d'))
+    prev_metrics = analytics_store.sales_summary(snap, last_month.replace(day=1).strftime('%Y-%m-%d'), last_month.strftime('%Y-%m-%d'))
 
-conn.close()
-
-# Prepare Values (Handle None from SQL SUM if 0 records)
+# Prepare Values
 c_rev = curr_metrics['revenue'] or 0
 c_prof = curr_metrics['profit'] or 0
 c_items = curr_metrics['items_sold'] or 0
@@ -118,7 +81,7 @@ def calc_delta(curr, prev):
     delta = ((curr - prev) / prev) * 100
     return f"{delta:+.1f}%"
 
-with st.container():
+with st.container(), ui.profile_section("Render: metrics"):
     c1, c2, c3, c4 = st.columns(4)
     c1.metric("Revenue (This Month)", f"₹{c_rev:,.0f}", delta=calc_delta(c_rev, p_rev))
     c2.metric("Net Profit (This Month)", f"₹{c_prof:,.0f}", delta=calc_delta(c_prof, p_prof))
@@ -131,19 +94,9 @@ st.markdown("---")
 # Row 1: Big Chart Left (2/3), Pie Chart Right (1/3)
 row1_col1, row1_col2 = st.columns([2, 1])
 
-with row1_col1:
+with row1_col1, ui.profile_section("Render: revenue trend"):
     st.subheader("📈 Revenue Trends (Daily)")
-    # Optimized Trend Query (Group by Date in SQL)
-    conn = db.get_connection()
-    aid = db.get_current_account_id()
-    q_trend = """
-        SELECT date(timestamp) as date, SUM(total_amount) as total_amount
-        FROM transactions 
-        WHERE account_id = ?
-        GROUP BY date(timestamp)
-        ORDER BY date(timestamp) ASC
-    """
-    trend_df = pd.read_sql_query(q_trend, conn, params=(aid,))
+    trend_df = analytics_store.daily_revenue(snap)
     
     if not trend_df.empty:
         fig_trend = px.area(trend_df, x='date', y='total_amount', title="", markers=True, 
@@ -153,26 +106,10 @@ with row1_col1:
     else:
         st.info("No sales data for trends.")
 
-with row1_col2:
+with row1_col2, ui.profile_section("Render: categories"):
     st.subheader("Category Distribution")
-    # Category Query (Optimized Group By)
-    cat_query = '''
-        SELECT p.category, SUM(ti.quantity * ti.price_at_sale) as revenue
-        FROM transaction_items ti
-        JOIN products p ON ti.product_id = p.id
-        JOIN transactions t ON ti.transaction_id = t.id
-        WHERE t.account_id = ?
-        GROUP BY p.category
-    '''
-    cat_df = pd.read_sql_query(cat_query, conn, params=(aid,))
-    conn.close()
-    
-    # Calculate Total Revenue for Insight (All Time)
-    # We need total revenue from db for the percentage calc
-    conn = db.get_connection() # Open fresh or reuse if open (it was closed above)
-    # Re-open for isolated logic or keep open? Let's just quick query.
-    total_rev_all = pd.read_sql_query("SELECT SUM(total_amount) FROM transactions WHERE account_id=?", conn, params=(aid,)).iloc[0][0] or 1
-    conn.close()
+    cat_df = analytics_store.category_revenue(snap)
+    total_rev_all = analytics_store.sales_summary(snap)['revenue'] or 1
 
     if not cat_df.empty:
         fig_pie = px.pie(cat_df, values='revenue', names='category', hole=0.6,
@@ -189,23 +126,8 @@ with row1_col2:
     # Row 2: Full Width "Leaderboard" styled as horizontal bars
 st.subheader("🏆 Product Leaderboard")
 
-conn = db.get_connection()
-aid = db.get_current_account_id()
-
-leaderboard_query = """
-    SELECT 
-        ti.product_name, 
-        SUM(ti.quantity) as quantity, 
-        SUM(ti.price_at_sale * ti.quantity) as price_at_sale
-    FROM transaction_items ti
-    JOIN transactions t ON ti.transaction_id = t.id
-    WHERE t.account_id = ?
-    GROUP BY ti.product_name
-    ORDER BY quantity DESC
-    LIMIT 5
-"""
-top_products = pd.read_sql_query(leaderboard_query, conn, params=(aid,))
-conn.close()
+with ui.profile_section("Data processing: leaderboard"):
+    top_products = analytics_store.top_products(snap, 5).rename(columns={'revenue': 'price_at_sale'})
 
 if not top_products.empty:
     # Custom HTML Table for "Template" feel
@@ -228,20 +150,9 @@ st.markdown("---")
 # --- 3. Customer Insights (Marketing) ---
 st.subheader("👥 Customer Insights (Marketing)")
 
-conn = db.get_connection()
-aid = db.get_current_account_id()
 try:
-    # Check if we have customer data linked (Scoped)
-    cust_query = '''
-        SELECT c.name, c.email, COUNT(t.id) as visits, SUM(t.total_amount) as total_spend, MAX(t.timestamp) as last_visit
-        FROM transactions t
-        JOIN customers c ON t.customer_id = c.id
-        WHERE t.account_id = ?
-        GROUP BY c.id
-        ORDER BY total_spend DESC
-        LIMIT 10
-    '''
-    top_customers = pd.read_sql_query(cust_query, conn, params=(aid,))
+    with ui.profile_section("Data processing: top customers"):
+        top_customers = analytics_store.top_customers(snap, 10)
     
     if not top_customers.empty:
         c1, c2 = st.columns([2, 1])
@@ -278,5 +189,3 @@ try:
         
 except Exception as e:
     st.error(f"Could not load customer data: {e}")
-finally:
-    conn.close()
@@ -1,8 +1,8 @@
 import streamlit as st
 import database as db
 import pandas as pd
-from datetime import datetime, timedelta
 import ui_components as ui
+import freshflow_engine
 
 st.set_page_config(page_title="FreshFlow Engine", layout="wide")
 ui.require_auth()
@@ -12,7 +12,20 @@ ui.render_top_header()
 st.title("🍏 FreshFlow: Zero-Waste Engine")
 st.markdown("Automated Expiry Tracking & Dynamic Pricing to eliminate spoilage.")
 
-tab1, tab2 = st.tabs(["🚀 Command Center", "📦 Batch Ingestion"])
+# Daily expiry sweep: re-bands batches, raises alerts, writes off expired stock (no-op after first run today)
+db.run_expiry_sweep()
+
+alerts = db.get_notifications()
+if not alerts.empty:
+    with st.expander(f"🔔 {len(alerts)} Expiry Alerts", expanded=True):
+        for _, a in alerts.iterrows():
+            icon = "🗑️" if a['kind'] == 'EXPIRED' else "⏰"
+            st.markdown(f"{icon} {a['message']}")
+        if st.button("Mark all as read"):
+            db.mark_notifications_read()
+            st.rerun()
+
+tab1, tab2, tab3 = st.tabs(["🚀 Command Center", "📦 Batch Ingestion", "🗑️ Write-Offs"])
 
 # --- TAB 1: COMMAND CENTER ---
 with tab1:
@@ -22,69 +35,53 @@ with tab1:
     # Default lookahead: 10 days
     days_lookahead = st.slider("Lookahead Days", min_value=1, max_value=30, value=10)
     
-    expiring_df = db.get_expiring_batches(days_lookahead)
+    c_mode, c_floor = st.columns(2)
+    mode = c_mode.radio("Markdown Rule", ["tiered", "curve"], horizontal=True,
+                        format_func=lambda m: {"tiered": "Tiers (50/30/10%)", "curve": "Smooth Curve"}[m])
+    floor_at_cost = c_floor.checkbox("Never price below cost (until expiry)", value=False)
+
+    expiring_df = db.get_freshflow_markdowns(days_lookahead, mode=mode, floor_at_cost=floor_at_cost)
     
     if not expiring_df.empty:
-        # Calculate dynamic discounts
-        # Rule: < 2 days = 50%, < 5 days = 30%, < 10 days = 10%
-        today = datetime.now().date()
-        
-        def calculate_discount(expiry_str):
-            try:
-                exp_date = datetime.strptime(expiry_str, '%Y-%m-%d').date()
-                days_left = (exp_date - today).days
-                if days_left <= 2: return 50
-                if days_left <= 5: return 30
-                if days_left <= 10: return 10
-                return 0
-            except:
-                return 0
-
-        expiring_df['days_left'] = expiring_df['expiry_date'].apply(lambda x: (datetime.strptime(x, '%Y-%m-%d').date() - today).days)
-        expiring_df['suggested_discount'] = expiring_df['expiry_date'].apply(calculate_discount)
-        expiring_df['new_price'] = expiring_df['current_price'] * (1 - expiring_df['suggested_discount'] / 100)
-        
         # Display Metrics
-        col1, col2, col3 = st.columns(3)
-        total_risk_value = (expiring_df['quantity'] * expiring_df['cost_price']).sum()
-        critical_count = len(expiring_df[expiring_df['days_left'] <= 2])
+        col1, col2, col3, col4 = st.columns(4)
+        critical_count = int((expiring_df['days_left'] <= 2).sum())
         
-        col1.metric("Total Stock Value at Risk", f"₹{total_risk_value:,.2f}")
-        col2.metric("Critical Items (< 48h)", critical_count)
-        col3.metric("Batches Flagged", len(expiring_df))
+        col1.metric("Total Stock Value at Risk", f"₹{expiring_df['value_at_risk'].sum():,.2f}")
+        col2.metric("Revenue at Shelf Price", f"₹{expiring_df['revenue_at_risk'].sum():,.2f}")
+        col3.metric("Critical Items (< 48h)", critical_count)
+        col4.metric("Batches Flagged", len(expiring_df))
         
         st.divider()
         
-        # Actionable Grid
-        for index, row in expiring_df.iterrows():
-            with st.container(border=True):
-                c1, c2, c3, c4 = st.columns([2, 1, 2, 2])
-                
-                with c1:
-                    st.markdown(f"**{row['product_name']}**")
-                    st.caption(f"Batch: {row['batch_code']}")
-                
-                with c2:
-                    color = "red" if row['days_left'] <= 2 else "orange"
-                    st.markdown(f":{color}[**{row['days_left']} Days Left**]")
-                    st.caption(f"Exp: {row['expiry_date']}")
-                    
-                with c3:
-                    st.write(f"Qty: {row['quantity']}")
-                    st.write(f"Cost: ₹{row['cost_price']}")
-                    
-                with c4:
-                    st.markdown(f"**Recomm: {row['suggested_discount']}% OFF**")
-                    st.markdown(f"₹{row['current_price']} ➝ **₹{row['new_price']:.2f}**")
-                    
-                    if st.button(f"⚡ FLASH SALE ({row['suggested_discount']}%)", key=f"f_{row['id']}"):
-                        # Logic to update main product price to this new price
-                        # Note: This changes global price. In a complex system we'd have 'batch specific pricing' at POS.
-                        # For this MVP, we update the Global Price to clear stock.
-                        res = db.update_product(row['product_id'], row['new_price'], row['cost_price'], row['quantity'], 0) # simplified update
-                        if res:
-                            st.toast(f"Price updated to ₹{row['new_price']:.2f} for clearance!", icon="💸")
-                            st.rerun()
+        # Actionable Grid (one dataframe, not a widget per batch)
+        st.dataframe(
+            expiring_df[['product_name', 'batch_code', 'expiry_date', 'days_left', 'quantity', 'cost_price',
+                         'current_price', 'suggested_discount', 'new_price', 'value_at_risk']],
+            column_config={
+                "product_name": "Product",
+                "batch_code": "Batch",
+                "expiry_date": "Expiry",
+                "days_left": st.column_config.NumberColumn("Days Left", format="%d ⏳"),
+                "cost_price": st.column_config.NumberColumn("Cost", format="₹%.2f"),
+                "current_price": st.column_config.NumberColumn("Price", format="₹%.2f"),
+                "suggested_discount": st.column_config.ProgressColumn("Recomm. Off", format="%d%%", min_value=0, max_value=100),
+                "new_price": st.column_config.NumberColumn("New Price", format="₹%.2f"),
+                "value_at_risk": st.column_config.NumberColumn("At Risk", format="₹%.2f"),
+            },
+            hide_index=True,
+            use_container_width=True,
+        )
+
+        # Prices are set per batch; the POS charges the FEFO batch's price, the master price is untouched.
+        markdowns = freshflow_engine.batch_markdowns(expiring_df)
+        if st.button(f"⚡ FLASH SALE: Apply {len(markdowns)} Markdowns", type="primary", disabled=markdowns.empty):
+            success, msg = db.apply_markdowns(markdowns)
+            if success:
+                st.toast(msg, icon="💸")
+                st.rerun()
+            else:
+                st.error(msg)
                             
     else:
         st.success("✅ No expiring inventory found in this window. Great job!")
@@ -119,3 +116,14 @@ with tab2:
                     st.error(msg)
         else:
             st.warning("Create products in Inventory first.")
+
+# --- TAB 3: WRITE-OFFS ---
+with tab3:
+    st.subheader("🗑️ Expired Stock Written Off")
+    st.caption("The daily sweep removes expired batch quantities from stock and logs them here.")
+    write_offs = db.get_write_offs()
+    if not write_offs.empty:
+        st.metric("Total Loss (at cost)", f"₹{write_offs['cost_value'].sum():,.2f}")
+        st.dataframe(write_offs, hide_index=True, use_container_width=True)
+    else:
+        st.success("✅ Nothing written off yet.")
@@ -12,47 +12,41 @@ ui.render_top_header()
 st.title("🚚 VendorTrust Control Tower")
 st.markdown("Automated Supplier Scoring & Risk Analysis.")
 
-tab1, tab2, tab3 = st.tabs(["📊 Supplier Scorecards", "📝 Purchase Orders", "➕ Add Supplier"])
+tab1, tab2, tab_auto, tab3 = st.tabs(["📊 Supplier Scorecards", "📝 Purchase Orders", "🔁 Auto-Replenish", "➕ Add Supplier"])
 
 # --- TAB 1: SCORECARDS ---
 with tab1:
     st.subheader("Partner Performance")
     
-    suppliers = db.get_all_suppliers()
+    # One aggregation for every supplier (on-time, quality, lead times, risk)
+    suppliers = db.get_vendor_scorecards()
     
     if not suppliers.empty:
-        # Display as cards
-        for index, row in suppliers.iterrows():
-            with st.container(border=True):
-                # Calculate Score
-                score = db.get_vendor_scorecard(row['id'])
-                
-                c1, c2, c3, c4 = st.columns([2, 1, 1, 2])
-                with c1:
-                    st.subheader(row['name'])
-                    st.caption(f"Category: {row['category_specialty']}")
-                    st.caption(f"Contact: {row['contact_person']} | 📞 {row['phone']}")
-                    
-                with c2:
-                    st.markdown("**On-Time Rate**")
-                    val = score['on_time_rate']
-                    color = "green" if val >= 90 else "orange" if val >= 70 else "red"
-                    st.markdown(f":{color}[**{val:.1f}%**]")
-                    
-                with c3:
-                    st.markdown("**Quality Score**")
-                    q = score['avg_quality']
-                    st.markdown(f"⭐ **{q:.1f}/5**")
-                    
-                with c4:
-                    st.markdown("**Risk Assessment**")
-                    risk = score['risk']
-                    if risk == "Low":
-                        st.success("✅ LOW RISK")
-                    elif risk == "Medium":
-                        st.warning("⚠️ MEDIUM RISK")
-                    else:
-                        st.error("🚨 HIGH RISK")
+        m1, m2, m3 = st.columns(3)
+        m1.metric("Suppliers", len(suppliers))
+        m2.metric("🚨 High Risk", int((suppliers['risk'] == "High").sum()))
+        m3.metric("Avg On-Time Rate", f"{suppliers.loc[suppliers['po_count'] > 0, 'on_time_rate'].mean():.1f}%" if (suppliers['po_count'] > 0).any() else "—")
+
+        risk_icon = {"Low": "✅ LOW", "Medium": "⚠️ MEDIUM", "High": "🚨 HIGH"}
+        view = suppliers.assign(risk=suppliers['risk'].map(risk_icon).fillna("🆕 NEW"))
+        st.dataframe(
+            view[['name', 'category_specialty', 'contact_person', 'phone', 'po_count', 'on_time_rate',
+                  'avg_quality', 'lead_p50_days', 'lead_p90_days', 'risk']],
+            column_config={
+                "name": "Supplier",
+                "category_specialty": "Category",
+                "contact_person": "Contact",
+                "phone": "📞 Phone",
+                "po_count": st.column_config.NumberColumn("POs Received"),
+                "on_time_rate": st.column_config.ProgressColumn("On-Time Rate", format="%.1f%%", min_value=0, max_value=100),
+                "avg_quality": st.column_config.NumberColumn("Quality", format="⭐ %.1f/5"),
+                "lead_p50_days": st.column_config.NumberColumn("Lead Time (p50)", format="%.0f d"),
+                "lead_p90_days": st.column_config.NumberColumn("Lead Time (p90)", format="%.0f d"),
+                "risk": "Risk Assessment",
+            },
+            hide_index=True,
+            use_container_width=True,
+        )
     else:
         st.info("No suppliers found. Add one in the 'Add Supplier' tab.")
 
@@ -71,19 +65,33 @@ with tab2:
                 
                 # Risk Warning Logic
                 if sel_s:
-                    s_id = suppliers[suppliers['name'] == sel_s].iloc[0]['id']
-                    score = db.get_vendor_scorecard(s_id)
+                    score = suppliers[suppliers['name'] == sel_s].iloc[0]
+                    s_id = score['id']
                     if score['risk'] == "High":
                         st.error(f"⚠️ WARNING: {sel_s} is High Risk! (On-Time: {score['on_time_rate']:.0f}%)")
                     elif score['risk'] == "Medium":
                         st.warning(f"Note: {sel_s} has had recent delays.")
                 
                 exp_date = st.date_input("Expected Delivery")
-                notes = st.text_area("Order Notes / Items")
+                products_df = db.fetch_all_products()
+                line_items = st.data_editor(
+                    pd.DataFrame({"Product": pd.Series(dtype=str), "Qty": pd.Series(dtype=int)}),
+                    column_config={"Product": st.column_config.SelectboxColumn("Product", options=products_df['name'].tolist() if not products_df.empty else []),
+                                   "Qty": st.column_config.NumberColumn("Qty", min_value=1, step=1)},
+                    num_rows="dynamic", hide_index=True, use_container_width=True,
+                )
+                notes = st.text_area("Order Notes")
                 
                 submitted = st.form_submit_button("Create PO")
                 if submitted:
-                    success, msg = db.create_purchase_order(int(s_id), exp_date, notes)
+                    lines = []
+                    if not products_df.empty:
+                        by_name = products_df.set_index('name')
+                        for li in line_items.dropna().itertuples(index=False):
+                            if li.Product in by_name.index:
+                                prod = by_name.loc[li.Product]
+                                lines.append({'product_id': prod['id'], 'quantity': int(li.Qty), 'unit_cost': prod['cost_price']})
+                    success, msg = db.create_purchase_order(s_id, exp_date, notes, lines=lines)
                     if success:
                         st.success("PO Created!")
                         st.rerun()
@@ -102,17 +110,80 @@ with tab2:
             for i, row in open_pos.iterrows():
                 with st.expander(f"📦 PO #{row['id']} - {row['supplier_name']} (Due: {row['expected_date']})"):
                     st.write(f"**Notes:** {row['notes']}")
+                    if row['line_count']:
+                        st.dataframe(db.get_po_lines(row['id'])[['product_name', 'quantity', 'unit_cost']], hide_index=True, use_container_width=True)
                     
-                    # Receive Form
+                    # Receive Form (lines are booked into stock as batches)
                     with st.form(f"recv_{row['id']}"):
                         q_rating = st.slider("Quality Rating (1-5)", 1, 5, 5)
+                        rc1, rc2 = st.columns(2)
+                        batch_code = rc1.text_input("Batch Code / Lot Number", key=f"bc_{row['id']}")
+                        perishable = rc2.checkbox("Perishable", key=f"per_{row['id']}")
+                        expiry = rc2.date_input("Expiry Date", key=f"exp_{row['id']}") if perishable else None
                         if st.form_submit_button("Mark Received"):
-                            db.receive_purchase_order(row['id'], q_rating)
-                            st.toast("Stock Received & Vendor Rated!", icon="✅")
-                            st.rerun()
+                            success, msg = db.receive_purchase_order(row['id'], q_rating, batch_code=batch_code or None,
+                                                                     expiry_date=expiry.strftime('%Y-%m-%d') if expiry else None)
+                            if success:
+                                st.toast(f"Stock Received & Vendor Rated! {msg}", icon="✅")
+                                st.rerun()
+                            else:
+                                st.error(msg)
         else:
             st.info("No pending orders.")
 
+# --- TAB: AUTO-REPLENISH ---
+with tab_auto:
+    st.subheader("Reorder Points & Draft POs")
+    st.caption("Reorder point = lead-time demand + safety stock (95% service level). Order size = EOQ.")
+
+    plan = db.compute_reorder_plan()
+    if not plan.empty:
+        below = plan[plan['order_qty'] > 0]
+        a1, a2, a3 = st.columns(3)
+        a1.metric("SKUs Below Reorder Point", len(below))
+        a2.metric("Units to Order", int(below['order_qty'].sum()))
+        a3.metric("Order Value", f"₹{(below['order_qty'] * below['unit_cost']).sum():,.0f}")
+
+        st.dataframe(
+            plan.sort_values('order_qty', ascending=False)[['name', 'stock_quantity', 'on_order', 'daily_demand', 'lead_days',
+                                                            'reorder_point', 'eoq', 'order_qty', 'supplier_name']],
+            column_config={
+                "name": "Product",
+                "stock_quantity": "Stock",
+                "on_order": "On Order",
+                "daily_demand": st.column_config.NumberColumn("Daily Demand", format="%.1f"),
+                "lead_days": st.column_config.NumberColumn("Lead Time", format="%.0f d"),
+                "reorder_point": st.column_config.NumberColumn("Reorder Point", format="%.0f"),
+                "eoq": st.column_config.NumberColumn("EOQ", format="%.0f"),
+                "order_qty": "Order Qty",
+                "supplier_name": "Supplier",
+            },
+            hide_index=True, use_container_width=True,
+        )
+        if st.button("⚡ Generate Draft POs", type="primary", disabled=below.empty):
+            success, msg = db.generate_draft_pos()
+            if success:
+                st.success(msg)
+                st.rerun()
+            else:
+                st.error(msg)
+    else:
+        st.info("Add products to plan replenishment.")
+
+    drafts = db.get_open_pos(status='DRAFT')
+    if not drafts.empty:
+        st.write("#### Draft POs (Awaiting Approval)")
+        for _, row in drafts.iterrows():
+            with st.expander(f"📝 {row['supplier_name']} - {row['line_count']} lines (₹{row['po_value'] or 0:,.0f})"):
+                st.dataframe(db.get_po_lines(row['id'])[['product_name', 'quantity', 'unit_cost']], hide_index=True, use_container_width=True)
+        if st.button(f"✅ Approve All {len(drafts)} Drafts"):
+            success, msg = db.approve_purchase_orders(drafts['id'].tolist())
+            if success:
+                st.toast(msg, icon="✅")
+                st.rerun()
+            else:
+                st.error(msg)
+
 # --- TAB 3: ADD SUPPLIER ---
 with tab3:
     st.subheader("Onboard New Vendor")
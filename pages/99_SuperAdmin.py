@@ -1,7 +1,11 @@
 import streamlit as st
 import pandas as pd
 import database as db
+import os
 import time
+from datetime import datetime
+import db_maintenance
+import query_profiler
 import ui_components as ui
 
 st.set_page_config(page_title="Super Admin", page_icon="🛡️", layout="wide")
@@ -44,7 +48,7 @@ st.markdown("Manage Tenants, Subscriptions, and System Health.")
 # Role-based Tabs
 user_role = st.session_state.get('role', 'staff')
 if user_role == 'super_admin':
-    tab_dash, tab_tenants, tab_plans, tab_billing, tab_team, tab_approvals = st.tabs(["📊 Overview", "🏢 Tenant Management", "💎 Manage Plans", "💳 Billing Reports", "👥 Manage Team", "✅ Approvals"])
+    tab_dash, tab_tenants, tab_plans, tab_billing, tab_team, tab_approvals, tab_perf = st.tabs(["📊 Overview", "🏢 Tenant Management", "💎 Manage Plans", "💳 Billing Reports", "👥 Manage Team", "✅ Approvals", "⚡ Performance"])
 else:
     # Sales Person: No Billing, No Plans (Actually requested: "should't have access to billing info... add features sales people need")
     # "Sales people... onboard new accounts, manage tenants"
@@ -68,6 +72,60 @@ with tab_dash:
     
     st.info("System is running in WAL Mode (Write-Ahead Logging) for performance.")
 
+    # Overview counts are read from the backup-API replica, not the live file
+    if db.REPLICA_TTL is not None:
+        age = db.get_replica_age()
+        c_rep, c_btn = st.columns([3, 1])
+        c_rep.caption(f"📸 Read replica: {'not created yet' if age is None else f'copied {age / 60:.0f} min ago'} (re-copied when older than {db.REPLICA_TTL // 60} min)")
+        if c_btn.button("Refresh Replica", use_container_width=True):
+            succ, msg = db.refresh_read_replica()
+            st.toast(msg, icon="📸" if succ else "⚠️")
+
+    # --- Database Maintenance (db_maintenance scheduler) ---
+    if user_role == 'super_admin':
+        st.divider()
+        st.subheader("🧹 Database Maintenance")
+        health = db.get_db_health()
+        last_runs = db.get_maintenance_last_runs()
+
+        def _ago(task):
+            ts = last_runs.get(task)
+            return "never" if ts is None else f"{(datetime.now() - ts).total_seconds() / 3600:.1f} h ago"
+
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("Database Size", f"{health['db_bytes'] / 1024 ** 2:,.1f} MB")
+        m2.metric("WAL Size", f"{health['wal_bytes'] / 1024 ** 2:,.1f} MB")
+        m3.metric("Free Pages", f"{health['freelist_count']:,}",
+                  f"{health['freelist_count'] / max(health['page_count'], 1):.1%} of file", delta_color="off")
+        m4.metric("Auto Vacuum", health['auto_vacuum'])
+
+        sched = db_maintenance.scheduler_status()
+        st.caption(
+            f"{'🟢 Scheduler running' if sched['running'] else '🔴 Scheduler not running'} (every {sched['tick']}s) · "
+            f"Checkpoint: {_ago('checkpoint_truncate')} · Optimize: {_ago('optimize')} · "
+            f"ANALYZE: {_ago('analyze')} · Vacuum: {_ago('vacuum')} · Integrity: {_ago('integrity_check')}"
+        )
+
+        b1, b2, b3, b4 = st.columns(4)
+        actions = {
+            b1: ("Checkpoint (Truncate)", 'checkpoint_truncate'),
+            b2: ("Optimize", 'optimize'),
+            b3: ("Vacuum", 'vacuum'),
+            b4: ("Integrity Check", 'integrity_check'),
+        }
+        for col, (label, task) in actions.items():
+            if col.button(label, use_container_width=True, key=f"maint_{task}"):
+                with st.spinner(f"Running {label}..."):
+                    succ, msg = db_maintenance.run_tasks([task])[task]
+                st.toast(f"{label}: {msg}", icon="✅" if succ else "⚠️")
+
+        log = db.get_maintenance_log(50)
+        if log.empty:
+            st.caption("No maintenance runs recorded yet.")
+        else:
+            log['success'] = log['success'].map({1: "✅", 0: "❌"})
+            st.dataframe(log, use_container_width=True, hide_index=True)
+
 with tab_tenants:
     st.header("Tenant Management")
     
@@ -352,7 +410,7 @@ if tab_team:
             # We need a query to fetch users for this account. 
             # Since db.create_user uses 'account_id', we can infer we just select from users where account_id = current
             aid = db.get_current_account_id()
-            conn = db.get_connection()
+            conn = db.get_connection(read_only=True)
             try:
                 team_df = pd.read_sql_query("SELECT username, email, role, created_at FROM users WHERE account_id = ?", conn, params=(aid,))
                 st.dataframe(team_df, use_container_width=True, hide_index=True)
@@ -396,3 +454,84 @@ if user_role == 'super_admin' and 'tab_approvals' in locals():
                             st.error(msg)
         else:
             st.success("No pending approvals! All caught up. 🎉")
+
+
+# --- PERFORMANCE TAB (query_profiler) ---
+if user_role == 'super_admin' and 'tab_perf' in locals():
+    with tab_perf:
+        st.header("⚡ Query Performance")
+        st.markdown("Per-function and per-statement SQL timings for this server process.")
+
+        c_on, c_slow, c_reset = st.columns([2, 2, 1])
+        enabled = c_on.toggle("Profile database queries", value=query_profiler.ENABLED,
+                              help="Adds well under a millisecond per query while on; nothing while off.")
+        slow_ms = c_slow.number_input("Slow query threshold (ms)", min_value=1, max_value=60_000,
+                                      value=int(query_profiler.SLOW_QUERY_MS), step=50)
+        if enabled:
+            query_profiler.enable(slow_ms)
+        else:
+            query_profiler.disable()
+        if c_reset.button("Reset Stats", use_container_width=True):
+            query_profiler.reset()
+
+        summary = query_profiler.summary()
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("Queries", f"{summary['calls']:,}")
+        m2.metric("Query Time", f"{summary['total_ms'] / 1000:,.1f} s")
+        m3.metric("Functions Seen", summary['functions'])
+        m4.metric("Slow Queries", summary['slow'])
+        st.caption(f"Collecting since {summary['since']:%Y-%m-%d %H:%M:%S}. Percentiles are histogram bucket upper bounds.")
+
+        fn_stats = query_profiler.function_stats()
+        if fn_stats.empty:
+            st.info("No queries recorded yet. Turn profiling on and use the app.")
+        else:
+            st.subheader("By Function")
+            st.dataframe(fn_stats, use_container_width=True, hide_index=True)
+
+            pick = st.selectbox("Latency histogram", fn_stats['function'].tolist())
+            hist = query_profiler.histogram('function', pick)
+            st.bar_chart(pd.DataFrame({'calls': list(hist.values())}, index=list(hist.keys())))
+
+            st.subheader("By Statement")
+            st.dataframe(query_profiler.statement_stats(), use_container_width=True, hide_index=True)
+
+        st.subheader("🖥️ Page Render Times")
+        st.caption("Named sections of page runs (ui.profile_section), aggregated over all sessions.")
+        ui.flush_page_stats()
+        page_stats = db.get_page_render_stats()
+        if page_stats.empty:
+            st.caption("No page sections recorded yet.")
+        else:
+            pages = sorted(page_stats['page'].unique())
+            pick_page = st.selectbox("Page", ["All pages"] + pages)
+            shown = page_stats if pick_page == "All pages" else page_stats[page_stats['page'] == pick_page]
+            st.dataframe(shown, use_container_width=True, hide_index=True)
+
+        c_cap, c_clear = st.columns([3, 1])
+        if c_cap.button("🔬 Capture cProfile of my next page run", help="Open a profiled page (POS, Dashboard, TableLink) next; its run is saved as a .prof file."):
+            ui.request_page_cprofile()
+            st.toast("The next profiled page you open will be captured.", icon="🔬")
+        if c_clear.button("Clear Page Stats", use_container_width=True):
+            succ, msg = db.clear_page_render_stats()
+            st.toast(msg, icon="🧹" if succ else "⚠️")
+        for path in ui.list_page_profiles(5):
+            with open(path, "rb") as f:
+                st.download_button(f"⬇️ {os.path.basename(path)}", f.read(), file_name=os.path.basename(path),
+                                   key=f"prof_{os.path.basename(path)}")
+
+        st.subheader("🐢 Slow Query Log")
+        slow_log = db.get_slow_query_log(100)
+        if slow_log.empty:
+            st.caption("No slow queries logged.")
+        else:
+            for _, row in slow_log.head(20).iterrows():
+                with st.expander(f"{row['duration_ms']:,.0f} ms · {row['function']} · {row['logged_at']}"):
+                    st.code(row['sql'], language="sql")
+                    st.caption(f"{row['rows']:,} rows")
+                    if row['plan']:
+                        st.code(row['plan'], language="text")
+            if st.button("Clear Slow Query Log"):
+                succ, msg = db.clear_slow_query_log()
+                st.toast(msg, icon="🧹" if succ else "⚠️")
+                st.rerun()
@@ -10,10 +10,13 @@ ui.require_auth()
 ui.render_sidebar()
 ui.render_top_header()
 
+# Fold any newly closed days into the context demand index (no-op once up to date)
+db.refresh_context_demand_index()
+
 st.title("🌡️ IsoBar: Demand Sensing")
 st.markdown("Context-Aware Forecasting. Predict sales based on Weather, Events, and History.")
 
-tab1, tab2 = st.tabs(["🔮 Predict & Simulate", "📅 Context Diary"])
+tab1, tab_fc, tab2 = st.tabs(["🔮 Predict & Simulate", "📈 14-Day Forecast", "📅 Context Diary"])
 
 # --- TAB 1: PREDICT ---
 with tab1:
@@ -24,12 +27,12 @@ with tab1:
     with col1:
         with st.form("sim_form"):
             st.write("#### Future Context")
-            sim_weather = st.selectbox("Forecasted Weather", ["None", "Sunny", "Rainy", "Cloudy", "Cold Wave", "Heatwave"])
-            sim_event = st.selectbox("Upcoming Event", ["None", "Weekend", "Holiday", "Festival", "Sports Match"])
+            sim_weather = st.multiselect("Forecasted Weather (any of)", ["Sunny", "Rainy", "Cloudy", "Cold Wave", "Heatwave"])
+            sim_event = st.multiselect("Upcoming Event (any of)", ["None", "Weekend", "Holiday", "Festival", "Sports Match"])
             
             if st.form_submit_button("Run Prediction 🔮"):
                 st.session_state['sim_result'] = db.analyze_context_demand(sim_weather, sim_event)
-                st.session_state['sim_context'] = f"{sim_weather} + {sim_event}"
+                st.session_state['sim_context'] = f"{' / '.join(sim_weather) or 'Any Weather'} + {' / '.join(sim_event) or 'Any Event'}"
 
     with col2:
         if 'sim_result' in st.session_state:
@@ -41,7 +44,7 @@ with tab1:
                 st.markdown("Based on historical data with similar conditions, specific items show **abnormal demand spikes**.")
                 
                 # Visual
-                fig = px.bar(res, x='total_qty', y='product_name', orientation='h', title="Expected Top Sellers", color='total_qty')
+                fig = px.bar(res, x='avg_daily_qty', y='product_name', orientation='h', title="Expected Top Sellers (Units / Day)", color='avg_daily_qty')
                 st.plotly_chart(fig, use_container_width=True)
                 
                 st.info("💡 **Recommendation:** Ensure these items are fully stocked in the 'Front Display'.")
@@ -51,6 +54,29 @@ with tab1:
         else:
             st.info("Select parameters to see what sells best under those conditions.")
 
+# --- TAB: FORECAST ---
+with tab_fc:
+    st.subheader("Next 14 Days")
+    st.caption("Per-SKU models (seasonal naive, exponential smoothing, weather/event lifts) refreshed nightly. Tag upcoming days in the Context Diary to factor them in.")
+
+    if st.button("🔄 Re-Fit Now"):
+        success, msg = db.refresh_demand_forecasts(force=True)
+        st.toast(msg, icon="📈" if success else "⚠️")
+    else:
+        db.refresh_demand_forecasts()
+
+    totals = db.get_forecast_totals()
+    if not totals.empty:
+        fig = px.line(totals, x='forecast_date', y='qty', markers=True, title="Forecast Units / Day (All SKUs)")
+        st.plotly_chart(fig, use_container_width=True)
+
+        fc_df = db.get_demand_forecast()
+        grid = fc_df.pivot_table(index='product_name', columns='forecast_date', values='qty', aggfunc='sum')
+        grid['Total'] = grid.sum(axis=1)
+        st.dataframe(grid.sort_values('Total', ascending=False).round(1), use_container_width=True)
+    else:
+        st.info("Not enough closed-day sales history to forecast yet.")
+
 # --- TAB 2: DIARY ---
 with tab2:
     st.subheader("Daily Log")
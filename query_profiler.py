@@ -0,0 +1,348 @@
+import re
+import sqlite3
+import sys
+import threading
+import time
+import weakref
+from collections import deque
+from datetime import datetime
+
+import pandas as pd
+
+# SQL profiler for database.py
+# While ENABLED, get_connection() hands out ProfiledConnection objects (through
+# sqlite3's factory= hook), which time every statement from execute() until
+# its cursor is drained or dropped, count rows fetched, count statements with
+# set_trace_callback (including executescript and triggers), and attribute
+# everything to the function that opened the connection.
+# Statements over SLOW_QUERY_MS are kept with their EXPLAIN QUERY PLAN and
+# written to slow_query_log once their connection closes.
+# Disabled (the default) costs get_connection() one attribute check.
+# Stats live in memory, per process (the Streamlit server is one process).
+
+ENABLED = False
+SLOW_QUERY_MS = 250.0
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)  # Histogram upper bounds (+ one overflow bucket)
+RECENT_SLOW = 200  # Slow queries kept in memory for the Performance tab
+
+_LOCK = threading.Lock()
+_FUNCTIONS = {}  # function -> stats
+_STATEMENTS = {}  # normalized sql -> stats
+_SLOW = deque(maxlen=RECENT_SLOW)
+_SINCE = datetime.now()
+
+
+def enable(slow_ms=None):
+    global ENABLED, SLOW_QUERY_MS
+    if slow_ms is not None:
+        SLOW_QUERY_MS = float(slow_ms)
+    ENABLED = True
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+
+def reset():
+    global _SINCE
+    with _LOCK:
+        _FUNCTIONS.clear()
+        _STATEMENTS.clear()
+        _SLOW.clear()
+        _SINCE = datetime.now()
+
+
+def normalize_sql(sql):
+    """One key per statement shape: whitespace collapsed, IN (?, ?, ...) lists folded."""
+    sql = " ".join(sql.split())
+    return re.sub(r"\?(?:\s*,\s*\?)+", "?, ...", sql)
+
+
+def _new_stats():
+    return {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0, 'statements': 0,
+            'buckets': [0] * (len(BUCKETS_MS) + 1), 'callers': set()}
+
+
+def bucket_index(ms):
+    for i, bound in enumerate(BUCKETS_MS):
+        if ms <= bound:
+            return i
+    return len(BUCKETS_MS)
+
+
+def _record(table, key, ms, rows, statements=0, caller=None):
+    with _LOCK:
+        stats = table.get(key)
+        if stats is None:
+            stats = table[key] = _new_stats()
+        stats['calls'] += 1
+        stats['total_ms'] += ms
+        stats['max_ms'] = max(stats['max_ms'], ms)
+        stats['rows'] += rows
+        stats['statements'] += statements
+        stats['buckets'][bucket_index(ms)] += 1
+        if caller:
+            stats['callers'].add(caller)
+
+
+def percentile(buckets, p):
+    """Upper bound (ms) of the histogram bucket holding the p-th percentile."""
+    total = sum(buckets)
+    if not total:
+        return 0.0
+    seen = 0
+    for i, count in enumerate(buckets):
+        seen += count
+        if seen >= total * p:
+            return float(BUCKETS_MS[i]) if i < len(BUCKETS_MS) else float("inf")
+    return float("inf")
+
+
+def _caller_name():
+    """The function that called get_connection() (module-qualified outside database.py)."""
+    frame = sys._getframe(2)
+    while frame is not None and frame.f_code.co_name == 'get_connection':
+        frame = frame.f_back
+    if frame is None:
+        return "?"
+    module = frame.f_globals.get('__name__', '')
+    name = frame.f_code.co_name
+    return name if module == 'database' else f"{module}.{name}"
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Times one statement at a time: execute() plus every fetch until the cursor is drained."""
+
+    def _start(self, sql, params):
+        self._finish()
+        self._sql, self._params, self._ms, self._rows = sql, params, 0.0, 0
+
+    def _finish(self):
+        sql = getattr(self, '_sql', None)
+        if sql is None:
+            return
+        self._sql = None
+        conn = self.connection
+        key = normalize_sql(sql)
+        _record(_STATEMENTS, key, self._ms, self._rows, caller=conn.function)
+        conn.rows += self._rows
+        if self._ms >= SLOW_QUERY_MS:
+            conn.slow.append({'logged_at': datetime.now(), 'function': conn.function, 'sql': key,
+                              'duration_ms': round(self._ms, 2), 'rows': self._rows,
+                              'raw_sql': sql, 'params': self._params})
+
+    def _timed(self, fn, *args):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self._ms += (time.perf_counter() - t0) * 1000
+
+    def execute(self, sql, parameters=()):
+        self._start(sql, parameters)
+        self._timed(super().execute, sql, parameters)
+        if self.description is None:  # No result rows (DML / DDL): done now
+            self._rows = max(self.rowcount, 0)
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._start(sql, None)
+        self._timed(super().executemany, sql, seq_of_parameters)
+        self._rows = max(self.rowcount, 0)
+        self._finish()
+        return self
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is None:
+            self._finish()
+        elif getattr(self, '_sql', None) is not None:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, self.arraysize if size is None else size)
+        if getattr(self, '_sql', None) is not None:
+            self._rows += len(rows)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        if getattr(self, '_sql', None) is not None:
+            self._rows += len(rows)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            row = self._timed(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+        if getattr(self, '_sql', None) is not None:
+            self._rows += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """Connection that records per-function totals when it is closed."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.function = _caller_name()
+        self.opened = time.perf_counter()
+        self.statements = 0
+        self.rows = 0
+        self.slow = []
+        self.closed = False
+        self._cursors = weakref.WeakSet()
+        self.set_trace_callback(self._traced)
+
+    def _traced(self, statement):
+        self.statements += 1
+
+    def cursor(self, factory=ProfiledCursor):
+        cur = super().cursor(factory)
+        if isinstance(cur, ProfiledCursor):
+            self._cursors.add(cur)
+        return cur
+
+    # sqlite3.Connection's shortcuts create plain cursors in C; route them through cursor()
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        if self.closed:
+            return super().close()
+        self.closed = True
+        for cur in list(self._cursors):
+            cur._finish()
+        self.set_trace_callback(None)
+        plans = [_explain(self, s) for s in self.slow]
+        super().close()
+        _record(_FUNCTIONS, self.function, (time.perf_counter() - self.opened) * 1000, self.rows, self.statements)
+        if self.slow:
+            for entry, plan in zip(self.slow, plans):
+                entry['plan'] = plan
+                del entry['raw_sql'], entry['params']
+            with _LOCK:
+                _SLOW.extend(self.slow)
+            _persist(self.slow)
+
+    def __del__(self):
+        try:
+            if not self.closed:
+                self.close()
+        except Exception:
+            pass
+
+
+def _explain(conn, entry):
+    """EXPLAIN QUERY PLAN of a slow SELECT, as indented text ('' for writes)."""
+    sql = entry['raw_sql']  # Not the normalized key: folding IN lists changes the parameter count
+    if not sql.lstrip().upper().startswith(("SELECT", "WITH")) or entry['params'] is None:
+        return ""
+    try:
+        rows = sqlite3.Connection.execute(conn, f"EXPLAIN QUERY PLAN {sql}", entry['params']).fetchall()
+    except sqlite3.Error as e:
+        return f"(no plan: {e})"
+    depth = {0: -1}
+    lines = []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node] + detail)
+    return "\n".join(lines)
+
+
+def _persist(entries):
+    """Best-effort write to slow_query_log (short timeout: never holds up the caller)."""
+    import database as db
+    try:
+        conn = sqlite3.connect(db.DB_NAME, timeout=0.5)
+        try:
+            conn.executemany('''
+                INSERT INTO slow_query_log (logged_at, function, sql, duration_ms, rows, plan)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', [(e['logged_at'], e['function'], e['sql'], e['duration_ms'], e['rows'], e['plan']) for e in entries])
+            conn.commit()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"Slow Query Log Error: {e}")
+
+
+def _frame(table, key_name):
+    columns = [key_name, 'calls', 'total_ms', 'avg_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms', 'rows', 'statements', 'callers']
+    with _LOCK:
+        items = [(key, dict(stats, buckets=list(stats['buckets']), callers=sorted(stats['callers'])))
+                 for key, stats in table.items()]
+    rows = [{
+        key_name: key,
+        'calls': s['calls'],
+        'total_ms': round(s['total_ms'], 2),
+        'avg_ms': round(s['total_ms'] / s['calls'], 2),
+        'p50_ms': percentile(s['buckets'], 0.50),
+        'p95_ms': percentile(s['buckets'], 0.95),
+        'p99_ms': percentile(s['buckets'], 0.99),
+        'max_ms': round(s['max_ms'], 2),
+        'rows': s['rows'],
+        'statements': s['statements'],
+        'callers': ", ".join(s['callers']),
+    } for key, s in items]
+    return pd.DataFrame(rows, columns=columns).sort_values('total_ms', ascending=False, ignore_index=True)
+
+
+def function_stats():
+    """Per database function: calls, latency (connection open -> close), rows, statements."""
+    return _frame(_FUNCTIONS, 'function').drop(columns=['callers'])
+
+
+def statement_stats():
+    """Per normalized SQL statement: calls, latency, rows fetched / changed, calling functions."""
+    return _frame(_STATEMENTS, 'sql').drop(columns=['statements'])
+
+
+def histogram(kind, key):
+    """{bucket label: calls} for one function ('function') or statement ('sql')."""
+    table = _FUNCTIONS if kind == 'function' else _STATEMENTS
+    with _LOCK:
+        buckets = list(table[key]['buckets']) if key in table else [0] * (len(BUCKETS_MS) + 1)
+    labels = [f"≤{b} ms" for b in BUCKETS_MS] + [f">{BUCKETS_MS[-1]} ms"]
+    return dict(zip(labels, buckets))
+
+
+def recent_slow_queries():
+    """Slow queries seen by this process since the last reset, newest first."""
+    with _LOCK:
+        return list(reversed(_SLOW))
+
+
+def summary():
+    with _LOCK:
+        return {
+            'enabled': ENABLED,
+            'since': _SINCE,
+            'slow_ms': SLOW_QUERY_MS,
+            'functions': len(_FUNCTIONS),
+            'statements': len(_STATEMENTS),
+            'calls': sum(s['calls'] for s in _STATEMENTS.values()),
+            'total_ms': sum(s['total_ms'] for s in _STATEMENTS.values()),
+            'slow': len(_SLOW),
+        }
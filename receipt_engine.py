@@ -0,0 +1,416 @@
+import functools
+from datetime import datetime
+
+# The "Printer" of VyaparMind
+# Receipts and KOTs are built once into a plain dict model (make_receipt /
+# make_kot) and rendered from it into:
+#   HTML    - compiled template: the static markup (styles, table head, tenant
+#             header with the inlined logo) is assembled once and cached; a
+#             render only formats the variable parts and joins the pieces
+#   text    - fixed-width lines for thermal printers
+#   ESC/POS - printer byte stream (alignment, bold, double size, cut)
+#   PDF     - dependency-free single-font PDF, one page per document
+# render_batch renders many documents (e.g. a day's receipts) in one pass.
+
+DEFAULT_STORE = {  # Tenants that have not filled in Settings (same fallback as db.get_setting)
+    'store_name': "VyaparMind Store",
+    'store_address': "",
+    'store_phone': "",
+}
+DEFAULT_FOOTER = "Thank you for dining with us!"
+
+LINE_WIDTH = 42       # Characters per line (80 mm roll, font A); 32 for 58 mm
+CURRENCY_TEXT = "Rs." # ₹ is not in printer code pages / the PDF base font
+
+_HEADER = """
+<div style="font-family: 'Courier New', monospace; padding: 20px; background: #fff; color: #000; border: 1px solid #ddd; max-width: 400px; margin: auto;">
+<!-- Header -->
+<div style="text-align: center; margin-bottom: 20px;">
+<div style="display: flex; justify-content: center; margin-bottom: 10px;">
+{logo_html}
+</div>
+<h2 style="margin: 0; font-weight: bold; font-size: 24px; text-transform: uppercase;">{store_name}</h2>
+{store_contact}
+</div>
+
+<hr style="border-top: 1px dashed #000; margin: 10px 0;">
+
+<!-- Metadata -->
+<div style="font-size: 14px; margin-bottom: 10px;">
+"""
+
+_META = "<strong>Receipt #:</strong> {receipt_id}<br>\n<strong>Date:</strong> {date_str}"
+_CUSTOMER = "<br><strong>Customer:</strong> {customer}"
+
+_TABLE_HEAD = """
+</div>
+
+<hr style="border-top: 1px dashed #000; margin: 10px 0;">
+
+<!-- Table -->
+<table style="width: 100%; font-size: 14px; border-collapse: collapse;">
+<thead>
+<tr style="border-bottom: 1px dashed #000;">
+<th style="text-align: left; padding: 5px 0;">Item</th>
+<th style="text-align: center; padding: 5px 0;">Qty</th>
+<th style="text-align: right; padding: 5px 0;">Rate</th>
+<th style="text-align: right; padding: 5px 0;">Amt</th>
+</tr>
+</thead>
+<tbody>
+"""
+
+_ROW = """
+<tr>
+<td style="text-align: left; padding: 5px 0;">{name}</td>
+<td style="text-align: center; padding: 5px 0;">{qty}</td>
+<td style="text-align: right; padding: 5px 0;">₹{rate:.2f}</td>
+<td style="text-align: right; padding: 5px 0;">₹{total:.2f}</td>
+</tr>
+"""
+
+_TOTALS = """
+</tbody>
+</table>
+
+<hr style="border-top: 1px dashed #000; margin: 10px 0;">
+
+<!-- Totals -->
+<div style="text-align: right; font-size: 14px; line-height: 1.6;">
+Subtotal: ₹{subtotal:.2f}<br>
+CGST (2.5%): ₹{half_tax:.2f}<br>
+SGST (2.5%): ₹{half_tax:.2f}<br>
+"""
+
+_LOYALTY = "<div style='color: green;'>Loyalty Disc: -₹{points:.2f}</div>"
+
+_FOOTER = """
+<div style="font-size: 20px; font-weight: bold; margin-top: 10px;">TOTAL: ₹{total:.2f}</div>
+</div>
+
+<hr style="border-top: 2px solid #000; margin: 10px 0;">
+<div style="text-align: center; font-size: 18px; font-weight: bold; margin-bottom: 20px;">
+NET PAYABLE: ₹{total:.2f}
+</div>
+
+<hr style="border-top: 1px dashed #000; margin: 10px 0;">
+
+<div style="text-align: center; font-size: 12px; margin-top: 20px;">
+{footer}
+</div>
+</div>
+"""
+
+
+@functools.lru_cache(maxsize=256)
+def compiled_header(logo_html, store_name, store_address, store_phone):
+    """Tenant header (logo + store block) formatted once per distinct store profile."""
+    contact = "<br>".join(_contact_lines(store_address, store_phone))
+    store_contact = f'<p style="margin: 5px 0; font-size: 12px;">{contact}</p>' if contact else ""
+    return _HEADER.format(logo_html=logo_html, store_name=store_name, store_contact=store_contact)
+
+
+def _contact_lines(store_address, store_phone):
+    """Address / phone lines under the store name (omitted when not set)."""
+    return [line for line in (store_address, f"Ph: {store_phone}" if store_phone else "") if line]
+
+
+def make_receipt(items, total_amount, subtotal, tax_amount, receipt_id, store=None, date_str=None,
+                 customer_info=None, points_redeemed=0, footer_msg=None):
+    """
+    Receipt model shared by every renderer.
+    items: dicts with 'name', 'qty', 'total' (rate is derived).
+    store: {'store_name', 'store_address', 'store_phone'} (missing keys use DEFAULT_STORE).
+    """
+    rows = []
+    for i in items:
+        qty = i.get('qty', 0)
+        total = i.get('total', 0.0)
+        rows.append({'name': i.get('name', 'Item'), 'qty': qty, 'rate': total / qty if qty > 0 else 0, 'total': total})
+    return {
+        'kind': 'receipt',
+        'receipt_id': receipt_id,
+        'date_str': date_str or datetime.now().strftime('%d-%b-%Y %H:%M:%S'),
+        'store': {k: (store or {}).get(k) or v for k, v in DEFAULT_STORE.items()},
+        'items': rows,
+        'subtotal': subtotal,
+        'tax': tax_amount,
+        'points_redeemed': points_redeemed or 0,
+        'total': total_amount,
+        'customer': customer_info,
+        'footer': footer_msg or DEFAULT_FOOTER,
+    }
+
+
+def make_kot(items, table_label, server_name="Staff", instructions="", order_id=None, time_str=None):
+    """KOT model. items: dicts with 'name', 'qty' and optional 'section' (default 'Kitchen')."""
+    sections = {}
+    for i in items:
+        sections.setdefault(i.get('section', 'Kitchen'), []).append((i.get('name', 'Item'), i.get('qty', 0)))
+    return {
+        'kind': 'kot',
+        'order_id': f"{order_id}" if order_id else "----",
+        'table': table_label,
+        'time_str': time_str or datetime.now().strftime("%I:%M %p"),
+        'server': server_name,
+        'sections': list(sections.items()),
+        'notes': instructions or "-",
+    }
+
+
+# --- HTML ---
+
+def item_rows(items):
+    """Receipt model items -> table rows."""
+    return "".join(_ROW.format(**i) for i in items)
+
+
+def receipt_html(receipt, logo_html=""):
+    store = receipt['store']
+    parts = [
+        compiled_header(logo_html, store['store_name'], store['store_address'], store['store_phone']),
+        _META.format(receipt_id=receipt['receipt_id'], date_str=receipt['date_str']),
+    ]
+    if receipt['customer']:
+        parts.append(_CUSTOMER.format(customer=receipt['customer']))
+    parts += [_TABLE_HEAD, item_rows(receipt['items']), _TOTALS.format(subtotal=receipt['subtotal'], half_tax=receipt['tax'] / 2)]
+    if receipt['points_redeemed'] > 0:
+        parts.append(_LOYALTY.format(points=receipt['points_redeemed']))
+    parts.append(_FOOTER.format(total=receipt['total'], footer=receipt['footer']))
+    return "".join(parts)
+
+
+def render_receipt_html(items, total_amount, subtotal, tax_amount, receipt_id, store=None, logo_html="",
+                        date_str=None, customer_info=None, points_redeemed=0, footer_msg=None):
+    """
+    Receipt HTML straight from the dialog arguments.
+    logo_html: pre-rendered <img> tag (asset_cache.logo_html).
+    """
+    return receipt_html(make_receipt(items, total_amount, subtotal, tax_amount, receipt_id, store, date_str,
+                                     customer_info, points_redeemed, footer_msg), logo_html)
+
+
+_KOT_WIDTH_PX = 320
+_KOT_RULE = "=========================="
+_KOT_DASH = "--------------------------"
+_KOT_PAIR = """<div style="display: flex; justify-content: space-between;">
+    <span>{label}</span>
+    <span>{value}</span>
+</div>
+"""
+_KOT_SECTION = """<div style="text-align: center; background: #eee; margin: 5px 0; padding: 2px;">-- {section} --</div>
+"""
+_KOT_ITEM = """<div style="display: flex; justify-content: space-between; align-items: flex-start;">
+    <span style="flex: 1; padding-right: 10px; word-wrap: break-word;">{name}</span>
+    <span style="white-space: nowrap;">{qty}</span>
+</div>
+"""
+
+
+def kot_html(kot):
+    parts = [
+        f"""<div style="font-family: 'Courier New', Courier, monospace; width: {_KOT_WIDTH_PX}px; margin: auto; background: #fff; color: #000; padding: 10px; font-weight: bold;">
+<div style="text-align: center;">{_KOT_RULE}</div>
+<div style="text-align: center; font-size: 20px; margin: 5px 0;">K O T</div>
+<div style="text-align: center;">{_KOT_DASH}</div>
+""",
+        _KOT_PAIR.format(label="Order No :", value=kot['order_id']),
+        _KOT_PAIR.format(label="Table No :", value=kot['table']),
+        _KOT_PAIR.format(label="KOT Time :", value=kot['time_str']),
+        _KOT_PAIR.format(label="Server   :", value=kot['server']),
+        f"""<div style="text-align: center;">{_KOT_DASH}</div>
+<div style="display: flex; justify-content: space-between; margin-bottom: 5px;">
+    <span>ITEM</span>
+    <span>QTY</span>
+</div>
+<div style="text-align: center;">{_KOT_DASH}</div>
+""",
+    ]
+    for section, rows in kot['sections']:
+        parts.append(_KOT_SECTION.format(section=section.upper()))
+        parts += [_KOT_ITEM.format(name=name, qty=qty) for name, qty in rows]
+    parts.append(f"""<div style="text-align: center;">{_KOT_DASH}</div>
+<div>Notes: {kot['notes']}</div>
+<div style="text-align: center;">{_KOT_RULE}</div>
+</div>
+""")
+    return "".join(parts)
+
+
+# --- TEXT LINES ---
+# Both printer formats start from (align, style, text) lines.
+# align: 'L' / 'C' / 'R'; style: '' / 'B' (bold) / 'D' (double size, bold).
+
+def _money(x):
+    return f"{CURRENCY_TEXT}{x:.2f}"
+
+
+def _pair(left, right, width):
+    room = width - len(right) - 1
+    return f"{left[:room]:<{room}} {right}"
+
+
+def receipt_lines(receipt, width=LINE_WIDTH):
+    store = receipt['store']
+    dash, rule = "-" * width, "=" * width
+    name = store['store_name'].upper()
+    lines = [('C', 'D' if len(name) <= width // 2 else 'B', name[:width])]
+    lines += [('C', '', line) for line in _contact_lines(store['store_address'], store['store_phone'])]
+    lines += [('L', '', dash), ('L', '', f"Receipt #: {receipt['receipt_id']}"), ('L', '', f"Date: {receipt['date_str']}")]
+    if receipt['customer']:
+        lines.append(('L', '', f"Customer: {receipt['customer']}"))
+    qty_w, amt_w = 5, 11
+    name_w = width - qty_w - amt_w
+    lines += [('L', '', dash), ('L', 'B', f"{'Item':<{name_w}}{'Qty':>{qty_w}}{'Amt':>{amt_w}}"), ('L', '', dash)]
+    for i in receipt['items']:
+        lines.append(('L', '', f"{str(i['name'])[:name_w - 1]:<{name_w}}{i['qty']:>{qty_w}}{_money(i['total']):>{amt_w}}"))
+        if i['qty'] > 1:
+            lines.append(('L', '', f"  @ {_money(i['rate'])}"))
+    lines += [('L', '', dash),
+              ('R', '', _pair("Subtotal:", _money(receipt['subtotal']), width)),
+              ('R', '', _pair("CGST (2.5%):", _money(receipt['tax'] / 2), width)),
+              ('R', '', _pair("SGST (2.5%):", _money(receipt['tax'] / 2), width))]
+    if receipt['points_redeemed'] > 0:
+        lines.append(('R', '', _pair("Loyalty Disc:", "-" + _money(receipt['points_redeemed']), width)))
+    lines += [('L', '', rule), ('R', 'D', f"TOTAL {_money(receipt['total'])}"), ('L', '', rule),
+              ('C', '', receipt['footer'])]
+    return lines
+
+
+def kot_lines(kot, width=LINE_WIDTH):
+    dash, rule = "-" * width, "=" * width
+    lines = [('C', '', rule), ('C', 'D', "K O T"), ('C', '', dash),
+             ('L', 'B', _pair("Order No :", str(kot['order_id']), width)),
+             ('L', 'B', _pair("Table No :", str(kot['table']), width)),
+             ('L', '', _pair("KOT Time :", kot['time_str'], width)),
+             ('L', '', _pair("Server   :", str(kot['server']), width)),
+             ('L', '', dash), ('L', 'B', _pair("ITEM", "QTY", width)), ('L', '', dash)]
+    for section, rows in kot['sections']:
+        lines.append(('C', 'B', f"-- {section.upper()} --"))
+        lines += [('L', 'B', _pair(str(name), str(qty), width)) for name, qty in rows]
+    lines += [('L', '', dash), ('L', '', f"Notes: {kot['notes']}"), ('C', '', rule)]
+    return lines
+
+
+def document_lines(doc, width=LINE_WIDTH):
+    return receipt_lines(doc, width) if doc['kind'] == 'receipt' else kot_lines(doc, width)
+
+
+def render_text(doc, width=LINE_WIDTH):
+    """Plain fixed-width text (double-size lines are printed normal size)."""
+    out = []
+    for align, _, text in document_lines(doc, width):
+        text = text.replace("₹", CURRENCY_TEXT)
+        out.append(text.center(width).rstrip() if align == 'C' else text.rjust(width) if align == 'R' else text)
+    return "\n".join(out) + "\n"
+
+
+# --- ESC/POS ---
+
+ESC_INIT = b"\x1b@"
+ESC_ALIGN = {'L': b"\x1ba\x00", 'C': b"\x1ba\x01", 'R': b"\x1ba\x02"}
+ESC_BOLD_ON, ESC_BOLD_OFF = b"\x1bE\x01", b"\x1bE\x00"
+GS_DOUBLE_ON, GS_DOUBLE_OFF = b"\x1d!\x11", b"\x1d!\x00"
+FEED_AND_CUT = b"\x1bd\x04\x1dVB\x00"  # Feed 4 lines, partial cut
+CODE_PAGE = "cp437"
+
+
+def render_escpos(doc, width=LINE_WIDTH, cut=True):
+    """ESC/POS byte stream for one receipt / KOT."""
+    out = [ESC_INIT]
+    for align, style, text in document_lines(doc, width):
+        out.append(ESC_ALIGN[align])
+        if style:
+            out.append(ESC_BOLD_ON)
+        if style == 'D':
+            out.append(GS_DOUBLE_ON)
+        out.append(text.replace("₹", CURRENCY_TEXT).encode(CODE_PAGE, errors="replace") + b"\n")
+        if style == 'D':
+            out.append(GS_DOUBLE_OFF)
+        if style:
+            out.append(ESC_BOLD_OFF)
+    if cut:
+        out.append(FEED_AND_CUT)
+    return b"".join(out)
+
+
+# --- PDF ---
+# Minimal PDF 1.4 writer: Courier (a standard font, nothing embedded), one
+# page per document, page height fitted to the roll length.
+
+PDF_FONT_SIZE = 9
+PDF_MARGIN = 12
+
+
+def _pdf_escape(text):
+    text = text.replace("₹", CURRENCY_TEXT).encode("latin-1", errors="replace").decode("latin-1")
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def pdf_document(pages, width=LINE_WIDTH, font_size=PDF_FONT_SIZE):
+    """pages: list of line lists (document_lines output) -> PDF bytes."""
+    leading = font_size * 1.25
+    char_w = font_size * 0.6  # Courier advance width
+    page_w = width * char_w + 2 * PDF_MARGIN
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>",
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier-Bold /Encoding /WinAnsiEncoding >>"]
+    kids = []
+    for lines in pages:
+        page_h = len(lines) * leading + 2 * PDF_MARGIN
+        y = page_h - PDF_MARGIN - font_size
+        ops = ["BT"]
+        for align, style, text in lines:
+            size = font_size * 2 if style == 'D' else font_size
+            cols = width // 2 if style == 'D' else width
+            text = text[:cols]
+            pad = (cols - len(text)) // 2 if align == 'C' else cols - len(text) if align == 'R' else 0
+            ops.append(f"/{'F2' if style else 'F1'} {size:g} Tf 1 0 0 1 {PDF_MARGIN + pad * size * 0.6:.2f} {y:.2f} Tm ({_pdf_escape(text)}) Tj")
+            y -= leading
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_no = len(objects)
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_w:.2f} {page_h:.2f}] "
+                       f"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents {content_no} 0 R >>".encode())
+        kids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{k} 0 R' for k in kids)}] /Count {len(kids)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for no, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % no + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def render_pdf(doc, width=LINE_WIDTH):
+    return pdf_document([document_lines(doc, width)], width)
+
+
+# --- BATCH ---
+
+FORMATS = ("html", "text", "escpos", "pdf")
+
+
+def render_batch(docs, fmt="pdf", width=LINE_WIDTH, logo_html=""):
+    """
+    Renders many receipts / KOTs in one pass into a single artifact:
+    html -> one page (page break between documents), text -> form-feed separated,
+    escpos -> one byte stream (cut after each), pdf -> one page per document.
+    """
+    if fmt == "pdf":
+        return pdf_document([document_lines(d, width) for d in docs], width)
+    if fmt == "escpos":
+        return b"".join(render_escpos(d, width) for d in docs)
+    if fmt == "text":
+        return "\f".join(render_text(d, width) for d in docs)
+    if fmt == "html":
+        pages = [receipt_html(d, logo_html) if d['kind'] == 'receipt' else kot_html(d) for d in docs]
+        return ("<html><head><meta charset='utf-8'><title>Receipts</title></head><body>"
+                + "<div style='page-break-after: always; margin-bottom: 20px;'></div>".join(pages) + "</body></html>")
+    raise ValueError(f"Unknown format: {fmt}")
@@ -0,0 +1,156 @@
+import argparse
+import socket
+import socketserver
+import threading
+import time
+
+import receipt_engine
+
+# Printer transports for receipt_engine output, plus a stand-in printer.
+# Thermal printers on the LAN listen on raw TCP port 9100 (JetDirect); the
+# stand-in is a local server on the same protocol that just counts bytes and
+# cut commands, so print throughput can be measured without hardware.
+# Usage:
+#   python receipt_printer.py audit --account ID --date 2026-10-19 --format pdf --out audit.pdf
+#   python receipt_printer.py bench [--receipts 1000] [--port 9100]
+
+RAW_PORT = 9100
+
+
+class FilePrinter:
+    """Appends print jobs to a file (e.g. /dev/usb/lp0 or a capture .bin)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.jobs = 0
+
+    def send(self, data):
+        with open(self.path, "ab") as f:
+            f.write(data)
+        self.jobs += 1
+
+    def close(self):
+        pass
+
+
+class SocketPrinter:
+    """Raw TCP (port 9100) network printer. One connection is kept open for many jobs."""
+
+    def __init__(self, host, port=RAW_PORT, timeout=5.0):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.jobs = 0
+
+    def send(self, data):
+        self.sock.sendall(data)
+        self.jobs += 1
+
+    def close(self):
+        self.sock.close()
+
+
+class _StandInHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        tail = b""  # Last byte of the previous chunk: a cut command may straddle two reads
+        while True:
+            chunk = self.request.recv(65536)
+            if not chunk:
+                break
+            with self.server.lock:
+                self.server.bytes_received += len(chunk)
+                self.server.cuts += (tail + chunk).count(b"\x1dV")
+            tail = chunk[-1:]
+
+
+class StandInPrinter(socketserver.ThreadingTCPServer):
+    """
+    Local stand-in for a network thermal printer.
+    Counts bytes and paper cuts (one per receipt) instead of printing.
+    """
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0):
+        super().__init__((host, port), _StandInHandler)
+        self.lock = threading.Lock()
+        self.bytes_received = 0
+        self.cuts = 0
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def address(self):
+        return self.server_address
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def print_documents(printer, docs, width=receipt_engine.LINE_WIDTH):
+    """Renders receipts / KOTs to ESC/POS and sends one job per document. Returns bytes sent."""
+    sent = 0
+    for doc in docs:
+        data = receipt_engine.render_escpos(doc, width)
+        printer.send(data)
+        sent += len(data)
+    return sent
+
+
+def run_audit(date_str, fmt, out, account_id=None):
+    """Re-renders one day's receipts into a single audit file."""
+    import database as db
+    t0 = time.perf_counter()
+    docs = db.get_receipts_for_day(date_str, override_account_id=account_id)
+    data = receipt_engine.render_batch(docs, fmt)
+    mode = "w" if isinstance(data, str) else "wb"
+    with open(out, mode, **({"encoding": "utf-8"} if mode == "w" else {})) as f:
+        f.write(data)
+    print(f"🧾 {len(docs)} receipts for {date_str} -> {out} ({fmt}, {len(data):,} bytes) in {time.perf_counter() - t0:.2f}s")
+
+
+def run_bench(receipts=1_000, port=0):
+    """Prints synthetic receipts to a local stand-in printer and reports throughput."""
+    items = [{'name': f"Item {k}", 'qty': k % 3 + 1, 'total': 40.0 * (k + 1)} for k in range(8)]
+    docs = [receipt_engine.make_receipt(items, 1512.0, 1440.0, 72.0, f"R{r:05d}") for r in range(receipts)]
+    stand_in = StandInPrinter(port=port).start()
+    t0 = time.perf_counter()
+    printer = SocketPrinter(*stand_in.address)
+    sent = print_documents(printer, docs)
+    printer.close()
+    while stand_in.bytes_received < sent and time.perf_counter() - t0 < 10:
+        time.sleep(0.01)
+    seconds = time.perf_counter() - t0
+    stand_in.stop()
+    print(f"Receipts         : {receipts:,} ({sent / receipts:.0f} bytes each)")
+    print(f"Stand-in printer : {stand_in.bytes_received:,} bytes, {stand_in.cuts:,} cuts")
+    print(f"Throughput       : {receipts / seconds:,.0f} receipts/s ({seconds * 1000 / receipts:.2f} ms each, render + send)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VyaparMind receipt printing")
+    parser.add_argument("--db", default=None, help="SQLite database file")
+    sub = parser.add_subparsers(dest="command", required=True)
+    audit = sub.add_parser("audit", help="Re-render a day's receipts into one file")
+    audit.add_argument("--date", required=True, help="YYYY-MM-DD")
+    audit.add_argument("--format", choices=receipt_engine.FORMATS, default="pdf")
+    audit.add_argument("--out", required=True)
+    audit.add_argument("--account", required=True, help="Account ID")
+    bench = sub.add_parser("bench", help="Throughput against a local stand-in printer")
+    bench.add_argument("--receipts", type=int, default=1_000)
+    bench.add_argument("--port", type=int, default=0, help="Stand-in port (0 = any free port)")
+    args = parser.parse_args()
+
+    if args.command == "audit":
+        import database as db
+        if args.db:
+            db.DB_NAME = args.db
+        run_audit(args.date, args.format, args.out, args.account)
+    else:
+        run_bench(args.receipts, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+from statistics import NormalDist
+
+import numpy as np
+
+# The "Brain" of VendorTrust Replenishment
+# Reorder points and economic order quantities for every SKU of a tenant at
+# once. Inputs are per-SKU arrays (one element per product) - no Python loops.
+
+SERVICE_LEVEL = 0.95     # Probability of not stocking out during a lead time
+ORDER_COST = 500.0       # Fixed cost of placing one PO (₹)
+HOLDING_RATE = 0.25      # Annual holding cost as a share of unit cost
+DEFAULT_LEAD_DAYS = 7.0  # Suppliers without received POs yet
+MAX_EOQ_DAYS = 90        # EOQ never exceeds this many days of demand
+DAYS_PER_YEAR = 365
+
+
+def sales_velocity(daily_qty):
+    """Mean and std of daily demand per SKU from a (n_skus x n_days) matrix (zero-sale days included)."""
+    daily_qty = np.asarray(daily_qty, dtype=float)
+    if daily_qty.shape[1] == 0:
+        zeros = np.zeros(daily_qty.shape[0])
+        return zeros, zeros
+    return daily_qty.mean(axis=1), daily_qty.std(axis=1)
+
+
+def reorder_points(daily_mean, daily_std, lead_mean, lead_std, service_level=SERVICE_LEVEL):
+    """
+    ROP = expected lead-time demand + safety stock, where safety stock covers
+    both demand and lead-time variability:
+        z * sqrt(L * sd_d^2 + d^2 * sd_L^2)
+    Returns (reorder_point, safety_stock).
+    """
+    z = NormalDist().inv_cdf(service_level)
+    d, sd_d = np.asarray(daily_mean, dtype=float), np.asarray(daily_std, dtype=float)
+    L, sd_L = np.asarray(lead_mean, dtype=float), np.asarray(lead_std, dtype=float)
+    safety = z * np.sqrt(L * sd_d ** 2 + d ** 2 * sd_L ** 2)
+    return d * L + safety, safety
+
+
+def economic_order_qty(daily_mean, unit_cost, order_cost=ORDER_COST, holding_rate=HOLDING_RATE, max_days=MAX_EOQ_DAYS):
+    """
+    Classic EOQ = sqrt(2 * annual demand * order cost / annual holding cost per unit),
+    capped at `max_days` of demand. SKUs without a unit cost get 0 (order just
+    enough to clear the reorder point) instead of an unbounded EOQ.
+    """
+    daily = np.asarray(daily_mean, dtype=float)
+    cost = np.asarray(unit_cost, dtype=float)
+    known = cost > 0
+    holding = np.where(known, cost, 1.0) * holding_rate
+    eoq = np.sqrt(2 * daily * DAYS_PER_YEAR * order_cost / holding)
+    return np.where(known, np.minimum(eoq, daily * max_days), 0.0)
+
+
+def plan_orders(stock, on_order, reorder_point, eoq):
+    """
+    Order quantity per SKU (0 = no order). A SKU is ordered when its
+    position (stock + open PO quantity) is at or below its reorder point;
+    it gets at least its EOQ and always enough to lift it back above the ROP.
+    """
+    position = np.asarray(stock, dtype=float) + np.asarray(on_order, dtype=float)
+    rop = np.asarray(reorder_point, dtype=float)
+    needed = (position <= rop) & (rop > 0)
+    qty = np.maximum(np.ceil(eoq), np.ceil(rop - position) + 1)
+    return np.where(needed, qty, 0).astype(int)
@@ -0,0 +1,106 @@
+import numpy as np
+
+# The "Brain" of ShiftSmart
+# Cost-minimal weekly rostering: greedy fill of the neediest slots with the
+# cheapest eligible staff, then a swap pass that hands shifts from expensive
+# staff to cheaper staff with spare capacity. All eligibility checks are
+# NumPy masks over the whole staff list.
+
+# Shift slots and their paid hours
+DEFAULT_SLOTS = {
+    "Morning (9AM-2PM)": 5,
+    "Evening (2PM-9PM)": 7,
+}
+MAX_SHIFTS_PER_WEEK = 5
+MAX_SLOTS_PER_DAY = 1
+
+
+def slot_demand(daily_units, slot_hours, units_per_staff, min_staff=1):
+    """
+    Splits forecast units per day across slots (by paid hours) and converts
+    them to headcount. Returns int array (n_days, n_slots).
+    """
+    daily_units = np.asarray(daily_units, dtype=float)
+    hours = np.asarray(slot_hours, dtype=float)
+    share = hours / hours.sum()
+    need = np.ceil(daily_units[:, None] * share[None, :] / units_per_staff)
+    return np.maximum(need, min_staff).astype(int)
+
+
+def solve_roster(demand, rates, slot_hours, roles=None, role_minimums=None, existing=None,
+                 max_shifts_per_week=MAX_SHIFTS_PER_WEEK, max_slots_per_day=MAX_SLOTS_PER_DAY):
+    """
+    Args:
+        demand: (n_days, n_slots) headcount needed
+        rates: (n_staff,) hourly rates
+        slot_hours: (n_slots,) paid hours per slot
+        roles: (n_staff,) role names (needed for role_minimums)
+        role_minimums: {role: min headcount in every staffed slot}, e.g. {'Store Manager': 1}
+        existing: (n_staff, n_days, n_slots) bool, shifts already on the roster
+
+    Returns dict: assign (n_staff, n_days, n_slots) bool incl. existing,
+    new (same shape, only added shifts), cost, unmet (n_days, n_slots).
+    """
+    demand = np.asarray(demand, dtype=int)
+    rates = np.asarray(rates, dtype=float)
+    hours = np.asarray(slot_hours, dtype=float)
+    n_days, n_slots = demand.shape
+    n_staff = len(rates)
+    roles = np.asarray(roles if roles is not None else [""] * n_staff)
+    role_minimums = role_minimums or {}
+
+    A = np.zeros((n_staff, n_days, n_slots), dtype=bool) if existing is None else np.asarray(existing, dtype=bool).copy()
+    locked = A.copy()
+    shifts_used = A.sum(axis=(1, 2))
+    day_used = A.sum(axis=2)
+
+    def eligible(d, s):
+        return (~A[:, d, s]) & (shifts_used < max_shifts_per_week) & (day_used[:, d] < max_slots_per_day)
+
+    def take(d, s, mask, k):
+        idx = np.flatnonzero(mask)
+        if k <= 0 or idx.size == 0:
+            return 0
+        k = min(k, idx.size)
+        cheapest = idx[np.argsort(rates[idx], kind='stable')[:k]]
+        A[cheapest, d, s] = True
+        shifts_used[cheapest] += 1
+        day_used[cheapest, d] += 1
+        return k
+
+    # 1. Greedy: neediest slots first (they have the fewest good options left)
+    order = np.argsort(-(demand - A.sum(axis=0)), axis=None, kind='stable')
+    for flat in order:
+        d, s = divmod(int(flat), n_slots)
+        if demand[d, s] <= 0:
+            continue
+        for role, k in role_minimums.items():
+            have = A[roles == role, d, s].sum()
+            take(d, s, eligible(d, s) & (roles == role), k - have)
+        take(d, s, eligible(d, s), demand[d, s] - A[:, d, s].sum())
+
+    # 2. Swap pass: move each new shift to the cheapest free, cheaper person
+    improved = True
+    while improved:
+        improved = False
+        staff_i, day_i, slot_i = np.nonzero(A & ~locked)
+        for i in np.argsort(-rates[staff_i], kind='stable'):
+            p, d, s = staff_i[i], day_i[i], slot_i[i]
+            cand = eligible(d, s) & (rates < rates[p])
+            role = roles[p]
+            if role in role_minimums and A[roles == role, d, s].sum() <= role_minimums[role]:
+                cand &= roles == role
+            idx = np.flatnonzero(cand)
+            if idx.size == 0:
+                continue
+            q = idx[np.argmin(rates[idx])]
+            A[p, d, s], A[q, d, s] = False, True
+            shifts_used[p] -= 1
+            shifts_used[q] += 1
+            day_used[p, d] -= 1
+            day_used[q, d] += 1
+            improved = True
+
+    cost = float((A * (rates[:, None, None] * hours[None, None, :])).sum())
+    unmet = np.maximum(demand - A.sum(axis=0), 0)
+    return {'assign': A, 'new': A & ~locked, 'cost': cost, 'unmet': unmet}
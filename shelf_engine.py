@@ -1,4 +1,8 @@
+import functools
 import json
+import math
+
+import numpy as np
 
 # The "Brain" of ShelfSense
 # Contains molecular rules and psychological associations.
@@ -53,73 +57,202 @@ PRODUCT_SCIENCE_DB = {
     'Milk': ['breakfast_complement']
 }
 
+@functools.lru_cache(maxsize=65536)
+def infer_tags(product_name):
+    """Keyword inference from the demo tag map (frozenset). Memoized: each name is scanned once."""
+    name = product_name.lower()
+    return frozenset(t for key, val in PRODUCT_SCIENCE_DB.items() if key.lower() in name for t in val)
+
 def get_tags(product_name):
     # Fuzzy match or direct lookup. 
     # For prototype, we check if key is IN the product name
-    tags = []
-    for key, val in PRODUCT_SCIENCE_DB.items():
-        if key.lower() in product_name.lower():
-            tags.extend(val)
-    return list(set(tags))
+    return sorted(infer_tags(product_name))
+
+def parse_science_tags(value):
+    """products.science_tags as stored ("['a', 'b']", JSON or "a,b") -> list of tags."""
+    if not isinstance(value, str) or not value:
+        return []
+    try:
+        tags = json.loads(value.replace("'", '"'))
+        if isinstance(tags, list):
+            return [str(t) for t in tags]
+    except ValueError:
+        pass
+    return [t.strip(" []'\"") for t in value.split(",") if t.strip(" []'\"")]
+
+def has_science_tags(value):
+    """True when products.science_tags holds a stored tag list (even an empty one, "[]")."""
+    return isinstance(value, str) and value.strip() != ""
+
+def format_science_tags(tags):
+    """Tag list -> products.science_tags value (sorted JSON list; "[]" = explicitly untagged)."""
+    return json.dumps(sorted(set(tags or [])))
 
-def analyze_grid(grid):
+def index_lookup(tag_index):
+    """tag_lookup for resolve_masks: catalog tag index first (stored empty sets included), keyword inference for unknown names."""
+    return lambda name: tag_index[name] if name in tag_index else infer_tags(name)
+
+# --- ARRAY ENGINE ---
+# A planogram is a 2D int array of product indices (-1 = empty slot). Each
+# product is resolved ONCE to an integer bitmask of its rule-relevant tags;
+# adjacency is then scored for the whole store with shifted array views.
+# Every adjacent slot pair (edge) fires each rule at most once, in either
+# direction, so scores do not depend on scan order.
+
+EMPTY = -1
+
+def compile_rules(knowledge_base=KNOWLEDGE_BASE):
+    """
+    Flattens the knowledge base into (tag_bits, rules).
+    tag_bits: {tag: bit index} for every tag a rule mentions (sorted, so stable).
+    rules: list of (name, src_mask, dst_mask, score, msg).
+    """
+    tags = set()
+    for tag, rule in knowledge_base.items():
+        tags.add(tag)
+        tags.update(rule.get('conflicts_with', []))
+        tags.update(rule.get('boosts', []))
+    if len(tags) > 64:
+        raise ValueError(f"Rule set uses {len(tags)} tags; bitmasks support 64.")
+    tag_bits = {t: i for i, t in enumerate(sorted(tags))}
+
+    rules = []
+    for tag, rule in sorted(knowledge_base.items()):
+        targets = rule.get('conflicts_with', []) + rule.get('boosts', [])
+        dst = 0
+        for t in targets:
+            dst |= 1 << tag_bits[t]
+        rules.append((tag, 1 << tag_bits[tag], dst, rule['score'], rule['msg']))
+    return tag_bits, rules
+
+TAG_BITS, RULES = compile_rules()
+
+def tag_mask(tags, tag_bits=TAG_BITS):
+    """Bitmask of the rule-relevant tags in a tag list (others are ignored)."""
+    mask = 0
+    for t in tags or []:
+        if t in tag_bits:
+            mask |= 1 << tag_bits[t]
+    return mask
+
+def resolve_masks(product_names, tag_lookup=get_tags, tag_bits=TAG_BITS):
+    """One bitmask per product (uint64 array). tag_lookup runs once per distinct name."""
+    names = list(product_names)
+    resolved = {}
+    for name in names:
+        if name not in resolved:
+            resolved[name] = tag_mask(tag_lookup(name) if name else [], tag_bits)
+    return np.array([resolved[n] for n in names], dtype=np.uint64)
+
+def _edges(cells):
+    """(a, b) views of every horizontal and vertical neighbour pair."""
+    return ((cells[:, :-1], cells[:, 1:]), (cells[:-1, :], cells[1:, :]))
+
+def _rule_hits(a, b, src, dst):
+    """Bool array: rule fires on these edges (src on one side, a target on the other)."""
+    src, dst = np.uint64(src), np.uint64(dst)
+    return (((a & src) != 0) & ((b & dst) != 0)) | (((b & src) != 0) & ((a & dst) != 0))
+
+def cell_masks(planogram, masks):
+    """Per-slot masks for a planogram of product indices (empty slots -> 0)."""
+    planogram = np.asarray(planogram)
+    padded = np.append(np.asarray(masks, dtype=np.uint64), np.uint64(0))
+    return padded[np.where(planogram == EMPTY, len(padded) - 1, planogram)]
+
+# --- BASKET AFFINITY ---
+# Product pairs mined from real baskets (basket_engine / product_affinity
+# table) score on top of the knowledge-base rules: 10 points per doubling of
+# lift, so a pair bought together 4x more often than chance is worth +20.
+
+AFFINITY_RULE = 'basket_affinity'
+AFFINITY_MSG = "🛒 BASKET AFFINITY: Bought together {lift:.1f}x more often than chance."
+AFFINITY_MAX_POINTS = 30
+
+def affinity_points(lift):
+    """Boost for placing a mined pair side by side (0 for lift <= 1)."""
+    if not lift or lift <= 1:
+        return 0
+    return min(AFFINITY_MAX_POINTS, int(round(10 * math.log2(lift))))
+
+def affinity_matrix(product_names, affinity):
+    """(n, n) symmetric boost points between products from mined pairs {(a, b): lift}."""
+    index = {n: i for i, n in enumerate(product_names)}
+    bonus = np.zeros((len(index), len(index)))
+    for (a, b), lift in (affinity or {}).items():
+        if a in index and b in index and a != b:
+            bonus[index[a], index[b]] = bonus[index[b], index[a]] = affinity_points(lift)
+    return bonus
+
+def score_planogram(planogram, masks, rules=RULES, bonus=None):
+    """
+    Scores a planogram of product indices.
+    bonus: optional (n_products x n_products) extra points per neighbour pair
+    (mined basket affinities, see affinity_matrix).
+    Returns dict: raw (sum of rule scores over all edges), score (100 + raw,
+    clamped 0-100 like the demo score) and counts {rule name: edges hit}.
+    """
+    cells = cell_masks(planogram, masks)
+    counts = {}
+    raw = 0
+    for name, src, dst, points, _ in rules:
+        n = sum(int(_rule_hits(a, b, src, dst).sum()) for a, b in _edges(cells))
+        if n:
+            counts[name] = n
+            raw += points * n
+    if bonus is not None:
+        hits, points = 0, 0
+        for pa, pb in _edges(np.asarray(planogram)):
+            filled = (pa != EMPTY) & (pb != EMPTY)
+            edge_points = np.asarray(bonus)[pa[filled], pb[filled]]
+            hits += int((edge_points > 0).sum())
+            points += int(edge_points.sum())
+        if hits:
+            counts[AFFINITY_RULE] = hits
+            raw += points
+    return {'raw': raw, 'score': max(0, min(100, 100 + raw)), 'counts': counts}
+
+def explain_planogram(planogram, masks, labels, rules=RULES, limit=50, affinity=None):
+    """
+    Readable events (rule msg + the two products) for the first `limit` rule hits.
+    affinity: optional {(name_a, name_b): lift} of mined basket pairs.
+    """
+    cells = cell_masks(planogram, masks)
+    planogram = np.asarray(planogram)
+    logs = []
+    for name, src, dst, _, msg in rules:
+        for (a, b), (pa, pb) in zip(_edges(cells), _edges(planogram)):
+            for i in np.argwhere(_rule_hits(a, b, src, dst)):
+                i = tuple(i)
+                logs.append(f"{msg} ({labels[pa[i]]} ↔ {labels[pb[i]]})")
+                if len(logs) >= limit:
+                    return logs
+    for pa, pb in _edges(planogram) if affinity else ():
+        for i in np.argwhere((pa != EMPTY) & (pb != EMPTY)):
+            i = tuple(i)
+            x, y = labels[pa[i]], labels[pb[i]]
+            lift = affinity.get((x, y)) or affinity.get((y, x))
+            if lift and affinity_points(lift) > 0:
+                logs.append(f"{AFFINITY_MSG.format(lift=lift)} ({x} ↔ {y})")
+                if len(logs) >= limit:
+                    return logs
+    return logs
+
+def encode_grid(grid):
+    """Product-name grid (None/'' = empty) -> (planogram of indices, product names)."""
+    names = sorted({x for row in grid for x in row if x})
+    index = {n: i for i, n in enumerate(names)}
+    planogram = np.array([[index[x] if x else EMPTY for x in row] for row in grid], dtype=np.int32)
+    return planogram, names
+
+def analyze_grid(grid, affinity=None, tag_lookup=get_tags):
     """
     Analyzes a 2D grid (list of lists) of product names.
+    affinity: optional {(name_a, name_b): lift} mined from baskets (boost rules).
+    tag_lookup: name -> tags (e.g. index_lookup of the tenant's tag index).
     Returns: score (0-100), logs (list of strings with HTML formatting)
     """
-    rows = len(grid)
-    cols = len(grid[0])
-    
-    score = 100 # Start perfect
-    logs = []
-    
-    # Helper to get neighbors
-    def get_neighbors(r, c):
-        n = []
-        if r > 0: n.append(grid[r-1][c]) # Up
-        if r < rows - 1: n.append(grid[r+1][c]) # Down
-        if c > 0: n.append(grid[r][c-1]) # Left
-        if c < cols - 1: n.append(grid[r][c+1]) # Right
-        return [x for x in n if x] # Filter empty
-        
-    processed_pairs = set()
-
-    for r in range(rows):
-        for c in range(cols):
-            current_item = grid[r][c]
-            if not current_item: continue
-            
-            my_tags = get_tags(current_item)
-            neighbors = get_neighbors(r, c)
-            
-            for neighbor in neighbors:
-                # Avoid checking A-B and B-A twice
-                pair_key = tuple(sorted([current_item, neighbor]))
-                if pair_key in processed_pairs:
-                    continue
-                processed_pairs.add(pair_key)
-                
-                neighbor_tags = get_tags(neighbor)
-                
-                # Check Rules
-                for tag in my_tags:
-                    rules = KNOWLEDGE_BASE.get(tag)
-                    if not rules: continue
-                    
-                    # 1. Check Conflicts
-                    if 'conflicts_with' in rules:
-                        for bad_tag in rules['conflicts_with']:
-                            if bad_tag in neighbor_tags:
-                                score += rules['score'] # Negative
-                                logs.append(f"{rules['msg']} ({current_item} ↔ {neighbor})")
-                                
-                    # 2. Check Boosts
-                    if 'boosts' in rules:
-                        for good_tag in rules['boosts']:
-                            if good_tag in neighbor_tags:
-                                score += rules['score'] # Positive
-                                logs.append(f"{rules['msg']} ({current_item} ↔ {neighbor})")
-
-    # Clamp score
-    score = max(0, min(100, score))
-    return score, logs
+    planogram, names = encode_grid(grid)
+    masks = resolve_masks(names, tag_lookup=tag_lookup)
+    bonus = affinity_matrix(names, affinity) if affinity else None
+    result = score_planogram(planogram, masks, bonus=bonus)
+    return result['score'], explain_planogram(planogram, masks, names, affinity=affinity)
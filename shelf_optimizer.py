@@ -0,0 +1,138 @@
+import math
+import random
+import time
+
+import numpy as np
+
+import shelf_engine as se
+
+# The "Planner" of ShelfSense
+# Simulated annealing over slot swaps. Pair scores between every two products
+# are precomputed from the rule bitmasks, so a swap only re-scores the edges
+# touching the two swapped slots (at most 8) instead of the whole aisle.
+
+ITERATIONS = 200_000
+START_TEMP = 20.0
+END_TEMP = 0.05
+HISTORY_POINTS = 100  # Score samples reported per run
+
+
+def pair_scores(masks, rules=se.RULES, bonus=None):
+    """
+    (n+1, n+1) score of placing product k next to product l; index n = empty slot.
+    bonus: optional (n, n) basket-affinity points (shelf_engine.affinity_matrix).
+    """
+    masks = np.asarray(masks, dtype=np.uint64)
+    n = len(masks)
+    P = np.zeros((n + 1, n + 1))
+    a, b = masks[:, None], masks[None, :]
+    for _, src, dst, points, _ in rules:
+        P[:n, :n] += points * se._rule_hits(a, b, src, dst)
+    if bonus is not None:
+        P[:n, :n] += bonus
+    return P
+
+
+def neighbours(rows, cols):
+    """Adjacency list of a rows x cols aisle (flat slot index)."""
+    nbrs = []
+    for r in range(rows):
+        for c in range(cols):
+            nbrs.append([(r + dr) * cols + (c + dc) for dr, dc in ((-1, 0), (1, 0), (0, -1), (0, 1))
+                         if 0 <= r + dr < rows and 0 <= c + dc < cols])
+    return nbrs
+
+
+def initial_layout(facings, rows, cols, rng):
+    """Random layout: product k appears facings[k] times, the rest of the slots are empty (-1)."""
+    slots = rows * cols
+    items = [k for k, f in enumerate(facings) for _ in range(int(f))]
+    if len(items) > slots:
+        raise ValueError(f"{len(items)} facings do not fit in {slots} slots.")
+    items += [se.EMPTY] * (slots - len(items))
+    rng.shuffle(items)
+    return items
+
+
+def optimize_layout(masks, facings, rows, cols, iterations=ITERATIONS, seed=0,
+                    start_temp=START_TEMP, end_temp=END_TEMP, bonus=None):
+    """
+    Searches for a high-scoring arrangement of one aisle.
+
+    Args:
+        masks: (n_products,) tag bitmasks (shelf_engine.resolve_masks)
+        facings: (n_products,) slots each product occupies
+        rows, cols: aisle shape (shelves x slots per shelf)
+        bonus: optional (n_products, n_products) basket-affinity points
+
+    Returns dict: planogram (rows x cols product indices, -1 empty), score
+    (raw, same scale as shelf_engine.score_planogram), start_score,
+    history [(iteration, best score)], seconds.
+    """
+    t0 = time.perf_counter()
+    rng = random.Random(seed)
+    n = len(masks)
+    P = pair_scores(masks, bonus=bonus).tolist()
+    nbrs = neighbours(rows, cols)
+    layout = initial_layout(facings, rows, cols, rng)
+    slots = len(layout)
+
+    def edge_sum(i, prod):
+        row = P[n if prod == se.EMPTY else prod]
+        return sum(row[n if layout[j] == se.EMPTY else layout[j]] for j in nbrs[i])
+
+    score = sum(edge_sum(i, layout[i]) for i in range(slots)) / 2
+    start_score = best = score
+    best_layout = list(layout)
+    every = max(1, iterations // HISTORY_POINTS)
+    history = [(0, best)]
+    decay = (end_temp / start_temp) ** (1 / max(1, iterations))
+    temp = start_temp
+
+    for it in range(1, iterations + 1):
+        i, j = rng.randrange(slots), rng.randrange(slots)
+        pi, pj = layout[i], layout[j]
+        if pi != pj:
+            # Delta: edges around i and j before and after the swap (i-j edge unchanged)
+            before = edge_sum(i, pi) + edge_sum(j, pj)
+            layout[i], layout[j] = pj, pi
+            after = edge_sum(i, pj) + edge_sum(j, pi)
+            delta = after - before
+            if delta >= 0 or rng.random() < math.exp(delta / temp):
+                score += delta
+                if score > best:
+                    best = score
+                    best_layout = list(layout)
+            else:
+                layout[i], layout[j] = pi, pj
+        temp *= decay
+        if it % every == 0:
+            history.append((it, best))
+
+    return {
+        'planogram': np.array(best_layout, dtype=np.int32).reshape(rows, cols),
+        'score': best,
+        'start_score': start_score,
+        'history': history,
+        'seconds': time.perf_counter() - t0,
+    }
+
+
+def _aisle_worker(job):
+    masks, facings, rows, cols, iterations, seed, bonus = job
+    return optimize_layout(masks, facings, rows, cols, iterations, seed, bonus=bonus)
+
+
+def optimize_aisles(aisles, iterations=ITERATIONS, max_workers=None, seed=0):
+    """
+    Optimizes many aisles in a process pool.
+    aisles: list of dicts {masks, facings, rows, cols[, bonus]}. Returns results in the same order.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    jobs = [(a['masks'], a['facings'], a['rows'], a['cols'], iterations, seed + k, a.get('bonus'))
+            for k, a in enumerate(aisles)]
+    if len(jobs) == 1:
+        return [_aisle_worker(jobs[0])]
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(_aisle_worker, jobs))
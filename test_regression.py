@@ -220,3 +220,1241 @@ if __name__ == "__main__":
         print(f"\n❌ TEST FAILED: {e}")
         import traceback
         traceback.print_exc()
+
+def test_churn_rfm_scoring(tmp_path):
+    print("\n--- Testing ChurnGuard RFM Engine ---")
+    import churn_engine
+    import numpy as np
+
+    # Engine: quintiles, monotonic churn probability, segment coverage
+    r = churn_engine.quintile_scores([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], higher_is_better=False)
+    assert r[0] == 5 and r[-1] == 1, f"Recency quintiles inverted wrongly: {r}"
+    assert len(set(churn_engine.quintile_scores([1, 1, 1, 1, 1]))) == 1, "Ties must share a quintile"
+
+    probs = churn_engine.churn_probability([0, 10, 60], [20, 20, 20])
+    assert probs[0] == 0 and probs[1] < probs[2] < 1, f"Churn probability not monotonic: {probs}"
+
+    scores = churn_engine.score_customers([5, 200], [10, 1], [5000, 50], [300, 0])
+    assert scores['churn_prob'][1] > scores['churn_prob'][0], "Lapsed one-timer should be riskier than a regular"
+
+    # DB: full score then incremental refresh touches only new buyers
+    db.DB_NAME = str(tmp_path / "churn_test.db")
+    db.init_db()
+    aid = '1111222233334444'
+    conn = db.get_connection()
+    now = datetime.now()
+    for i in range(10):
+        cid = f"CUST{i:02d}"
+        conn.execute("INSERT INTO customers (id, account_id, name, phone) VALUES (?, ?, ?, ?)", (cid, aid, f"Cust {i}", f"90000000{i:02d}"))
+        for k in range(i + 1):
+            ts = now - timedelta(days=5 * i + 7 * k)
+            conn.execute("INSERT INTO transactions (id, account_id, customer_id, timestamp, total_amount, total_profit) VALUES (?, ?, ?, ?, ?, 0)",
+                         (f"T{i:02d}{k:02d}", aid, cid, ts, 100.0 * (k + 1)))
+    conn.commit()
+    conn.close()
+
+    succ, msg = db.refresh_customer_rfm(override_account_id=aid)
+    assert succ, msg
+    rfm = db.get_customer_rfm(override_account_id=aid)
+    assert len(rfm) == 10, f"Expected 10 scored customers, got {len(rfm)}"
+    assert rfm['churn_prob'].between(0, 1).all()
+
+    conn = db.get_connection()
+    conn.execute("INSERT INTO transactions (id, account_id, customer_id, timestamp, total_amount, total_profit) VALUES ('TNEW', ?, 'CUST09', ?, 999, 0)", (aid, datetime.now()))
+    conn.commit()
+    conn.close()
+
+    succ, msg = db.refresh_customer_rfm(override_account_id=aid)
+    assert succ and "1 refreshed" in msg, f"Incremental refresh should touch 1 customer: {msg}"
+    rfm = db.get_customer_rfm(override_account_id=aid).set_index('id')
+    assert rfm.loc['CUST09', 'frequency'] == 11
+
+    # Nothing sold since the watermark: no re-score
+    succ, msg = db.refresh_customer_rfm(override_account_id=aid)
+    assert succ and msg == "Scores up to date.", f"Idle refresh should return early: {msg}"
+    print("RFM Scoring Verified.")
+
+def test_geo_revenue_rollup(tmp_path):
+    print("\n--- Testing GeoViz Rollup ---")
+    db.DB_NAME = str(tmp_path / "geo_test.db")
+    db.init_db()
+    aid = '1111222233334444'
+    conn = db.get_connection()
+    conn.execute("INSERT INTO customers (id, account_id, name, phone, city, pincode) VALUES ('G1', ?, 'Geo One', '1', 'Hyderabad', '500001')", (aid,))
+    conn.execute("INSERT INTO customers (id, account_id, name, phone, city, pincode) VALUES ('G2', ?, 'Geo Two', '2', 'Warangal', '506001')", (aid,))
+    conn.commit()
+    conn.close()
+    db.add_product("GeoItem", "General", 100, 50, 100, override_account_id=aid)
+    pid = db.fetch_all_products(override_account_id=aid).iloc[0]['id']
+    items = [{'id': pid, 'name': 'GeoItem', 'qty': 1, 'price': 100, 'cost': 50}]
+
+    assert db.record_transaction(items, 100, 50, customer_id='G1', override_account_id=aid)
+    assert db.record_transaction(items, 300, 150, customer_id='G2', override_account_id=aid)
+
+    geo = db.get_geo_revenue(override_account_id=aid).set_index('city')
+    assert geo.loc['Hyderabad', 'revenue'] == 100 and geo.loc['Warangal', 'revenue'] == 300
+
+    # Address change moves only that customer's revenue
+    succ, msg = db.update_customer_address('G2', 'Hyderabad', '500002', override_account_id=aid)
+    assert succ, msg
+    pins = db.get_geo_revenue_by_pincode('Hyderabad', override_account_id=aid).set_index('pincode')
+    assert pins.loc['500002', 'revenue'] == 300 and len(db.get_geo_revenue(override_account_id=aid)) == 1
+
+    # A cleared address falls back to the 'Unknown' bucket, and moving out of it nets to zero
+    assert db.update_customer_address('G2', None, None, override_account_id=aid)[0]
+    geo = db.get_geo_revenue(override_account_id=aid).set_index('city')
+    assert geo.loc['Unknown', 'revenue'] == 300 and geo.loc['Hyderabad', 'revenue'] == 100
+    assert db.update_customer_address('G2', 'Hyderabad', '500002', override_account_id=aid)[0]
+    assert list(db.get_geo_revenue(override_account_id=aid)['city']) == ['Hyderabad']
+
+    # Bulk assignment rebuilds from source and agrees with incremental state
+    succ, msg = db.bulk_assign_customer_geo([('G1', 'Pune', '411001'), ('G2', 'Pune', '411002')], override_account_id=aid)
+    assert succ, msg
+    geo = db.get_geo_revenue(override_account_id=aid)
+    assert list(geo['city']) == ['Pune'] and geo.iloc[0]['revenue'] == 400
+    print("Geo Rollup Verified.")
+
+def test_context_demand_index(tmp_path):
+    print("\n--- Testing IsoBar Context Index ---")
+    db.DB_NAME = str(tmp_path / "context_test.db")
+    db.init_db()
+    aid = '1111222233334444'
+    conn = db.get_connection()
+    days = [(datetime.now() - timedelta(days=d)).strftime('%Y-%m-%d') for d in (1, 2, 3)]
+    for n, day in enumerate(days):
+        conn.execute("INSERT INTO transactions (id, account_id, timestamp, total_amount, total_profit) VALUES (?, ?, ?, 0, 0)", (f"CT{n}", aid, f"{day} 10:00:00"))
+        conn.execute("INSERT INTO transaction_items (id, transaction_id, product_name, quantity, price_at_sale) VALUES (?, ?, 'Tea', ?, 10)", (f"CI{n}", f"CT{n}", 10 * (n + 1)))
+    conn.commit()
+    conn.close()
+
+    db.set_daily_context(days[0], "Rainy", "None", override_account_id=aid)
+    db.set_daily_context(days[1], "Rainy", "Festival", override_account_id=aid)
+    succ, msg = db.refresh_context_demand_index(override_account_id=aid)
+    assert succ, msg
+
+    rainy = db.analyze_context_demand("Rainy", "None", override_account_id=aid)
+    assert rainy.iloc[0]['total_qty'] == 30, f"Rainy/Any should see 10 + 20 Tea, got {rainy}"
+    assert rainy.iloc[0]['avg_daily_qty'] == 15
+
+    # Tagging an already-closed day folds it in without a rebuild
+    db.set_daily_context(days[2], "Sunny", "None", override_account_id=aid)
+    sunny = db.analyze_context_demand("Sunny", None, override_account_id=aid)
+    assert sunny.iloc[0]['total_qty'] == 30
+
+    # Re-tagging moves the day's sales between contexts
+    db.set_daily_context(days[0], "Sunny", "None", override_account_id=aid)
+    assert db.analyze_context_demand("Rainy", None, override_account_id=aid).iloc[0]['total_qty'] == 20
+
+    # List filters bind as one parameter regardless of size
+    many = ["Sunny", "Rainy"] + [f"Tag{i}" for i in range(40000)]
+    both = db.analyze_context_demand(many, None, override_account_id=aid)
+    assert both.iloc[0]['total_qty'] == 60
+    assert db.predict_labor_demand("Sunny", None, override_account_id=aid) >= 2
+    print("Context Index Verified.")
+
+def test_demand_forecasting(tmp_path):
+    print("\n--- Testing IsoBar Forecasting ---")
+    import forecast_engine as fe
+    import numpy as np
+
+    # Engine: a clean weekly pattern is reproduced almost exactly
+    n_days = 56
+    dow = np.arange(n_days) % 7
+    Y = np.tile(np.array([10, 10, 10, 10, 10, 30, 30], dtype=float), (3, n_days // 7))
+    result = fe.forecast_skus(Y[:, :-14], dow[:-14], dow[-14:])
+    assert fe.mape(Y[:, -14:], result['forecast']) < 5, f"Weekly pattern not captured: {result['forecast'][0]}"
+
+    # DB: forecasts land in the table and drive staffing
+    db.DB_NAME = str(tmp_path / "forecast_test.db")
+    db.init_db()
+    aid = '1111222233334444'
+    conn = db.get_connection()
+    for d in range(1, 43):
+        day = (datetime.now() - timedelta(days=d)).strftime('%Y-%m-%d')
+        conn.execute("INSERT INTO transactions (id, account_id, timestamp, total_amount, total_profit) VALUES (?, ?, ?, 0, 0)", (f"FT{d}", aid, f"{day} 12:00:00"))
+        conn.execute("INSERT INTO transaction_items (id, transaction_id, product_name, quantity, price_at_sale) VALUES (?, ?, 'Milk', 500, 20)", (f"FI{d}", f"FT{d}"))
+    conn.commit()
+    conn.close()
+
+    succ, msg = db.refresh_demand_forecasts(override_account_id=aid)
+    assert succ, msg
+    fc = db.get_demand_forecast(override_account_id=aid)
+    assert len(fc) == fe.HORIZON and abs(fc['qty'].mean() - 500) < 1, f"Flat demand should forecast flat: {fc}"
+    assert db.refresh_demand_forecasts(override_account_id=aid)[1] == "Forecasts already fresh."
+
+    tomorrow = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
+    assert db.predict_labor_demand("Sunny", "None", date_str=tomorrow, override_account_id=aid) == 6
+    print("Forecasting Verified.")
+
+def test_roster_optimizer(tmp_path):
+    print("\n--- Testing ShiftSmart Optimizer ---")
+    import roster_engine as re_
+    import numpy as np
+
+    # Engine: cheapest staff fill demand, weekly cap respected, manager rule honoured
+    rates = np.array([300, 100, 120, 500], dtype=float)
+    roles = np.array(["Cashier", "Cashier", "Cashier", "Store Manager"])
+    demand = np.full((7, 2), 2)
+    res = re_.solve_roster(demand, rates, [5, 7], roles=roles, role_minimums={"Store Manager": 1}, max_shifts_per_week=5)
+    assert res['assign'].sum(axis=(1, 2)).max() <= 5
+    assert (res['assign'].sum(axis=2) <= 1).all(), "Nobody works two slots a day"
+    assert res['assign'][1].sum() == 5 and res['assign'][2].sum() == 5, "Cheapest staff should be used first"
+
+    # DB: plan -> publish in bulk, duplicates rejected, foreign staff refused
+    db.DB_NAME = str(tmp_path / "roster_test.db")
+    db.init_db()
+    aid = '1111222233334444'
+    for i, rate in enumerate([100, 150, 200]):
+        db.add_staff(f"S{i}", "Cashier", rate, override_account_id=aid)
+    start = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
+    plan_df, summary = db.plan_week_roster(start, override_account_id=aid)
+    assert len(plan_df) == summary['new_shifts'] > 0
+    rows = list(plan_df[['date', 'slot', 'staff_id']].itertuples(index=False, name=None))
+    assert db.bulk_assign_shifts(rows, override_account_id=aid)[0]
+    assert db.bulk_assign_shifts(rows, override_account_id=aid)[1].startswith("0 shifts assigned")
+    assert db.assign_shift(rows[0][0], rows[0][1], rows[0][2], override_account_id=aid) == (True, "Already assigned.")
+    assert not db.bulk_assign_shifts([(start, "Morning (9AM-2PM)", "NOT_MINE")], override_account_id=aid)[0]
+
+    replan, _ = db.plan_week_roster(start, override_account_id=aid)
+    assert replan.empty, "Published shifts count toward demand"
+
+    # Legacy duplicates are dropped once, when the unique index is first created
+    conn = db.get_connection()
+    conn.execute("DROP INDEX idx_shifts_unique")
+    conn.execute("INSERT INTO shifts (id, date, slot, staff_id) VALUES ('DUP', ?, ?, ?)", rows[0])
+    conn.commit()
+    conn.close()
+    db.init_db()
+    conn = db.get_connection()
+    assert conn.execute("SELECT COUNT(*) FROM shifts WHERE date = ? AND slot = ? AND staff_id = ?", rows[0]).fetchone()[0] == 1
+    assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_shifts_unique'").fetchone()
+    conn.close()
+    print("Roster Optimizer Verified.")
+
+def test_freshflow_markdowns(tmp_path):
+    print("\n--- Testing FreshFlow Markdowns ---")
+    import freshflow_engine as ff
+
+    today = datetime.now()
+    day = lambda n: (today + timedelta(days=n)).strftime('%Y-%m-%d')
+    batches = pd.DataFrame({
+        'id': ['b1', 'b2', 'b3', 'b4'],
+        'product_id': ['A', 'A', 'B', 'C'],
+        'expiry_date': [day(1), day(4), day(9), 'not-a-date'],
+        'quantity': [10, 5, 2, 1],
+        'cost_price': [60.0, 60.0, 95.0, 5.0],
+        'current_price': [100.0, 100.0, 100.0, 10.0],
+    })
+    priced = ff.price_markdowns(batches)
+    assert priced['days_left'].tolist()[:3] == [1, 4, 9]
+    assert priced['suggested_discount'].tolist() == [50, 30, 10, 0]
+    assert priced['value_at_risk'].tolist() == [600, 300, 190, 5]
+    assert ff.price_markdowns(batches, floor_at_cost=True)['new_price'].tolist()[:3] == [60, 70, 95]
+    assert ff.batch_markdowns(priced)['id'].tolist() == ['b1', 'b2', 'b3']
+
+    # DB: markdowns land on batches; POS charges the FEFO batch price, master price untouched
+    db.DB_NAME = str(tmp_path / "fresh_test.db")
+    db.init_db()
+    aid = '1111222233334444'
+    conn = db.get_connection()
+    conn.execute("INSERT INTO products (id, account_id, name, price, cost_price, stock_quantity) VALUES ('P1', ?, 'Milk', 100, 60, 12)", (aid,))
+    conn.execute("INSERT INTO product_batches (id, account_id, product_id, batch_code, expiry_date, quantity, cost_price) VALUES ('B1', ?, 'P1', 'L1', ?, 2, 60)", (aid, day(1)))
+    conn.execute("INSERT INTO product_batches (id, account_id, product_id, batch_code, expiry_date, quantity, cost_price) VALUES ('B2', ?, 'P1', 'L2', ?, 10, 60)", (aid, day(20)))
+    conn.commit()
+    conn.close()
+
+    db.run_expiry_sweep(override_account_id=aid)  # Bands raw-inserted batches, as the FreshFlow page does on load
+    md = db.get_freshflow_markdowns(10, override_account_id=aid)
+    assert len(md) == 1 and md.iloc[0]['new_price'] == 50
+    assert db.fetch_pos_inventory(override_account_id=aid).iloc[0]['price'] == 100
+    assert db.apply_markdowns(ff.batch_markdowns(md), override_account_id=aid) == (True, "Markdowns applied to 1 batches.")
+    assert not db.apply_markdowns([('B1', 1.0)], override_account_id='OTHER')[1].endswith("to 1 batches.")
+    pos = db.fetch_pos_inventory(override_account_id=aid).iloc[0]
+    assert pos['price'] == 50 and pos['list_price'] == 100 and pos['on_markdown']
+
+    # Selling out the marked-down batch moves FEFO to the full-price batch
+    db.record_transaction([{'id': 'P1', 'name': 'Milk', 'qty': 2, 'price': 50, 'cost': 60}], 100, -20, override_account_id=aid)
+    assert db.fetch_pos_inventory(override_account_id=aid).iloc[0]['price'] == 100
+    print("FreshFlow Verified.")
+
+def test_expiry_sweep(tmp_path, monkeypatch):
+    print("\n--- Testing FreshFlow Expiry Sweep ---")
+    db.DB_NAME = str(tmp_path / "sweep_test.db")
+    db.init_db()
+    aid = '1111222233334444'
+    day = lambda n: (datetime.now() + timedelta(days=n)).strftime('%Y-%m-%d')
+    conn = db.get_connection()
+    conn.execute("INSERT INTO products (id, account_id, name, price, cost_price, stock_quantity) VALUES ('P1', ?, 'Curd', 40, 25, 0)", (aid,))
+    conn.commit()
+    conn.close()
+    for code, offset, qty in [('OLD', -1, 4), ('HOT', 1, 3), ('MID', 7, 5), ('FAR', 60, 8)]:
+        assert db.add_batch('P1', code, day(offset), qty, 25.0, override_account_id=aid)[0]
+
+    conn = db.get_connection()
+    bands = dict(conn.execute("SELECT batch_code, expiry_bucket FROM product_batches").fetchall())
+    conn.close()
+    assert bands == {'OLD': -1, 'HOT': 2, 'MID': 10, 'FAR': None}, bands
+    assert not db.get_expiring_batches(10, override_account_id=aid).empty and db.get_notifications(override_account_id=aid).empty, "Reads do not sweep"
+
+    ok, msg = db.run_expiry_sweep(override_account_id=aid)
+    assert ok and "2 new alerts, 1 expired batches written off (4 units)" in msg, msg
+    assert db.run_expiry_sweep(override_account_id=aid)[1] == "Expiry sweep already ran today."
+    assert db.run_expiry_sweep(force=True, override_account_id=aid)[1].startswith("Swept: 0 new alerts"), "Alerts are not duplicated"
+
+    conn = db.get_connection()
+    stock = conn.execute("SELECT stock_quantity FROM products WHERE id = 'P1'").fetchone()[0]
+    conn.close()
+    assert stock == 16, f"Expired units leave stock: {stock}"
+    assert db.get_write_offs(override_account_id=aid)['cost_value'].sum() == 100
+    assert len(db.get_notifications(override_account_id=aid)) == 2
+
+    # Lookahead reads the bands, exact cut-off still honoured
+    assert db.get_expiring_batches(2, override_account_id=aid)['batch_code'].tolist() == ['HOT']
+    assert db.get_expiring_batches(6, override_account_id=aid)['batch_code'].tolist() == ['HOT']
+    assert db.get_expiring_batches(10, override_account_id=aid)['batch_code'].tolist() == ['HOT', 'MID']
+    assert db.get_expiring_batches(90, override_account_id=aid)['batch_code'].tolist() == ['HOT', 'MID', 'FAR']
+
+    # Beyond the bands the day cut uses the local date, like the bands do: pick a zone whose date differs from UTC
+    import time
+    monkeypatch.setenv('TZ', 'UTC-14' if datetime.utcnow().hour >= 12 else 'UTC+12')
+    time.tzset()
+    try:
+        for code, offset in [('EDGE', 90), ('PAST', 91)]:
+            assert db.add_batch('P1', code, day(offset), 1, 25.0, override_account_id=aid)[0]
+        assert db.get_expiring_batches(90, override_account_id=aid)['batch_code'].tolist()[-1] == 'EDGE'
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+    print("Expiry Sweep Verified.")
+
+def test_vendor_scorecards(tmp_path):
+    print("\n--- Testing VendorTrust Scorecards ---")
+    db.DB_NAME = str(tmp_path / "vendor_test.db")
+    db.init_db()
+    aid = '1111222233334444'
+    conn = db.get_connection()
+    conn.execute("INSERT INTO suppliers (id, account_id, name, phone) VALUES ('S1', ?, 'Reliable', '1'), ('S2', ?, 'Slow', '2'), ('S3', ?, 'Fresh', '3')", (aid, aid, aid))
+    # (supplier, order, expected, received, quality): S1 always on time, S2 late on 3 of 4
+    pos = [('S1', '2025-01-01', '2025-01-05', '2025-01-03', 5), ('S1', '2025-02-01', '2025-02-05', '2025-02-05', 4),
+           ('S2', '2025-01-01', '2025-01-03', '2025-01-02', 3), ('S2', '2025-02-01', '2025-02-03', '2025-02-05', 3),
+           ('S2', '2025-03-01', '2025-03-03', '2025-03-09', 2), ('S2', '2025-04-01', '2025-04-03', '2025-04-11', 3)]
+    conn.executemany("INSERT INTO purchase_orders (id, account_id, supplier_id, order_date, expected_date, received_date, status, quality_rating) VALUES (?, ?, ?, ?, ?, ?, 'RECEIVED', ?)",
+                     [(f"PO{i}", aid, *p) for i, p in enumerate(pos)])
+    conn.execute("INSERT INTO purchase_orders (id, account_id, supplier_id, order_date, expected_date, status) VALUES ('OPEN', ?, 'S1', '2025-05-01', '2025-05-02', 'PENDING')", (aid,))
+    conn.commit()
+    conn.close()
+
+    cards = db.get_vendor_scorecards(override_account_id=aid).set_index('id')
+    assert cards.loc['S1', ['po_count', 'on_time_rate', 'avg_quality', 'risk']].tolist() == [2, 100.0, 4.5, 'Low']
+    assert cards.loc['S2', ['on_time_rate', 'risk']].tolist() == [25.0, 'High']
+    assert cards.loc['S2', ['lead_p50_days', 'lead_p90_days']].tolist() == [4.0, 10.0], "Nearest-rank lead times of [1, 4, 8, 10]"
+    assert cards.loc['S3', ['po_count', 'risk']].tolist() == [0, 'Unknown (New)']
+    assert db.get_vendor_scorecard('S2', override_account_id=aid)['on_time_rate'] == 25.0
+    print("Vendor Scorecards Verified.")
+
+def test_reorder_and_receiving(tmp_path):
+    print("\n--- Testing Replenishment ---")
+    import reorder_engine as ro
+
+    # Engine: 10/day with no variability over a 5-day lead time -> ROP 50, no safety stock
+    rop, safety = ro.reorder_points([10.0], [0.0], [5.0], [0.0])
+    assert rop[0] == 50 and safety[0] == 0
+    assert ro.plan_orders([60, 40], [0, 0], [50, 50], [30, 30]).tolist() == [0, 30]
+    assert ro.plan_orders([10], [0], [50], [5]).tolist() == [41], "Order lifts position above ROP even if EOQ is small"
+    assert ro.economic_order_qty([1.0, 1.0], [0.0, 20.0]).tolist() == [0, ro.MAX_EOQ_DAYS], "Unknown cost -> no EOQ; EOQ capped in days"
+
+    db.DB_NAME = str(tmp_path / "reorder_test.db")
+    db.init_db()
+    aid = '1111222233334444'
+    conn = db.get_connection()
+    conn.execute("INSERT INTO suppliers (id, account_id, name, phone) VALUES ('S1', ?, 'Dairy Co', '1')", (aid,))
+    conn.execute("INSERT INTO products (id, account_id, name, price, cost_price, stock_quantity) VALUES ('P1', ?, 'Milk', 30, 20, 5), ('P2', ?, 'Salt', 20, 10, 500)", (aid, aid))
+    for d in range(1, 29):
+        day = (datetime.now() - timedelta(days=d)).strftime('%Y-%m-%d 10:00:00')
+        conn.execute("INSERT INTO transactions (id, account_id, timestamp, total_amount, total_profit) VALUES (?, ?, ?, 0, 0)", (f"T{d}", aid, day))
+        conn.execute("INSERT INTO transaction_items (id, transaction_id, product_id, product_name, quantity, price_at_sale) VALUES (?, ?, 'P1', 'Milk', 10, 30)", (f"I{d}", f"T{d}"))
+    conn.commit()
+    conn.close()
+
+    plan = db.compute_reorder_plan(history_days=28, override_account_id=aid).set_index('product_id')
+    assert plan.loc['P1', 'daily_demand'] == 10 and plan.loc['P1', 'order_qty'] > 0
+    assert plan.loc['P2', 'order_qty'] == 0, "Slow mover with plenty of stock is not reordered"
+
+    ok, msg = db.generate_draft_pos(history_days=28, override_account_id=aid)
+    assert ok and msg == "1 draft POs created for 1 SKUs.", msg
+    assert db.compute_reorder_plan(history_days=28, override_account_id=aid).set_index('product_id').loc['P1', 'order_qty'] == 0, "Draft counts as on order"
+
+    po_id = db.get_open_pos(status='DRAFT', override_account_id=aid).iloc[0]['id']
+    assert db.receive_purchase_order(po_id, 4, override_account_id=aid) == (False, "PO not found, not approved yet, or already received."), "Drafts must be approved first"
+    assert db.approve_purchase_orders([po_id], override_account_id=aid) == (True, "1 POs approved.")
+    qty = int(db.get_po_lines(po_id, override_account_id=aid).iloc[0]['quantity'])
+    ok, msg = db.receive_purchase_order(po_id, 4, batch_code="LOT9", expiry_date=(datetime.now() + timedelta(days=4)).strftime('%Y-%m-%d'), override_account_id=aid)
+    assert ok, msg
+    assert not db.receive_purchase_order(po_id, 4, override_account_id=aid)[0], "Cannot receive twice"
+
+    conn = db.get_connection()
+    stock = conn.execute("SELECT stock_quantity FROM products WHERE id = 'P1'").fetchone()[0]
+    batch = conn.execute("SELECT batch_code, quantity, cost_price, expiry_bucket FROM product_batches WHERE product_id = 'P1'").fetchall()
+    conn.close()
+    assert stock == 5 + qty and batch == [("LOT9", qty, 20.0, 5)], (stock, batch)
+
+    # Undated (non-perishable) batches sort after dated ones for FEFO price and deduction
+    conn = db.get_connection()
+    conn.execute("INSERT INTO product_batches (id, account_id, product_id, batch_code, expiry_date, quantity, cost_price, created_at) VALUES ('BN', ?, 'P1', 'NODATE', NULL, 100, 20, '2000-01-01')", (aid,))
+    lot9 = conn.execute("SELECT id FROM product_batches WHERE batch_code = 'LOT9'").fetchone()[0]
+    conn.commit()
+    conn.close()
+    assert db.apply_markdowns([(lot9, 15.0)], override_account_id=aid)[0]
+    assert db.fetch_pos_inventory(search_term="Milk", override_account_id=aid).iloc[0]['price'] == 15
+    db.record_transaction([{'id': 'P1', 'name': 'Milk', 'qty': 2, 'price': 15, 'cost': 20}], 30, -10, override_account_id=aid)
+    conn = db.get_connection()
+    left = dict(conn.execute("SELECT batch_code, quantity FROM product_batches WHERE product_id = 'P1'").fetchall())
+    conn.close()
+    assert left == {"LOT9": qty - 2, "NODATE": 100}, left
+
+    # Zero-cost SKU selling 1/day: ordered back above its ROP, not by a runaway EOQ
+    conn = db.get_connection()
+    conn.execute("UPDATE purchase_orders SET order_date = date(received_date, '-7 days')")  # 7-day lead time
+    conn.execute("INSERT INTO products (id, account_id, name, price, cost_price, stock_quantity) VALUES ('P3', ?, 'Freebie', 5, 0, 0)", (aid,))
+    conn.executemany("INSERT INTO transaction_items (id, transaction_id, product_id, product_name, quantity, price_at_sale) VALUES (?, ?, 'P3', 'Freebie', 1, 5)",
+                     [(f"F{d}", f"T{d}") for d in range(1, 29)])
+    conn.commit()
+    conn.close()
+    p3 = db.compute_reorder_plan(history_days=28, override_account_id=aid).set_index('product_id').loc['P3']
+    assert p3['eoq'] == 0 and 0 < p3['order_qty'] <= p3['reorder_point'] + 1, p3.to_dict()
+    print("Replenishment Verified.")
+
+def test_supplier_dedupe(tmp_path):
+    print("\n--- Testing Supplier Dedupe ---")
+    db.DB_NAME = str(tmp_path / "supplier_test.db")
+    aid = '1111222233334444'
+    # Legacy database: duplicates by name and by phone, POs pointing at the duplicates
+    conn = sqlite3.connect(db.DB_NAME)
+    conn.execute("CREATE TABLE suppliers (id TEXT PRIMARY KEY, account_id TEXT, name TEXT, contact_person TEXT, phone TEXT, category_specialty TEXT, created_at TIMESTAMP)")
+    conn.execute("CREATE TABLE purchase_orders (id TEXT PRIMARY KEY, account_id TEXT, supplier_id TEXT, order_date DATE, expected_date DATE, received_date DATE, status TEXT DEFAULT 'PENDING', quality_rating REAL, notes TEXT)")
+    conn.executemany("INSERT INTO suppliers (id, account_id, name, contact_person, phone) VALUES (?, ?, ?, ?, ?)", [
+        ('S1', aid, 'Agro', None, '111'), ('S2', aid, 'Agro', 'Ravi', '111'), ('S3', aid, 'Agro Foods', None, '111'),
+        ('S4', aid, 'Dairy', None, ''), ('S5', aid, 'Bakery', None, ''), ('S6', 'OTHER', 'Agro', None, '111')])
+    conn.executemany("INSERT INTO purchase_orders (id, account_id, supplier_id) VALUES (?, ?, ?)", [('PO1', aid, 'S2'), ('PO2', aid, 'S3'), ('PO3', aid, 'S4')])
+    conn.commit()
+    conn.close()
+
+    db.init_db()
+    supps = db.get_all_suppliers(override_account_id=aid)
+    assert supps['id'].tolist() == ['S1', 'S5', 'S4'], supps
+    assert supps.set_index('id').loc['S1', 'contact_person'] == 'Ravi', "Blank details filled from duplicates"
+    conn = db.get_connection()
+    assert dict(conn.execute("SELECT id, supplier_id FROM purchase_orders").fetchall()) == {'PO1': 'S1', 'PO2': 'S1', 'PO3': 'S4'}
+    conn.close()
+    assert len(db.get_all_suppliers(override_account_id='OTHER')) == 1
+
+    assert db.add_supplier("Agro", "X", "999", "Fruits", override_account_id=aid)[0] is False
+    assert db.add_supplier("New Co", "X", "111", "Fruits", override_account_id=aid)[0] is False, "Phone already taken"
+    assert db.add_supplier("New Co", "X", "", "Fruits", override_account_id=aid)[0], "Blank phones don't collide"
+    ok, msg = db.upsert_suppliers([("Agro", "Meena", None, "Fruits"), ("Spice Hub", "Anil", "222", "Spices")], override_account_id=aid)
+    assert ok and msg == "2 suppliers imported.", msg
+    supps = db.get_all_suppliers(override_account_id=aid).set_index('name')
+    assert supps.loc['Agro', 'contact_person'] == 'Meena' and supps.loc['Agro', 'phone'] == '111' and len(supps) == 5
+    print("Supplier Dedupe Verified.")
+
+def test_shelf_engine_bitmasks():
+    print("\n--- Testing ShelfSense Engine ---")
+    import shelf_engine as se
+    import numpy as np
+
+    # Order-independent: the Apple/Banana conflict fires whichever cell is scanned first
+    assert se.analyze_grid([["Banana", "Apple"]])[0] == se.analyze_grid([["Apple", "Banana"]])[0] == 50
+    # Every adjacent pair counts (two Apple cells no longer dedupe by name)
+    score, logs = se.analyze_grid([["Apple", "Banana", "Apple"]])
+    assert score == 0 and len(logs) == 2
+    # Beer & Diapers stacked vertically
+    assert se.analyze_grid([["Beer"], ["Diapers"]])[0] == 100
+
+    names = ["Apple", "Banana", "Chips", "Coke", "Soap"]
+    masks = se.resolve_masks(names)
+    assert masks[4] == 0, "Untagged products have an empty mask"
+    planogram = np.array([[0, 1, -1], [2, 3, 4]])
+    res = se.score_planogram(planogram, masks)
+    assert res['counts'] == {'ethylene_producer': 1, 'impulse_snack': 1} and res['raw'] == -30
+    # 15k-slot store: tiles only touch through neutral pairs, so the score is 2,500 tiles' worth
+    big = np.tile(planogram, (50, 50))
+    assert se.score_planogram(big, masks)['raw'] == 2500 * -30
+    print("ShelfSense Engine Verified.")
+
+def test_shelf_optimizer(tmp_path):
+    print("\n--- Testing ShelfSense Optimizer ---")
+    import shelf_engine as se
+    import shelf_optimizer as so
+
+    names = ["Apple", "Banana", "Beer", "Diapers", "Chips", "Coke"]
+    masks = se.resolve_masks(names)
+    res = so.optimize_layout(masks, [2] * 6, 3, 4, iterations=20_000, seed=1)
+    assert sorted(res['planogram'].ravel().tolist()) == sorted([k for k in range(6) for _ in range(2)]), "Facings preserved"
+    assert res['score'] == se.score_planogram(res['planogram'], masks)['raw'], "Incremental score matches a full re-score"
+    assert res['score'] >= res['start_score'] and res['score'] > 0
+    planogram = res['planogram']
+    apple, banana = planogram == 0, planogram == 1
+    touching = ((apple[:, :-1] & banana[:, 1:]) | (banana[:, :-1] & apple[:, 1:])).any() or ((apple[:-1] & banana[1:]) | (banana[:-1] & apple[1:])).any()
+    assert not touching, "Optimizer keeps Apple away from Banana"
+    assert [h[1] for h in res['history']] == sorted(h[1] for h in res['history']), "Best score never decreases"
+
+    # DB: tenant science_tags drive the masks
+    db.DB_NAME = str(tmp_path / "shelf_test.db")
+    db.init_db()
+    aid = '1111222233334444'
+    conn = db.get_connection()
+    conn.execute("INSERT INTO products (id, account_id, name, price, cost_price, science_tags) VALUES ('P1', ?, 'Mango', 50, 30, \"['ethylene_producer']\"), ('P2', ?, 'Kiwi', 60, 40, 'ethylene_sensitive')", (aid, aid))
+    conn.commit()
+    conn.close()
+    out = db.optimize_shelf_layouts([{'products': ['Mango', 'Kiwi'], 'facings': [1, 1], 'rows': 1, 'cols': 3}], iterations=500, override_account_id=aid)
+    assert out[0]['score'] == 0 and out[0]['products'] == ['Mango', 'Kiwi'], "Empty slot placed between the conflicting pair"
+    print("ShelfSense Optimizer Verified.")
+
+def test_basket_affinity(tmp_path):
+    print("\n--- Testing ShelfSense Basket Affinity ---")
+    import basket_engine as be
+    import shelf_engine as se
+
+    # Engine: chunk boundaries and duplicate lines do not change the counts
+    baskets = [1, 1, 1, 2, 2, 3, 3, 3, 4]
+    items = ["Chips", "Coke", "Chips", "Chips", "Coke", "Bread", "Jam", "Coke", "Bread"]
+    whole = be.BasketMiner()
+    whole.add(baskets, items)
+    split = be.BasketMiner()
+    split.add(baskets[:3], items[:3])
+    split.add(baskets[3:], items[3:])
+    for miner in (whole, split):
+        rules = {(r['product_a'], r['product_b']): r for r in miner.rules(min_baskets=1)}
+        pair = rules.get(("Chips", "Coke")) or rules.get(("Coke", "Chips"))
+        assert miner.n_baskets == 4 and pair['pair_count'] == 2
+        assert abs(pair['lift'] - 2 * 4 / (2 * 3)) < 1e-9, "lift = n_ab * N / (n_a * n_b)"
+
+    # DB: streamed in tiny chunks (baskets straddle fetchmany boundaries)
+    db.DB_NAME = str(tmp_path / "basket_test.db")
+    db.init_db()
+    aid = '1111222233334444'
+    conn = db.get_connection()
+    txns, lines = [], []
+    for t in range(40):
+        names = ["Chips", "Coke"] if t % 2 == 0 else ["Bread", "Milk", "Jam"]
+        if t % 5 == 0:
+            names = names + ["Soap"]
+        txns.append((f"T{t:03d}", aid, 10, 2))
+        lines += [(f"T{t:03d}-{k}", f"T{t:03d}", n, 1) for k, n in enumerate(names)]
+    conn.executemany("INSERT INTO transactions (id, account_id, total_amount, total_profit) VALUES (?, ?, ?, ?)", txns)
+    conn.executemany("INSERT INTO transaction_items (id, transaction_id, product_name, quantity) VALUES (?, ?, ?, ?)", lines)
+    conn.commit()
+    conn.close()
+
+    ok, msg = db.refresh_product_affinity(chunk_size=3, override_account_id=aid)
+    assert ok, msg
+    df = db.get_product_affinity(override_account_id=aid)
+    pairs = {frozenset((a, b)): (n, lift) for a, b, n, lift in zip(df['product_a'], df['product_b'], df['pair_count'], df['lift'])}
+    assert pairs[frozenset(("Chips", "Coke"))] == (20, 2.0), "Every even basket, counted once per basket"
+    assert frozenset(("Chips", "Bread")) not in pairs, "Never bought together"
+
+    # Mined pairs boost the shelf score
+    affinity = db.get_affinity_map(override_account_id=aid)
+    assert se.affinity_points(2.0) == 10
+    base, _ = se.analyze_grid([["Bread", "Jam"]])
+    boosted, logs = se.analyze_grid([["Bread", "Jam"]], affinity=affinity)
+    assert boosted > base or boosted == 100
+    assert any("BASKET AFFINITY" in log for log in logs)
+    planogram, names = se.encode_grid([["Bread", "Jam"]])
+    raw = se.score_planogram(planogram, se.resolve_masks(names), bonus=se.affinity_matrix(names, affinity))
+    assert raw['counts'][se.AFFINITY_RULE] == 1 and raw['raw'] == 15 + se.affinity_points(affinity.get(("Bread", "Jam")) or affinity[("Jam", "Bread")])
+    print("ShelfSense Basket Affinity Verified.")
+
+def test_science_tag_index(tmp_path):
+    print("\n--- Testing ShelfSense Tag Index ---")
+    import shelf_engine as se
+
+    db.DB_NAME = str(tmp_path / "tags_test.db")
+    db.init_db()
+    aid = '1111222233334444'
+    conn = db.get_connection()
+    conn.execute("INSERT INTO products (id, account_id, name, category, price, cost_price, science_tags) VALUES "
+                 "('P1', ?, 'Green Apple', 'Produce', 50, 30, '[\"moisture_sensitive\"]'), "
+                 "('P2', ?, 'Banana Chips', 'Snacks', 20, 10, NULL), "
+                 "('P3', ?, 'Widget', 'Misc', 5, 1, '')", (aid, aid, aid))
+    conn.commit()
+    conn.close()
+
+    index = db.get_tag_index(override_account_id=aid)
+    assert index['Green Apple'] == {'moisture_sensitive'}, "Stored tags win over keyword inference"
+    assert index['Banana Chips'] == se.infer_tags('Banana Chips') and 'impulse_snack' in index['Banana Chips']
+    assert index['Widget'] == frozenset()
+    assert db.get_tag_index(override_account_id=aid) is index, "Cached per tenant"
+    assert db.get_tag_lookup(override_account_id=aid)('Coke') == se.infer_tags('Coke'), "Unknown names fall back to inference"
+
+    ok, _ = db.set_science_tags(['P2'], ['impulse_drink'], mode='add', override_account_id=aid)
+    assert ok
+    index = db.get_tag_index(override_account_id=aid)
+    assert index['Banana Chips'] == se.infer_tags('Banana Chips') | {'impulse_drink'}, "Add keeps the inferred tags"
+    db.set_science_tags(['P1', 'P2'], ['moisture_sensitive'], mode='remove', override_account_id=aid)
+    db.set_science_tags(['P3'], ['target_men'], mode='replace', override_account_id=aid)
+    df = db.get_shelf_products(override_account_id=aid).set_index('id')
+    assert df.loc['P1', 'tags'] == [] and 'moisture_sensitive' not in df.loc['P2', 'tags']
+    assert df.loc['P3', 'tags'] == ['target_men'] and df.loc['P3', 'tag_source'] == 'catalog'
+    lookup = db.get_tag_lookup(override_account_id=aid)
+    assert lookup('Green Apple') == frozenset(), "Stored [] means untagged, not 'infer from the name'"
+    score, logs = se.analyze_grid([["Green Apple", "Banana"]], tag_lookup=lookup)
+    assert score == 100 and not logs, logs
+
+    db.add_product('Coke Can', 'Drinks', 40, 20, 10, override_account_id=aid)
+    assert 'impulse_drink' in db.get_tag_index(override_account_id=aid)['Coke Can'], "New products invalidate the index"
+    ok, msg = db.persist_inferred_tags(override_account_id=aid)
+    assert ok and db.get_shelf_products(override_account_id=aid).set_index('name').loc['Coke Can', 'tag_source'] == 'catalog'
+
+    score, logs = se.analyze_grid([["Widget", "Diapers"]], tag_lookup=db.get_tag_lookup(override_account_id=aid))
+    assert any("Diapers" in log for log in logs), "Catalog tags feed the rule engine"
+    print("ShelfSense Tag Index Verified.")
+
+def test_entitlements(tmp_path, monkeypatch):
+    print("\n--- Testing Sidebar Entitlements ---")
+    import pytest
+    import streamlit as st
+    import entitlements
+
+    assert entitlements.resolve_pages('Starter', 'admin') == {'1_Inventory.py', '2_POS.py', '3_Settings.py', '4_Dashboard.py'}
+    assert entitlements.resolve_pages('Enterprise', 'staff') == {'2_POS.py', '8_VoiceAudit.py', '17_Kitchen_Display_System.py'}
+    assert entitlements.resolve_pages('Custom', 'admin', custom_modules="ShelfSense, Nope") == {'3_Settings.py', '4_Dashboard.py', '14_ShelfSense.py'}
+    assert entitlements.resolve_pages('Enterprise', 'manager', permissions="Inventory,GeoViz") == {'1_Inventory.py', '12_GeoViz.py'}
+    assert entitlements.resolve_pages('Starter', 'super_admin') == {'99_SuperAdmin.py'}, "System roles only see System"
+
+    db.DB_NAME = str(tmp_path / "ent_test.db")
+    db.init_db()
+    aid = '1111222233334444'
+    conn = db.get_connection()
+    conn.execute("INSERT INTO users (username, password_hash, role, account_id) VALUES ('mgr', 'x', 'manager', ?)", (aid,))
+    conn.commit()
+    conn.close()
+
+    state = {'account_id': aid, 'username': 'mgr', 'role': 'manager'}
+    monkeypatch.setattr(st, "session_state", state)
+    monkeypatch.setattr(db, "get_current_account_id", lambda: aid)
+    first = entitlements.get_entitlements()
+    assert first['plan'] == 'Starter' and first['pages'] == {'1_Inventory.py', '2_POS.py', '4_Dashboard.py'}
+
+    calls = []
+    real_inputs = db.get_entitlement_inputs
+    monkeypatch.setattr(db, "get_entitlement_inputs", lambda *a, **k: calls.append(1) or real_inputs(*a, **k))
+    assert entitlements.get_entitlements() is first and not calls, "Reruns are served from session state"
+
+    db.update_tenant_plan(aid, 'Enterprise')
+    assert '6_FreshFlow.py' in entitlements.get_entitlements()['pages'] and len(calls) == 1, "Plan change bumps the stamp"
+    db.update_user_permissions('mgr', ['POS Terminal'])
+    assert entitlements.get_entitlements()['pages'] == {'2_POS.py'} and state['permissions'] == 'POS Terminal'
+
+    # Pages opened by URL are checked against the resolved set
+    import ui_components as ui
+    class Stopped(Exception):
+        pass
+    def stop():
+        raise Stopped()
+    errors = []
+    state['authenticated'] = True
+    monkeypatch.setattr(st, "error", errors.append)
+    monkeypatch.setattr(st, "button", lambda *a, **k: False)
+    monkeypatch.setattr(st, "stop", stop)
+    exec(compile("ui.require_auth()", "pages/2_POS.py", "exec"), {'ui': ui})
+    assert not errors
+    with pytest.raises(Stopped):
+        exec(compile("ui.require_auth()", "pages/1_Inventory.py", "exec"), {'ui': ui})
+    assert errors, "Inventory is not in this user's entitlements"
+    db.add_plan('Gold', 100, 'ShelfSense')
+    assert len(calls) == 2 and entitlements.get_entitlements() and len(calls) == 3, "Plan catalog changes bump every tenant"
+
+    # Upgrading happens in Settings, so only roles that can open it get the button
+    monkeypatch.undo()
+    from streamlit.testing.v1 import AppTest
+    def sidebar():
+        import ui_components as ui
+        ui.render_sidebar()
+    db.update_tenant_plan(aid, 'Starter')
+    for username, role, shown in (('mgr', 'manager', False), ('owner', 'admin', True)):
+        at = AppTest.from_function(sidebar)
+        for key, value in {'authenticated': True, 'account_id': aid, 'username': username, 'role': role}.items():
+            at.session_state[key] = value
+        at.run()
+        assert not at.exception, at.exception
+        labels = [b.label for b in at.sidebar.button]
+        assert ("🚀 Upgrade to Enterprise" in labels) == shown, (role, labels)
+    print("Sidebar Entitlements Verified.")
+
+def test_asset_cache_and_receipt_template(tmp_path, monkeypatch):
+    print("\n--- Testing Asset Cache & Receipt Template ---")
+    import os
+    import asset_cache
+    import receipt_engine
+
+    logo = tmp_path / "logo.png"
+    logo.write_bytes(b"\x89PNG-one")
+    asset_cache.clear()
+    monkeypatch.setattr(asset_cache, "STAT_TTL", 0.0)
+    html = asset_cache.logo_html(str(logo))
+    assert "data:image/png;base64," in html and asset_cache.logo_html(str(logo)) is html, "Encoded once, same object"
+    loads = asset_cache.stats()['loads']
+    logo.write_bytes(b"\x89PNG-two")
+    os.utime(logo, (1, 1))
+    assert asset_cache.logo_html(str(logo)) != html and asset_cache.stats()['loads'] == loads + 1, "New mtime reloads"
+    monkeypatch.setattr(asset_cache, "STAT_TTL", 3600.0)
+    os.remove(logo)
+    assert asset_cache.data_uri(str(logo)), "Within the TTL the file system is not consulted"
+    assert asset_cache.resolve_logo_file(None) == asset_cache.DEFAULT_LOGO
+    assert asset_cache.resolve_logo_file("missing.png") == asset_cache.FALLBACK_LOGO
+
+    items = [{'name': 'Tea', 'qty': 2, 'total': 40.0}, {'name': 'Bun', 'qty': 0, 'total': 0.0}]
+    out = receipt_engine.render_receipt_html(items, 42.0, 40.0, 2.0, "R1", store={'store_name': 'Chai Point', 'store_address': 'MG Road'},
+                                             logo_html="<img>", customer_info="Asha", points_redeemed=5, date_str="01-Jan-2026")
+    for fragment in ("Chai Point", "MG Road", "R1", "01-Jan-2026", "Customer:</strong> Asha", "₹20.00", "₹40.00",
+                     "CGST (2.5%): ₹1.00", "Loyalty Disc: -₹5.00", "NET PAYABLE: ₹42.00", receipt_engine.DEFAULT_FOOTER):
+        assert fragment in out, fragment
+    receipt_engine.render_receipt_html(items, 42.0, 40.0, 2.0, "R2", store={'store_name': 'Chai Point', 'store_address': 'MG Road'}, logo_html="<img>")
+    assert receipt_engine.compiled_header.cache_info().hits >= 1, "Header compiled once per store profile"
+
+    db.DB_NAME = str(tmp_path / "settings_test.db")
+    db.init_db()
+    monkeypatch.setattr(db, "get_current_account_id", lambda: '1111222233334444')
+
+    # A tenant with no store settings gets the generic store name, no made-up address or phone
+    bare = db.get_settings(('store_name', 'store_address', 'store_phone'), override_account_id='5555666677778888')
+    assert bare == {}
+    plain = receipt_engine.make_receipt(items, 42.0, 40.0, 2.0, "R3", store=bare)
+    assert plain['store']['store_name'] == "VyaparMind Store", "Same fallback as db.get_setting"
+    html, text = receipt_engine.receipt_html(plain), receipt_engine.render_text(plain)
+    assert "Ph:" not in html and "Ph:" not in text and "Hyderabad" not in html + text
+
+    db.set_setting('store_phone', '123')
+    assert db.get_settings(('store_phone', 'nope')) == {'store_phone': '123'}
+    print("Asset Cache & Receipt Template Verified.")
+
+def test_receipt_rendering(tmp_path):
+    print("\n--- Testing Receipt / KOT Rendering ---")
+    import re
+    import receipt_engine as rcpt
+    import receipt_printer
+
+    receipt = rcpt.make_receipt([{'name': 'Paneer (Tikka)', 'qty': 2, 'total': 300.0}], 310.0, 300.0, 15.0, "R9",
+                               customer_info="Asha", points_redeemed=5, date_str="01-Jan-2026 10:00:00")
+    kot = rcpt.make_kot([{'name': 'Noodles', 'qty': 2}, {'name': 'Mojito', 'qty': 1, 'section': 'Bar'}], "T4", "Ravi", "", "O7")
+
+    text = rcpt.render_text(receipt)
+    assert all(len(line) <= rcpt.LINE_WIDTH for line in text.splitlines())
+    assert "Rs.300.00" in text and "Rs.150.00" in text and "TOTAL Rs.310.00" in text and "-Rs.5.00" in text
+    assert "-- BAR --" in rcpt.render_text(kot) and "Notes: -" in rcpt.render_text(kot)
+    assert "₹150.00" in rcpt.receipt_html(receipt) and "-- KITCHEN --" in rcpt.kot_html(kot)
+
+    esc = rcpt.render_escpos(receipt)
+    assert esc.startswith(rcpt.ESC_INIT) and esc.endswith(rcpt.FEED_AND_CUT) and rcpt.GS_DOUBLE_ON in esc
+
+    pdf = rcpt.render_batch([receipt, kot], "pdf")
+    assert pdf.startswith(b"%PDF-1.4") and pdf.rstrip().endswith(b"%%EOF") and b"/Count 2" in pdf
+    assert b"Paneer \\(Tikka\\)" in pdf, "Parentheses escaped in PDF strings"
+    xref = int(re.search(rb"startxref\n(\d+)", pdf).group(1))
+    offsets = [int(x) for x in re.findall(rb"(\d{10}) 00000 n", pdf[xref:])]
+    assert all(pdf[o:].startswith(b"%d 0 obj" % (k + 1)) for k, o in enumerate(offsets)), "xref offsets point at objects"
+
+    # Batch audit from the DB
+    db.DB_NAME = str(tmp_path / "receipts_test.db")
+    db.init_db()
+    aid = '1111222233334444'
+    conn = db.get_connection()
+    conn.executemany("INSERT INTO transactions (id, account_id, timestamp, total_amount, total_profit, points_redeemed) VALUES (?, ?, ?, ?, 0, ?)",
+                     [("T1", aid, "2026-01-01 09:00:00", 105.0, 0), ("T2", aid, "2026-01-01 18:00:00", 50.0, 10), ("T3", aid, "2026-01-02 09:00:00", 1.0, 0)])
+    conn.executemany("INSERT INTO transaction_items (id, transaction_id, product_name, quantity, price_at_sale) VALUES (?, ?, ?, ?, ?)",
+                     [("I1", "T1", "Rice", 2, 50.0), ("I2", "T2", "Dal", 1, 60.0), ("I3", "T3", "Salt", 1, 1.0)])
+    conn.commit()
+    conn.close()
+    docs = db.get_receipts_for_day("2026-01-01", override_account_id=aid)
+    assert [d['receipt_id'] for d in docs] == ["T1", "T2"]
+    assert docs[0]['subtotal'] == 100.0 and docs[0]['tax'] == 5.0 and docs[1]['points_redeemed'] == 10
+    receipt_printer.run_audit("2026-01-01", "text", str(tmp_path / "audit.txt"), aid)
+    assert (tmp_path / "audit.txt").read_text(encoding="utf-8").count("Receipt #:") == 2
+
+    # Stand-in printer receives one cut per document
+    stand_in = receipt_printer.StandInPrinter().start()
+    printer = receipt_printer.SocketPrinter(*stand_in.address)
+    sent = receipt_printer.print_documents(printer, docs + [kot])
+    printer.close()
+    import time
+    deadline = time.time() + 5
+    while stand_in.bytes_received < sent and time.time() < deadline:
+        time.sleep(0.01)
+    stand_in.stop()
+    assert stand_in.bytes_received == sent and stand_in.cuts == 3
+    print("Receipt / KOT Rendering Verified.")
+
+def test_streaming_export(tmp_path, monkeypatch):
+    print("\n--- Testing Streaming Data Export ---")
+    import csv
+    import data_export
+    import pytest
+    from openpyxl import load_workbook
+
+    db.DB_NAME = str(tmp_path / "export_test.db")
+    db.init_db()
+    aid, other = '1111222233334444', '9999000099990000'
+    conn = db.get_connection()
+    txns = [(f"T{k}", aid, f"2026-0{1 + k % 2}-{10 + k % 5:02d} 10:00:00", 10.0 * k, 1.0) for k in range(20)]
+    txns.append(("X1", other, "2026-01-12 10:00:00", 99.0, 1.0))
+    conn.executemany("INSERT INTO transactions (id, account_id, timestamp, total_amount, total_profit) VALUES (?, ?, ?, ?, ?)", txns)
+    conn.executemany("INSERT INTO transaction_items (id, transaction_id, product_name, quantity, price_at_sale) VALUES (?, ?, ?, ?, ?)",
+                     [(f"I{t[0]}{j}", t[0], f"P{j}", j + 1, 5.0) for t in txns for j in range(3)])
+    conn.commit()
+    conn.close()
+
+    # January only, own tenant, tiny chunks: 10 bills x 3 lines
+    seen = []
+    stats = data_export.export_dataset("transaction_items", "csv", str(tmp_path / "jan.csv"), "2026-01-01", "2026-01-31",
+                                       chunk_size=7, account_id=aid, progress=lambda done, total: seen.append((done, total)))
+    with open(tmp_path / "jan.csv", newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows[0][:2] == ["timestamp", "transaction_id"] and len(rows) == 31 and stats['rows'] == 30
+    assert all(r[0].startswith("2026-01") and not r[1].startswith("X") for r in rows[1:])
+    assert [d for d, _ in seen] == [7, 14, 21, 28, 30] and {t for _, t in seen} == {30}
+
+    # XLSX rolls over to a new sheet at the row limit
+    monkeypatch.setattr(data_export, "XLSX_MAX_ROWS", 12)
+    stats = data_export.export_dataset("transactions", "xlsx", str(tmp_path / "all.xlsx"), chunk_size=4, account_id=aid)
+    wb = load_workbook(tmp_path / "all.xlsx", read_only=True)
+    sheets = [list(ws.values) for ws in wb.worksheets]
+    assert [len(s) for s in sheets] == [12, 10] and all(s[0][0] == "id" for s in sheets) and stats['rows'] == 20
+
+    # Settings hands exports over UI_MAX_ROWS to the CLI
+    assert data_export.cli_command(aid, "transaction_items", "csv", "2026-01-01", "2026-01-31") == \
+        f"python data_export.py --account {aid} --dataset transaction_items --format csv --from 2026-01-01 --to 2026-01-31 --out transaction_items.csv"
+
+    # Empty result still has a header; parquet needs pyarrow
+    data_export.export_dataset("customers", "csv", str(tmp_path / "none.csv"), account_id=aid)
+    assert (tmp_path / "none.csv").read_text(encoding="utf-8").startswith("id,name")
+    if data_export.parquet_available():
+        import pyarrow.parquet as pq
+        stats = data_export.export_dataset("transaction_items", "parquet", str(tmp_path / "items.parquet"), chunk_size=7, account_id=aid)
+        table = pq.read_table(tmp_path / "items.parquet")
+        assert table.num_rows == stats['rows'] == 60 and str(table.schema.field("quantity").type) == "int64"
+
+        # Schema from declared types: cost_at_sale (REAL) is NULL in every row and still exports as double
+        assert str(table.schema.field("cost_at_sale").type) == "double" and table.column("cost_at_sale").null_count == 60
+
+        # A fractional value in an INTEGER column raises instead of being truncated (2.75 -> 2)
+        conn = db.get_connection()
+        conn.execute("UPDATE transaction_items SET quantity = 2.75 WHERE id = 'IT192'")
+        conn.commit()
+        conn.close()
+        with pytest.raises(ValueError, match="quantity"):
+            data_export.export_dataset("transaction_items", "parquet", str(tmp_path / "bad.parquet"), chunk_size=7, account_id=aid)
+    else:
+        assert "parquet" not in data_export.available_formats()
+        with pytest.raises(RuntimeError):
+            data_export.export_dataset("products", "parquet", str(tmp_path / "p.parquet"), account_id=aid)
+    print("Streaming Data Export Verified.")
+
+def test_analytics_snapshot(tmp_path, monkeypatch):
+    print("\n--- Testing Columnar Analytics Snapshot ---")
+    import numpy as np
+    import analytics_store as an
+
+    db.DB_NAME = str(tmp_path / "snapshot_test.db")
+    db.init_db()
+    aid, other = '1111222233334444', '9999000099990000'
+    conn = db.get_connection()
+    conn.executemany("INSERT INTO products (id, account_id, name, category, price, cost_price) VALUES (?, ?, ?, ?, 10, 6)",
+                     [("P0", aid, "Tea", "Drinks"), ("P1", aid, "Rice", "Staples")])
+    conn.executemany("INSERT INTO customers (id, account_id, name, city) VALUES (?, ?, ?, ?)",
+                     [("C0", aid, "Asha", "Pune"), ("C1", aid, "Ravi", "Delhi")])
+    days = [(datetime.now() - timedelta(days=d)).strftime('%Y-%m-%d') for d in (3, 2, 1)]
+    for k in range(12):
+        conn.execute("INSERT INTO transactions (id, account_id, customer_id, timestamp, total_amount, total_profit) VALUES (?, ?, ?, ?, ?, 1)",
+                     (f"T{k}", aid, f"C{k % 2}" if k % 3 else None, f"{days[k % 3]} 1{k % 10}:00:00", 10.0 + k))
+        conn.execute("INSERT INTO transaction_items (id, transaction_id, product_id, product_name, quantity, price_at_sale, cost_at_sale) VALUES (?, ?, ?, ?, ?, 10, 6)",
+                     (f"I{k}", f"T{k}", f"P{k % 2}", ["Tea", "Rice"][k % 2], 1 + k % 3))
+    conn.execute("INSERT INTO transactions (id, account_id, timestamp, total_amount, total_profit) VALUES ('X', ?, ?, 500, 1)", (other, f"{days[0]} 10:00:00"))
+    conn.execute("INSERT INTO transaction_items (id, transaction_id, product_name, quantity, price_at_sale) VALUES ('XI', 'X', 'Tea', 50, 10)")
+    conn.commit()
+    conn.close()
+
+    # Context index and RFM through the plain SQL path first (no snapshot yet)
+    db.set_daily_context(days[0], "Rainy", "None", override_account_id=aid)
+    db.refresh_context_demand_index(full=True, override_account_id=aid)
+    db.refresh_customer_rfm(full=True, override_account_id=aid)
+    conn = db.get_connection()
+    sql_daily = sorted(conn.execute("SELECT date, product_name, qty, revenue FROM daily_product_sales WHERE account_id = ?", (aid,)).fetchall())
+    sql_rfm = sorted(conn.execute("SELECT customer_id, frequency, monetary, last_seen FROM customer_rfm WHERE account_id = ?", (aid,)).fetchall())
+    conn.close()
+
+    backends = [False, True] if an.parquet_available() else [False]
+    for use_parquet in backends:
+        monkeypatch.setattr(an, "parquet_available", lambda: use_parquet)
+        succ, msg = an.refresh_snapshot(full=True, account_id=aid, chunk_rows=5)
+        assert succ and "+12 bills, +12 line items" in msg, msg
+        snap = an.load_snapshot(aid)
+        if not use_parquet:
+            assert isinstance(snap['items']['qty'], np.memmap), "memmap backend reads zero-copy"
+
+        summary = an.sales_summary(snap, days[1], days[2])
+        assert summary['bills'] == 8 and summary['revenue'] == sum(10.0 + k for k in range(12) if k % 3) and summary['items_sold'] == 20
+        assert an.daily_revenue(snap)['bills'].tolist() == [4, 4, 4]
+        assert dict(zip(*an.category_revenue(snap).to_dict('list').values())) == {'Drinks': 120.0, 'Staples': 120.0}
+        vips = an.top_customers(snap)
+        assert sorted(vips['name']) == ["Asha", "Ravi"] and vips['visits'].tolist() == [4, 4] and vips['total_spend'].tolist() == [64.0, 64.0]
+        assert set(an.area_product_sales(snap, "Pune")['buyers']) == {1}
+
+    # Incremental sync reads only new rows (and recovers from a torn append)
+    monkeypatch.setattr(an, "parquet_available", lambda: False)
+    an.refresh_snapshot(full=True, account_id=aid)
+    with open(os.path.join(an.snapshot_dir(aid), "items.qty.bin"), "ab") as f:
+        f.write(b"junk")
+    conn = db.get_connection()
+    conn.execute("INSERT INTO transactions (id, account_id, customer_id, timestamp, total_amount, total_profit) VALUES ('TN', ?, 'C0', ?, 99, 1)", (aid, f"{days[2]} 23:00:00"))
+    conn.execute("INSERT INTO transaction_items (id, transaction_id, product_id, product_name, quantity, price_at_sale, cost_at_sale) VALUES ('IN', 'TN', 'P0', 'Tea', 4, 10, 6)")
+    conn.commit()
+    conn.close()
+    succ, msg = an.refresh_snapshot(account_id=aid)
+    assert succ and "+1 bills, +1 line items (13 total" in msg, msg
+    snap = an.load_snapshot(aid)
+    assert snap['items']['qty'][-1] == 4 and an.sales_summary(snap)['items_sold'] == 28
+    conn = db.get_connection()
+    conn.execute("DELETE FROM transaction_items WHERE id = 'IN'")
+    conn.execute("DELETE FROM transactions WHERE id = 'TN'")
+    conn.commit()
+    conn.close()
+    an.refresh_snapshot(full=True, account_id=aid)
+
+    # Overlapping syncs of a tenant are skipped: other sessions (thread lock) and other processes (lock file)
+    path = an.snapshot_dir(aid)
+    manifest = os.stat(os.path.join(path, "manifest.json")).st_mtime_ns
+    with an._sync_lock(path) as held:
+        assert held and an.refresh_snapshot(account_id=aid) == (True, "Sync already running; skipped.")
+    with open(f"{path}.lock", "ab") as other_process:
+        assert an._lock_file(other_process, wait=False)
+        import subprocess
+        import sys
+        out = subprocess.run([sys.executable, "-c", "import sys, database as db, analytics_store as an; db.DB_NAME = sys.argv[1]; "
+                              "print(an.refresh_snapshot(account_id=sys.argv[2])[1])", db.DB_NAME, aid],
+                             capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert "skipped" in out.stdout, out.stdout + out.stderr
+    assert os.stat(os.path.join(path, "manifest.json")).st_mtime_ns == manifest
+    assert an.refresh_snapshot(account_id=aid)[1].startswith("+0 bills"), "Lock released"
+
+    # Parquet parts are compacted instead of piling up one per sync
+    if an.parquet_available():
+        monkeypatch.setattr(an, "parquet_available", lambda: True)
+        monkeypatch.setattr(an, "COMPACT_PARTS", 4)
+        an.refresh_snapshot(full=True, account_id=aid)
+        for k in range(6):
+            conn = db.get_connection()
+            conn.execute("INSERT INTO transactions (id, account_id, timestamp, total_amount, total_profit) VALUES (?, ?, ?, 1, 0)", (f"TP{k}", aid, f"{days[2]} 12:00:00"))
+            conn.execute("INSERT INTO transaction_items (id, transaction_id, product_id, product_name, quantity, price_at_sale) VALUES (?, ?, 'P0', 'Tea', 1, 1)", (f"IP{k}", f"TP{k}"))
+            conn.commit()
+            conn.close()
+            assert an.refresh_snapshot(account_id=aid)[0]
+            assert len(an._read_manifest(path)['parts']['transactions']) < 4
+        conn = db.get_connection()
+        conn.execute("INSERT INTO transaction_items (id, transaction_id, product_id, product_name, quantity, price_at_sale) VALUES ('IOLD', 'T0', 'P1', 'Rice', 7, 1)")
+        conn.commit()
+        conn.close()
+        assert "+0 bills, +1 line items" in an.refresh_snapshot(account_id=aid)[1], "Item added to an already-synced bill"
+        snap = an.load_snapshot(aid)
+        assert len(snap['txn']['rowid']) == 18 and snap['txn']['rowid'][snap['items']['txn'][-1]] == snap['txn']['rowid'][0]
+        assert an.refresh_snapshot(account_id=aid, compact=True)[0] and an.refresh_snapshot(account_id=aid)[0]
+        assert len(os.listdir(os.path.join(path, "transactions"))) == 1, "Merged, and superseded parts swept"
+        assert an.sales_summary(an.load_snapshot(aid))['items_sold'] == 24 + 6 + 7
+        conn = db.get_connection()
+        conn.execute("DELETE FROM transaction_items WHERE id LIKE 'IP%' OR id = 'IOLD'")
+        conn.execute("DELETE FROM transactions WHERE id LIKE 'TP%'")
+        conn.commit()
+        conn.close()
+        monkeypatch.setattr(an, "parquet_available", lambda: False)
+        an.refresh_snapshot(full=True, account_id=aid)
+
+    # Snapshot-backed rebuilds match the SQL ones
+    db.refresh_context_demand_index(full=True, override_account_id=aid)
+    db.refresh_customer_rfm(full=True, override_account_id=aid)
+    conn = db.get_connection()
+    assert sorted(conn.execute("SELECT date, product_name, qty, revenue FROM daily_product_sales WHERE account_id = ?", (aid,)).fetchall()) == sql_daily
+    assert sorted(conn.execute("SELECT customer_id, frequency, monetary, last_seen FROM customer_rfm WHERE account_id = ?", (aid,)).fetchall()) == sql_rfm
+    conn.close()
+    print("Analytics Snapshot Verified.")
+
+def test_read_only_connections(tmp_path, monkeypatch):
+    print("\n--- Testing Read-Only / Replica Connections ---")
+    import time
+    import pytest
+
+    db.DB_NAME = str(tmp_path / "replica test.db")
+    db.init_db()
+    aid = '1111222233334444'
+    conn = db.get_connection(read_only=True)
+    assert conn.execute("PRAGMA query_only").fetchone()[0] == 1
+    with pytest.raises(sqlite3.OperationalError):
+        conn.execute("INSERT INTO settings (account_id, key, value) VALUES (?, 'k', 'v')", (aid,))
+    conn.close()
+
+    # First replica read falls back to the live file while the copy is made in the background
+    def add_txn(tid):
+        w = db.get_connection()
+        w.execute("INSERT INTO transactions (id, account_id, timestamp, total_amount, total_profit) VALUES (?, ?, '2026-01-01 10:00:00', 1, 0)", (tid, aid))
+        w.commit()
+        w.close()
+    add_txn("T1")
+    assert db.get_replica_age() is None
+    assert db.get_system_overview()['Total Transactions'] == 1
+    deadline = time.time() + 10
+    while db.get_replica_age() is None and time.time() < deadline:
+        time.sleep(0.05)
+    assert db.get_replica_age() is not None and os.path.exists(db.replica_path())
+
+    # Replica serves the copy (stale by design) until it is refreshed
+    add_txn("T2")
+    assert db.get_system_overview()['Total Transactions'] == 1
+    live = db.get_connection(read_only=True)
+    assert live.execute("SELECT COUNT(*) FROM transactions").fetchone()[0] == 2
+    live.close()
+    succ, msg = db.refresh_read_replica()
+    assert succ, msg
+    assert db.get_system_overview()['Total Transactions'] == 2
+    monkeypatch.setattr(db, "REPLICA_TTL", None)
+    add_txn("T3")
+    assert db.get_system_overview()['Total Transactions'] == 3, "No replica: reads go to the live file"
+
+    # A long read on the replica does not hold back a full checkpoint of the live WAL
+    reader = db.get_connection(read_only=True)
+    reader.execute("BEGIN")
+    reader.execute("SELECT COUNT(*) FROM transactions").fetchone()
+    add_txn("T4")
+    w = sqlite3.connect(db.DB_NAME, timeout=0.1)
+    assert w.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()[0] == 1, "Live reader blocks the checkpoint"
+    reader.close()
+    reader = sqlite3.connect(f"file:{db.replica_path()}?mode=ro", uri=True)
+    reader.execute("BEGIN")
+    reader.execute("SELECT COUNT(*) FROM transactions").fetchone()
+    add_txn("T5")
+    assert w.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()[0] == 0, "Replica reader does not"
+    reader.close()
+    w.close()
+    print("Read-Only / Replica Connections Verified.")
+
+def test_db_maintenance(tmp_path):
+    print("\n--- Testing Database Maintenance ---")
+    import db_maintenance
+
+    # Policy: size-triggered checkpoints, hourly optimize, nightly tasks only off-peak
+    noon, night = datetime(2026, 10, 19, 12, 0), datetime(2026, 10, 19, 3, 0)
+    assert db_maintenance.due_tasks(noon, 0, {}) == ['optimize']
+    assert db_maintenance.due_tasks(noon, 5 * 1024 ** 2, {'optimize': noon})[0] == 'checkpoint_passive'
+    assert db_maintenance.due_tasks(noon, 100 * 1024 ** 2, {'optimize': noon}) == ['checkpoint_truncate']
+    assert db_maintenance.due_tasks(night, 0, {}) == ['optimize', 'analyze', 'vacuum', 'integrity_check']
+    recent = {t: night - timedelta(minutes=30) for t in db_maintenance.TASKS}
+    assert db_maintenance.due_tasks(night, 0, recent) == []
+    big = 8 * 1024 ** 2
+    assert db_maintenance.due_tasks(noon, big, {'optimize': noon}, checkpointed_bytes=big) == [], "Completed checkpoint: no re-run"
+    assert db_maintenance.due_tasks(noon, big + 4096, {'optimize': noon}, checkpointed_bytes=big) == []
+    assert db_maintenance.due_tasks(noon, 2 * big, {'optimize': noon}, checkpointed_bytes=big) == ['checkpoint_passive']
+    assert db_maintenance.due_tasks(night, big, recent, checkpointed_bytes=big) == ['checkpoint_truncate'], "Shrunk off-peak"
+
+    db.DB_NAME = str(tmp_path / "maintenance.db")
+    db.init_db()
+    assert db.get_db_health()['auto_vacuum'] == 'INCREMENTAL'
+    aid = '1111222233334444'
+    reader = db.get_connection(read_only=True)  # Keeps the WAL file from being removed on the writer's close
+    reader.execute("SELECT COUNT(*) FROM settings").fetchone()
+    w = db.get_connection()
+    w.executemany("INSERT INTO transactions (id, account_id, timestamp, total_amount, total_profit) VALUES (?, ?, '2026-01-01 10:00:00', 1, 0)",
+                  [(f"T{i}", aid) for i in range(5000)])
+    w.commit()
+    w.execute("DELETE FROM transactions")
+    w.commit()
+    w.close()
+    assert db.get_wal_size() > 0
+
+    # A reader on an old snapshot holds back TRUNCATE; the busy run is logged as a failure
+    reader.execute("BEGIN")
+    reader.execute("SELECT COUNT(*) FROM settings").fetchone()
+    w = db.get_connection()
+    w.execute("INSERT INTO settings (account_id, key, value) VALUES (?, 'k', 'v')", (aid,))
+    w.commit()
+    w.close()
+    succ, msg = db.checkpoint_wal('TRUNCATE')
+    assert not succ and msg.startswith("Busy")
+    reader.rollback()
+    succ, msg = db.checkpoint_wal('TRUNCATE')
+    assert succ, msg
+    run = db.get_maintenance_log(1).iloc[0]
+    assert run['wal_bytes_before'] > 1024 ** 2 and run['wal_bytes_after'] == 0, "TRUNCATE resets the WAL file"
+
+    for task, (succ, msg) in db_maintenance.run_tasks(['optimize', 'analyze', 'vacuum', 'integrity_check']).items():
+        assert succ, f"{task}: {msg}"
+    assert db.get_db_health()['freelist_count'] == 0, "Incremental vacuum releases the deleted pages"
+    reader.close()
+    last = db.get_maintenance_last_runs()
+    assert set(last) == {'checkpoint_truncate', 'optimize', 'analyze', 'vacuum', 'integrity_check'}
+    assert db.get_maintenance_last_runs(successful=False).keys() == last.keys()
+    log = db.get_maintenance_log()
+    assert len(log) == 6 and log['success'].tolist().count(0) == 1
+
+    # Scheduler tick: nightly work already done, so only what is due runs, and only once
+    sched = db_maintenance.MaintenanceScheduler()
+    now = datetime.now()
+    assert sched.run_once(now + timedelta(minutes=10)) == {}
+    next_night = (now + timedelta(days=2)).replace(hour=3, minute=0)
+    assert set(sched.run_once(next_night)) == {'analyze', 'vacuum', 'integrity_check', 'optimize'}
+    assert sched.run_once(next_night + timedelta(minutes=1)) == {}
+    assert db.prune_maintenance_log(days=0)[0]
+    assert db.get_maintenance_log().empty
+
+    # A PASSIVE checkpoint completes but a reader keeps TRUNCATE from shrinking the file: not re-run every tick
+    reader = db.get_connection(read_only=True)
+    reader.execute("SELECT COUNT(*) FROM settings").fetchone()
+    w = db.get_connection()
+    w.executemany("INSERT INTO settings (account_id, key, value) VALUES (?, ?, ?)", [(aid, f"k{i}", "x" * 500) for i in range(2000)])
+    w.commit()
+    w.close()
+    reader.execute("BEGIN")
+    reader.execute("SELECT COUNT(*) FROM settings").fetchone()
+    saved, db_maintenance.WAL_PASSIVE_BYTES = db_maintenance.WAL_PASSIVE_BYTES, 1024 ** 2
+    try:
+        noon = datetime.now().replace(hour=12)
+        assert db.get_wal_size() > 1024 ** 2
+        assert sched.run_once(noon).get('checkpoint_passive', (False,))[0]
+        assert db.get_maintenance_log(1).iloc[0]['task'] == 'checkpoint_truncate', "TRUNCATE follows a completed PASSIVE"
+        assert db.get_checkpointed_wal_size() > 1024 ** 2, "Held back by the reader"
+        assert 'checkpoint_passive' not in sched.run_once(noon + timedelta(minutes=5))
+    finally:
+        db_maintenance.WAL_PASSIVE_BYTES = saved
+        reader.close()
+    print("Database Maintenance Verified.")
+
+def test_query_profiler(tmp_path):
+    print("\n--- Testing Query Profiler ---")
+    import query_profiler
+
+    db.DB_NAME = str(tmp_path / "profiler.db")
+    db.init_db()
+    aid = '1111222233334444'
+    conn = db.get_connection()
+    assert type(conn) is sqlite3.Connection, "Disabled: plain connections"
+    conn.close()
+
+    query_profiler.reset()
+    query_profiler.enable(slow_ms=0)  # Every statement counts as slow
+    try:
+        w = db.get_connection()
+        w.executemany("INSERT INTO settings (account_id, key, value) VALUES (?, ?, ?)",
+                      [(aid, f"k{i}", str(i)) for i in range(10)])
+        w.commit()
+        w.close()
+        settings = db.get_settings(['k1', 'k2', 'k3'], override_account_id=aid)
+        assert settings == {'k1': '1', 'k2': '2', 'k3': '3'}
+        db.get_settings(['k4'], override_account_id=aid)
+        db.get_maintenance_log()
+    finally:
+        query_profiler.disable()
+
+    fns = query_profiler.function_stats().set_index('function')
+    assert fns.loc['get_settings', 'calls'] == 2 and fns.loc['get_settings', 'rows'] == 4
+    assert fns.loc['test_regression.test_query_profiler', 'rows'] == 10, "executemany rowcount, caller outside database.py"
+    assert fns.loc['get_maintenance_log', 'statements'] >= 2, "Trace callback counts pandas' statements too"
+    stmts = query_profiler.statement_stats()
+    by_settings = stmts[stmts['sql'].str.contains("FROM settings WHERE")]
+    assert len(by_settings) == 1 and by_settings.iloc[0]['calls'] == 2
+    assert query_profiler.normalize_sql("SELECT *\n FROM t WHERE id IN (?, ?,?)") == "SELECT * FROM t WHERE id IN (?, ...)"
+    assert sum(query_profiler.histogram('function', 'get_settings').values()) == 2
+
+    slow = db.get_slow_query_log()
+    select = slow[slow['sql'].str.contains("FROM settings WHERE")].iloc[0]
+    assert select['function'] == 'get_settings' and "settings" in select['plan']
+    assert slow[slow['sql'].str.startswith("INSERT")].iloc[0]['plan'] == ""
+    assert len(query_profiler.recent_slow_queries()) == len(slow)
+
+    calls = query_profiler.summary()['calls']
+    db.get_settings(['k1'], override_account_id=aid)
+    assert query_profiler.summary()['calls'] == calls, "Nothing recorded while disabled"
+    assert db.clear_slow_query_log()[0] and db.get_slow_query_log().empty
+    query_profiler.reset()
+    print("Query Profiler Verified.")
+
+def test_page_section_profiler(tmp_path, monkeypatch):
+    print("\n--- Testing Page Section Profiler ---")
+    import pstats
+    import time
+    import ui_components as ui
+
+    db.DB_NAME = str(tmp_path / "pages.db")
+    db.init_db()
+    monkeypatch.setattr(ui, "PAGE_STATS_FLUSH", 3600)
+    ui.flush_page_stats()
+    st.session_state.pop('_page_run', None)
+    with ui.profile_section("Outside a page run"):  # Scripts / tests: a no-op
+        pass
+    assert ui.flush_page_stats() == (True, "Nothing to flush.")
+
+    @ui.profiled("Data processing: totals")
+    def totals(rows):
+        time.sleep(0.002)
+        return sum(rows)
+
+    ui.request_page_cprofile()
+    for _ in range(3):  # Three reruns of the same page
+        ui._begin_page_run("4_Dashboard.py")
+        with ui.profile_section("DB fetch: sales"):
+            time.sleep(0.005)
+        with ui.profile_section("Render: charts"):
+            with ui.profile_section("Render: legend"):
+                assert totals([1, 2, 3]) == 6
+    ui._begin_page_run("2_POS.py")  # Closes the third Dashboard run
+
+    succ, msg = ui.flush_page_stats()
+    assert succ, msg
+    stats = db.get_page_render_stats("4_Dashboard.py").set_index('section')
+    assert set(stats.index) == {"DB fetch: sales", "Render: charts", "Render: charts / Render: legend",
+                                "Render: charts / Render: legend / Data processing: totals", "(whole run)"}
+    assert (stats['calls'] == 3).all()
+    assert stats.loc["DB fetch: sales", 'avg_ms'] >= 5 and stats.loc["DB fetch: sales", 'p95_ms'] >= 5
+    assert stats.loc["(whole run)", 'avg_ms'] >= stats.loc["DB fetch: sales", 'avg_ms'] + stats.loc["Render: charts", 'avg_ms'] * 0.99
+
+    # Later flushes merge into the stored rows
+    ui._begin_page_run("4_Dashboard.py")
+    with ui.profile_section("DB fetch: sales"):
+        pass
+    ui.flush_page_stats()
+    assert db.get_page_render_stats("4_Dashboard.py").set_index('section').loc["DB fetch: sales", 'calls'] == 4
+
+    # The requested cProfile capture covers exactly one run
+    profiles = ui.list_page_profiles()
+    assert len(profiles) == 1 and os.path.basename(profiles[0]).startswith("4_Dashboard_")
+    funcs = {fn for (_, _, fn) in pstats.Stats(profiles[0]).stats}
+    assert 'totals' in funcs and '<built-in method time.sleep>' in funcs
+    assert db.clear_page_render_stats()[0] and db.get_page_render_stats().empty
+    st.session_state.pop('_page_run', None)
+    print("Page Section Profiler Verified.")
+
+def test_load_harness(tmp_path, monkeypatch):
+    print("\n--- Testing Load Harness ---")
+    import load_test
+
+    load_test.seed_database(str(tmp_path / "load.db"), customers=50, history=200, tables=4)
+    report = load_test.run_load(clients=4, duration=1.0, mix='mixed', seed=7)
+    ops = report['operations']
+    assert set(ops) == set(load_test.MIXES['mixed']) and all(op['calls'] > 0 for op in ops.values())
+    assert report['ops'] == sum(op['calls'] for op in ops.values()) and report['throughput'] > 0
+    for op in ops.values():
+        assert op['failed'] == 0 and op['lock_timeouts'] == 0
+        assert op['p50_ms'] <= op['p95_ms'] <= op['p99_ms'] <= op['max_ms']
+    checks = report['checks']
+    assert checks['units_sold'] > 0 and checks['units_sold'] == checks['stock_drop'], "Sales deduct stock exactly"
+    assert checks['table_items_added'] > 0
+
+    # A writer holding the lock past the busy timeout shows up as lock timeouts, not crashes
+    monkeypatch.setattr(db, "BUSY_TIMEOUT", 0.05)
+    blocker = sqlite3.connect(db.DB_NAME)
+    blocker.execute("BEGIN IMMEDIATE")
+    try:
+        report = load_test.run_load(clients=2, duration=0.3, mix={'pos_sale': 1}, seed=7)
+    finally:
+        blocker.rollback()
+        blocker.close()
+    sale = report['operations']['pos_sale']
+    assert sale['calls'] > 0 and sale['failed'] == sale['calls'] == sale['lock_timeouts']
+    assert report['checks']['units_sold'] == report['checks']['stock_drop'] == 0
+    print("Load Harness Verified.")